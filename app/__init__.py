@@ -27,7 +27,20 @@ db = SQLAlchemy()
 login_manager = LoginManager()
 login_manager.login_view = "auth.login"
 storage_uri = os.getenv("RATELIMIT_STORAGE_URI", "memory://")
-limiter = Limiter(key_func=get_remote_address, storage_uri=storage_uri)
+
+
+def _record_rate_limit_breach(limit) -> None:
+    """Count a Flask-Limiter rejection in the metrics registry."""
+    from app.services.metrics import record_rate_limit_breach
+
+    record_rate_limit_breach(limit)
+
+
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=storage_uri,
+    on_breach=_record_rate_limit_breach,
+)
 socketio = None
 
 
@@ -406,6 +419,17 @@ def create_app(args=None):
     app.config["MAILGUN_INBOUND_STORAGE_DIR"] = os.getenv(
         "MAILGUN_INBOUND_STORAGE_DIR", ""
     )
+    app.config["ATTACHMENT_STORE_FOLDER"] = (
+        os.getenv("ATTACHMENT_STORE_FOLDER")
+        or app.config["MAILGUN_INBOUND_STORAGE_DIR"]
+        or os.path.join(app.config["UPLOAD_FOLDER"], "attachments")
+    )
+    app.config["ATTACHMENT_GC_INTERVAL_HOURS"] = float(
+        os.getenv("ATTACHMENT_GC_INTERVAL_HOURS", "24")
+    )
+    app.config["ATTACHMENT_GC_GRACE_HOURS"] = float(
+        os.getenv("ATTACHMENT_GC_GRACE_HOURS", "24")
+    )
     app.config["POS_IMPORT_INGEST_MODE"] = os.getenv(
         "POS_IMPORT_INGEST_MODE", "webhook"
     )
@@ -415,6 +439,60 @@ def create_app(args=None):
     app.config["POS_IMPORT_POLL_INTERVAL_SECONDS"] = int(
         os.getenv("POS_IMPORT_POLL_INTERVAL_SECONDS", "3600")
     )
+    app.config["STOCK_SNAPSHOT_INTERVAL_HOURS"] = float(
+        os.getenv("STOCK_SNAPSHOT_INTERVAL_HOURS", "24")
+    )
+    app.config["RESULT_STORE_TTL_HOURS"] = float(
+        os.getenv("RESULT_STORE_TTL_HOURS", "12")
+    )
+    app.config["TERMINAL_SALES_PDF_WORKERS"] = int(
+        os.getenv("TERMINAL_SALES_PDF_WORKERS", "2")
+    )
+    app.config["TERMINAL_SALES_PDF_PARALLEL_PAGES"] = int(
+        os.getenv("TERMINAL_SALES_PDF_PARALLEL_PAGES", "16")
+    )
+    app.config["TERMINAL_SALES_PDF_CACHE_SIZE"] = int(
+        os.getenv("TERMINAL_SALES_PDF_CACHE_SIZE", "32")
+    )
+    app.config["MAIL_POOL_SIZE"] = int(os.getenv("MAIL_POOL_SIZE", "4"))
+    app.config["MAIL_POOL_IDLE_SECONDS"] = float(
+        os.getenv("MAIL_POOL_IDLE_SECONDS", "60")
+    )
+    app.config["MAIL_SEND_ATTEMPTS"] = int(os.getenv("MAIL_SEND_ATTEMPTS", "3"))
+    app.config["ACTIVITY_LOG_QUEUE_SIZE"] = int(
+        os.getenv("ACTIVITY_LOG_QUEUE_SIZE", "10000")
+    )
+    app.config["ACTIVITY_LOG_BATCH_SIZE"] = int(
+        os.getenv("ACTIVITY_LOG_BATCH_SIZE", "200")
+    )
+    app.config["ACTIVITY_LOG_FLUSH_INTERVAL"] = float(
+        os.getenv("ACTIVITY_LOG_FLUSH_INTERVAL", "0.25")
+    )
+    app.config["ACTIVITY_LOG_ENQUEUE_TIMEOUT"] = float(
+        os.getenv("ACTIVITY_LOG_ENQUEUE_TIMEOUT", "0.05")
+    )
+    app.config["ACTIVITY_LOG_RETENTION_DAYS"] = int(
+        os.getenv("ACTIVITY_LOG_RETENTION_DAYS", "180")
+    )
+    app.config["ACTIVITY_LOG_PURGE_BATCH_SIZE"] = int(
+        os.getenv("ACTIVITY_LOG_PURGE_BATCH_SIZE", "500")
+    )
+    app.config["ACTIVITY_RETENTION_INTERVAL_HOURS"] = float(
+        os.getenv("ACTIVITY_RETENTION_INTERVAL_HOURS", "24")
+    )
+    app.config["ACTIVITY_ARCHIVE_FOLDER"] = os.getenv(
+        "ACTIVITY_ARCHIVE_FOLDER", os.path.join(base_dir, "activity_archive")
+    )
+    app.config["ANALYTICS_EXPORT_FOLDER"] = os.getenv(
+        "ANALYTICS_EXPORT_FOLDER", os.path.join(base_dir, "analytics_export")
+    )
+    app.config["ANALYTICS_EXPORT_REFRESH_DAYS"] = int(
+        os.getenv("ANALYTICS_EXPORT_REFRESH_DAYS", "35")
+    )
+    refresh_hour = os.getenv("PURCHASE_RECOMMENDATION_REFRESH_HOUR", "2")
+    app.config["PURCHASE_RECOMMENDATION_REFRESH_HOUR"] = (
+        int(refresh_hour) if refresh_hour.strip() else None
+    )
     app.config["POS_IMPORT_IMAP_HOST"] = os.getenv("POS_IMPORT_IMAP_HOST", "")
     app.config["POS_IMPORT_IMAP_PORT"] = int(os.getenv("POS_IMPORT_IMAP_PORT", "993"))
     app.config["POS_IMPORT_IMAP_USERNAME"] = os.getenv("POS_IMPORT_IMAP_USERNAME", "")
@@ -433,6 +511,8 @@ def create_app(args=None):
     app.config["POS_IMPORT_API_ACK_PATH_TEMPLATE"] = os.getenv(
         "POS_IMPORT_API_ACK_PATH_TEMPLATE", "/messages/{message_id}/ack"
     )
+    app.config["METRICS_ENABLED"] = _get_bool_env("METRICS_ENABLED", default=True)
+    app.config["METRICS_TOKEN"] = os.getenv("METRICS_TOKEN", "")
     app.config.setdefault(
         "RESTORE_REQUIRED_TABLES",
         ["setting", "user", "invoice", "transfer"],
@@ -469,6 +549,7 @@ def create_app(args=None):
 
     Migrate(app, db)
     login_manager.init_app(app)
+    app.config["RATELIMIT_ENABLED"] = _get_bool_env("RATELIMIT_ENABLED", default=True)
     if app.config.get("TESTING"):
         app.config["RATELIMIT_ENABLED"] = False
     limiter.init_app(app)
@@ -643,6 +724,7 @@ def create_app(args=None):
         from app.routes.mailgun_routes import mailgun
         from app.routes.main_routes import main
         from app.routes.menu_routes import menu as menu_bp
+        from app.routes.metrics_routes import metrics_bp
         from app.routes.note_routes import notes
         from app.routes.preferences_routes import preferences
         from app.routes.product_routes import product
@@ -671,6 +753,18 @@ def create_app(args=None):
         app.register_blueprint(event)
         app.register_blueprint(glcode_bp)
         app.register_blueprint(preferences)
+        app.register_blueprint(metrics_bp)
+
+        from app.services import metrics as metrics_service
+
+        metrics_service.init_app(app)
+
+        from app.services import stock_ledger
+
+        stock_ledger.install_listeners()
+        from app.services import product_last_sold
+
+        product_last_sold.install_listeners()
         from sqlalchemy.exc import OperationalError
 
         from app.models import Setting
@@ -708,6 +802,13 @@ def create_app(args=None):
                 parse_conversion_setting,
             )
             from app.services.pos_sales_polling import start_pos_sales_mailbox_poller
+            from app.services.purchase_recommendations import (
+                start_recommendation_refresh_thread,
+            )
+            from app.services.activity_retention import (
+                start_activity_retention_thread,
+            )
+            from app.services.attachment_store import start_attachment_gc_thread
 
             app.config["AUTO_BACKUP_ENABLED"] = (
                 auto_setting.value == "1" if auto_setting else False
@@ -741,6 +842,10 @@ def create_app(args=None):
             )
             start_auto_backup_thread(app)
             start_pos_sales_mailbox_poller(app)
+            stock_ledger.start_stock_snapshot_thread(app)
+            start_recommendation_refresh_thread(app)
+            start_activity_retention_thread(app)
+            start_attachment_gc_thread(app)
         except OperationalError:
             pass
 
@@ -801,6 +801,7 @@ class SetPasswordForm(FlaskForm):
 
 class ImportItemsForm(FlaskForm):
     file = FileField("Item File", validators=[FileRequired()])
+    dry_run = BooleanField("Preview only")
     submit = SubmitField("Import")
 
 
@@ -1378,6 +1379,7 @@ class ImportForm(FlaskForm):
         "CSV File",
         validators=[FileRequired(), FileAllowed({"csv"}, "CSV only!")],
     )
+    dry_run = BooleanField("Preview only")
     submit = SubmitField("Import")
 
 
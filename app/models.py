@@ -5,8 +5,7 @@ from typing import Optional
 from flask import current_app, has_app_context
 from flask_login import UserMixin
 from sqlalchemy import ForeignKeyConstraint, func, select
-from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import query_expression, relationship
 
 from app import db
 
@@ -222,7 +221,10 @@ class Item(db.Model):
     )
 
     def purchase_gl_code_for_location(self, location_id: int):
-        """Return the purchase GL code for this item at a specific location."""
+        """Return the purchase GL code for this item at a specific location.
+
+        Use ``app.services.gl_resolution`` when resolving many items at once.
+        """
         lsi = LocationStandItem.query.filter_by(
             location_id=location_id, item_id=self.id
         ).first()
@@ -439,6 +441,11 @@ class Product(db.Model):
         db.Integer, db.ForeignKey("gl_code.id"), nullable=True
     )
     sales_gl_code = relationship("GLCode", foreign_keys=[sales_gl_code_id])
+    # Latest invoice, terminal sale, sales fact or approved POS import sale;
+    # kept up to date by app.services.product_last_sold.
+    last_sold_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (db.Index("ix_product_last_sold_at", "last_sold_at"),)
 
     # Define a one-to-many relationship with InvoiceProduct
     invoice_products = relationship("InvoiceProduct", back_populates="product")
@@ -462,18 +469,6 @@ class Product(db.Model):
         "Menu", secondary=menu_products, back_populates="products"
     )
 
-    @hybrid_property
-    def last_sold_at(self):
-        """Return the most recent sale date from invoices or terminal sales."""
-        dates = [
-            ip.invoice.date_created
-            for ip in self.invoice_products
-            if ip.invoice and ip.invoice.date_created
-        ]
-        dates.extend(ts.sold_at for ts in self.terminal_sales if ts.sold_at)
-        return max(dates) if dates else None
-
-
     @property
     def food_cost_percentage(self) -> float:
         """Return the food cost as a percentage of the price before tax."""
@@ -601,6 +596,8 @@ class InvoiceProduct(db.Model):
         db.Boolean, nullable=True
     )  # True = apply PST, False = exempt, None = fallback to customer
 
+    __table_args__ = (db.Index("ix_invoice_product_product_id", "product_id"),)
+
 
 class ProductRecipeItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -621,6 +618,203 @@ class ProductRecipeItem(db.Model):
     unit = relationship("ItemUnit")
 
 
+class ProductCostHistory(db.Model):
+    """Audit trail of product cost changes driven by recipe costing."""
+
+    __tablename__ = "product_cost_history"
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(
+        db.Integer,
+        db.ForeignKey("product.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    previous_cost = db.Column(db.Float, nullable=True)
+    cost = db.Column(db.Float, nullable=False)
+    source = db.Column(db.String(50), nullable=False)
+    changed_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        server_default=func.now(),
+    )
+
+    product = relationship(
+        "Product",
+        backref=db.backref(
+            "cost_history",
+            cascade="all, delete-orphan",
+            passive_deletes=True,
+            order_by="ProductCostHistory.changed_at",
+        ),
+    )
+
+    __table_args__ = (
+        db.Index(
+            "ix_product_cost_history_product_changed",
+            "product_id",
+            "changed_at",
+        ),
+    )
+
+
+class StockMovement(db.Model):
+    """Append-only ledger entry for a change in on-hand quantity.
+
+    Rows with a ``location_id`` track ``LocationStandItem.expected_count``;
+    rows without one track the item-wide ``Item.quantity`` balance. Quantities
+    are signed deltas in the item's base unit.
+    """
+
+    __tablename__ = "stock_movement"
+
+    id = db.Column(db.Integer, primary_key=True)
+    location_id = db.Column(
+        db.Integer, db.ForeignKey("location.id"), nullable=True
+    )
+    item_id = db.Column(db.Integer, db.ForeignKey("item.id"), nullable=False)
+    quantity = db.Column(db.Float, nullable=False)
+    movement_type = db.Column(db.String(32), nullable=False)
+    reference_type = db.Column(db.String(32), nullable=True)
+    reference_id = db.Column(db.String(64), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
+    occurred_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        server_default=func.now(),
+    )
+
+    __table_args__ = (
+        db.Index(
+            "ix_stock_movement_location_item_occurred",
+            "location_id",
+            "item_id",
+            "occurred_at",
+        ),
+        db.Index("ix_stock_movement_item_occurred", "item_id", "occurred_at"),
+        db.Index("ix_stock_movement_occurred", "occurred_at"),
+    )
+
+
+class StockSnapshot(db.Model):
+    """Checkpoint of ledger balances up to ``last_movement_id``."""
+
+    __tablename__ = "stock_snapshot"
+
+    id = db.Column(db.Integer, primary_key=True)
+    snapshot_at = db.Column(db.DateTime, nullable=False, index=True)
+    last_movement_id = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        server_default=func.now(),
+    )
+
+    lines = relationship(
+        "StockSnapshotLine",
+        back_populates="snapshot",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+
+class StockSnapshotLine(db.Model):
+    """Balance of one item (optionally at one location) in a snapshot."""
+
+    __tablename__ = "stock_snapshot_line"
+
+    id = db.Column(db.Integer, primary_key=True)
+    snapshot_id = db.Column(
+        db.Integer,
+        db.ForeignKey("stock_snapshot.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    location_id = db.Column(db.Integer, nullable=True)
+    item_id = db.Column(db.Integer, nullable=False)
+    quantity = db.Column(db.Float, nullable=False)
+
+    snapshot = relationship("StockSnapshot", back_populates="lines")
+
+    __table_args__ = (
+        db.Index(
+            "ix_stock_snapshot_line_snapshot_location_item",
+            "snapshot_id",
+            "location_id",
+            "item_id",
+        ),
+    )
+
+
+class PurchaseRecommendationRun(db.Model):
+    """A precomputed set of purchase order recommendations.
+
+    Runs use the default forecast settings; only the latest run is kept.
+    """
+
+    __tablename__ = "purchase_recommendation_run"
+
+    id = db.Column(db.Integer, primary_key=True)
+    generated_at = db.Column(db.DateTime, nullable=False, index=True)
+    lookback_days = db.Column(db.Integer, nullable=False)
+    method = db.Column(
+        db.String(20), nullable=False, default="average", server_default="average"
+    )
+    line_count = db.Column(db.Integer, nullable=False, default=0)
+
+    lines = relationship(
+        "PurchaseRecommendationLine",
+        back_populates="run",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+
+class PurchaseRecommendationLine(db.Model):
+    """Forecast history for one item at one location in a run.
+
+    Open purchase orders change during the day, so they are not stored;
+    queries fill ``open_po_qty`` with the current totals when serving.
+    """
+
+    __tablename__ = "purchase_recommendation_line"
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(
+        db.Integer,
+        db.ForeignKey("purchase_recommendation_run.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    item_id = db.Column(db.Integer, db.ForeignKey("item.id"), nullable=False)
+    location_id = db.Column(
+        db.Integer, db.ForeignKey("location.id"), nullable=False
+    )
+    sales_qty = db.Column(db.Float, nullable=False, default=0.0)
+    transfer_in_qty = db.Column(db.Float, nullable=False, default=0.0)
+    transfer_out_qty = db.Column(db.Float, nullable=False, default=0.0)
+    invoice_qty = db.Column(db.Float, nullable=False, default=0.0)
+    base_consumption = db.Column(db.Float, nullable=False, default=0.0)
+    default_unit_id = db.Column(db.Integer, nullable=True)
+    last_activity_at = db.Column(db.DateTime, nullable=True)
+    open_po_qty = query_expression()
+
+    run = relationship("PurchaseRecommendationRun", back_populates="lines")
+    item = relationship("Item")
+    location = relationship("Location")
+
+    __table_args__ = (
+        db.Index(
+            "ix_purchase_recommendation_line_run_location",
+            "run_id",
+            "location_id",
+        ),
+        db.Index(
+            "ix_purchase_recommendation_line_run_item", "run_id", "item_id"
+        ),
+    )
+
+
 class PurchaseOrder(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     vendor_id = db.Column(
@@ -634,6 +828,7 @@ class PurchaseOrder(db.Model):
     expected_total_cost = db.Column(db.Float, nullable=True)
     delivery_charge = db.Column(db.Float, nullable=False, default=0.0)
     received = db.Column(db.Boolean, default=False, nullable=False)
+    source_attachment_sha256 = db.Column(db.String(64), nullable=True)
     items = relationship(
         "PurchaseOrderItem",
         backref="purchase_order",
@@ -750,7 +945,10 @@ class PurchaseInvoiceItem(db.Model):
         return self.quantity * (abs(self.cost) + abs(self.container_deposit))
 
     def resolved_purchase_gl_code(self, location_id: Optional[int] = None):
-        """Return the effective purchase GL code for this invoice line."""
+        """Return the effective purchase GL code for this invoice line.
+
+        Use ``app.services.gl_resolution`` when resolving many lines at once.
+        """
         if self.purchase_gl_code:
             return self.purchase_gl_code
 
@@ -820,6 +1018,28 @@ class ActivityLog(db.Model):
 
     user = relationship("User", backref="activity_logs")
 
+    __table_args__ = (db.Index("ix_activity_log_timestamp", "timestamp"),)
+
+
+class ActivityLogRollup(db.Model):
+    """Daily activity counts per user and action kept after logs are archived."""
+
+    __tablename__ = "activity_log_rollup"
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("user.id", ondelete="SET NULL"), nullable=True
+    )
+    action = db.Column(db.String(64), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    user = relationship("User")
+
+    __table_args__ = (
+        db.Index("ix_activity_log_rollup_day_user_action", "day", "user_id", "action"),
+    )
+
 
 class Note(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -870,6 +1090,12 @@ class Event(db.Model):
     locations = relationship(
         "EventLocation", back_populates="event", cascade="all, delete-orphan"
     )
+    close_summary = relationship(
+        "EventCloseSummary",
+        back_populates="event",
+        cascade="all, delete-orphan",
+        uselist=False,
+    )
 
 
 class EventLocation(db.Model):
@@ -929,6 +1155,10 @@ class TerminalSale(db.Model):
     )
     product = relationship("Product", back_populates="terminal_sales")
 
+    __table_args__ = (
+        db.Index("ix_terminal_sale_product_sold_at", "product_id", "sold_at"),
+    )
+
 
 class EventLocationTerminalSalesSummary(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -954,6 +1184,71 @@ class EventLocationTerminalSalesSummary(db.Model):
     )
 
 
+class SalesFact(db.Model):
+    """Terminal sales of a closed event, summed per day, location and product.
+
+    Rows are appended when an event closes and its ``TerminalSale`` rows are
+    removed; they are never updated afterwards.
+    """
+
+    __tablename__ = "sales_fact"
+
+    id = db.Column(db.Integer, primary_key=True)
+    sale_date = db.Column(db.Date, nullable=False)
+    location_id = db.Column(
+        db.Integer, db.ForeignKey("location.id"), nullable=False
+    )
+    product_id = db.Column(
+        db.Integer, db.ForeignKey("product.id"), nullable=False
+    )
+    event_id = db.Column(
+        db.Integer, db.ForeignKey("event.id", ondelete="SET NULL"), nullable=True
+    )
+    quantity = db.Column(db.Float, nullable=False, default=0.0)
+    amount = db.Column(db.Float, nullable=False, default=0.0)
+    last_sold_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(
+        db.DateTime, nullable=False, default=datetime.utcnow
+    )
+
+    location = relationship("Location")
+    product = relationship("Product")
+
+    __table_args__ = (
+        db.Index(
+            "ix_sales_fact_date_location_product",
+            "sale_date",
+            "location_id",
+            "product_id",
+        ),
+        db.Index("ix_sales_fact_product_date", "product_id", "sale_date"),
+        db.Index("ix_sales_fact_event", "event_id"),
+    )
+
+
+class EventCloseSummary(db.Model):
+    """Totals, variance and top products captured when an event closes."""
+
+    __tablename__ = "event_close_summary"
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(
+        db.Integer,
+        db.ForeignKey("event.id", ondelete="CASCADE"),
+        nullable=False,
+        unique=True,
+    )
+    closed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    terminal_quantity = db.Column(db.Float, nullable=False, default=0.0)
+    terminal_amount = db.Column(db.Float, nullable=False, default=0.0)
+    variance_quantity = db.Column(db.Float, nullable=False, default=0.0)
+    variance_cost = db.Column(db.Float, nullable=False, default=0.0)
+    location_totals = db.Column(db.JSON, nullable=True)
+    top_products = db.Column(db.JSON, nullable=True)
+
+    event = relationship("Event", back_populates="close_summary")
+
+
 class TerminalSaleProductAlias(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     source_name = db.Column(db.String(255), nullable=False)
@@ -996,6 +1291,7 @@ class TerminalSalesResolutionState(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     token_id = db.Column(db.String(128), nullable=False)
     payload = db.Column(db.JSON, nullable=False)
+    attachment_sha256 = db.Column(db.String(64), nullable=True)
     created_at = db.Column(
         db.DateTime,
         nullable=False,
@@ -1028,6 +1324,140 @@ class TerminalSalesResolutionState(db.Model):
     )
 
 
+class TerminalSalesStagedRow(db.Model):
+    """A parsed row of a terminal sales upload awaiting location mapping."""
+
+    __tablename__ = "terminal_sales_staged_row"
+
+    id = db.Column(db.Integer, primary_key=True)
+    state_id = db.Column(
+        db.Integer,
+        db.ForeignKey("terminal_sales_resolution_state.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    position = db.Column(db.Integer, nullable=False)
+    location = db.Column(db.String(255), nullable=False)
+    product = db.Column(db.String(255), nullable=True)
+    is_location_total = db.Column(
+        db.Boolean, default=False, nullable=False, server_default="0"
+    )
+    quantity = db.Column(db.Float, nullable=True)
+    price = db.Column(db.Float, nullable=True)
+    raw_price = db.Column(db.Float, nullable=True)
+    amount = db.Column(db.Float, nullable=True)
+    net_including_tax_total = db.Column(db.Float, nullable=True)
+    discount_total = db.Column(db.Float, nullable=True)
+
+    __table_args__ = (
+        db.Index(
+            "ix_terminal_sales_staged_row_state_position", "state_id", "position"
+        ),
+    )
+
+
+class TerminalSalesStagedSale(db.Model):
+    """A pending product sale from a terminal sales upload awaiting apply."""
+
+    __tablename__ = "terminal_sales_staged_sale"
+
+    id = db.Column(db.Integer, primary_key=True)
+    state_id = db.Column(
+        db.Integer,
+        db.ForeignKey("terminal_sales_resolution_state.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    position = db.Column(db.Integer, nullable=False)
+    event_location_id = db.Column(db.Integer, nullable=False)
+    product_id = db.Column(db.Integer, nullable=True)
+    product_name = db.Column(db.String(255), nullable=True)
+    source_name = db.Column(db.String(255), nullable=True)
+    normalized_name = db.Column(db.String(255), nullable=True)
+    product_price = db.Column(db.Float, nullable=True)
+    quantity = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        db.Index(
+            "ix_terminal_sales_staged_sale_state_position", "state_id", "position"
+        ),
+    )
+
+
+class TerminalSalesStagedTotal(db.Model):
+    """Pending location totals from a terminal sales upload awaiting apply."""
+
+    __tablename__ = "terminal_sales_staged_total"
+
+    id = db.Column(db.Integer, primary_key=True)
+    state_id = db.Column(
+        db.Integer,
+        db.ForeignKey("terminal_sales_resolution_state.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    position = db.Column(db.Integer, nullable=False)
+    event_location_id = db.Column(db.Integer, nullable=False)
+    source_location = db.Column(db.String(255), nullable=True)
+    total_quantity = db.Column(db.Float, nullable=True)
+    total_amount = db.Column(db.Float, nullable=True)
+    net_including_tax_total = db.Column(db.Float, nullable=True)
+    discount_total = db.Column(db.Float, nullable=True)
+    variance_details = db.Column(db.JSON, nullable=True)
+
+    __table_args__ = (
+        db.Index(
+            "ix_terminal_sales_staged_total_state_position", "state_id", "position"
+        ),
+    )
+
+
+class ResultStoreEntry(db.Model):
+    """Server-side payload referenced by an opaque token kept in the session."""
+
+    __tablename__ = "result_store_entry"
+
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(64), nullable=False, unique=True)
+    namespace = db.Column(db.String(64), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
+    payload = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        server_default=func.now(),
+    )
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class Attachment(db.Model):
+    """A stored file, kept once per distinct content in the attachment store.
+
+    ``ref_count`` counts the rows that point at the file through its
+    ``sha256``; files nothing refers to are removed by the collector in
+    :mod:`app.services.attachment_store`.
+    """
+
+    __tablename__ = "attachment"
+
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False, unique=True)
+    filename = db.Column(db.String(255), nullable=True)
+    size = db.Column(db.Integer, nullable=False)
+    stored_size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    created_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        server_default=func.now(),
+    )
+    last_referenced_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        server_default=func.now(),
+    )
+
+
 class PosSalesImport(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     source_provider = db.Column(db.String(100), nullable=False)
@@ -50,8 +50,7 @@ from app.forms import (
 )
 from app.models import (
     ActivityLog,
-    Customer,
-    GLCode,
+    ActivityLogRollup,
     Location,
     Invoice,
     Item,
@@ -79,23 +78,26 @@ from app.utils.backup import (
     start_auto_backup_thread,
     validate_backup_file_compatibility,
 )
-from app.utils.imports import (
-    _import_csv,
-    _import_items,
-    _import_locations,
-    _import_products,
+from app.services.bulk_import import (
+    MAX_ERRORS_SHOWN,
+    ImportValidationError,
+    import_file,
+    importer_for,
 )
+from app.services import activity_retention, pos_sales_review
 from app.services.purchase_imports import (
     normalize_vendor_alias_text,
     update_or_create_vendor_alias,
 )
+from app.services.stock_adjustments import StockAdjustments
+from app.services.stock_ledger import tag_movements
+from app.utils.pagination import build_pagination_args, get_per_page
 from app.utils.units import (
     DEFAULT_BASE_UNIT_CONVERSIONS,
     get_allowed_target_units,
     parse_conversion_setting,
     serialize_conversion_setting,
 )
-from app.utils.pos_import import normalize_pos_alias
 
 auth = Blueprint("auth", __name__)
 admin = Blueprint("admin", __name__)
@@ -770,12 +772,7 @@ def download_backup(filename):
     return send_from_directory(backups_dir, filename, as_attachment=True)
 
 
-@admin.route("/controlpanel/activity", methods=["GET"])
-@login_required
-def activity_logs():
-    """Display a log of user actions."""
-    if not current_user.is_admin:
-        abort(403)
+def _activity_filter_form() -> ActivityLogFilterForm:
     form = ActivityLogFilterForm(meta={"csrf": False})
     user_choices = [(-1, "All Users"), (-2, "System Activity")]
     user_choices.extend(
@@ -785,6 +782,16 @@ def activity_logs():
     form.process(request.args)
     if form.user_id.data is None:
         form.user_id.data = -1
+    return form
+
+
+@admin.route("/controlpanel/activity", methods=["GET"])
+@login_required
+def activity_logs():
+    """Display a log of user actions."""
+    if not current_user.is_admin:
+        abort(403)
+    form = _activity_filter_form()
 
     query = ActivityLog.query.options(selectinload(ActivityLog.user))
 
@@ -807,8 +814,72 @@ def activity_logs():
         end_dt = datetime.combine(form.end_date.data, datetime.max.time())
         query = query.filter(ActivityLog.timestamp <= end_dt)
 
-    logs = query.order_by(ActivityLog.timestamp.desc()).all()
-    return render_template("admin/activity_logs.html", logs=logs, form=form)
+    per_page = get_per_page(default=100)
+    logs = query.order_by(ActivityLog.timestamp.desc(), ActivityLog.id.desc()).paginate(
+        page=request.args.get("page", 1, type=int), per_page=per_page
+    )
+    return render_template(
+        "admin/activity_logs.html",
+        logs=logs,
+        form=form,
+        pagination_args=build_pagination_args(per_page),
+    )
+
+
+@admin.route("/controlpanel/activity/archive", methods=["GET"])
+@login_required
+def activity_archive():
+    """Search archived activity and the daily per-user, per-action counts."""
+    if not current_user.is_admin:
+        abort(403)
+    form = _activity_filter_form()
+    user_filter = form.user_id.data
+    user_id = user_filter if user_filter not in (None, -1, -2) else None
+
+    entries = activity_retention.search_archive(
+        current_app.config["ACTIVITY_ARCHIVE_FOLDER"],
+        user_id=user_id,
+        system_only=user_filter == -2,
+        activity=form.activity.data,
+        start=form.start_date.data,
+        end=form.end_date.data,
+    )
+
+    total = db.func.sum(ActivityLogRollup.count)
+    rollups = db.session.query(
+        ActivityLogRollup.user_id,
+        User.email,
+        ActivityLogRollup.action,
+        total.label("count"),
+        db.func.min(ActivityLogRollup.day).label("first_day"),
+        db.func.max(ActivityLogRollup.day).label("last_day"),
+    ).outerjoin(User, User.id == ActivityLogRollup.user_id)
+    if user_filter == -2:
+        rollups = rollups.filter(ActivityLogRollup.user_id.is_(None))
+    elif user_id is not None:
+        rollups = rollups.filter(ActivityLogRollup.user_id == user_id)
+    activity_filter = (form.activity.data or "").strip()
+    if activity_filter:
+        rollups = rollups.filter(ActivityLogRollup.action.ilike(f"%{activity_filter}%"))
+    if form.start_date.data:
+        rollups = rollups.filter(ActivityLogRollup.day >= form.start_date.data)
+    if form.end_date.data:
+        rollups = rollups.filter(ActivityLogRollup.day <= form.end_date.data)
+    rollups = (
+        rollups.group_by(ActivityLogRollup.user_id, User.email, ActivityLogRollup.action)
+        .order_by(total.desc(), ActivityLogRollup.action)
+        .limit(activity_retention.SEARCH_LIMIT)
+        .all()
+    )
+
+    return render_template(
+        "admin/activity_archive.html",
+        form=form,
+        entries=entries,
+        rollups=rollups,
+        search_limit=activity_retention.SEARCH_LIMIT,
+        retention_days=current_app.config.get("ACTIVITY_LOG_RETENTION_DAYS"),
+    )
 
 
 @admin.route("/controlpanel/system", methods=["GET"])
@@ -900,48 +971,30 @@ def import_data(data_type):
     path = os.path.join(upload_dir, filename)
     file.save(path)
 
+    dry_run = bool(form.dry_run.data)
     try:
-        if data_type == "locations":
-            count = _import_locations(path)
-        elif data_type == "products":
-            count = _import_products(path)
-        elif data_type == "gl_codes":
-            count = _import_csv(
-                path, GLCode, {"code": "code", "description": "description"}
-            )
-        elif data_type == "items":
-            count = _import_items(path)
-        elif data_type == "customers":
-            count = _import_csv(
-                path,
-                Customer,
-                {
-                    "first_name": "first_name",
-                    "last_name": "last_name",
-                },
-            )
-        elif data_type == "vendors":
-            count = _import_csv(
-                path,
-                Vendor,
-                {
-                    "first_name": "first_name",
-                    "last_name": "last_name",
-                },
-            )
-        elif data_type == "users":
-            count = _import_csv(
-                path, User, {"email": "email", "password": "password"}
-            )
-        else:
-            abort(400)
-    except ValueError as exc:
-        flash(str(exc), "error")
+        report = import_file(importer_for(data_type), path, dry_run=dry_run)
+    except ImportValidationError as exc:
+        db.session.rollback()
+        for issue in exc.report.errors[:MAX_ERRORS_SHOWN]:
+            flash(str(issue), "error")
+        hidden = len(exc.report.errors) - MAX_ERRORS_SHOWN
+        if hidden > 0:
+            flash(f"{hidden} more rows have errors.", "error")
+        flash("Nothing was imported.", "error")
         return redirect(url_for("admin.import_page"))
     finally:
         if os.path.exists(path):
             os.remove(path)
-    flash(f'Imported {count} {data_type.replace("_", " ")}.', "success")
+    if dry_run:
+        return render_template(
+            "admin/import_preview.html",
+            report=report,
+            label=data_type.replace("_", " "),
+        )
+    db.session.commit()
+    log_activity(f"Imported {data_type}: {report.summary()}")
+    flash(report.summary(), "success")
     return redirect(url_for("admin.import_page"))
 
 
@@ -1298,6 +1351,30 @@ def _parse_sales_import_approval_changes(row: PosSalesImportRow) -> list[dict]:
     return [change for change in changes if isinstance(change, dict)]
 
 
+def _sales_import_change_payload(
+    stand_change, item_change, quantity_key: str, quantity: float
+) -> dict:
+    """Describe an applied sales import change for the row's metadata."""
+
+    def _balances(change):
+        if change is None or change.after is None:
+            return 0.0, (change.quantity if change is not None else quantity)
+        return change.before, change.after
+
+    expected_before, expected_after = _balances(stand_change)
+    item_before, item_after = _balances(item_change)
+    return {
+        "item_id": item_change.item_id,
+        "location_id": stand_change.location_id if stand_change else None,
+        "location_stand_item_id": stand_change.record_id if stand_change else None,
+        "expected_count_before": expected_before,
+        "expected_count_after": expected_after,
+        "item_quantity_before": item_before,
+        "item_quantity_after": item_after,
+        quantity_key: quantity,
+    }
+
+
 def _check_negative_sales_import_reverse(import_record: PosSalesImport) -> list[str]:
     """Return warnings if reversing an approved import could cause negative inventory."""
 
@@ -1369,9 +1446,6 @@ def sales_import_detail(import_id: int):
 
     sales_import = (
         PosSalesImport.query.options(
-            selectinload(PosSalesImport.locations)
-            .selectinload(PosSalesImportLocation.rows)
-            .selectinload(PosSalesImportRow.product),
             selectinload(PosSalesImport.locations).selectinload(PosSalesImportLocation.location),
             selectinload(PosSalesImport.approver),
             selectinload(PosSalesImport.reverser),
@@ -1382,14 +1456,8 @@ def sales_import_detail(import_id: int):
     )
 
     def _refresh_import_mapping_status() -> tuple[int, int]:
-        unresolved_location_count = sum(
-            1 for location in sales_import.locations if location.location_id is None
-        )
-        unresolved_row_count = sum(
-            1
-            for location in sales_import.locations
-            for row in location.rows
-            if row.product_id is None
+        unresolved_location_count, unresolved_row_count = (
+            pos_sales_review.unresolved_counts(db.session, sales_import.id)
         )
         next_status = (
             "needs_mapping"
@@ -1405,85 +1473,16 @@ def sales_import_detail(import_id: int):
         return unresolved_location_count, unresolved_row_count
 
     def _apply_auto_mappings() -> bool:
-        changed = False
-
-        exact_location_lookup = {
-            (location.name or "").strip().casefold(): location.id
-            for location in Location.query.all()
-            if location.name
-        }
-        exact_product_lookup = {
-            (product.name or "").strip().casefold(): product.id
-            for product in Product.query.all()
-            if product.name
-        }
-
-        location_alias_lookup = {
-            alias.normalized_name: alias.location_id
-            for alias in TerminalSaleLocationAlias.query.all()
-            if alias.normalized_name and alias.location_id
-        }
-        product_alias_lookup = {
-            alias.normalized_name: alias.product_id
-            for alias in TerminalSaleProductAlias.query.all()
-            if alias.normalized_name and alias.product_id
-        }
-
-        normalized_location_lookup = {
-            normalize_pos_alias(location.name or ""): location.id
-            for location in Location.query.all()
-            if location.name
-        }
-        normalized_product_lookup = {
-            normalize_pos_alias(product.name or ""): product.id
-            for product in Product.query.all()
-            if product.name
-        }
-
-        for location in sales_import.locations:
-            if location.location_id is None:
-                exact_key = (location.source_location_name or "").strip().casefold()
-                normalized_key = location.normalized_location_name or normalize_pos_alias(
-                    location.source_location_name or ""
-                )
-                matched_location_id = exact_location_lookup.get(exact_key)
-                if matched_location_id is None and normalized_key:
-                    matched_location_id = location_alias_lookup.get(normalized_key)
-                if matched_location_id is None and normalized_key:
-                    matched_location_id = normalized_location_lookup.get(normalized_key)
-                if matched_location_id is not None:
-                    location.location_id = matched_location_id
-                    changed = True
-
-            for row in location.rows:
-                if row.product_id is not None:
-                    continue
-                exact_key = (row.source_product_name or "").strip().casefold()
-                normalized_key = row.normalized_product_name or normalize_pos_alias(
-                    row.source_product_name or ""
-                )
-                matched_product_id = exact_product_lookup.get(exact_key)
-                if matched_product_id is None and normalized_key:
-                    matched_product_id = product_alias_lookup.get(normalized_key)
-                if matched_product_id is None and normalized_key:
-                    matched_product_id = normalized_product_lookup.get(normalized_key)
-                if matched_product_id is not None:
-                    row.product_id = matched_product_id
-                    changed = True
-
-        return changed
+        if not pos_sales_review.auto_map(db.session, sales_import.id):
+            return False
+        db.session.expire(sales_import, ["locations"])
+        return True
 
     def _collect_mapping_state(
         import_record: PosSalesImport,
     ) -> tuple[int, int, list[str]]:
-        unresolved_location_count = sum(
-            1 for location in import_record.locations if location.location_id is None
-        )
-        unresolved_row_count = sum(
-            1
-            for location in import_record.locations
-            for row in location.rows
-            if row.product_id is None
+        unresolved_location_count, unresolved_row_count = (
+            pos_sales_review.unresolved_counts(db.session, import_record.id)
         )
         errors: list[str] = []
         if unresolved_location_count:
@@ -1515,9 +1514,9 @@ def sales_import_detail(import_id: int):
                 flash("Select a location to map.", "warning")
             else:
                 normalized_key = location_record.normalized_location_name
-                for scoped_location in sales_import.locations:
-                    if scoped_location.normalized_location_name == normalized_key:
-                        scoped_location.location_id = target_location_id
+                pos_sales_review.map_location_name(
+                    db.session, sales_import.id, normalized_key, target_location_id
+                )
 
                 alias = TerminalSaleLocationAlias.query.filter_by(
                     normalized_name=normalized_key
@@ -1560,9 +1559,9 @@ def sales_import_detail(import_id: int):
                     db.session.flush()
 
                 normalized_key = location_record.normalized_location_name
-                for scoped_location in sales_import.locations:
-                    if scoped_location.normalized_location_name == normalized_key:
-                        scoped_location.location_id = created_location.id
+                pos_sales_review.map_location_name(
+                    db.session, sales_import.id, normalized_key, created_location.id
+                )
 
                 alias = TerminalSaleLocationAlias.query.filter_by(
                     normalized_name=normalized_key
@@ -1587,14 +1586,12 @@ def sales_import_detail(import_id: int):
         elif action == "map_product":
             row_id = request.form.get("row_id", type=int)
             target_product_id = request.form.get("target_product_id", type=int)
-            row_record = next(
-                (
-                    row
-                    for location in sales_import.locations
-                    for row in location.rows
-                    if row.id == row_id
-                ),
-                None,
+            row_record = (
+                PosSalesImportRow.query.filter_by(
+                    id=row_id, import_id=sales_import.id
+                ).first()
+                if row_id
+                else None
             )
             if not row_record:
                 flash("Unable to find the selected import row.", "danger")
@@ -1602,9 +1599,9 @@ def sales_import_detail(import_id: int):
                 flash("Select a product to map.", "warning")
             else:
                 normalized_key = row_record.normalized_product_name
-                for scoped_row in sales_import.rows:
-                    if scoped_row.normalized_product_name == normalized_key:
-                        scoped_row.product_id = target_product_id
+                pos_sales_review.map_product_name(
+                    db.session, sales_import.id, normalized_key, target_product_id
+                )
 
                 alias = TerminalSaleProductAlias.query.filter_by(
                     normalized_name=normalized_key
@@ -1629,14 +1626,12 @@ def sales_import_detail(import_id: int):
         elif action == "create_product":
             row_id = request.form.get("row_id", type=int)
             new_product_name = (request.form.get("new_product_name") or "").strip()
-            row_record = next(
-                (
-                    row
-                    for location in sales_import.locations
-                    for row in location.rows
-                    if row.id == row_id
-                ),
-                None,
+            row_record = (
+                PosSalesImportRow.query.filter_by(
+                    id=row_id, import_id=sales_import.id
+                ).first()
+                if row_id
+                else None
             )
             if not row_record:
                 flash("Unable to find the selected import row.", "danger")
@@ -1657,9 +1652,9 @@ def sales_import_detail(import_id: int):
                     db.session.flush()
 
                 normalized_key = row_record.normalized_product_name
-                for scoped_row in sales_import.rows:
-                    if scoped_row.normalized_product_name == normalized_key:
-                        scoped_row.product_id = created_product.id
+                pos_sales_review.map_product_name(
+                    db.session, sales_import.id, normalized_key, created_product.id
+                )
 
                 alias = TerminalSaleProductAlias.query.filter_by(
                     normalized_name=normalized_key
@@ -1745,7 +1740,14 @@ def sales_import_detail(import_id: int):
                 approval_batch_id = f"pos-import-{locked_import.id}-{uuid.uuid4().hex[:12]}"
                 approval_time = datetime.utcnow()
                 row_change_count = 0
+                tag_movements(
+                    "pos_sale",
+                    reference_type="pos_sales_import",
+                    reference_id=locked_import.id,
+                )
 
+                adjustments = StockAdjustments(fill_purchase_gl_codes=True)
+                pending_rows: list[tuple[PosSalesImportRow, list[tuple]]] = []
                 for import_location in locked_import.locations:
                     if import_location.location_id is None:
                         continue
@@ -1758,7 +1760,7 @@ def sales_import_detail(import_id: int):
                         if product is None:
                             continue
 
-                        row_changes: list[dict] = []
+                        row_changes: list[tuple] = []
                         for recipe_item in product.recipe_items:
                             if not recipe_item.countable or recipe_item.item_id is None:
                                 continue
@@ -1774,63 +1776,45 @@ def sales_import_detail(import_id: int):
                             if abs(delta) < 1e-9:
                                 continue
 
-                            record = LocationStandItem.query.filter_by(
-                                location_id=import_location.location_id,
-                                item_id=recipe_item.item_id,
-                            ).first()
-                            if record is None:
-                                record = LocationStandItem(
-                                    location_id=import_location.location_id,
-                                    item_id=recipe_item.item_id,
-                                    expected_count=0,
-                                    purchase_gl_code_id=(
-                                        recipe_item.item.purchase_gl_code_id
-                                        if recipe_item.item is not None
-                                        else None
+                            row_changes.append(
+                                (
+                                    delta,
+                                    adjustments.adjust_location(
+                                        import_location.location_id,
+                                        recipe_item.item_id,
+                                        -delta,
+                                    ),
+                                    adjustments.adjust_item(
+                                        recipe_item.item_id, -delta
                                     ),
                                 )
-                                db.session.add(record)
-                                db.session.flush()
-                            elif (
-                                record.purchase_gl_code_id is None
-                                and recipe_item.item is not None
-                                and recipe_item.item.purchase_gl_code_id is not None
-                            ):
-                                record.purchase_gl_code_id = recipe_item.item.purchase_gl_code_id
-
-                            expected_before = float(record.expected_count or 0.0)
-                            expected_after = expected_before - delta
-                            record.expected_count = expected_after
-
-                            item = db.session.get(Item, recipe_item.item_id)
-                            item_qty_before = float(item.quantity or 0.0) if item else 0.0
-                            item_qty_after = item_qty_before - delta
-                            if item is not None:
-                                item.quantity = item_qty_after
-
-                            row_changes.append(
-                                {
-                                    "item_id": recipe_item.item_id,
-                                    "location_id": import_location.location_id,
-                                    "location_stand_item_id": record.id,
-                                    "expected_count_before": expected_before,
-                                    "expected_count_after": expected_after,
-                                    "item_quantity_before": item_qty_before,
-                                    "item_quantity_after": item_qty_after,
-                                    "consumed_quantity": delta,
-                                }
                             )
 
                         row.approval_batch_id = approval_batch_id
-                        if row_changes:
-                            row.approval_metadata = json.dumps(
-                                {
-                                    "approval_batch_id": approval_batch_id,
-                                    "approved_at": approval_time.isoformat(),
-                                    "changes": row_changes,
-                                }
-                            )
-                            row_change_count += 1
+                        pending_rows.append((row, row_changes))
+
+                # Apply every row's deltas atomically, then record the
+                # balances each change moved between.
+                adjustments.apply()
+                for row, row_changes in pending_rows:
+                    if not row_changes:
+                        continue
+                    row.approval_metadata = json.dumps(
+                        {
+                            "approval_batch_id": approval_batch_id,
+                            "approved_at": approval_time.isoformat(),
+                            "changes": [
+                                _sales_import_change_payload(
+                                    stand_change,
+                                    item_change,
+                                    "consumed_quantity",
+                                    delta,
+                                )
+                                for delta, stand_change, item_change in row_changes
+                            ],
+                        }
+                    )
+                    row_change_count += 1
 
                 locked_import.status = "approved"
                 locked_import.approved_by = current_user.id
@@ -1907,7 +1891,14 @@ def sales_import_detail(import_id: int):
                 reversal_time = datetime.utcnow()
                 reversal_batch_id = f"pos-import-reverse-{locked_import.id}-{uuid.uuid4().hex[:12]}"
                 row_change_count = 0
+                tag_movements(
+                    "pos_sale_reversal",
+                    reference_type="pos_sales_import",
+                    reference_id=locked_import.id,
+                )
 
+                adjustments = StockAdjustments()
+                pending_rows: list[tuple[PosSalesImportRow, list[tuple]]] = []
                 for import_location in locked_import.locations:
                     if import_location.approval_batch_id:
                         import_location.reversal_batch_id = reversal_batch_id
@@ -1916,7 +1907,7 @@ def sales_import_detail(import_id: int):
                         if not row_changes:
                             continue
 
-                        reversal_changes: list[dict] = []
+                        reversal_changes: list[tuple] = []
                         for change in row_changes:
                             item_id = change.get("item_id")
                             location_id = change.get("location_id")
@@ -1932,73 +1923,58 @@ def sales_import_detail(import_id: int):
                             if abs(consumed_quantity) < 1e-9:
                                 continue
 
-                            stand_record = None
                             stand_record_id = change.get("location_stand_item_id")
-                            if stand_record_id is not None:
+                            if location_id is None and stand_record_id is not None:
                                 stand_record = db.session.get(
                                     LocationStandItem, stand_record_id
                                 )
-                            if stand_record is None and location_id is not None:
-                                stand_record = LocationStandItem.query.filter_by(
-                                    location_id=location_id,
-                                    item_id=item_id,
-                                ).first()
-                            if stand_record is None and location_id is not None:
-                                stand_record = LocationStandItem(
-                                    location_id=location_id,
-                                    item_id=item_id,
-                                    expected_count=0,
-                                )
-                                db.session.add(stand_record)
-                                db.session.flush()
-
-                            expected_before = (
-                                float(stand_record.expected_count or 0.0)
-                                if stand_record is not None
-                                else 0.0
-                            )
-                            expected_after = expected_before + consumed_quantity
-                            if stand_record is not None:
-                                stand_record.expected_count = expected_after
-
-                            item = db.session.get(Item, item_id)
-                            item_qty_before = float(item.quantity or 0.0) if item else 0.0
-                            item_qty_after = item_qty_before + consumed_quantity
-                            if item is not None:
-                                item.quantity = item_qty_after
+                                if stand_record is not None:
+                                    location_id = stand_record.location_id
 
                             reversal_changes.append(
-                                {
-                                    "item_id": item_id,
-                                    "location_id": location_id,
-                                    "location_stand_item_id": (
-                                        stand_record.id if stand_record is not None else None
+                                (
+                                    consumed_quantity,
+                                    (
+                                        adjustments.adjust_location(
+                                            location_id, item_id, consumed_quantity
+                                        )
+                                        if location_id is not None
+                                        else None
                                     ),
-                                    "expected_count_before": expected_before,
-                                    "expected_count_after": expected_after,
-                                    "item_quantity_before": item_qty_before,
-                                    "item_quantity_after": item_qty_after,
-                                    "reversed_quantity": consumed_quantity,
-                                }
+                                    adjustments.adjust_item(item_id, consumed_quantity),
+                                )
                             )
 
                         row.reversal_batch_id = reversal_batch_id
-                        if reversal_changes:
+                        pending_rows.append((row, reversal_changes))
+
+                adjustments.apply()
+                for row, reversal_changes in pending_rows:
+                    if not reversal_changes:
+                        continue
+                    metadata = {}
+                    if row.approval_metadata:
+                        try:
+                            metadata = json.loads(row.approval_metadata)
+                        except (TypeError, ValueError, json.JSONDecodeError):
                             metadata = {}
-                            if row.approval_metadata:
-                                try:
-                                    metadata = json.loads(row.approval_metadata)
-                                except (TypeError, ValueError, json.JSONDecodeError):
-                                    metadata = {}
-                            metadata["reversal"] = {
-                                "reversal_batch_id": reversal_batch_id,
-                                "reversed_at": reversal_time.isoformat(),
-                                "reversed_by": current_user.id,
-                                "reason": reversal_reason,
-                                "changes": reversal_changes,
-                            }
-                            row.approval_metadata = json.dumps(metadata)
-                            row_change_count += 1
+                    metadata["reversal"] = {
+                        "reversal_batch_id": reversal_batch_id,
+                        "reversed_at": reversal_time.isoformat(),
+                        "reversed_by": current_user.id,
+                        "reason": reversal_reason,
+                        "changes": [
+                            _sales_import_change_payload(
+                                stand_change,
+                                item_change,
+                                "reversed_quantity",
+                                consumed_quantity,
+                            )
+                            for consumed_quantity, stand_change, item_change in reversal_changes
+                        ],
+                    }
+                    row.approval_metadata = json.dumps(metadata)
+                    row_change_count += 1
 
                 locked_import.status = "reversed"
                 locked_import.reversed_by = current_user.id
@@ -2068,6 +2044,8 @@ def sales_import_detail(import_id: int):
                 "admin.sales_import_detail",
                 import_id=sales_import.id,
                 location_id=selected_location_id,
+                row_filter=request.form.get("row_filter") or None,
+                page=request.form.get("page", type=int),
             )
         )
 
@@ -2100,16 +2078,30 @@ def sales_import_detail(import_id: int):
             float(loc.computed_total or 0.0) for loc in sales_import.locations
         ),
     }
+    location_summaries = pos_sales_review.location_summaries(
+        db.session, sales_import.id
+    )
 
     location_errors: dict[int, list[str]] = {}
-    row_errors: dict[int, list[str]] = {}
     for location in sales_import.locations:
         errors: list[str] = []
         if location.location_id is None:
             errors.append("Location is not mapped.")
         location_errors[location.id] = errors
 
-        for row in location.rows:
+    row_filter = request.args.get("row_filter") or None
+    if row_filter not in pos_sales_review.ROW_FILTERS:
+        row_filter = None
+    per_page = get_per_page(default=100)
+    rows = None
+    row_errors: dict[int, list[str]] = {}
+    if selected_location is not None:
+        rows = pos_sales_review.rows_query(selected_location.id, row_filter).paginate(
+            page=request.args.get("page", 1, type=int),
+            per_page=per_page,
+            error_out=False,
+        )
+        for row in rows.items:
             row_validation_errors: list[str] = []
             if row.product_id is None:
                 row_validation_errors.append("Product is not mapped.")
@@ -2129,8 +2121,18 @@ def sales_import_detail(import_id: int):
         sales_import=sales_import,
         selected_location=selected_location,
         import_totals=import_totals,
+        location_summaries=location_summaries,
         location_errors=location_errors,
+        rows=rows,
         row_errors=row_errors,
+        row_filter=row_filter,
+        row_filters=pos_sales_review.ROW_FILTERS,
+        pagination_args=build_pagination_args(
+            per_page,
+            extra_params={
+                "location_id": selected_location.id if selected_location else None
+            },
+        ),
         locations=Location.query.order_by(Location.name).all(),
         products=Product.query.order_by(Product.name).all(),
         unresolved_location_count=unresolved_location_count,
@@ -5,9 +5,11 @@ import math
 import os
 from decimal import Decimal, ROUND_HALF_UP
 from collections import defaultdict
+from contextlib import ExitStack
 from datetime import datetime
 from secrets import token_urlsafe
 from types import SimpleNamespace
+from typing import Iterable
 
 from flask import (
     Blueprint,
@@ -48,12 +50,24 @@ from app.models import (
     LocationStandItem,
     Product,
     ProductRecipeItem,
+    SalesFact,
     TerminalSale,
     TerminalSaleProductAlias,
     TerminalSaleLocationAlias,
     TerminalSalesResolutionState,
 )
+from app.services import (
+    attachment_store,
+    product_last_sold,
+    result_store,
+    sales_facts,
+    terminal_sales_pdf,
+    terminal_sales_staging,
+)
+from app.services.event_close import close_event as close_event_records
+from app.services.gl_resolution import load_purchase_gl_codes
 from app.services.pdf import render_stand_sheet_pdf
+from app.services.stock_ledger import tag_movements
 from app.utils.activity import log_activity
 from app.utils.numeric import coerce_float
 from app.utils.pos_import import (
@@ -71,10 +85,11 @@ from app.utils.units import (
     convert_quantity_for_reporting,
     get_unit_label,
 )
+from app.utils.batching import chunks
 from app.utils.text import normalize_name_for_sorting
-from app.utils.email import send_email
+from app.utils.email import MailDeliveryError, send_email
 from itsdangerous import BadSignature, URLSafeSerializer
-from sqlalchemy import func, or_
+from sqlalchemy import func, insert, or_, select
 from sqlalchemy.orm import Session, selectinload
 
 _STAND_SHEET_FIELDS = (
@@ -321,23 +336,40 @@ def _fallback_item_price(item, allowed_product_ids: set[int] | None = None) -> f
     return None
 
 
+def _sale_amount(sale) -> Decimal:
+    """Revenue of a terminal sale or archived sales fact."""
+
+    if isinstance(sale, SalesFact):
+        return Decimal(str(sale.amount or 0.0))
+    product = sale.product
+    price = Decimal(str(getattr(product, "price", 0.0) or 0.0)) if product else Decimal("0.00")
+    return Decimal(str(sale.quantity or 0.0)) * price
+
+
 def _build_item_price_lookup(
-    event_location: EventLocation, stand_items: list[dict]
+    event_location: EventLocation,
+    stand_items: list[dict],
+    sales: Iterable | None = None,
 ) -> dict[int, float]:
-    """Return a mapping of item IDs to price-per-unit estimates for a location."""
+    """Return a mapping of item IDs to price-per-unit estimates for a location.
+
+    ``sales`` defaults to the location's live terminal sales; closed events
+    pass their archived :class:`SalesFact` rows as well.
+    """
 
     usage_totals: dict[int, float] = defaultdict(float)
     revenue_totals: dict[int, float] = defaultdict(float)
 
-    for sale in event_location.terminal_sales:
+    if sales is None:
+        sales = event_location.terminal_sales
+    for sale in sales:
         product = sale.product
         if product is None:
             continue
         quantity = float(sale.quantity or 0.0)
-        price = float(getattr(product, "price", 0.0) or 0.0)
         if quantity == 0:
             continue
-        sale_revenue = quantity * price
+        sale_revenue = float(_sale_amount(sale))
         for recipe in product.recipe_items:
             if not recipe.countable or recipe.item_id is None:
                 continue
@@ -484,6 +516,63 @@ def _ensure_location_items(location_obj: Location, product_obj: Product) -> None
             )
 
 
+def _ensure_location_items_for(links: list[tuple[Location, Product]]) -> None:
+    """Batched :func:`_ensure_location_items` for many location/product pairs."""
+
+    if not links:
+        return
+    # New products and locations need ids before they can be queried.
+    db.session.flush()
+    locations_by_product: dict[int, set[int]] = {}
+    for location_obj, product_obj in links:
+        locations_by_product.setdefault(product_obj.id, set()).add(location_obj.id)
+
+    wanted: dict[tuple[int, int], int | None] = {}
+    for chunk in chunks(sorted(locations_by_product)):
+        rows = db.session.execute(
+            select(
+                ProductRecipeItem.product_id,
+                ProductRecipeItem.item_id,
+                Item.purchase_gl_code_id,
+            )
+            .join(Item, Item.id == ProductRecipeItem.item_id)
+            .where(
+                ProductRecipeItem.product_id.in_(chunk),
+                ProductRecipeItem.countable.is_(True),
+            )
+        )
+        for product_id, item_id, gl_code_id in rows:
+            for location_id in locations_by_product[product_id]:
+                wanted.setdefault((location_id, item_id), gl_code_id)
+    if not wanted:
+        return
+
+    location_ids = sorted({location_id for location_id, _ in wanted})
+    item_ids = sorted({item_id for _, item_id in wanted})
+    existing: set[tuple[int, int]] = set()
+    for location_chunk in chunks(location_ids):
+        for item_chunk in chunks(item_ids):
+            existing.update(
+                db.session.query(
+                    LocationStandItem.location_id, LocationStandItem.item_id
+                ).filter(
+                    LocationStandItem.location_id.in_(location_chunk),
+                    LocationStandItem.item_id.in_(item_chunk),
+                )
+            )
+    for (location_id, item_id), gl_code_id in sorted(wanted.items()):
+        if (location_id, item_id) in existing:
+            continue
+        db.session.add(
+            LocationStandItem(
+                location_id=location_id,
+                item_id=item_id,
+                expected_count=0,
+                purchase_gl_code_id=gl_code_id,
+            )
+        )
+
+
 def _normalize_variance_details(value):
     """Return a dict variance payload, decoding JSON strings when needed."""
 
@@ -560,7 +649,12 @@ def _apply_pending_sales(
     *,
     link_products_to_locations: bool = False,
 ) -> set[str]:
-    """Persist uploaded terminal sales for the provided event locations."""
+    """Persist uploaded terminal sales for the provided event locations.
+
+    Existing sales and summaries for the locations are replaced. Locations,
+    products and aliases are looked up in batches and the new rows are
+    written with bulk inserts.
+    """
 
     updated_locations: set[str] = set()
     totals_map: dict[int, dict] = {}
@@ -589,7 +683,16 @@ def _apply_pending_sales(
             totals_map[el_id] = entry
             event_location_ids.add(el_id)
 
+    # Bulk statements skip the flush hooks that keep last_sold_at current.
+    touched_product_ids: set[int] = set()
     if event_location_ids:
+        touched_product_ids.update(
+            db.session.execute(
+                select(TerminalSale.product_id)
+                .where(TerminalSale.event_location_id.in_(event_location_ids))
+                .distinct()
+            ).scalars()
+        )
         (
             TerminalSale.query.filter(
                 TerminalSale.event_location_id.in_(event_location_ids)
@@ -676,24 +779,83 @@ def _apply_pending_sales(
             return None
         return sanitized
 
+    location_loader = selectinload(EventLocation.location)
+    product_loaders = []
+    if link_products_to_locations or totals_map:
+        location_loader = location_loader.selectinload(Location.products)
+        # Appending to Location.products also updates the Product.locations
+        # backref, so load it up front rather than once per product.
+        product_loaders.append(selectinload(Product.locations))
+    event_locations: dict[int, EventLocation] = {}
+    for chunk in chunks(sorted(event_location_ids)):
+        for event_location in EventLocation.query.options(location_loader).filter(
+            EventLocation.id.in_(chunk)
+        ):
+            event_locations[event_location.id] = event_location
+
+    def _product_key(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    products_by_id: dict[int, Product] = {}
+    product_ids = {
+        key
+        for key in (_product_key(entry.get("product_id")) for entry in sanitized_sales)
+        if key is not None
+    }
+    for chunk in chunks(sorted(product_ids)):
+        for product in Product.query.options(*product_loaders).filter(
+            Product.id.in_(chunk)
+        ):
+            products_by_id[product.id] = product
+
+    lookup_names: set[str] = set()
+    normalized_names: set[str] = set()
+    for entry in sanitized_sales:
+        if _product_key(entry.get("product_id")) not in products_by_id:
+            for name in (entry.get("product_name"), entry.get("source_name")):
+                if name:
+                    lookup_names.add(name)
+        normalized_name = (entry.get("normalized_name") or "").strip()
+        if normalized_name:
+            normalized_names.add(normalized_name)
+
+    products_by_name: dict[str, Product] = {}
+    for chunk in chunks(sorted(lookup_names)):
+        for product in (
+            Product.query.options(*product_loaders)
+            .filter(Product.name.in_(chunk))
+            .order_by(Product.id)
+        ):
+            products_by_name.setdefault(product.name, product)
+
+    aliases: dict[str, TerminalSaleProductAlias] = {}
+    for chunk in chunks(sorted(normalized_names)):
+        for alias in TerminalSaleProductAlias.query.filter(
+            TerminalSaleProductAlias.normalized_name.in_(chunk)
+        ):
+            aliases[alias.normalized_name] = alias
+
+    # Later entries for the same location and product replace earlier ones.
+    sale_quantities: dict[tuple[int, int], object] = {}
+    new_links: list[tuple[Location, Product]] = []
     for entry in sanitized_sales:
         event_location_id = entry.get("event_location_id")
-        product_id = entry.get("product_id")
         quantity_value = entry.get("quantity", 0.0)
         if not event_location_id:
             continue
-        event_location = db.session.get(EventLocation, event_location_id)
+        event_location = event_locations.get(event_location_id)
         if event_location is None:
             continue
-        product = None
-        if product_id:
-            product = db.session.get(Product, product_id)
+        product = products_by_id.get(_product_key(entry.get("product_id")))
         source_name = entry.get("source_name")
         product_name = entry.get("product_name") or source_name
         if product is None and product_name:
-            product = Product.query.filter(Product.name == product_name).first()
+            product = products_by_name.get(product_name)
         if product is None and source_name and source_name != product_name:
-            product = Product.query.filter(Product.name == source_name).first()
+            product = products_by_name.get(source_name)
         if product is None:
             if not product_name:
                 continue
@@ -706,11 +868,10 @@ def _apply_pending_sales(
             )
             db.session.add(product)
             db.session.flush()
+            products_by_name[product_name] = product
         normalized_name = (entry.get("normalized_name") or "").strip()
         if normalized_name:
-            alias = TerminalSaleProductAlias.query.filter_by(
-                normalized_name=normalized_name
-            ).first()
+            alias = aliases.get(normalized_name)
             if alias is None:
                 alias = TerminalSaleProductAlias(
                     source_name=source_name or product_name,
@@ -718,70 +879,67 @@ def _apply_pending_sales(
                     product=product,
                 )
                 db.session.add(alias)
+                aliases[normalized_name] = alias
             else:
                 alias.source_name = source_name or product_name
                 alias.product = product
-        entry["product_id"] = product.id
-        entry.setdefault("product_name", product.name)
+        sale_quantities[(event_location.id, product.id)] = quantity_value
         location_obj = event_location.location
-        sale = TerminalSale.query.filter_by(
-            event_location_id=event_location.id, product_id=product.id
-        ).first()
-        if sale:
-            sale.quantity = quantity_value
-        else:
-            db.session.add(
-                TerminalSale(
-                    event_location_id=event_location.id,
-                    product_id=product.id,
-                    quantity=quantity_value,
-                    sold_at=datetime.utcnow(),
-                )
-            )
-        if (
-            link_products_to_locations
-            and location_obj is not None
-            and product not in location_obj.products
+        if location_obj is not None and (
+            link_products_to_locations or event_location_id in totals_map
         ):
-            location_obj.products.append(product)
-            _ensure_location_items(location_obj, product)
-        if location_obj is not None and event_location_id in totals_map:
             if product not in location_obj.products:
                 location_obj.products.append(product)
-                _ensure_location_items(location_obj, product)
+                new_links.append((location_obj, product))
         if location_obj is not None and location_obj.name:
             updated_locations.add(location_obj.name)
 
-    if totals_map:
-        for el_id, data in totals_map.items():
-            summary = EventLocationTerminalSalesSummary.query.filter_by(
-                event_location_id=el_id
-            ).first()
-            if summary is None:
-                summary = EventLocationTerminalSalesSummary(
-                    event_location_id=el_id
-                )
-                db.session.add(summary)
-            summary.source_location = data.get("source_location")
-            summary.total_quantity = coerce_float(data.get("total_quantity"))
-            total_amount_value = coerce_float(data.get("total_amount"))
-            net_total_value = coerce_float(data.get("net_including_tax_total"))
-            discount_value = coerce_float(data.get("discount_total"))
-            if total_amount_value is None:
-                total_amount_value = combine_terminal_sales_totals(
-                    net_total_value, discount_value
-                )
-            summary.total_amount = total_amount_value
-            summary.variance_details = _sanitize_variance_details(
-                data.get("variance_details")
-            )
-            fallback_quantity, fallback_amount = _derive_summary_totals_from_details(
-                summary.variance_details
+    _ensure_location_items_for(new_links)
+
+    sold_at = datetime.utcnow()
+    sale_rows = [
+        {
+            "event_location_id": event_location_id,
+            "product_id": product_id,
+            "quantity": quantity_value,
+            "sold_at": sold_at,
+        }
+        for (event_location_id, product_id), quantity_value in sale_quantities.items()
+    ]
+    for chunk in chunks(sale_rows):
+        db.session.execute(insert(TerminalSale), chunk)
+    touched_product_ids.update(row["product_id"] for row in sale_rows)
+    product_last_sold.refresh_last_sold(db.session, touched_product_ids)
+
+    summary_rows: list[dict] = []
+    for el_id, data in totals_map.items():
+        total_quantity = coerce_float(data.get("total_quantity"))
+        total_amount_value = coerce_float(data.get("total_amount"))
+        net_total_value = coerce_float(data.get("net_including_tax_total"))
+        discount_value = coerce_float(data.get("discount_total"))
+        if total_amount_value is None:
+            total_amount_value = combine_terminal_sales_totals(
+                net_total_value, discount_value
             )
-            if summary.total_quantity is None and fallback_quantity is not None:
-                summary.total_quantity = fallback_quantity
-            if summary.total_amount is None and fallback_amount is not None:
-                summary.total_amount = fallback_amount
+        variance_details = _sanitize_variance_details(data.get("variance_details"))
+        fallback_quantity, fallback_amount = _derive_summary_totals_from_details(
+            variance_details
+        )
+        if total_quantity is None and fallback_quantity is not None:
+            total_quantity = fallback_quantity
+        if total_amount_value is None and fallback_amount is not None:
+            total_amount_value = fallback_amount
+        summary_rows.append(
+            {
+                "event_location_id": el_id,
+                "source_location": data.get("source_location"),
+                "total_quantity": total_quantity,
+                "total_amount": total_amount_value,
+                "variance_details": variance_details,
+            }
+        )
+    for chunk in chunks(summary_rows):
+        db.session.execute(insert(EventLocationTerminalSalesSummary), chunk)
     return updated_locations
 
 
@@ -1106,6 +1264,10 @@ def closed_event_report(event_id):
     if event is None or not event.closed:
         abort(404)
 
+    archived_sales: dict[int, list[SalesFact]] = defaultdict(list)
+    for fact in sales_facts.event_sales(db.session, event.id):
+        archived_sales[fact.location_id].append(fact)
+
     conversions = _conversion_mapping()
     location_reports: list[SimpleNamespace] = []
     total_terminal_quantity = 0.0
@@ -1130,22 +1292,18 @@ def closed_event_report(event_id):
             ),
             reverse=True,
         )
-        price_lookup = _build_item_price_lookup(event_location, stand_items)
+        location_sales = list(event_location.terminal_sales) + archived_sales.get(
+            event_location.location_id, []
+        )
+        price_lookup = _build_item_price_lookup(
+            event_location, stand_items, location_sales
+        )
 
         location_terminal_quantity = 0.0
         location_terminal_amount = Decimal("0.00")
-        for sale in event_location.terminal_sales:
-            quantity_value = sale.quantity or 0.0
-            quantity = float(quantity_value)
-            quantity_decimal = Decimal(str(quantity_value or 0.0))
-            product = sale.product
-            price_decimal = (
-                Decimal(str(getattr(product, "price", 0.0) or 0.0))
-                if product
-                else Decimal("0.00")
-            )
-            location_terminal_quantity += quantity
-            location_terminal_amount += quantity_decimal * price_decimal
+        for sale in location_sales:
+            location_terminal_quantity += float(sale.quantity or 0.0)
+            location_terminal_amount += _sale_amount(sale)
 
         location_physical_quantity = 0.0
         location_physical_amount = Decimal("0.00")
@@ -1710,20 +1868,45 @@ def upload_terminal_sales(event_id):
             ).one_or_none()
         )
 
+    staged_state_id: int | None = None
+
     def _load_state_payload(token_id: str) -> dict | None:
+        nonlocal staged_state_id
         row = _load_state_row(token_id)
         if row is None or not isinstance(row.payload, dict):
             return None
         payload = dict(row.payload)
         payload.setdefault("token_id", token_id)
+        staged_state_id = row.id
         return payload
 
-    def _store_state_payload(token_id: str, payload: dict) -> None:
+    def _load_pending(data: dict) -> tuple[list, list]:
+        # States saved before staging keep their pending lists in the payload.
+        if any(key in data for key in terminal_sales_staging.STAGED_KEYS):
+            return data.get("pending_sales") or [], data.get("pending_totals") or []
+        if staged_state_id is None:
+            return [], []
+        return terminal_sales_staging.load(db.session, staged_state_id)
+
+    def _summarize_upload(payload_data: dict | None) -> dict[str, dict]:
+        rows = (payload_data or {}).get("rows")
+        if rows is not None:
+            return _group_rows(rows)
+        if staged_state_id is None:
+            return {}
+        return terminal_sales_staging.summarize_rows(db.session, staged_state_id)
+
+    def _store_state_payload(
+        token_id: str,
+        payload: dict,
+        staged: tuple[list, list] | None = None,
+        staged_rows: list | None = None,
+    ) -> int | None:
         if not current_user.is_authenticated:
-            return
+            return None
         bind = db.session.get_bind()
         if bind is None:
-            return
+            return None
         with Session(bind=bind) as state_session:
             state_row = (
                 state_session.query(TerminalSalesResolutionState)
@@ -1741,14 +1924,36 @@ def upload_terminal_sales(event_id):
                     token_id=token_id,
                 )
             state_row.payload = payload
+            attachment = payload.get("attachment")
+            if (
+                isinstance(attachment, dict)
+                and state_row.attachment_sha256 != attachment.get("sha256")
+            ):
+                # Keep the uploaded file while its wizard is in progress.
+                state_row.attachment_sha256 = attachment["sha256"]
+                attachment_store.acquire(
+                    state_session,
+                    attachment_store.StoredBlob(**attachment),
+                    filename=payload.get("mapping_filename"),
+                )
             state_session.add(state_row)
-            state_session.query(TerminalSalesResolutionState).filter(
+            state_session.flush()
+            state_id = state_row.id
+            if staged is not None:
+                terminal_sales_staging.stage(state_session, state_id, *staged)
+            if staged_rows is not None:
+                terminal_sales_staging.stage_rows(state_session, state_id, staged_rows)
+            replaced = state_session.query(TerminalSalesResolutionState).filter(
                 TerminalSalesResolutionState.event_id == event_id,
                 TerminalSalesResolutionState.user_id == current_user.id,
                 TerminalSalesResolutionState.token_id != token_id,
             ).delete(synchronize_session=False)
+            if replaced:
+                terminal_sales_staging.discard_orphans(state_session)
+            result_store.purge_expired(state_session)
             state_session.commit()
         db.session.expire_all()
+        return state_id
 
     def _clear_state() -> None:
         removed = state_store.pop(event_state_key, None)
@@ -1773,6 +1978,7 @@ def upload_terminal_sales(event_id):
             if token_to_remove:
                 query = query.filter_by(token_id=token_to_remove)
             query.delete(synchronize_session=False)
+            terminal_sales_staging.discard_orphans(state_session)
             state_session.commit()
         db.session.expire_all()
 
@@ -1795,15 +2001,34 @@ def upload_terminal_sales(event_id):
         state_data = None
 
     def _save_state(data: dict) -> tuple[str, dict]:
-        nonlocal state_entry, stored_token_id
+        nonlocal state_entry, stored_token_id, staged_state_id
         token_id = data.get("token_id") or token_urlsafe(16)
         data["token_id"] = token_id
         token = _serialize_token(token_id)
         state_store[event_state_key] = {"token_id": token_id}
         session[_TERMINAL_SALES_STATE_KEY] = state_store
         session.modified = True
-        stored_payload = _prepare_state_payload(data)
-        _store_state_payload(token_id, stored_payload)
+        # Pending sales, totals and the parsed upload rows are staged in their
+        # own tables, and only by the steps that set them on ``data``.
+        staged = None
+        if any(key in data for key in terminal_sales_staging.STAGED_KEYS):
+            staged = (
+                list(data.pop("pending_sales", None) or []),
+                list(data.pop("pending_totals", None) or []),
+            )
+        staged_rows = None
+        payload_data = data.get("payload")
+        if isinstance(payload_data, dict) and "rows" in payload_data:
+            staged_rows = list(payload_data.get("rows") or [])
+            data["payload"] = {
+                key: value for key, value in payload_data.items() if key != "rows"
+            }
+        stored_payload = _prepare_state_payload(dict(data))
+        state_id = _store_state_payload(
+            token_id, stored_payload, staged, staged_rows
+        )
+        if state_id is not None:
+            staged_state_id = state_id
         state_entry = {"token_id": token_id}
         stored_token_id = token_id
         return token, data
@@ -2083,8 +2308,6 @@ def upload_terminal_sales(event_id):
             }
 
             queue: list[dict] = state_data.get("queue") or []
-            pending_sales: list[dict] = state_data.get("pending_sales") or []
-            pending_totals: list[dict] = state_data.get("pending_totals") or []
             selected_locations: list[str] = state_data.get("selected_locations") or []
             menu_candidates: list[dict] = state_data.get("menu_candidates") or []
             menu_candidate_selection = (
@@ -2106,18 +2329,17 @@ def upload_terminal_sales(event_id):
                     flash("Unable to process the uploaded sales data.", "danger")
                     return redirect(url_for("event.upload_terminal_sales", event_id=event_id))
 
-                rows = payload_data.get("rows", [])
                 mapping_filename = (
                     payload_data.get("filename") or mapping_filename
                 )
-                if not rows:
+                sales_summary = _summarize_upload(payload_data)
+                if not sales_summary:
                     flash(
                         "No sales records were found in the uploaded file.",
                         "warning",
                     )
                     return redirect(url_for("event.upload_terminal_sales", event_id=event_id))
 
-                sales_summary = _group_rows(rows)
                 sales_location_names = list(sales_summary.keys())
                 default_mapping: dict[int, str] = {}
                 for key, value in stored_mapping.items():
@@ -2310,8 +2532,6 @@ def upload_terminal_sales(event_id):
             if issue_index >= len(queue):
                 if menu_candidates:
                     state_data["queue"] = queue
-                    state_data["pending_sales"] = pending_sales
-                    state_data["pending_totals"] = pending_totals
                     state_data["selected_locations"] = selected_locations
                     state_data["issue_index"] = issue_index
                     state_data["stage"] = "menus"
@@ -2357,6 +2577,7 @@ def upload_terminal_sales(event_id):
                         created_product_ids=sorted(created_product_ids_state),
                         wizard_stage="menus",
                     )
+                pending_sales, pending_totals = _load_pending(state_data)
                 updated_locations = _apply_pending_sales(
                     pending_sales,
                     pending_totals,
@@ -2410,8 +2631,6 @@ def upload_terminal_sales(event_id):
                     flash(message, "danger")
 
             state_data["queue"] = queue
-            state_data["pending_sales"] = pending_sales
-            state_data["pending_totals"] = pending_totals
             state_data["selected_locations"] = selected_locations
             state_data["issue_index"] = issue_index
             state_data["token_id"] = token_id
@@ -2525,8 +2744,7 @@ def upload_terminal_sales(event_id):
                     wizard_stage="menus",
                 )
 
-            pending_sales = state_data.get("pending_sales") or []
-            pending_totals = state_data.get("pending_totals") or []
+            pending_sales, pending_totals = _load_pending(state_data)
             queue = state_data.get("queue") or []
 
             combined_queue = list(queue)
@@ -2619,19 +2837,19 @@ def upload_terminal_sales(event_id):
                     payload_data = None
             if payload_data is None and state_data:
                 payload_data = state_data.get("payload")
-                if payload_data:
-                    payload = json.dumps(payload_data)
             if not payload_data:
                 flash("Unable to process the uploaded sales data.", "danger")
                 return redirect(url_for("event.upload_terminal_sales", event_id=event_id))
 
-            rows = payload_data.get("rows", [])
             mapping_filename = payload_data.get("filename")
-            if not rows:
+            sales_summary = _summarize_upload(payload_data)
+            if not sales_summary:
                 flash("No sales records were found in the uploaded file.", "warning")
                 return redirect(url_for("event.upload_terminal_sales", event_id=event_id))
-
-            sales_summary = _group_rows(rows)
+            # Rows are staged server side; the form only carries the filename.
+            payload = json.dumps(
+                {key: value for key, value in payload_data.items() if key != "rows"}
+            )
 
             stage = request.form.get("stage")
             if not stage and request.form.get("product-resolution-step"):
@@ -3793,8 +4011,11 @@ def upload_terminal_sales(event_id):
         file = form.file.data
         filename = secure_filename(file.filename)
         ext = os.path.splitext(filename)[1].lower()
-        filepath = os.path.join(current_app.config["UPLOAD_FOLDER"], filename)
-        file.save(filepath)
+        upload_blob = attachment_store.write_blob(file.stream)
+        upload_files = ExitStack()
+        filepath = upload_files.enter_context(
+            attachment_store.materialize(upload_blob.sha256, ext)
+        )
 
         rows: list[dict] = []
 
@@ -4025,13 +4246,10 @@ def upload_terminal_sales(event_id):
                         discounts_total=discounts,
                     )
             elif ext == ".pdf":
-                import pdfplumber
-
                 try:
-                    with pdfplumber.open(filepath) as pdf:
-                        text = "\n".join(
-                            page.extract_text() or "" for page in pdf.pages
-                        )
+                    pdf_rows = terminal_sales_pdf.parse_terminal_sales_pdf(
+                        filepath, sha256=upload_blob.sha256
+                    )
                 except Exception:
                     current_app.logger.exception(
                         "Failed to parse PDF file during terminal sales upload"
@@ -4044,32 +4262,10 @@ def upload_terminal_sales(event_id):
                     return redirect(
                         url_for("event.upload_terminal_sales", event_id=event_id)
                     )
-                current_loc = None
-                for line in text.splitlines():
-                    line = line.strip()
-                    if not line:
-                        continue
-                    if not line[0].isdigit():
-                        current_loc = line
-                        continue
-                    if current_loc is None:
-                        continue
-                    parts = line.split()
-                    idx = 1
-                    while (
-                        idx < len(parts)
-                        and not parts[idx].replace(".", "", 1).isdigit()
-                    ):
-                        idx += 1
-                    if idx + 2 < len(parts):
-                        name = " ".join(parts[1:idx])
-                        qty = parts[idx + 2]
-                        add_row(current_loc, name, qty)
+                for location_name, product_name, quantity in pdf_rows:
+                    add_row(location_name, product_name, quantity)
         finally:
-            try:
-                os.remove(filepath)
-            except OSError:
-                pass
+            upload_files.close()
 
         if not rows:
             flash(
@@ -4081,9 +4277,7 @@ def upload_terminal_sales(event_id):
 
             sales_summary = _group_rows(rows_data)
             sales_location_names = list(sales_summary.keys())
-            mapping_payload = json.dumps(
-                {"rows": rows_data, "filename": filename}
-            )
+            mapping_payload = json.dumps({"filename": filename})
             mapping_filename = filename
             default_mapping = suggest_terminal_sales_location_mapping(
                 open_locations, sales_summary
@@ -4102,6 +4296,7 @@ def upload_terminal_sales(event_id):
                 "stage": "locations",
                 "payload": {"rows": rows_data, "filename": filename},
                 "mapping_filename": filename,
+                "attachment": upload_blob.to_dict(),
                 "selected_mapping": {
                     str(key): value for key, value in default_mapping.items()
                 },
@@ -4124,9 +4319,10 @@ def upload_terminal_sales(event_id):
     if request.method != "POST" and state_data and wizard_stage in {"locations", "products", "menus"}:
         payload_data = state_data.get("payload") or {}
         if payload_data:
-            mapping_payload = json.dumps(payload_data)
-            rows = payload_data.get("rows") or []
-            sales_summary = _group_rows(rows)
+            mapping_payload = json.dumps(
+                {key: value for key, value in payload_data.items() if key != "rows"}
+            )
+            sales_summary = _summarize_upload(payload_data)
             sales_location_names = list(sales_summary.keys())
         mapping_filename = state_data.get("mapping_filename") or mapping_filename
         stored_mapping = state_data.get("selected_mapping") or {}
@@ -5203,11 +5399,17 @@ def email_bulk_stand_sheets(event_id):
                 )
             ],
         )
-    except Exception:
+    except Exception as exc:
         current_app.logger.exception(
             "Failed to send stand sheet email for event %s", event_id
         )
         message = "Unable to send the stand sheet email."
+        if isinstance(exc, MailDeliveryError):
+            message = (
+                "Unable to send the stand sheet email to "
+                + ", ".join(recipient for recipient, _ in exc.failed)
+                + "."
+            )
         if is_ajax:
             return jsonify({"success": False, "message": message}), 500
         flash(message, "danger")
@@ -5257,44 +5459,8 @@ def close_event(event_id):
             "warning",
         )
         return redirect(url_for("event.view_event", event_id=event_id))
-    for el in ev.locations:
-        counted_item_ids = set()
-        for sheet in el.stand_sheet_items:
-            counted_item_ids.add(sheet.item_id)
-            lsi = LocationStandItem.query.filter_by(
-                location_id=el.location_id, item_id=sheet.item_id
-            ).first()
-            if not sheet.closing_count:
-                if lsi:
-                    db.session.delete(lsi)
-                continue
-            if not lsi:
-                lsi = LocationStandItem(
-                    location_id=el.location_id,
-                    item_id=sheet.item_id,
-                    purchase_gl_code_id=sheet.item.purchase_gl_code_id,
-                )
-                db.session.add(lsi)
-            elif (
-                lsi.purchase_gl_code_id is None
-                and sheet.item.purchase_gl_code_id is not None
-            ):
-                lsi.purchase_gl_code_id = sheet.item.purchase_gl_code_id
-            lsi.expected_count = sheet.closing_count
-
-        if counted_item_ids:
-            LocationStandItem.query.filter(
-                LocationStandItem.location_id == el.location_id,
-                ~LocationStandItem.item_id.in_(counted_item_ids),
-            ).delete(synchronize_session=False)
-        else:
-            LocationStandItem.query.filter_by(
-                location_id=el.location_id
-            ).delete()
-
-        TerminalSale.query.filter_by(event_location_id=el.id).delete()
-
-    ev.closed = True
+    tag_movements("count", reference_type="event", reference_id=ev.id)
+    close_event_records(db.session, ev)
     db.session.commit()
     log_activity(f"Closed event {event_id}")
     flash("Event closed")
@@ -5313,17 +5479,28 @@ def inventory_report(event_id):
     gl_totals = {}
     grand_total = 0.0
 
+    pairs = [
+        (sheet.item_id, el.location_id)
+        for el in ev.locations
+        for sheet in el.stand_sheet_items
+    ]
+    location_ids = {el.location_id for el in ev.locations}
+    expected_counts = {
+        (record.item_id, record.location_id): record.expected_count
+        for record in LocationStandItem.query.filter(
+            LocationStandItem.location_id.in_(location_ids)
+        )
+    }
+    purchase_gl_codes = load_purchase_gl_codes(pairs)
+
     for el in ev.locations:
         loc = el.location
         for sheet in el.stand_sheet_items:
             item = sheet.item
-            lsi = LocationStandItem.query.filter_by(
-                location_id=loc.id, item_id=item.id
-            ).first()
-            expected = lsi.expected_count if lsi else 0
+            expected = expected_counts.get((item.id, loc.id)) or 0
             variance = sheet.closing_count - expected
             cost_total = sheet.closing_count * item.cost
-            gl_obj = item.purchase_gl_code_for_location(loc.id)
+            gl_obj = purchase_gl_codes.for_item(item.id, loc.id)
             gl_code = gl_obj.code if gl_obj else "Unassigned"
             rows.append(
                 {
@@ -21,6 +21,8 @@ from app.forms import (
     InvoiceForm,
 )
 from app.models import Customer, Invoice, InvoiceProduct, Product
+from app.services.stock_adjustments import StockAdjustments
+from app.services.stock_ledger import tag_movements
 from app.utils.activity import log_activity
 from app.utils.numeric import coerce_float
 from app.utils.pagination import build_pagination_args, get_per_page
@@ -46,6 +48,7 @@ def _create_invoice_from_form(form):
         id=invoice_id, customer_id=customer.id, user_id=current_user.id
     )
     db.session.add(invoice)
+    tag_movements("sale", reference_type="invoice", reference_id=invoice_id)
 
     product_data = form.products.data.removesuffix(":").split(":")
 
@@ -71,6 +74,7 @@ def _create_invoice_from_form(form):
     )
     product_lookup = {p.name: p for p in products}
 
+    adjustments = StockAdjustments()
     for product_name, quantity, override_gst, override_pst in parsed_entries:
         product = product_lookup.get(product_name)
 
@@ -122,15 +126,15 @@ def _create_invoice_from_form(form):
             )
             db.session.add(invoice_product)
 
-            product.quantity = (product.quantity or 0) - quantity
+            adjustments.adjust_product(product.id, -quantity)
 
             for recipe_item in product.recipe_items:
-                item = recipe_item.item
                 factor = recipe_item.unit.factor if recipe_item.unit else 1
-                item.quantity = (item.quantity or 0) - (
-                    recipe_item.quantity * factor * quantity
+                adjustments.adjust_item(
+                    recipe_item.item_id, -(recipe_item.quantity * factor * quantity)
                 )
 
+    adjustments.apply()
     db.session.commit()
     log_activity(f"Created invoice {invoice.id}")
     return invoice
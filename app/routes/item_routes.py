@@ -42,6 +42,12 @@ from app.models import (
     TransferItem,
     Vendor,
 )
+from app.services.bulk_import import (
+    MAX_ERRORS_SHOWN,
+    ImportValidationError,
+    ItemImporter,
+    import_file,
+)
 from app.utils.activity import log_activity
 from app.utils.filter_state import (
     filters_to_query_args,
@@ -1312,26 +1318,27 @@ def import_items():
         filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
         file.save(filepath)
 
-        # Read all unique item names from the uploaded file
-        with open(filepath, "r") as file:
-            names = {line.strip() for line in file if line.strip()}
-
-        # Fetch existing active items in a single query and build a lookup
-        existing_items = Item.query.filter(
-            Item.name.in_(names), Item.archived.is_(False)
-        ).all()
-        existing_lookup = {item.name for item in existing_items}
-
-        # Bulk create only the missing items
-        new_items = [
-            Item(name=name) for name in names if name not in existing_lookup
-        ]
-        if new_items:
-            db.session.bulk_save_objects(new_items)
+        dry_run = bool(form.dry_run.data)
+        try:
+            report = import_file(ItemImporter(), filepath, dry_run=dry_run)
+        except ImportValidationError as exc:
+            db.session.rollback()
+            for issue in exc.report.errors[:MAX_ERRORS_SHOWN]:
+                flash(str(issue), "error")
+            hidden = len(exc.report.errors) - MAX_ERRORS_SHOWN
+            if hidden > 0:
+                flash(f"{hidden} more rows have errors.", "error")
+            return redirect(url_for("item.import_items"))
+        finally:
+            os.remove(filepath)
+        if dry_run:
+            return render_template(
+                "items/import_items.html", form=form, report=report
+            )
         db.session.commit()
         log_activity("Imported items from file")
 
-        flash("Items imported successfully.", "success")
+        flash(report.summary(), "success")
         return redirect(url_for("item.import_items"))
 
     return render_template("items/import_items.html", form=form)
@@ -25,9 +25,15 @@ from app.forms import (
     LocationItemAddForm,
 )
 from app.models import GLCode, Item, Location, LocationStandItem, Menu
+from app.services import menu_sync
 from app.services.pdf import render_stand_sheet_pdf
+from app.services.stock_ledger import tag_movements
 from app.utils.activity import log_activity
-from app.utils.menu_assignments import apply_menu_products, set_location_menu
+from app.utils.menu_assignments import (
+    apply_menu_products,
+    set_location_menu,
+    set_locations_menu,
+)
 from app.utils.pagination import build_pagination_args, get_per_page
 from app.utils.units import (
     DEFAULT_BASE_UNIT_CONVERSIONS,
@@ -35,7 +41,7 @@ from app.utils.units import (
     get_unit_label,
 )
 from app.utils.text import normalize_name_for_sorting
-from app.utils.email import SMTPConfigurationError, send_email
+from app.utils.email import MailDeliveryError, SMTPConfigurationError, send_email
 
 location = Blueprint("locations", __name__)
 
@@ -260,61 +266,32 @@ def copy_location_items(source_id: int):
 
     target_ids = [int(tid) for tid in ids]
 
-    # Cache source products and stand items for reuse
-    source_products = list(source.products)
+    found = db.session.query(Location.id).filter(Location.id.in_(target_ids)).count()
+    if found != len(set(target_ids)):
+        abort(404)
+
     source_stand_items = {
-        record.item_id: record
-        for record in LocationStandItem.query.filter_by(location_id=source.id).all()
+        item_id: (expected_count, purchase_gl_code_id)
+        for item_id, expected_count, purchase_gl_code_id in db.session.query(
+            LocationStandItem.item_id,
+            LocationStandItem.expected_count,
+            LocationStandItem.purchase_gl_code_id,
+        ).filter(LocationStandItem.location_id == source.id)
     }
 
-    processed_targets = []
-    for tid in target_ids:
-        target = db.session.get(Location, tid)
-        if target is None:
-            abort(404)
-
-        if source.current_menu is not None:
-            set_location_menu(target, source.current_menu)
-            db.session.flush()
-            for record in list(target.stand_items):
-                source_record = source_stand_items.get(record.item_id)
-                if source_record is not None:
-                    record.expected_count = source_record.expected_count
-                    record.purchase_gl_code_id = source_record.purchase_gl_code_id
-        else:
-            set_location_menu(target, None)
-            db.session.flush()
-            target.products = list(source_products)
-            existing_items: set[int] = set()
-            for product in source_products:
-                for recipe_item in product.recipe_items:
-                    if not recipe_item.countable:
-                        continue
-                    item_id = recipe_item.item_id
-                    if item_id in existing_items:
-                        continue
-                    source_record = source_stand_items.get(item_id)
-                    expected = (
-                        source_record.expected_count
-                        if source_record is not None
-                        else 0
-                    )
-                    purchase_gl_code_id = (
-                        source_record.purchase_gl_code_id
-                        if source_record is not None
-                        else recipe_item.item.purchase_gl_code_id
-                    )
-                    db.session.add(
-                        LocationStandItem(
-                            location=target,
-                            item_id=item_id,
-                            expected_count=expected,
-                            purchase_gl_code_id=purchase_gl_code_id,
-                        )
-                    )
-                    existing_items.add(item_id)
-
-        processed_targets.append(str(tid))
+    tag_movements("location_copy", reference_type="location", reference_id=source.id)
+    menu_sync.assign_menu(
+        db.session,
+        target_ids,
+        source.current_menu_id,
+        product_ids=(
+            None
+            if source.current_menu_id is not None
+            else [product.id for product in source.products]
+        ),
+        stand_values=source_stand_items,
+    )
+    processed_targets = [str(tid) for tid in target_ids]
 
     db.session.commit()
     log_activity(
@@ -463,6 +440,13 @@ def email_stand_sheets(location_id: int | None = None):
         return _respond_error(
             "Email settings are not configured. Please update SMTP settings before sending emails."
         )
+    except MailDeliveryError as exc:
+        current_app.logger.warning("Stand sheet email partly refused: %s", exc)
+        return _respond_error(
+            "Unable to send the stand sheet email to "
+            + ", ".join(recipient for recipient, _ in exc.failed)
+            + "."
+        )
     except Exception:
         current_app.logger.exception(
             "Failed to send stand sheet email for locations %s",
@@ -962,11 +946,10 @@ def bulk_update_locations():
                     location_obj.is_spoilage = new_is_spoilage
                 if apply_archived:
                     location_obj.archived = new_archived
-                if apply_menu:
-                    if new_menu_id and menu_obj is not None:
-                        set_location_menu(location_obj, menu_obj)
-                    else:
-                        set_location_menu(location_obj, None)
+            if apply_menu:
+                set_locations_menu(
+                    locations, menu_obj if new_menu_id else None
+                )
         db.session.commit()
 
         refreshed_locations = (
@@ -7,7 +7,6 @@ import hmac
 import os
 import time
 from email.utils import parseaddr
-from pathlib import Path
 
 from flask import Blueprint, current_app, jsonify, request
 from werkzeug.utils import secure_filename
@@ -110,13 +109,6 @@ def inbound_mailgun():
     if not request.files:
         return jsonify({"ok": False, "error": "missing_attachment"}), 400
 
-    storage_dir_config = current_app.config.get("MAILGUN_INBOUND_STORAGE_DIR")
-    storage_dir = Path(
-        storage_dir_config
-        or os.path.join(current_app.config["UPLOAD_FOLDER"], "mailgun_inbound")
-    )
-    storage_dir.mkdir(parents=True, exist_ok=True)
-
     imported = []
     for upload in request.files.values():
         filename = secure_filename(upload.filename or "")
@@ -135,9 +127,13 @@ def inbound_mailgun():
                 400,
             )
 
-        content = upload.read()
-        if not content:
+        # Stream the spooled upload into the attachment store instead of
+        # reading it into memory.
+        content = upload.stream
+        content.seek(0, os.SEEK_END)
+        if not content.tell():
             continue
+        content.seek(0)
 
         message_id = _message_id()
         try:
@@ -146,7 +142,6 @@ def inbound_mailgun():
                 source_message_id=message_id,
                 filename=filename,
                 content=content,
-                storage_dir=storage_dir,
             )
             imported.append({"id": sales_import.id, "duplicate": duplicate})
             if duplicate:
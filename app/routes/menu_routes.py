@@ -22,7 +22,7 @@ from app.forms import (
 )
 from app.models import Location, Menu, MenuAssignment, Product
 from app.utils.activity import log_activity
-from app.utils.menu_assignments import set_location_menu, sync_menu_locations
+from app.utils.menu_assignments import set_locations_menu, sync_menu_locations
 
 menu = Blueprint("menu", __name__)
 
@@ -162,8 +162,7 @@ def delete_menu(menu_id: int):
     if menu is None:
         abort(404)
     active_locations = [assignment.location for assignment in menu.assignments if assignment.unassigned_at is None and assignment.location]
-    for location in active_locations:
-        set_location_menu(location, None)
+    set_locations_menu(active_locations, None)
     db.session.delete(menu)
     db.session.commit()
     log_activity(f"Deleted menu {menu.name}")
@@ -183,13 +182,13 @@ def assign_menu(menu_id: int):
     if form.validate_on_submit():
         selected_ids = set(form.location_ids.data)
         current_locations = Location.query.filter_by(current_menu_id=menu.id).all()
-        for location in current_locations:
-            if location.id not in selected_ids:
-                set_location_menu(location, None)
+        set_locations_menu(
+            [location for location in current_locations if location.id not in selected_ids],
+            None,
+        )
         if selected_ids:
             locations = Location.query.filter(Location.id.in_(selected_ids)).all()
-            for location in locations:
-                set_location_menu(location, menu)
+            set_locations_menu(locations, menu)
         db.session.commit()
         log_activity(
             "Updated menu assignments for {name}".format(name=menu.name)
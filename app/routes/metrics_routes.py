@@ -0,0 +1,43 @@
+"""Prometheus scrape endpoint."""
+
+from __future__ import annotations
+
+import hmac
+
+from flask import Blueprint, Response, abort, current_app, request
+from flask_login import current_user
+
+from app import limiter
+from app.services.metrics import CONTENT_TYPE_LATEST, render_latest
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+def _bearer_token_valid() -> bool:
+    expected = current_app.config.get("METRICS_TOKEN") or ""
+    if not expected:
+        return False
+    header = request.headers.get("Authorization", "")
+    scheme, _, token = header.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    return hmac.compare_digest(token.strip().encode(), expected.encode())
+
+
+@metrics_bp.route("/metrics")
+@limiter.exempt
+def metrics():
+    """Expose process metrics to Prometheus scrapers.
+
+    Scrapers authenticate with ``Authorization: Bearer $METRICS_TOKEN``;
+    logged-in administrators may also view the output in a browser.
+    """
+
+    if not current_app.config.get("METRICS_ENABLED", True):
+        abort(404)
+    if not _bearer_token_valid():
+        if not current_user.is_authenticated:
+            abort(401)
+        if not current_user.is_admin:
+            abort(403)
+    return Response(render_latest(), content_type=CONTENT_TYPE_LATEST)
@@ -12,7 +12,7 @@ from flask import (
     url_for,
 )
 from flask_login import current_user, login_required
-from sqlalchemy import case, func, or_
+from sqlalchemy import or_
 from sqlalchemy.orm import aliased, selectinload
 
 from app import db
@@ -33,9 +33,9 @@ from app.models import (
     Customer,
     Invoice,
     InvoiceProduct,
-    TerminalSale,
     TerminalSaleProductAlias,
 )
+from app.services.product_costing import recalculate_product_costs
 from app.utils.activity import log_activity
 from app.utils.filter_state import (
     filters_to_query_args,
@@ -47,6 +47,13 @@ from app.utils.pagination import build_pagination_args, get_per_page
 
 product = Blueprint("product", __name__)
 
+# ``sort`` values accepted by the product list, with their labels.
+PRODUCT_SORTS = {
+    "": "Default",
+    "last_sold_desc": "Last sold (newest first)",
+    "last_sold_asc": "Last sold (oldest first)",
+}
+
 
 @product.route("/products")
 @login_required
@@ -118,6 +125,9 @@ def view_products():
         "yes",
         "on",
     ]
+    sort = request.args.get("sort", "")
+    if sort not in PRODUCT_SORTS:
+        sort = ""
     last_sold_before = None
     if last_sold_before_str:
         try:
@@ -173,37 +183,20 @@ def view_products():
         query = query.filter(Product.price >= price_min)
     if price_max is not None:
         query = query.filter(Product.price <= price_max)
-    invoice_last_sold = func.max(Invoice.date_created)
-    terminal_sale_last_sold = func.max(TerminalSale.sold_at)
-    bind = db.session.get_bind()
-    if bind is not None and bind.dialect.name == "sqlite":
-        greatest_last_sold = case(
-            (invoice_last_sold >= terminal_sale_last_sold, invoice_last_sold),
-            else_=terminal_sale_last_sold,
-        )
-    else:
-        greatest_last_sold = func.greatest(
-            invoice_last_sold, terminal_sale_last_sold
-        )
-    last_sold_expr = func.coalesce(
-        greatest_last_sold, invoice_last_sold, terminal_sale_last_sold
-    )
-    query = (
-        query.outerjoin(InvoiceProduct, Product.invoice_products)
-        .outerjoin(Invoice, InvoiceProduct.invoice_id == Invoice.id)
-        .outerjoin(TerminalSale, Product.id == TerminalSale.product_id)
-        .group_by(Product.id)
-    )
     if last_sold_before:
         if include_unsold:
-            query = query.having(
+            query = query.filter(
                 or_(
-                    last_sold_expr < last_sold_before,
-                    last_sold_expr.is_(None),
+                    Product.last_sold_at < last_sold_before,
+                    Product.last_sold_at.is_(None),
                 )
             )
         else:
-            query = query.having(last_sold_expr < last_sold_before)
+            query = query.filter(Product.last_sold_at < last_sold_before)
+    if sort == "last_sold_desc":
+        query = query.order_by(Product.last_sold_at.desc(), Product.id)
+    elif sort == "last_sold_asc":
+        query = query.order_by(Product.last_sold_at.asc(), Product.id)
 
     query = query.options(
         selectinload(Product.sales_gl_code),
@@ -244,6 +237,8 @@ def view_products():
         price_max=price_max,
         last_sold_before=last_sold_before_str,
         include_unsold=include_unsold,
+        sort=sort,
+        sort_options=PRODUCT_SORTS,
         bulk_cost_form=bulk_cost_form,
         per_page=per_page,
         pagination_args=build_pagination_args(per_page),
@@ -1010,34 +1005,17 @@ def bulk_set_cost_from_recipe():
         except (TypeError, ValueError):
             continue
 
-    query = Product.query.options(
-        selectinload(Product.recipe_items).selectinload(ProductRecipeItem.item),
-        selectinload(Product.recipe_items).selectinload(ProductRecipeItem.unit),
-    )
+    query = db.session.query(Product.id)
     if product_ids:
         query = query.filter(Product.id.in_(product_ids))
 
-    products = query.all()
-    if not products:
+    selected_ids = [selected_id for (selected_id,) in query]
+    if not selected_ids:
         flash("No products selected for recipe cost update.", "warning")
         return redirect(url_for("product.view_products"))
 
-    updated = 0
-    for product_obj in products:
-        total = 0.0
-        for recipe_item in product_obj.recipe_items:
-            item_cost = getattr(recipe_item.item, "cost", 0.0)
-            try:
-                quantity = float(recipe_item.quantity or 0)
-            except (TypeError, ValueError):
-                quantity = 0.0
-            factor = recipe_item.unit.factor if recipe_item.unit else 1
-            total += (item_cost or 0.0) * quantity * factor
-        yield_quantity = product_obj.recipe_yield_quantity or 0
-        if not yield_quantity or yield_quantity <= 0:
-            yield_quantity = 1.0
-        product_obj.cost = total / yield_quantity if yield_quantity else total
-        updated += 1
+    recalculate_product_costs(selected_ids, source="recipe_recalculation")
+    updated = len(selected_ids)
 
     db.session.commit()
     log_activity(
@@ -45,8 +45,14 @@ from app.routes.report_routes import (
     _invoice_gl_code_rows,
     invoice_gl_code_report,
 )
-from app.utils.forecasting import DemandForecastingHelper
-from app.utils.pagination import build_pagination_args, get_per_page
+from app.utils.forecasting import FORECAST_METHODS, DemandForecastingHelper
+from app.utils.pagination import (
+    ListPagination,
+    build_pagination_args,
+    get_per_page,
+)
+from app.services import attachment_store
+from app.services.product_costing import propagate_item_cost_changes
 from app.services.purchase_merge import (
     PurchaseMergeError,
     merge_purchase_orders,
@@ -58,9 +64,24 @@ from app.services.purchase_imports import (
     serialize_parsed_line,
     update_or_create_vendor_alias,
 )
+from app.services.purchase_receiving import receive_invoice_lines
+from app.services.purchase_recommendations import (
+    DEFAULT_LEAD_TIME_DAYS,
+    DEFAULT_LOOKBACK_DAYS,
+    DEFAULT_METHOD,
+    active_location_ids,
+    as_recommendations,
+    current_run,
+    recommendation_totals,
+    stored_recommendation_totals,
+    stored_recommendations_query,
+)
+from app.services.stock_adjustments import StockAdjustments
+from app.services.stock_ledger import tag_movements
 
 import datetime
 import json
+import os
 import re
 
 from sqlalchemy import func, or_
@@ -562,6 +583,12 @@ def upload_purchase_order():
         flash("Select an enabled vendor before uploading a purchase order file.", "danger")
         return redirect(url_for("purchase.view_purchase_orders"))
 
+    source_attachment = None
+    if file:
+        # Keep the vendor file so the order can be traced back to it.
+        source_attachment = attachment_store.write_blob(file.stream).to_dict()
+        file.stream.seek(0)
+
     try:
         parsed_order = parse_purchase_order_csv(file, vendor)
         resolved_lines = resolve_vendor_purchase_lines(vendor, parsed_order.items)
@@ -573,6 +600,7 @@ def upload_purchase_order():
         "vendor_id": vendor.id,
         "vendor_name": f"{vendor.first_name} {vendor.last_name}",
         "source_filename": getattr(file, "filename", None),
+        "source_attachment": source_attachment,
         "order_number": parsed_order.order_number,
         "order_date": parsed_order.order_date.isoformat()
         if parsed_order.order_date
@@ -913,6 +941,16 @@ def create_purchase_order():
             expected_total_cost=expected_total,
             delivery_charge=form.delivery_charge.data or 0.0,
         )
+        source_attachment = (upload_state or {}).get("source_attachment")
+        if isinstance(source_attachment, dict) and os.path.exists(
+            source_attachment.get("path") or ""
+        ):
+            po.source_attachment_sha256 = source_attachment["sha256"]
+            attachment_store.acquire(
+                db.session,
+                attachment_store.StoredBlob(**source_attachment),
+                filename=upload_state.get("source_filename"),
+            )
         db.session.add(po)
         db.session.commit()
 
@@ -1010,7 +1048,7 @@ def purchase_order_recommendations():
     raw_lookback = coerce_float(params.get("lookback_days"))
     lookback_days = int(raw_lookback) if raw_lookback is not None else 0
     if not lookback_days:
-        lookback_days = 30
+        lookback_days = DEFAULT_LOOKBACK_DAYS
     location_id = params.get("location_id", type=int)
     item_id = params.get("item_id", type=int)
     attendance_multiplier = coerce_float(params.get("attendance_multiplier")) or 1.0
@@ -1019,27 +1057,90 @@ def purchase_order_recommendations():
     raw_lead_time = coerce_float(params.get("lead_time_days"))
     lead_time_days = int(raw_lead_time) if raw_lead_time is not None else 0
     if not lead_time_days:
-        lead_time_days = 3
-
-    helper = DemandForecastingHelper(
-        lookback_days=lookback_days, lead_time_days=lead_time_days
-    )
-    recommendations = helper.build_recommendations(
-        location_ids=[location_id] if location_id else None,
-        item_ids=[item_id] if item_id else None,
-        attendance_multiplier=attendance_multiplier,
-        weather_multiplier=weather_multiplier,
-        promo_multiplier=promo_multiplier,
-    )
-
-    vendors = Vendor.query.filter_by(archived=False).all()
-    locations = Location.query.filter_by(archived=False).all()
+        lead_time_days = DEFAULT_LEAD_TIME_DAYS
+    method = params.get("method") or DEFAULT_METHOD
+    if method not in FORECAST_METHODS:
+        method = DEFAULT_METHOD
+    multiplier = attendance_multiplier * weather_multiplier * promo_multiplier
+    location_ids = [location_id] if location_id else None
+    item_ids = [item_id] if item_id else None
 
     wants_json = (
         request.args.get("format") == "json"
         or request.accept_mimetypes["application/json"]
         > request.accept_mimetypes["text/html"]
     )
+    # The JSON feed returns every line unless a page is asked for.
+    paged = not wants_json or "page" in params or "per_page" in params
+    page = max(params.get("page", 1, type=int) or 1, 1)
+    per_page = get_per_page(default=100)
+
+    run = current_run(lookback_days=lookback_days, method=method)
+    if run is not None:
+        statement = stored_recommendations_query(
+            run, location_ids=location_ids, item_ids=item_ids, multiplier=multiplier
+        )
+        if paged:
+            pagination = db.paginate(
+                statement,
+                page=page,
+                per_page=per_page,
+                max_per_page=None,
+                error_out=False,
+            )
+            lines = pagination.items
+        else:
+            pagination = None
+            lines = db.session.scalars(statement).unique().all()
+        recommendations = as_recommendations(
+            lines, multiplier=multiplier, lead_time_days=lead_time_days
+        )
+        chart_rows = (
+            None
+            if wants_json
+            else stored_recommendation_totals(
+                run,
+                location_ids=location_ids,
+                item_ids=item_ids,
+                multiplier=multiplier,
+            )
+        )
+    else:
+        # Cover the same locations and items as the stored run.
+        forecast_location_ids = active_location_ids(location_ids)
+        helper = DemandForecastingHelper(
+            lookback_days=lookback_days, lead_time_days=lead_time_days
+        )
+        recommendations = [
+            rec
+            for rec in (
+                helper.build_recommendations(
+                    location_ids=forecast_location_ids,
+                    item_ids=item_ids,
+                    attendance_multiplier=attendance_multiplier,
+                    weather_multiplier=weather_multiplier,
+                    promo_multiplier=promo_multiplier,
+                    method=method,
+                )
+                if forecast_location_ids
+                else []
+            )
+            if not rec.item.archived
+        ]
+        chart_rows = None if wants_json else recommendation_totals(recommendations)
+        pagination = None
+        if paged:
+            pagination = ListPagination(
+                page=page,
+                per_page=per_page,
+                max_per_page=None,
+                error_out=False,
+                items=recommendations,
+            )
+            recommendations = pagination.items
+
+    vendors = Vendor.query.filter_by(archived=False).all()
+    locations = Location.query.filter_by(archived=False).all()
 
     if wants_json:
         payload = {
@@ -1049,6 +1150,9 @@ def purchase_order_recommendations():
                 "weather_multiplier": weather_multiplier,
                 "promo_multiplier": promo_multiplier,
                 "lead_time_days": lead_time_days,
+                "method": method,
+                "source": "precomputed" if run is not None else "live",
+                "generated_at": run.generated_at.isoformat() if run else None,
             },
             "data": [
                 {
@@ -1070,20 +1174,15 @@ def purchase_order_recommendations():
                 for rec in recommendations
             ],
         }
+        if pagination is not None:
+            payload["meta"].update(
+                page=pagination.page,
+                per_page=pagination.per_page,
+                total=pagination.total,
+                pages=pagination.pages,
+            )
         return jsonify(payload)
 
-    chart_rows = [
-        {
-            "label": f"{rec.item.name} @ {rec.location.name}",
-            "recommended": rec.recommended_quantity,
-            "consumption": rec.base_consumption,
-            "incoming": rec.history["transfer_in_qty"]
-            + rec.history["invoice_qty"]
-            + rec.history["open_po_qty"],
-        }
-        for rec in recommendations
-    ]
-
     if request.method == "POST" and request.form.get("action") == "seed":
         selected_keys = request.form.getlist("selected_lines")
         if not selected_keys:
@@ -1151,6 +1250,11 @@ def purchase_order_recommendations():
         weather_multiplier=weather_multiplier,
         promo_multiplier=promo_multiplier,
         lead_time_days=lead_time_days,
+        method=method,
+        recommendation_run=run,
+        pagination=pagination,
+        per_page=per_page,
+        pagination_args=build_pagination_args(per_page),
         chart_rows=chart_rows,
         today=today,
     )
@@ -1459,6 +1563,11 @@ def receive_invoice(po_id):
         # committing the transaction yet. This keeps all updates in a single
         # commit so item cost changes persist reliably.
         db.session.flush()
+        tag_movements(
+            "purchase_receipt",
+            reference_type="purchase_invoice",
+            reference_id=invoice.id,
+        )
 
         item_entries = []
         fallback_counter = 0
@@ -1512,96 +1621,15 @@ def receive_invoice(po_id):
             )
         )
 
-        for order_index, entry in enumerate(item_entries):
-            item_obj = db.session.get(Item, entry["item_id"])
-            unit_obj = (
-                db.session.get(ItemUnit, entry["unit_id"]) if entry["unit_id"] else None
-            )
-
-            prev_cost = item_obj.cost if item_obj and item_obj.cost else 0.0
-            quantity = entry["quantity"]
-            cost = entry["cost"]
-            container_deposit = entry.get("container_deposit", 0.0)
-
-            db.session.add(
-                PurchaseInvoiceItem(
-                    invoice_id=invoice.id,
-                    item_id=item_obj.id if item_obj else None,
-                    unit_id=unit_obj.id if unit_obj else None,
-                    item_name=item_obj.name if item_obj else "",
-                    unit_name=unit_obj.name if unit_obj else None,
-                    quantity=quantity,
-                    cost=cost,
-                    container_deposit=container_deposit,
-                    prev_cost=prev_cost,
-                    position=order_index,
-                    purchase_gl_code_id=entry["gl_code_id"],
-                    location_id=entry["location_id"],
-                )
-            )
-
-            if item_obj:
-                factor = unit_obj.factor if unit_obj and unit_obj.factor else 1
-                prev_qty = (
-                    db.session.query(
-                        db.func.sum(LocationStandItem.expected_count)
-                    )
-                    .filter(LocationStandItem.item_id == item_obj.id)
-                    .scalar()
-                    or 0
-                )
-                new_qty = quantity * factor
-                total_qty = prev_qty + new_qty
-
-                # Cost per base unit for the newly received stock
-                cost_per_unit = cost / factor if factor else cost
-                prev_total_cost = prev_qty * prev_cost
-                new_total_cost = cost_per_unit * new_qty
-                if total_qty > 0:
-                    weighted_cost = (prev_total_cost + new_total_cost) / total_qty
-                else:
-                    weighted_cost = cost_per_unit
-
-                item_obj.quantity = total_qty
-                item_obj.cost = weighted_cost
-
-                # Explicitly mark the item as dirty so cost updates persist
-                db.session.add(item_obj)
-
-                line_location_id = entry["location_id"] or invoice.location_id
-                record = LocationStandItem.query.filter_by(
-                    location_id=line_location_id, item_id=item_obj.id
-                ).first()
-                if not record:
-                    record = LocationStandItem(
-                        location_id=line_location_id,
-                        item_id=item_obj.id,
-                        expected_count=0,
-                        purchase_gl_code_id=item_obj.purchase_gl_code_id,
-                    )
-                    db.session.add(record)
-                elif (
-                    record.purchase_gl_code_id is None
-                    and item_obj.purchase_gl_code_id is not None
-                ):
-                    record.purchase_gl_code_id = item_obj.purchase_gl_code_id
-                record.expected_count += quantity * factor
-
-                if entry.get("deposit_provided"):
-                    base_deposit = (
-                        container_deposit / factor if factor else container_deposit
-                    )
-                    item_obj.container_deposit = base_deposit
-                    db.session.add(item_obj)
-
-                # Ensure the in-memory changes are sent to the database so
-                # subsequent iterations or queries within this request see
-                # the updated cost and quantity values immediately.
-                db.session.flush()
+        receive_invoice_lines(invoice, item_entries)
         po.received = True
         db.session.add(po)
         if draft:
             db.session.delete(draft)
+        propagate_item_cost_changes(
+            [entry["item_id"] for entry in item_entries],
+            source="receive_invoice",
+        )
         # Commit once so that invoice, items, and updated item costs are saved
         # atomically, ensuring the weighted cost persists in the database.
         db.session.commit()
@@ -1924,6 +1952,12 @@ def reverse_purchase_invoice(invoice_id):
                 payload=json.dumps(draft_payload),
             )
         )
+    tag_movements(
+        "purchase_reversal",
+        reference_type="purchase_invoice",
+        reference_id=invoice.id,
+    )
+    adjustments = StockAdjustments(fill_purchase_gl_codes=True)
     for inv_item in invoice.items:
         factor = 1
         if inv_item.unit_id:
@@ -1939,31 +1973,12 @@ def reverse_purchase_invoice(invoice_id):
             return redirect(url_for("purchase.view_purchase_invoices"))
 
         removed_qty = inv_item.quantity * factor
-        qty_before = itm.quantity
-        itm.quantity = qty_before - removed_qty
+        adjustments.adjust_item(itm.id, -removed_qty)
         itm.cost = inv_item.prev_cost or 0.0
 
         # Update expected count for the location where items were received
         line_location_id = inv_item.location_id or invoice.location_id
-        record = LocationStandItem.query.filter_by(
-            location_id=line_location_id,
-            item_id=itm.id,
-        ).first()
-        if not record:
-            record = LocationStandItem(
-                location_id=line_location_id,
-                item_id=itm.id,
-                expected_count=0,
-                purchase_gl_code_id=itm.purchase_gl_code_id,
-            )
-            db.session.add(record)
-        elif (
-            record.purchase_gl_code_id is None
-            and itm.purchase_gl_code_id is not None
-        ):
-            record.purchase_gl_code_id = itm.purchase_gl_code_id
-        new_count = record.expected_count - removed_qty
-        record.expected_count = new_count
+        adjustments.adjust_location(line_location_id, itm.id, -removed_qty)
 
     location_ids = {
         inv_item.location_id or invoice.location_id for inv_item in invoice.items
@@ -1980,6 +1995,11 @@ def reverse_purchase_invoice(invoice_id):
         )
         return redirect(url_for("purchase.view_purchase_invoices"))
 
+    adjustments.apply()
+    propagate_item_cost_changes(
+        [inv_item.item_id for inv_item in invoice.items],
+        source="reverse_invoice",
+    )
     PurchaseInvoiceItem.query.filter_by(invoice_id=invoice.id).delete()
     db.session.delete(invoice)
     po.received = False
@@ -3,7 +3,6 @@ import tempfile
 from dataclasses import asdict
 from datetime import datetime
 from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
-from secrets import token_urlsafe
 from typing import Dict
 
 from flask import (
@@ -48,12 +47,13 @@ from app.models import (
     PurchaseInvoice,
     PurchaseInvoiceItem,
     PurchaseOrder,
-    TerminalSale,
     TerminalSaleProductAlias,
     Transfer,
     TransferItem,
     User,
 )
+from app.services import result_store, sales_facts
+from app.services.gl_resolution import load_invoice_line_gl_codes
 from app.utils.forecasting import DemandForecastingHelper
 from app.utils.pos_import import parse_department_sales_forecast
 from app.utils.units import (
@@ -170,6 +170,7 @@ def _compute_vendor_invoice_line_base(invoice: Invoice, item: InvoiceProduct) ->
 
 
 _DEPARTMENT_SALES_STATE_KEY = "department_sales_forecast_state"
+_DEPARTMENT_SALES_NAMESPACE = "department_sales_forecast"
 _SKIP_SELECTION_VALUE = "__skip__"
 _CREATE_SELECTION_VALUE = "__create__"
 
@@ -517,8 +518,7 @@ def _calculate_department_usage(
 @login_required
 def department_sales_forecast():
     if request.args.get("reset") == "1":
-        session.pop(_DEPARTMENT_SALES_STATE_KEY, None)
-        session.modified = True
+        result_store.clear_from_session(_DEPARTMENT_SALES_STATE_KEY)
         return redirect(url_for("report.department_sales_forecast"))
 
     form = DepartmentSalesForecastForm()
@@ -546,8 +546,7 @@ def department_sales_forecast():
         try:
             state_data = serializer.loads(raw_token)
         except BadSignature:
-            session.pop(_DEPARTMENT_SALES_STATE_KEY, None)
-            session.modified = True
+            result_store.clear_from_session(_DEPARTMENT_SALES_STATE_KEY)
             flash(
                 "The uploaded sales data could not be verified. Upload the file again.",
                 "danger",
@@ -556,21 +555,25 @@ def department_sales_forecast():
 
         token_id = state_data.get("token_id")
         expected_id = session.get(_DEPARTMENT_SALES_STATE_KEY)
-        if not token_id or expected_id != token_id:
-            session.pop(_DEPARTMENT_SALES_STATE_KEY, None)
-            session.modified = True
+        stored_state = (
+            result_store.get(_DEPARTMENT_SALES_NAMESPACE, token_id)
+            if token_id and expected_id == token_id
+            else None
+        )
+        if stored_state is None:
+            result_store.clear_from_session(_DEPARTMENT_SALES_STATE_KEY)
             flash(
                 "The department sales forecast session is no longer valid. Upload the file again.",
                 "danger",
             )
             return redirect(url_for("report.department_sales_forecast"))
 
-        payload = state_data.get("payload") or {}
+        payload = stored_state.get("payload") or {}
         if not isinstance(payload, dict):
             flash("Unable to continue processing the uploaded data.", "danger")
             return redirect(url_for("report.department_sales_forecast"))
 
-        filename = state_data.get("filename")
+        filename = stored_state.get("filename")
         options = payload.setdefault("options", {})
         only_mapped = bool(request.form.get("only_mapped"))
         options["only_mapped"] = only_mapped
@@ -773,13 +776,14 @@ def department_sales_forecast():
             payload["manual_mappings"] = {}
             payload["options"] = {"only_mapped": bool(form.only_mapped_products.data)}
             only_mapped = payload["options"]["only_mapped"]
-            token_id = token_urlsafe(16)
-            session[_DEPARTMENT_SALES_STATE_KEY] = token_id
-            session.modified = True
-            serializer = _department_sales_serializer()
-            state_token = serializer.dumps(
-                {"token_id": token_id, "payload": payload, "filename": filename}
+            result_store.clear_from_session(_DEPARTMENT_SALES_STATE_KEY)
+            token_id = result_store.save_in_session(
+                _DEPARTMENT_SALES_STATE_KEY,
+                _DEPARTMENT_SALES_NAMESPACE,
+                {"payload": payload, "filename": filename},
             )
+            serializer = _department_sales_serializer()
+            state_token = serializer.dumps({"token_id": token_id})
 
     elif request.method == "POST":
         # Form submission failed validation; errors will be displayed.
@@ -897,15 +901,13 @@ def department_sales_forecast():
             overall_skipped_products,
         ) = _calculate_department_usage(payload, resolved_map, only_mapped)
 
-        token_id = session.get(_DEPARTMENT_SALES_STATE_KEY)
-        if not token_id:
-            token_id = token_urlsafe(16)
-            session[_DEPARTMENT_SALES_STATE_KEY] = token_id
-            session.modified = True
-        serializer = _department_sales_serializer()
-        state_token = serializer.dumps(
-            {"token_id": token_id, "payload": payload, "filename": filename}
+        token_id = result_store.save_in_session(
+            _DEPARTMENT_SALES_STATE_KEY,
+            _DEPARTMENT_SALES_NAMESPACE,
+            {"payload": payload, "filename": filename},
         )
+        serializer = _department_sales_serializer()
+        state_token = serializer.dumps({"token_id": token_id})
     else:
         form.only_mapped_products.data = False
 
@@ -1114,6 +1116,7 @@ def purchase_inventory_summary():
                 )
 
             invoice_items = query.all()
+            purchase_gl_codes = load_invoice_line_gl_codes(invoice_items)
             selected_gl_codes = set(form.gl_codes.data or [])
             aggregates = {}
             conversions = _get_base_unit_conversions()
@@ -1121,7 +1124,7 @@ def purchase_inventory_summary():
             for inv_item in invoice_items:
                 invoice = inv_item.invoice
                 location_id = inv_item.location_id or (invoice.location_id if invoice else None)
-                resolved_gl = inv_item.resolved_purchase_gl_code(location_id)
+                resolved_gl = purchase_gl_codes.for_invoice_line(inv_item, location_id)
                 gl_id = resolved_gl.id if resolved_gl else None
 
                 if selected_gl_codes:
@@ -1268,13 +1271,14 @@ def inventory_variance_report():
                 )
 
             purchase_items = purchase_query.all()
+            purchase_gl_codes = load_invoice_line_gl_codes(purchase_items)
             purchases: dict[tuple[object, int], dict] = {}
             purchases_by_item: dict[object, list[dict]] = {}
 
             for inv_item in purchase_items:
                 invoice = inv_item.invoice
                 location_id = inv_item.location_id or (invoice.location_id if invoice else None)
-                resolved_gl = inv_item.resolved_purchase_gl_code(location_id)
+                resolved_gl = purchase_gl_codes.for_invoice_line(inv_item, location_id)
                 gl_id = resolved_gl.id if resolved_gl else None
 
                 if selected_gl_codes:
@@ -1710,10 +1714,13 @@ def inventory_variance_report():
 
 def _invoice_gl_code_rows(invoice: PurchaseInvoice):
     buckets: Dict[str, Dict[str, Decimal]] = {}
+    purchase_gl_codes = load_invoice_line_gl_codes(
+        invoice.items, invoice.location_id
+    )
 
     for item in invoice.items:
         line_location_id = item.location_id or invoice.location_id
-        gl = item.resolved_purchase_gl_code(line_location_id)
+        gl = purchase_gl_codes.for_invoice_line(item, line_location_id)
         if gl is not None:
             code_key = gl.code
             display_code = gl.code
@@ -2331,30 +2338,18 @@ def product_location_sales_report():
             row.product_id: {"last_sale": row.last_sale} for row in invoice_rows
         }
 
-        term_rows = (
-            db.session.query(
-                TerminalSale.product_id.label("product_id"),
-                EventLocation.location_id.label("location_id"),
-                db.func.sum(TerminalSale.quantity).label("total_quantity"),
-                db.func.max(TerminalSale.sold_at).label("last_sale"),
-            )
-            .join(EventLocation, TerminalSale.event_location_id == EventLocation.id)
-            .filter(TerminalSale.sold_at >= start, TerminalSale.sold_at <= end)
-            .group_by(TerminalSale.product_id, EventLocation.location_id)
-            .all()
-        )
+        term_rows = sales_facts.product_location_sales(db.session, start, end)
 
         terminal_data = {}
         location_ids = set()
-        for row in term_rows:
-            pid = row.product_id
-            location_ids.add(row.location_id)
+        for pid, location_id, total_quantity, last_sale in term_rows:
+            location_ids.add(location_id)
             data = terminal_data.setdefault(
-                pid, {"locations": {}, "last_sale": row.last_sale}
+                pid, {"locations": {}, "last_sale": last_sale}
             )
-            data["locations"][row.location_id] = row.total_quantity
-            if row.last_sale > data["last_sale"]:
-                data["last_sale"] = row.last_sale
+            data["locations"][location_id] = total_quantity
+            if last_sale > data["last_sale"]:
+                data["last_sale"] = last_sale
 
         locations = {}
         if location_ids:
@@ -2403,35 +2398,22 @@ def event_terminal_sales_report():
         start_dt = datetime.combine(start_date, datetime.min.time())
         end_dt = datetime.combine(end_date, datetime.max.time())
 
-        sale_amount = func.coalesce(TerminalSale.quantity, 0) * func.coalesce(
-            Product.price, 0
+        sales = sales_facts.event_sales_amounts(start_dt, end_dt)
+        event_total_sales = func.coalesce(func.sum(sales.c.amount), 0)
+        in_window = or_(
+            and_(Event.end_date >= start_date, Event.end_date <= end_date),
+            sales.c.event_id.is_not(None),
         )
 
-        event_total_sales = func.coalesce(func.sum(sale_amount), 0)
-
         event_totals = (
             db.session.query(
                 Event.id.label("event_id"),
                 Event.name.label("event_name"),
                 event_total_sales.label("total_sales"),
             )
-            .outerjoin(EventLocation, Event.locations)
-            .outerjoin(
-                TerminalSale,
-                and_(
-                    EventLocation.id == TerminalSale.event_location_id,
-                    TerminalSale.sold_at >= start_dt,
-                    TerminalSale.sold_at <= end_dt,
-                ),
-            )
-            .outerjoin(Product, TerminalSale.product)
+            .outerjoin(sales, sales.c.event_id == Event.id)
             .filter(Event.closed.is_(True))
-            .filter(
-                or_(
-                    and_(Event.end_date >= start_date, Event.end_date <= end_date),
-                    and_(TerminalSale.sold_at >= start_dt, TerminalSale.sold_at <= end_dt),
-                )
-            )
+            .filter(in_window)
             .group_by(Event.id, Event.name)
             .order_by(event_total_sales.desc(), Event.name)
             .all()
@@ -2442,26 +2424,19 @@ def event_terminal_sales_report():
                 Event.id.label("event_id"),
                 Location.id.label("location_id"),
                 Location.name.label("location_name"),
-                func.coalesce(func.sum(sale_amount), 0).label("total_sales"),
+                event_total_sales.label("total_sales"),
             )
             .outerjoin(EventLocation, Event.locations)
             .outerjoin(Location, EventLocation.location)
             .outerjoin(
-                TerminalSale,
+                sales,
                 and_(
-                    EventLocation.id == TerminalSale.event_location_id,
-                    TerminalSale.sold_at >= start_dt,
-                    TerminalSale.sold_at <= end_dt,
+                    sales.c.event_id == Event.id,
+                    sales.c.location_id == EventLocation.location_id,
                 ),
             )
-            .outerjoin(Product, TerminalSale.product)
             .filter(Event.closed.is_(True))
-            .filter(
-                or_(
-                    and_(Event.end_date >= start_date, Event.end_date <= end_date),
-                    and_(TerminalSale.sold_at >= start_dt, TerminalSale.sold_at <= end_dt),
-                )
-            )
+            .filter(in_window)
             .group_by(Event.id, Location.id, Location.name)
             .all()
         )
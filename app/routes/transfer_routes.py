@@ -14,7 +14,6 @@ from flask import (
     redirect,
     render_template,
     request,
-    session,
     url_for,
 )
 from flask_login import current_user, login_required
@@ -31,6 +30,9 @@ from app.models import (
     TransferItem,
     User,
 )
+from app.services import result_store
+from app.services.stock_adjustments import StockAdjustments
+from app.services.stock_ledger import tag_movements
 from app.utils.activity import log_activity
 from app.utils.numeric import coerce_float
 from app.utils.pagination import build_pagination_args, get_per_page
@@ -38,6 +40,9 @@ from app.utils.sms import send_sms
 
 transfer = Blueprint("transfer", __name__)
 
+_TRANSFER_REPORT_SESSION_KEY = "transfer_report_token"
+_TRANSFER_REPORT_NAMESPACE = "transfer_report"
+
 
 def _extract_transfer_items(prefix: str):
     """Parse dynamic transfer item inputs from ``request.form``.
@@ -194,61 +199,26 @@ def update_expected_counts(
     """Update expected counts for locations involved in a transfer."""
     transfer_items = transfer_items or transfer_obj.transfer_items
     quantities = quantities or {}
-    pairs = {
-        (transfer_obj.from_location_id, ti.item_id)
-        for ti in transfer_items
-    } | {
-        (transfer_obj.to_location_id, ti.item_id)
-        for ti in transfer_items
-    }
-    if not pairs:
-        return
-    records = LocationStandItem.query.filter(
-        tuple_(LocationStandItem.location_id, LocationStandItem.item_id).in_(
-            pairs
-        )
-    ).all()
-    indexed = {(r.location_id, r.item_id): r for r in records}
-
+    adjustments = StockAdjustments()
     for ti in transfer_items:
         quantity = quantities.get(ti.id, ti.quantity)
         if not quantity:
             continue
-        item_obj = db.session.get(Item, ti.item_id)
-
-        from_key = (transfer_obj.from_location_id, ti.item_id)
-        from_record = indexed.get(from_key)
-        if not from_record:
-            from_record = LocationStandItem(
-                location_id=transfer_obj.from_location_id,
-                item_id=ti.item_id,
-                expected_count=0,
-                purchase_gl_code_id=(
-                    item_obj.purchase_gl_code_id if item_obj else None
-                ),
-            )
-            db.session.add(from_record)
-            indexed[from_key] = from_record
-        from_record.expected_count = (
-            from_record.expected_count - multiplier * quantity
+        adjustments.adjust_location(
+            transfer_obj.from_location_id, ti.item_id, -multiplier * quantity
         )
-
-        to_key = (transfer_obj.to_location_id, ti.item_id)
-        to_record = indexed.get(to_key)
-        if not to_record:
-            to_record = LocationStandItem(
-                location_id=transfer_obj.to_location_id,
-                item_id=ti.item_id,
-                expected_count=0,
-                purchase_gl_code_id=(
-                    item_obj.purchase_gl_code_id if item_obj else None
-                ),
-            )
-            db.session.add(to_record)
-            indexed[to_key] = to_record
-        to_record.expected_count = (
-            to_record.expected_count + multiplier * quantity
+        adjustments.adjust_location(
+            transfer_obj.to_location_id, ti.item_id, multiplier * quantity
         )
+    if not adjustments:
+        return
+
+    tag_movements(
+        "transfer" if multiplier > 0 else "transfer_reversal",
+        reference_type="transfer",
+        reference_id=transfer_obj.id,
+    )
+    adjustments.apply()
 
 
 @transfer.route("/transfers", methods=["GET"])
@@ -950,36 +920,35 @@ def generate_report():
             .all()
         )
 
-        # Process the results for display or session storage
-        session["aggregated_transfers"] = [
+        # Keep the rows on the server; the session only carries the token.
+        result_store.save_in_session(
+            _TRANSFER_REPORT_SESSION_KEY,
+            _TRANSFER_REPORT_NAMESPACE,
             {
-                "from_location_name": result[0],
-                "to_location_name": result[1],
-                "item_name": result[2],
-                "total_quantity": result[3],
-            }
-            for result in aggregated_transfers
-        ]
-
-        # Store start and end date/time in session for use in the report
-        session["report_start_datetime"] = start_datetime.strftime(
-            "%Y-%m-%d %H:%M"
-        )
-        session["report_end_datetime"] = end_datetime.strftime(
-            "%Y-%m-%d %H:%M"
+                "aggregated_transfers": [
+                    {
+                        "from_location_name": result[0],
+                        "to_location_name": result[1],
+                        "item_name": result[2],
+                        "total_quantity": result[3],
+                    }
+                    for result in aggregated_transfers
+                ],
+                "start_datetime": start_datetime.strftime("%Y-%m-%d %H:%M"),
+                "end_datetime": end_datetime.strftime("%Y-%m-%d %H:%M"),
+                "from_locations": [
+                    location_lookup.get(location_id)
+                    for location_id in from_location_ids
+                    if location_lookup.get(location_id)
+                ],
+                "to_locations": [
+                    location_lookup.get(location_id)
+                    for location_id in to_location_ids
+                    if location_lookup.get(location_id)
+                ],
+            },
         )
 
-        session["report_from_locations"] = [
-            location_lookup.get(location_id)
-            for location_id in from_location_ids
-            if location_lookup.get(location_id)
-        ]
-        session["report_to_locations"] = [
-            location_lookup.get(location_id)
-            for location_id in to_location_ids
-            if location_lookup.get(location_id)
-        ]
-
         flash("Transfer report generated successfully.", "success")
         return redirect(url_for("transfer.view_report"))
 
@@ -990,10 +959,17 @@ def generate_report():
 @login_required
 def view_report():
     """Display the previously generated transfer report."""
-    aggregated_transfers = session.get("aggregated_transfers", [])
+    report = (
+        result_store.load_from_session(
+            _TRANSFER_REPORT_SESSION_KEY, _TRANSFER_REPORT_NAMESPACE
+        )
+        or {}
+    )
     return render_template(
         "transfers/view_report.html",
-        aggregated_transfers=aggregated_transfers,
-        from_locations=session.get("report_from_locations", []),
-        to_locations=session.get("report_to_locations", []),
+        aggregated_transfers=report.get("aggregated_transfers", []),
+        start_datetime=report.get("start_datetime"),
+        end_datetime=report.get("end_datetime"),
+        from_locations=report.get("from_locations", []),
+        to_locations=report.get("to_locations", []),
     )
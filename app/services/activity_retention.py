@@ -0,0 +1,306 @@
+"""Retention, archival and daily rollups for the activity log.
+
+``ActivityLog`` gets a row for nearly every action and was never pruned, so
+it became the largest table: backups and restores copied all of it and the
+admin page scanned it on every view.
+
+:func:`archive_activity` moves rows older than a cutoff out of the database
+in small batches. Each batch is appended to one gzip-compressed JSON-lines
+file per day under the archive folder, counted into
+:class:`~app.models.ActivityLogRollup` per day, user and action, deleted and
+committed on its own so the write lock is only held briefly. Archived rows
+are searched with :func:`search_archive`; the rollups stay queryable in SQL
+for audits.
+
+A batch interrupted between writing its files and committing is archived
+again on the next run; :func:`search_archive` drops the duplicate ids.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select, update
+
+from app import db
+from app.models import ActivityLog, ActivityLogRollup, User
+from app.utils.periodic import start_periodic_job, stop_periodic_job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+SEARCH_LIMIT = 500
+ACTION_LENGTH = 64
+
+_FILE_PATTERN = re.compile(r"^activity-(\d{4}-\d{2}-\d{2})\.jsonl\.gz$")
+
+
+@dataclass(frozen=True)
+class ArchiveResult:
+    archived: int
+    files: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class ArchivedActivity:
+    id: int
+    timestamp: datetime
+    user_id: Optional[int]
+    user_email: Optional[str]
+    activity: str
+
+
+def activity_action(activity: str) -> str:
+    """Return the rollup action of a log message: its first two words.
+
+    Messages start with a verb and the kind of record ("Edited item 4",
+    "Logged in"), so the first two words group them without the ids and
+    names that follow.
+    """
+
+    return " ".join((activity or "").split()[:2])[:ACTION_LENGTH]
+
+
+def archive_path(folder: str, day: date) -> str:
+    return os.path.join(folder, f"activity-{day:%Y-%m-%d}.jsonl.gz")
+
+
+def _archive_days(folder: str) -> List[date]:
+    if not os.path.isdir(folder):
+        return []
+    days = []
+    for name in os.listdir(folder):
+        match = _FILE_PATTERN.match(name)
+        if match:
+            days.append(date.fromisoformat(match.group(1)))
+    return sorted(days)
+
+
+def _write_batch(folder: str, rows) -> List[str]:
+    by_day: Dict[date, List[str]] = {}
+    for record_id, user_id, email, activity, timestamp in rows:
+        by_day.setdefault(timestamp.date(), []).append(
+            json.dumps(
+                {
+                    "id": record_id,
+                    "timestamp": timestamp.isoformat(),
+                    "user_id": user_id,
+                    "user_email": email,
+                    "activity": activity,
+                }
+            )
+        )
+    paths = []
+    for day, lines in sorted(by_day.items()):
+        path = archive_path(folder, day)
+        # Appending adds a gzip member; readers see one continuous stream.
+        with gzip.open(path, "at", encoding="utf-8") as handle:
+            handle.write("\n".join(lines) + "\n")
+        paths.append(path)
+    return paths
+
+
+def _add_rollups(counts: Counter) -> None:
+    days = sorted({day for day, _, _ in counts})
+    existing: Dict[Tuple[date, Optional[int], str], Tuple[int, int]] = {}
+    rows = db.session.execute(
+        select(
+            ActivityLogRollup.id,
+            ActivityLogRollup.day,
+            ActivityLogRollup.user_id,
+            ActivityLogRollup.action,
+            ActivityLogRollup.count,
+        ).where(ActivityLogRollup.day.in_(days))
+    )
+    for rollup_id, day, user_id, action, count in rows:
+        existing[(day, user_id, action)] = (rollup_id, count)
+
+    inserts = []
+    updates = []
+    for key, count in counts.items():
+        current = existing.get(key)
+        if current is None:
+            day, user_id, action = key
+            inserts.append(
+                {
+                    "day": day,
+                    "user_id": user_id,
+                    "action": action,
+                    "count": count,
+                }
+            )
+        else:
+            updates.append({"id": current[0], "count": current[1] + count})
+    if inserts:
+        db.session.execute(insert(ActivityLogRollup), inserts)
+    if updates:
+        db.session.execute(update(ActivityLogRollup), updates)
+
+
+def archive_activity(
+    folder: str,
+    cutoff: datetime,
+    *,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> ArchiveResult:
+    """Archive and delete activity logged before ``cutoff``.
+
+    Commits after every batch of ``batch_size`` rows.
+    """
+
+    os.makedirs(folder, exist_ok=True)
+    archived = 0
+    files = set()
+    while True:
+        rows = db.session.execute(
+            select(
+                ActivityLog.id,
+                ActivityLog.user_id,
+                User.email,
+                ActivityLog.activity,
+                ActivityLog.timestamp,
+            )
+            .outerjoin(User, User.id == ActivityLog.user_id)
+            .where(ActivityLog.timestamp < cutoff)
+            .order_by(ActivityLog.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        files.update(_write_batch(folder, rows))
+        _add_rollups(
+            Counter(
+                (timestamp.date(), user_id, activity_action(activity))
+                for _, user_id, _, activity, timestamp in rows
+            )
+        )
+        db.session.execute(
+            delete(ActivityLog)
+            .where(ActivityLog.id.in_([row[0] for row in rows]))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        archived += len(rows)
+    return ArchiveResult(archived=archived, files=tuple(sorted(files)))
+
+
+def apply_retention(app) -> ArchiveResult:
+    """Archive activity older than ``ACTIVITY_LOG_RETENTION_DAYS``."""
+
+    days = int(app.config.get("ACTIVITY_LOG_RETENTION_DAYS") or 0)
+    if days <= 0:
+        return ArchiveResult(archived=0, files=())
+    return archive_activity(
+        app.config["ACTIVITY_ARCHIVE_FOLDER"],
+        datetime.utcnow() - timedelta(days=days),
+        batch_size=int(
+            app.config.get("ACTIVITY_LOG_PURGE_BATCH_SIZE")
+            or DEFAULT_BATCH_SIZE
+        ),
+    )
+
+
+def _read_archive(path: str) -> List[dict]:
+    records = []
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as handle:
+            for line in handle:
+                if line.strip():
+                    records.append(json.loads(line))
+    except (EOFError, OSError, ValueError):
+        # Keep what was readable from a truncated or damaged file.
+        logger.warning("Could not fully read activity archive %s", path)
+    return records
+
+
+def search_archive(
+    folder: str,
+    *,
+    user_id: Optional[int] = None,
+    system_only: bool = False,
+    activity: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: int = SEARCH_LIMIT,
+) -> List[ArchivedActivity]:
+    """Return up to ``limit`` archived entries, newest first.
+
+    Only the files for days between ``start`` and ``end`` are opened.
+    """
+
+    needle = (activity or "").strip().casefold()
+    results: List[ArchivedActivity] = []
+    seen = set()
+    for day in reversed(_archive_days(folder)):
+        if (start and day < start) or (end and day > end):
+            continue
+        records = _read_archive(archive_path(folder, day))
+        records.sort(key=lambda record: (record["timestamp"], record["id"]))
+        for record in reversed(records):
+            if record["id"] in seen:
+                continue
+            seen.add(record["id"])
+            if system_only and record["user_id"] is not None:
+                continue
+            if user_id is not None and record["user_id"] != user_id:
+                continue
+            if needle and needle not in record["activity"].casefold():
+                continue
+            results.append(
+                ArchivedActivity(
+                    id=record["id"],
+                    timestamp=datetime.fromisoformat(record["timestamp"]),
+                    user_id=record["user_id"],
+                    user_email=record["user_email"],
+                    activity=record["activity"],
+                )
+            )
+            if len(results) >= limit:
+                return results
+    return results
+
+
+def _retention_job(app) -> None:
+    result = apply_retention(app)
+    if result.archived:
+        logger.info(
+            "Archived %s activity log rows into %s file(s)",
+            result.archived,
+            len(result.files),
+        )
+
+
+def start_activity_retention_thread(app) -> None:
+    """Start or restart the periodic activity log retention thread."""
+
+    if int(app.config.get("ACTIVITY_LOG_RETENTION_DAYS") or 0) <= 0:
+        stop_periodic_job("activity-retention")
+        return
+    start_periodic_job(
+        app,
+        "activity-retention",
+        "ACTIVITY_RETENTION_INTERVAL_HOURS",
+        _retention_job,
+    )
+
+
+__all__ = [
+    "ArchiveResult",
+    "ArchivedActivity",
+    "DEFAULT_BATCH_SIZE",
+    "SEARCH_LIMIT",
+    "activity_action",
+    "apply_retention",
+    "archive_activity",
+    "archive_path",
+    "search_archive",
+    "start_activity_retention_thread",
+]
@@ -0,0 +1,495 @@
+"""Incremental Parquet export of the core fact tables for offline analysis.
+
+Finance and ops used to copy report tables out of the browser or run ad hoc
+queries against the live SQLite file. :func:`export_all` writes the fact
+tables to Hive-style partitioned Parquet files instead::
+
+    <folder>/<table>/month=YYYY-MM/part-*.parquet
+
+which pandas, DuckDB or Polars read directly (``pd.read_parquet(folder /
+"invoice_lines")``). Run it against a backup copy of the database to keep
+all read load off the app.
+
+Change capture uses high-water marks kept in ``<folder>/_state.json``:
+
+* Append-only tables (stock movements, sales facts) only ever gain rows, so
+  each run writes the rows above the table's id mark as a new part file in
+  their month.
+* Terminal sales only hold the sales of open events (closing moves them to
+  sales facts) and uploads replace them, so the table is small and rewritten
+  in full every run.
+* Document tables (invoices, purchase invoices, transfers and their lines)
+  can be edited, and have no change timestamp. Each run rewrites, whole,
+  the months that received rows above the mark plus the months still inside
+  ``refresh_days``; a month that falls out of that window no longer changes
+  in the export.
+
+Nothing is committed; only SELECTs are issued.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, Numeric, func, select
+from sqlalchemy.orm import Session
+
+from app.models import (
+    EventLocation,
+    Invoice,
+    InvoiceProduct,
+    PurchaseInvoice,
+    PurchaseInvoiceItem,
+    SalesFact,
+    StockMovement,
+    TerminalSale,
+    Transfer,
+    TransferItem,
+)
+
+DEFAULT_REFRESH_DAYS = 35
+STATE_FILE = "_state.json"
+
+APPEND = "append"
+REFRESH = "refresh"
+SNAPSHOT = "snapshot"
+
+
+@dataclass(frozen=True)
+class ExportSpec:
+    """One exported table.
+
+    ``query`` returns the SELECT of every exported column; ``date_column``
+    picks the partition month and ``id_column`` carries the high-water mark.
+    ``mode`` is :data:`APPEND`, :data:`REFRESH` or :data:`SNAPSHOT`.
+    """
+
+    name: str
+    query: Callable[[], object]
+    date_column: object
+    id_column: object
+    mode: str = REFRESH
+
+
+@dataclass(frozen=True)
+class ExportResult:
+    table: str
+    rows: int
+    partitions: List[str]
+    high_water: Optional[object]
+
+
+def _columns(model, *names):
+    return [getattr(model, name).label(name) for name in names]
+
+
+EXPORTS: List[ExportSpec] = [
+    ExportSpec(
+        name="invoices",
+        query=lambda: select(
+            *_columns(
+                Invoice,
+                "id",
+                "user_id",
+                "customer_id",
+                "date_created",
+                "is_paid",
+                "paid_at",
+            )
+        ),
+        date_column=Invoice.date_created,
+        id_column=Invoice.date_created,
+    ),
+    ExportSpec(
+        name="invoice_lines",
+        query=lambda: select(
+            *_columns(
+                InvoiceProduct,
+                "id",
+                "invoice_id",
+                "product_id",
+                "product_name",
+                "quantity",
+                "unit_price",
+                "line_subtotal",
+                "line_gst",
+                "line_pst",
+            ),
+            Invoice.date_created.label("invoice_date"),
+        ).join(Invoice, Invoice.id == InvoiceProduct.invoice_id),
+        date_column=Invoice.date_created,
+        id_column=InvoiceProduct.id,
+    ),
+    ExportSpec(
+        name="purchase_invoices",
+        query=lambda: select(
+            *_columns(
+                PurchaseInvoice,
+                "id",
+                "purchase_order_id",
+                "user_id",
+                "location_id",
+                "vendor_name",
+                "location_name",
+                "received_date",
+                "invoice_number",
+                "department",
+                "gst",
+                "pst",
+                "delivery_charge",
+            )
+        ),
+        date_column=PurchaseInvoice.received_date,
+        id_column=PurchaseInvoice.id,
+    ),
+    ExportSpec(
+        name="purchase_invoice_lines",
+        query=lambda: select(
+            *_columns(
+                PurchaseInvoiceItem,
+                "id",
+                "invoice_id",
+                "position",
+                "item_id",
+                "unit_id",
+                "item_name",
+                "unit_name",
+                "quantity",
+                "cost",
+                "container_deposit",
+                "location_id",
+                "purchase_gl_code_id",
+            ),
+            PurchaseInvoice.received_date.label("received_date"),
+        ).join(PurchaseInvoice, PurchaseInvoice.id == PurchaseInvoiceItem.invoice_id),
+        date_column=PurchaseInvoice.received_date,
+        id_column=PurchaseInvoiceItem.id,
+    ),
+    ExportSpec(
+        name="transfers",
+        query=lambda: select(
+            *_columns(
+                Transfer,
+                "id",
+                "from_location_id",
+                "to_location_id",
+                "user_id",
+                "date_created",
+                "completed",
+                "from_location_name",
+                "to_location_name",
+            )
+        ),
+        date_column=Transfer.date_created,
+        id_column=Transfer.id,
+    ),
+    ExportSpec(
+        name="transfer_lines",
+        query=lambda: select(
+            *_columns(
+                TransferItem,
+                "id",
+                "transfer_id",
+                "item_id",
+                "item_name",
+                "quantity",
+                "unit_id",
+                "unit_quantity",
+                "base_quantity",
+                "completed_quantity",
+                "completed_at",
+            ),
+            Transfer.date_created.label("transfer_date"),
+        ).join(Transfer, Transfer.id == TransferItem.transfer_id),
+        date_column=Transfer.date_created,
+        id_column=TransferItem.id,
+    ),
+    ExportSpec(
+        name="terminal_sales",
+        query=lambda: select(
+            *_columns(
+                TerminalSale,
+                "id",
+                "event_location_id",
+                "product_id",
+                "quantity",
+                "sold_at",
+            ),
+            EventLocation.event_id.label("event_id"),
+            EventLocation.location_id.label("location_id"),
+        ).join(EventLocation, EventLocation.id == TerminalSale.event_location_id),
+        date_column=TerminalSale.sold_at,
+        id_column=TerminalSale.id,
+        mode=SNAPSHOT,
+    ),
+    ExportSpec(
+        name="sales_facts",
+        query=lambda: select(
+            *_columns(
+                SalesFact,
+                "id",
+                "sale_date",
+                "location_id",
+                "product_id",
+                "event_id",
+                "quantity",
+                "amount",
+                "last_sold_at",
+            )
+        ),
+        date_column=SalesFact.sale_date,
+        id_column=SalesFact.id,
+        mode=APPEND,
+    ),
+    ExportSpec(
+        name="stock_movements",
+        query=lambda: select(
+            *_columns(
+                StockMovement,
+                "id",
+                "location_id",
+                "item_id",
+                "quantity",
+                "movement_type",
+                "reference_type",
+                "reference_id",
+                "user_id",
+                "occurred_at",
+            )
+        ),
+        date_column=StockMovement.occurred_at,
+        id_column=StockMovement.id,
+        mode=APPEND,
+    ),
+]
+
+
+def _arrow_schema(statement):
+    import pyarrow as pa
+
+    fields = []
+    for column in statement.selected_columns:
+        column_type = column.type
+        if isinstance(column_type, Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(column_type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column_type, (Float, Numeric)):
+            arrow_type = pa.float64()
+        elif isinstance(column_type, DateTime):
+            arrow_type = pa.timestamp("us")
+        elif isinstance(column_type, Date):
+            arrow_type = pa.date32()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type))
+    return pa.schema(fields)
+
+
+def _write_part(path: str, schema, rows) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pylist([dict(row._mapping) for row in rows], schema=schema)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.tmp"
+    pq.write_table(table, temporary, compression="zstd")
+    os.replace(temporary, path)
+
+
+def _month(column):
+    return func.strftime("%Y-%m", column)
+
+
+def _month_bounds(month: str):
+    start = datetime.strptime(month, "%Y-%m")
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def _mark_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _parse_mark(spec: ExportSpec, value):
+    if value is None or not isinstance(spec.id_column.type, (Date, DateTime)):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def export_table(
+    session: Session,
+    spec: ExportSpec,
+    folder: str,
+    high_water=None,
+    *,
+    refresh_days: int = DEFAULT_REFRESH_DAYS,
+    today: Optional[date] = None,
+) -> ExportResult:
+    """Export the changes of one table since ``high_water``."""
+
+    statement = spec.query()
+    schema = _arrow_schema(statement)
+    month = _month(spec.date_column)
+    new_rows = statement
+    if high_water is not None:
+        new_rows = statement.where(spec.id_column > high_water)
+    new_months = set(
+        session.execute(
+            new_rows.with_only_columns(month)
+            .distinct()
+            .where(spec.date_column.is_not(None))
+        ).scalars()
+    )
+    mark = session.execute(
+        new_rows.with_only_columns(func.max(spec.id_column))
+    ).scalar()
+    if mark is None:
+        mark = high_water
+
+    table_folder = os.path.join(folder, spec.name)
+    written = 0
+    partitions = []
+    if spec.mode == APPEND:
+        for partition in sorted(new_months):
+            rows = session.execute(
+                new_rows.where(month == partition).order_by(spec.id_column)
+            ).all()
+            first, last = rows[0]._mapping["id"], rows[-1]._mapping["id"]
+            _write_part(
+                os.path.join(
+                    table_folder, f"month={partition}", f"part-{first}-{last}.parquet"
+                ),
+                schema,
+                rows,
+            )
+            written += len(rows)
+            partitions.append(partition)
+        return ExportResult(spec.name, written, partitions, mark)
+
+    today = today or date.today()
+    refresh_from = (today - timedelta(days=refresh_days)).strftime("%Y-%m")
+    if spec.mode == SNAPSHOT:
+        new_months = set(
+            session.execute(
+                statement.with_only_columns(month)
+                .distinct()
+                .where(spec.date_column.is_not(None))
+            ).scalars()
+        )
+        refresh = {name.split("=", 1)[1] for name in _partition_names(table_folder)}
+    elif high_water is None:
+        refresh = set()
+    else:
+        refresh = set(
+            session.execute(
+                statement.with_only_columns(month)
+                .distinct()
+                .where(spec.date_column >= _month_bounds(refresh_from)[0])
+            ).scalars()
+        )
+        # Months in the window that lost every row still need rewriting.
+        refresh.update(
+            name.split("=", 1)[1]
+            for name in _partition_names(table_folder)
+            if name.split("=", 1)[1] >= refresh_from
+        )
+    for partition in sorted(new_months | refresh):
+        start, end = _month_bounds(partition)
+        rows = session.execute(
+            statement.where(spec.date_column >= start, spec.date_column < end)
+            .order_by(spec.date_column, spec.id_column)
+        ).all()
+        path = os.path.join(table_folder, f"month={partition}", "part-0.parquet")
+        if rows:
+            _write_part(path, schema, rows)
+        elif os.path.exists(path):
+            os.remove(path)
+        written += len(rows)
+        partitions.append(partition)
+    return ExportResult(spec.name, written, partitions, mark)
+
+
+def _partition_names(table_folder: str) -> List[str]:
+    if not os.path.isdir(table_folder):
+        return []
+    return sorted(
+        name for name in os.listdir(table_folder) if name.startswith("month=")
+    )
+
+
+def load_state(folder: str) -> Dict[str, dict]:
+    path = os.path.join(folder, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def _save_state(folder: str, state: Dict[str, dict]) -> None:
+    path = os.path.join(folder, STATE_FILE)
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as handle:
+        json.dump(state, handle, indent=2, sort_keys=True)
+    os.replace(temporary, path)
+
+
+def export_all(
+    session: Session,
+    folder: str,
+    *,
+    tables: Optional[List[str]] = None,
+    full: bool = False,
+    refresh_days: int = DEFAULT_REFRESH_DAYS,
+) -> List[ExportResult]:
+    """Export every table (or ``tables``) and advance their high-water marks.
+
+    ``full`` ignores the stored marks and rewrites each table's folder from
+    scratch.
+    """
+
+    os.makedirs(folder, exist_ok=True)
+    state = {} if full else load_state(folder)
+    results = []
+    for spec in EXPORTS:
+        if tables and spec.name not in tables:
+            continue
+        if full:
+            shutil.rmtree(os.path.join(folder, spec.name), ignore_errors=True)
+        entry = state.get(spec.name, {})
+        result = export_table(
+            session,
+            spec,
+            folder,
+            _parse_mark(spec, entry.get("high_water")),
+            refresh_days=refresh_days,
+        )
+        state[spec.name] = {
+            "high_water": _mark_value(result.high_water),
+            "exported_at": datetime.utcnow().isoformat(timespec="seconds"),
+        }
+        # Saved per table so an interrupted run resumes where it stopped.
+        _save_state(folder, state)
+        results.append(result)
+    return results
+
+
+__all__ = [
+    "APPEND",
+    "DEFAULT_REFRESH_DAYS",
+    "EXPORTS",
+    "ExportResult",
+    "ExportSpec",
+    "REFRESH",
+    "SNAPSHOT",
+    "export_all",
+    "export_table",
+    "load_state",
+]
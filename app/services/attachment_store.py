@@ -0,0 +1,371 @@
+"""Content-addressed storage for uploaded and received files.
+
+POS attachments, terminal sales uploads and purchase order files used to be
+handled one way each: written under a per-feature folder, saved by their
+upload name into ``UPLOAD_FOLDER`` (where two users uploading ``sales.xls``
+overwrote each other) or only parsed from memory and dropped, so nothing
+could be re-processed or audited without asking for the file again.
+
+:func:`write_blob` streams a file into ``ATTACHMENT_STORE_FOLDER`` while
+hashing it, gzip-compressed under ``<sha[:2]>/<sha256>.gz``. A file whose
+content is already stored is not written twice. Rows that keep a file name
+it by ``sha256`` and call :func:`acquire`, which records the file in
+:class:`~app.models.Attachment` and counts the reference; :func:`release`
+drops one. Parsers that need a real path use :func:`materialize`.
+
+Several owners are removed with bulk deletes that never call
+:func:`release`, so :func:`collect_garbage` first recounts the references
+from every column listed in :data:`REFERENCES`, then removes the files
+nothing refers to once they are older than the grace period. Blobs left on
+disk by a transaction that rolled back have no row and are removed the same
+way.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import BinaryIO, Dict, Iterator, List, Optional, Union
+
+from flask import current_app
+from sqlalchemy import delete, func, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import (
+    Attachment,
+    PosSalesImport,
+    PurchaseOrder,
+    TerminalSalesResolutionState,
+)
+from app.utils.periodic import start_periodic_job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GRACE_HOURS = 24
+COMPRESS_LEVEL = 6
+_READ_SIZE = 1024 * 1024
+_SUFFIX = ".gz"
+_INCOMING_PREFIX = ".incoming-"
+
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+# Every column that refers to a stored file by its sha256.
+REFERENCES = (
+    PosSalesImport.attachment_sha256,
+    PurchaseOrder.source_attachment_sha256,
+    TerminalSalesResolutionState.attachment_sha256,
+)
+
+
+@dataclass(frozen=True)
+class StoredBlob:
+    sha256: str
+    size: int
+    stored_size: int
+    path: str
+
+    def to_dict(self) -> dict:
+        """Return a JSON-safe form; ``StoredBlob(**data)`` restores it."""
+
+        return asdict(self)
+
+
+@dataclass(frozen=True)
+class GarbageResult:
+    recounted: int
+    removed: int
+    freed_bytes: int
+
+
+def store_folder(app=None) -> str:
+    config = (app or current_app).config
+    return config.get("ATTACHMENT_STORE_FOLDER") or os.path.join(
+        config["UPLOAD_FOLDER"], "attachments"
+    )
+
+
+def blob_path(sha256: str, folder: Optional[str] = None) -> str:
+    folder = folder or store_folder()
+    return os.path.join(folder, sha256[:2], f"{sha256}{_SUFFIX}")
+
+
+def _read_chunks(source: Union[bytes, bytearray, memoryview, BinaryIO]):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for start in range(0, len(view), _READ_SIZE):
+            yield view[start : start + _READ_SIZE]
+        return
+    while True:
+        chunk = source.read(_READ_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+def write_blob(
+    source: Union[bytes, bytearray, memoryview, BinaryIO],
+    *,
+    folder: Optional[str] = None,
+) -> StoredBlob:
+    """Store ``source`` (bytes or a binary file object) by its sha256.
+
+    The content is hashed and compressed in one pass into a temporary file
+    in the store, then renamed into place unless identical content is
+    already stored. Nothing is written to the database.
+    """
+
+    folder = folder or store_folder()
+    os.makedirs(folder, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    handle, temporary = tempfile.mkstemp(dir=folder, prefix=_INCOMING_PREFIX)
+    try:
+        with os.fdopen(handle, "wb") as raw:
+            with gzip.GzipFile(
+                fileobj=raw, mode="wb", compresslevel=COMPRESS_LEVEL, mtime=0
+            ) as compressed:
+                for chunk in _read_chunks(source):
+                    digest.update(chunk)
+                    compressed.write(chunk)
+                    size += len(chunk)
+        sha256 = digest.hexdigest()
+        path = blob_path(sha256, folder)
+        if os.path.exists(path):
+            os.remove(temporary)
+            # A fresh mtime keeps the collector off a file about to be reused.
+            os.utime(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return StoredBlob(sha256, size, os.path.getsize(path), path)
+
+
+def acquire(
+    session: Session, blob: StoredBlob, *, filename: Optional[str] = None
+) -> None:
+    """Record one more reference to ``blob``, adding its row if needed."""
+
+    now = datetime.utcnow()
+    table = Attachment.__table__
+    statement = _UPSERT_DIALECTS[session.get_bind().dialect.name](
+        table
+    ).values(
+        sha256=blob.sha256,
+        filename=filename[:255] if filename else None,
+        size=blob.size,
+        stored_size=blob.stored_size,
+        ref_count=1,
+        created_at=now,
+        last_referenced_at=now,
+    )
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[table.c.sha256],
+            set_={
+                "ref_count": table.c.ref_count + 1,
+                "last_referenced_at": now,
+            },
+        )
+    )
+
+
+def release(session: Session, sha256: Optional[str]) -> None:
+    """Drop one reference to the file stored as ``sha256``."""
+
+    if not sha256:
+        return
+    session.execute(
+        update(Attachment)
+        .where(Attachment.sha256 == sha256, Attachment.ref_count > 0)
+        .values(ref_count=Attachment.ref_count - 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def open_blob(sha256: str, folder: Optional[str] = None) -> BinaryIO:
+    """Return a binary file object reading the original content."""
+
+    return gzip.open(blob_path(sha256, folder), "rb")
+
+
+@contextmanager
+def materialize(
+    sha256: str, suffix: str = "", folder: Optional[str] = None
+) -> Iterator[str]:
+    """Yield the path of a private, decompressed copy of a stored file.
+
+    For readers (xlrd, openpyxl, pdfplumber) that want a seekable file with
+    the right extension. The copy is removed on exit.
+    """
+
+    handle, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(handle, "wb") as target, open_blob(
+            sha256, folder
+        ) as source:
+            shutil.copyfileobj(source, target, _READ_SIZE)
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def recount_references(session: Session) -> int:
+    """Set every ``ref_count`` from the rows in :data:`REFERENCES`.
+
+    Returns the number of attachments whose count changed.
+    """
+
+    references = union_all(
+        *(
+            select(column.label("sha256")).where(column.is_not(None))
+            for column in REFERENCES
+        )
+    ).subquery()
+    counts: Dict[str, int] = dict(
+        session.execute(
+            select(references.c.sha256, func.count()).group_by(
+                references.c.sha256
+            )
+        ).all()
+    )
+    changes = [
+        {"id": attachment_id, "ref_count": counts.get(sha256, 0)}
+        for attachment_id, sha256, ref_count in session.execute(
+            select(Attachment.id, Attachment.sha256, Attachment.ref_count)
+        )
+        if counts.get(sha256, 0) != ref_count
+    ]
+    if changes:
+        session.execute(update(Attachment), changes)
+    return len(changes)
+
+
+def _stray_blobs(folder: str, known: set, cutoff: float) -> List[str]:
+    paths = []
+    if not os.path.isdir(folder):
+        return paths
+    for root, _, names in os.walk(folder):
+        for name in names:
+            path = os.path.join(root, name)
+            if name.startswith(_INCOMING_PREFIX):
+                stray = True
+            elif name.endswith(_SUFFIX):
+                stray = name[: -len(_SUFFIX)] not in known
+            else:
+                continue
+            try:
+                if stray and os.path.getmtime(path) < cutoff:
+                    paths.append(path)
+            except OSError:
+                continue
+    return paths
+
+
+def collect_garbage(
+    session: Session,
+    *,
+    folder: Optional[str] = None,
+    grace: timedelta = timedelta(hours=DEFAULT_GRACE_HOURS),
+) -> GarbageResult:
+    """Remove stored files nothing has referred to for ``grace``.
+
+    Commits once after recounting and removing rows; files are deleted after
+    the commit so a failed commit never leaves rows without their files. A
+    file stored again within the grace period (see :func:`write_blob`) is
+    kept and removed by a later run if it is still unreferenced.
+    """
+
+    folder = folder or store_folder()
+    recounted = recount_references(session)
+    cutoff = datetime.utcnow() - grace
+    unreferenced = session.execute(
+        select(Attachment.id, Attachment.sha256, Attachment.stored_size).where(
+            Attachment.ref_count == 0, Attachment.last_referenced_at < cutoff
+        )
+    ).all()
+    if unreferenced:
+        session.execute(
+            delete(Attachment)
+            .where(Attachment.id.in_([row.id for row in unreferenced]))
+            .execution_options(synchronize_session=False)
+        )
+    known = set(session.execute(select(Attachment.sha256)).scalars())
+    session.commit()
+
+    removed = 0
+    freed = 0
+    paths = [blob_path(row.sha256, folder) for row in unreferenced]
+    paths.extend(_stray_blobs(folder, known, cutoff.timestamp()))
+    for path in dict.fromkeys(paths):
+        try:
+            if os.path.getmtime(path) >= cutoff.timestamp():
+                continue
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            continue
+        removed += 1
+        freed += size
+    return GarbageResult(
+        recounted=recounted, removed=removed, freed_bytes=freed
+    )
+
+
+def _gc_job(app) -> None:
+    result = collect_garbage(
+        db.session,
+        grace=timedelta(
+            hours=float(
+                app.config.get("ATTACHMENT_GC_GRACE_HOURS")
+                or DEFAULT_GRACE_HOURS
+            )
+        ),
+    )
+    if result.removed:
+        logger.info(
+            "Removed %s unreferenced attachment(s), %s bytes",
+            result.removed,
+            result.freed_bytes,
+        )
+
+
+def start_attachment_gc_thread(app) -> None:
+    """Start or restart the periodic attachment garbage collector."""
+
+    start_periodic_job(
+        app, "attachment-gc", "ATTACHMENT_GC_INTERVAL_HOURS", _gc_job
+    )
+
+
+__all__ = [
+    "DEFAULT_GRACE_HOURS",
+    "GarbageResult",
+    "REFERENCES",
+    "StoredBlob",
+    "acquire",
+    "blob_path",
+    "collect_garbage",
+    "materialize",
+    "open_blob",
+    "recount_references",
+    "release",
+    "start_attachment_gc_thread",
+    "store_folder",
+    "write_blob",
+]
@@ -0,0 +1,715 @@
+"""Bulk CSV imports for items, products, locations and simple records.
+
+Each importer works in three passes over the whole file:
+
+1. ``prefetch`` loads every existing key the file refers to (names, UPCs, GL
+   codes, units) with a handful of ``IN`` queries;
+2. ``plan`` validates every row in memory and sorts it into creates,
+   updates, skips and errors, collected on an :class:`ImportReport`;
+3. ``write`` applies the plan with chunked bulk inserts and updates.
+
+Nothing is written when the file has errors or when ``dry_run`` is set, so a
+10k-line vendor catalog can be previewed first and never fails halfway.
+Item cost changes are propagated to the products whose recipes use them.
+Nothing here commits; the caller owns the transaction.
+"""
+
+from __future__ import annotations
+
+import abc
+import csv
+import os
+from dataclasses import dataclass, field
+from typing import (
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from sqlalchemy import insert, update
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models import (
+    Customer,
+    GLCode,
+    Item,
+    ItemUnit,
+    Location,
+    Product,
+    ProductRecipeItem,
+    User,
+    Vendor,
+    location_products,
+)
+from app.services import menu_sync
+from app.services.product_costing import propagate_item_cost_changes
+from app.utils.batching import chunks
+
+Row = Tuple[int, Dict[str, str]]
+
+# Rejected rows listed to the user before "N more rows have errors".
+MAX_ERRORS_SHOWN = 10
+
+
+@dataclass(frozen=True)
+class ImportIssue:
+    """A row that was skipped or rejected."""
+
+    line: int
+    message: str
+
+    def __str__(self) -> str:
+        return f"Line {self.line}: {self.message}"
+
+
+@dataclass
+class ImportReport:
+    """What an import did, or would do on a dry run."""
+
+    kind: str
+    dry_run: bool = False
+    created: List[str] = field(default_factory=list)
+    updated: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    skipped: List[ImportIssue] = field(default_factory=list)
+    errors: List[ImportIssue] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def summary(self) -> str:
+        label = self.kind.replace("_", " ")
+        verb = "Would import" if self.dry_run else "Imported"
+        parts = [f"{verb} {len(self.created)} {label}."]
+        if self.updated:
+            verb = "Would update" if self.dry_run else "Updated"
+            parts.append(f"{verb} {len(self.updated)}.")
+        if self.skipped:
+            parts.append(f"Skipped {len(self.skipped)}.")
+        return " ".join(parts)
+
+
+class ImportValidationError(ValueError):
+    """Raised when a file has errors; nothing was written."""
+
+    def __init__(self, report: ImportReport):
+        self.report = report
+        super().__init__(str(report.errors[0]))
+
+
+def read_rows(path: str) -> List[Row]:
+    """Return ``(line_number, row)`` pairs from a CSV or plain text file.
+
+    Plain text files hold one name per line and become ``{"name": line}``.
+    """
+
+    with open(path, newline="", encoding="utf-8-sig") as handle:
+        if os.path.splitext(path)[1].lower() == ".csv":
+            return [
+                (line, row)
+                for line, row in enumerate(csv.DictReader(handle), start=2)
+            ]
+        return [
+            (line, {"name": text.strip()})
+            for line, text in enumerate(handle, start=1)
+            if text.strip()
+        ]
+
+
+def _text(row: Mapping[str, Optional[str]], column: str) -> str:
+    return (row.get(column) or "").strip()
+
+
+def _number(
+    row: Mapping[str, Optional[str]], column: str, default: Optional[float] = None
+) -> Optional[float]:
+    """Parse ``row[column]``; blank returns ``default``, junk raises."""
+
+    raw = _text(row, column)
+    if not raw:
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        raise ValueError(f"{column} must be a number, got {raw!r}") from None
+
+
+class BulkImporter(abc.ABC):
+    """Base class for importers; see the module docstring."""
+
+    kind = "records"
+
+    def __init__(self) -> None:
+        self.report = ImportReport(self.kind)
+
+    def run(self, rows: Sequence[Row], *, dry_run: bool = False) -> ImportReport:
+        """Validate ``rows`` and, unless ``dry_run`` or invalid, write them."""
+
+        self.report = ImportReport(self.kind, dry_run=dry_run)
+        self.prefetch(rows)
+        for line, row in rows:
+            try:
+                self.plan(line, row)
+            except ValueError as exc:
+                self.error(line, str(exc))
+        if not dry_run and self.report.ok:
+            self.write()
+        return self.report
+
+    def error(self, line: int, message: str) -> None:
+        self.report.errors.append(ImportIssue(line, message))
+
+    def skip(self, line: int, message: str) -> None:
+        self.report.skipped.append(ImportIssue(line, message))
+
+    @abc.abstractmethod
+    def prefetch(self, rows: Sequence[Row]) -> None:
+        """Load the existing rows the file refers to."""
+
+    @abc.abstractmethod
+    def plan(self, line: int, row: Mapping[str, str]) -> None:
+        """Validate one row and record what to write for it."""
+
+    @abc.abstractmethod
+    def write(self) -> None:
+        """Apply the planned changes."""
+
+    @staticmethod
+    def _load_by(
+        column, values: Iterable, *criteria, order_by=None
+    ) -> Dict[object, object]:
+        """Map ``column`` value to the first matching row of its model."""
+
+        model = column.class_
+        loaded: Dict[object, object] = {}
+        for chunk in chunks(sorted(set(values))):
+            query = model.query.filter(column.in_(chunk), *criteria)
+            query = query.order_by(*(order_by or (model.id,)))
+            for obj in query:
+                loaded.setdefault(getattr(obj, column.key), obj)
+        return loaded
+
+    @staticmethod
+    def _insert_returning(model, rows: List[dict], key) -> Dict[object, int]:
+        """Bulk insert ``rows`` and map each row's ``key`` value to its id."""
+
+        ids: Dict[object, int] = {}
+        for chunk in chunks(rows):
+            result = db.session.execute(
+                insert(model).returning(model.id, key), list(chunk)
+            )
+            ids.update((value, row_id) for row_id, value in result)
+        return ids
+
+    @staticmethod
+    def _insert(model, rows: List[dict]) -> None:
+        for chunk in chunks(rows):
+            db.session.execute(insert(model), list(chunk))
+
+    @staticmethod
+    def _update(model, rows: List[dict]) -> None:
+        for chunk in chunks(rows):
+            db.session.execute(update(model), list(chunk))
+
+
+class ItemImporter(BulkImporter):
+    """Items with optional ``base_unit``, ``cost``, ``gl_code``, ``upc`` and
+    ``units`` (``name:factor`` pairs separated by ``;``).
+
+    Rows match an active item by UPC, then by name. Matches get their cost,
+    GL code and UPC updated when the file gives different values; their
+    units are left alone.
+    """
+
+    kind = "items"
+
+    def prefetch(self, rows: Sequence[Row]) -> None:
+        names = {_text(row, "name") for _, row in rows} - {""}
+        upcs = {_text(row, "upc") for _, row in rows} - {""}
+        codes = {_text(row, "gl_code") for _, row in rows} - {""}
+        self.by_name = self._load_by(Item.name, names, Item.archived.is_(False))
+        self.by_upc = self._load_by(Item.upc, upcs)
+        self.gl_codes = self._load_by(GLCode.code, codes)
+        self.creates: List[Tuple[dict, List[dict]]] = []
+        self.updates: List[dict] = []
+        self.seen_names: Dict[str, int] = {}
+        self.seen_upcs: Dict[str, int] = {}
+
+    def plan(self, line: int, row: Mapping[str, str]) -> None:
+        name = _text(row, "name")
+        if not name:
+            return
+        if name in self.seen_names:
+            self.skip(line, f"{name} repeats line {self.seen_names[name]}")
+            return
+        self.seen_names[name] = line
+
+        upc = _text(row, "upc") or None
+        if upc and upc in self.seen_upcs:
+            raise ValueError(f"UPC {upc} repeats line {self.seen_upcs[upc]}")
+        cost = _number(row, "cost")
+        gl = self.gl_codes.get(_text(row, "gl_code"))
+        gl_code_id = gl.id if gl else None
+        if upc:
+            self.seen_upcs[upc] = line
+
+        upc_owner = self.by_upc.get(upc) if upc else None
+        if upc_owner is not None and not upc_owner.archived:
+            existing = upc_owner
+        else:
+            existing = self.by_name.get(name)
+        if upc_owner is not None and upc_owner is not existing:
+            raise ValueError(f"UPC {upc} already belongs to {upc_owner.name}")
+        if existing is not None:
+            changes = {}
+            if cost is not None and cost != existing.cost:
+                changes["cost"] = cost
+            if gl_code_id is not None and gl_code_id != existing.gl_code_id:
+                changes["gl_code_id"] = gl_code_id
+            if upc and upc != existing.upc:
+                changes["upc"] = upc
+            if changes:
+                self.updates.append({"id": existing.id, **changes})
+                self.report.updated.append(existing.name)
+            else:
+                self.report.unchanged += 1
+            return
+
+        base_unit = _text(row, "base_unit").lower() or "each"
+        self.creates.append(
+            (
+                {
+                    "name": name,
+                    "base_unit": base_unit,
+                    "cost": cost or 0.0,
+                    "gl_code_id": gl_code_id,
+                    "upc": upc,
+                },
+                self._units(row.get("units") or "", base_unit),
+            )
+        )
+        self.report.created.append(name)
+
+    @staticmethod
+    def _units(spec: str, base_unit: str) -> List[dict]:
+        units = []
+        for part in spec.split(";"):
+            part = part.strip()
+            if not part:
+                continue
+            unit_name, _, factor_text = part.partition(":")
+            try:
+                factor = float(factor_text) if factor_text else 1.0
+            except ValueError:
+                factor = 1.0
+            default = not units
+            units.append(
+                {
+                    "name": unit_name.strip(),
+                    "factor": factor,
+                    "receiving_default": default,
+                    "transfer_default": default,
+                }
+            )
+        if not units:
+            units.append(
+                {
+                    "name": base_unit,
+                    "factor": 1.0,
+                    "receiving_default": True,
+                    "transfer_default": True,
+                }
+            )
+        return units
+
+    def write(self) -> None:
+        ids = self._insert_returning(
+            Item, [values for values, _ in self.creates], Item.name
+        )
+        unit_rows = [
+            dict(unit, item_id=ids[values["name"]])
+            for values, units in self.creates
+            for unit in units
+        ]
+        self._insert(ItemUnit, unit_rows)
+        self._update(Item, self.updates)
+        propagate_item_cost_changes(
+            [row["id"] for row in self.updates if "cost" in row],
+            source="item_import",
+        )
+
+
+class ProductImporter(BulkImporter):
+    """Products with ``price`` and optional ``cost``, ``gl_code`` and
+    ``recipe`` (``item:quantity:unit`` specs separated by ``;``).
+
+    Existing products get price, cost and GL code updates; their recipes are
+    left alone.
+    """
+
+    kind = "products"
+
+    def prefetch(self, rows: Sequence[Row]) -> None:
+        names = {_text(row, "name") for _, row in rows} - {""}
+        codes = {_text(row, "gl_code") for _, row in rows} - {""}
+        item_names = set()
+        for _, row in rows:
+            for spec in (row.get("recipe") or "").split(";"):
+                item_name = spec.split(":")[0].strip()
+                if item_name:
+                    item_names.add(item_name)
+        self.by_name = self._load_by(Product.name, names)
+        self.gl_codes = self._load_by(GLCode.code, codes)
+        self.items = self._load_by(
+            Item.name, item_names, order_by=(Item.archived, Item.id)
+        )
+        self.units: Dict[Tuple[int, str], int] = {}
+        item_ids = sorted(item.id for item in self.items.values())
+        for chunk in chunks(item_ids):
+            for unit_id, item_id, unit_name in db.session.query(
+                ItemUnit.id, ItemUnit.item_id, ItemUnit.name
+            ).filter(ItemUnit.item_id.in_(chunk)):
+                self.units.setdefault((item_id, unit_name), unit_id)
+        self.creates: List[Tuple[dict, List[dict]]] = []
+        self.updates: List[dict] = []
+        self.seen: Dict[str, int] = {}
+
+    def plan(self, line: int, row: Mapping[str, str]) -> None:
+        name = _text(row, "name")
+        if not name:
+            return
+        if name in self.seen:
+            self.skip(line, f"{name} repeats line {self.seen[name]}")
+            return
+        self.seen[name] = line
+
+        price = _number(row, "price")
+        if price is None:
+            raise ValueError(f"price is required for {name}")
+        cost = _number(row, "cost", 0.0)
+        gl = self.gl_codes.get(_text(row, "gl_code"))
+        gl_code_id = gl.id if gl else None
+        recipe = self._recipe(row.get("recipe") or "")
+
+        existing = self.by_name.get(name)
+        if existing is not None:
+            changes = {}
+            if price != existing.price:
+                changes["price"] = price
+                changes["invoice_sale_price"] = price
+            if _text(row, "cost") and cost != existing.cost:
+                changes["cost"] = cost
+            if gl_code_id is not None and gl_code_id != existing.gl_code_id:
+                changes["gl_code_id"] = gl_code_id
+            if changes:
+                self.updates.append({"id": existing.id, **changes})
+                self.report.updated.append(name)
+            else:
+                self.report.unchanged += 1
+            return
+
+        self.creates.append(
+            (
+                {
+                    "name": name,
+                    "price": price,
+                    "invoice_sale_price": price,
+                    "cost": cost,
+                    "gl_code_id": gl_code_id,
+                },
+                recipe,
+            )
+        )
+        self.report.created.append(name)
+
+    def _recipe(self, spec: str) -> List[dict]:
+        recipe = []
+        for part in spec.split(";"):
+            part = part.strip()
+            if not part:
+                continue
+            pieces = part.split(":")
+            item_name = pieces[0].strip()
+            quantity = 1.0
+            if len(pieces) >= 2 and pieces[1] != "":
+                try:
+                    quantity = float(pieces[1])
+                except ValueError:
+                    quantity = 0.0
+            item = self.items.get(item_name)
+            if item is None:
+                raise ValueError(f"Unknown item: {item_name}")
+            unit_id = None
+            unit_name = pieces[2].strip() if len(pieces) == 3 else ""
+            if unit_name:
+                unit_id = self.units.get((item.id, unit_name))
+                if unit_id is None:
+                    raise ValueError(f"Unknown unit {unit_name} for item {item_name}")
+            recipe.append(
+                {
+                    "item_id": item.id,
+                    "unit_id": unit_id,
+                    "quantity": quantity,
+                    "countable": False,
+                }
+            )
+        return recipe
+
+    def write(self) -> None:
+        ids = self._insert_returning(
+            Product, [values for values, _ in self.creates], Product.name
+        )
+        recipe_rows = [
+            dict(entry, product_id=ids[values["name"]])
+            for values, recipe in self.creates
+            for entry in recipe
+        ]
+        self._insert(ProductRecipeItem, recipe_rows)
+        self._update(Product, self.updates)
+
+
+class LocationImporter(BulkImporter):
+    """Locations with an optional ``products`` list separated by ``;``.
+
+    Products listed for an existing location are added to it, unless the
+    location follows a menu. Product links and stand sheet items are written
+    by :func:`app.services.menu_sync.apply_products`.
+    """
+
+    kind = "locations"
+
+    def prefetch(self, rows: Sequence[Row]) -> None:
+        names = {_text(row, "name") for _, row in rows} - {""}
+        product_names = {
+            product_name.strip()
+            for _, row in rows
+            for product_name in (row.get("products") or "").split(";")
+        } - {""}
+        self.by_name = self._load_by(Location.name, names)
+        self.products = self._load_by(Product.name, product_names)
+        self.links: Dict[int, Set[int]] = {
+            location.id: set() for location in self.by_name.values()
+        }
+        for chunk in chunks(sorted(self.links)):
+            for location_id, product_id in db.session.query(
+                location_products.c.location_id, location_products.c.product_id
+            ).filter(location_products.c.location_id.in_(chunk)):
+                self.links[location_id].add(product_id)
+        self.creates: List[Tuple[str, List[int]]] = []
+        self.product_sets: Dict[int, FrozenSet[int]] = {}
+        self.seen: Dict[str, int] = {}
+
+    def plan(self, line: int, row: Mapping[str, str]) -> None:
+        name = _text(row, "name")
+        if not name:
+            return
+        if name in self.seen:
+            self.skip(line, f"{name} repeats line {self.seen[name]}")
+            return
+        self.seen[name] = line
+
+        product_ids: List[int] = []
+        for product_name in (row.get("products") or "").split(";"):
+            product_name = product_name.strip()
+            if not product_name:
+                continue
+            product = self.products.get(product_name)
+            if product is None:
+                raise ValueError(f"Unknown product: {product_name}")
+            if product.id not in product_ids:
+                product_ids.append(product.id)
+
+        existing = self.by_name.get(name)
+        if existing is not None:
+            current = self.links[existing.id]
+            if current.issuperset(product_ids):
+                self.report.unchanged += 1
+                return
+            if existing.current_menu_id is not None:
+                raise ValueError(
+                    f"{name} follows a menu; add products to the menu instead"
+                )
+            self.product_sets[existing.id] = frozenset(current.union(product_ids))
+            self.report.updated.append(name)
+            return
+
+        self.creates.append((name, product_ids))
+        self.report.created.append(name)
+
+    def write(self) -> None:
+        ids = self._insert_returning(
+            Location, [{"name": name} for name, _ in self.creates], Location.name
+        )
+        product_sets = dict(self.product_sets)
+        product_sets.update(
+            (ids[name], frozenset(product_ids))
+            for name, product_ids in self.creates
+            if product_ids
+        )
+        # One sync per distinct product set; none of these follow a menu.
+        locations_by_set: Dict[FrozenSet[int], List[int]] = {}
+        for location_id, product_ids in product_sets.items():
+            locations_by_set.setdefault(product_ids, []).append(location_id)
+        for product_ids, location_ids in locations_by_set.items():
+            menu_sync.apply_products(db.session, location_ids, product_ids)
+
+
+class RecordImporter(BulkImporter):
+    """Flat records mapped column-for-column onto ``model``.
+
+    ``key`` names the field that identifies an existing record: rows that
+    match it update ``update_fields`` (or are left alone). Without a key
+    every row is created. ``prepare`` can derive extra fields from the row.
+    """
+
+    def __init__(
+        self,
+        model,
+        mappings: Mapping[str, str],
+        *,
+        kind: Optional[str] = None,
+        key: Optional[str] = None,
+        update_fields: Sequence[str] = (),
+        prepare: Optional[Callable[[dict, Mapping[str, str]], dict]] = None,
+    ) -> None:
+        self.kind = kind or model.__tablename__
+        super().__init__()
+        self.model = model
+        self.mappings = dict(mappings)
+        self.key = key
+        self.update_fields = tuple(update_fields)
+        self.prepare = prepare
+
+    def _values(self, row: Mapping[str, str]) -> dict:
+        return {
+            field_name: row[column]
+            for field_name, column in self.mappings.items()
+            if row.get(column) is not None
+        }
+
+    def prefetch(self, rows: Sequence[Row]) -> None:
+        self.existing = {}
+        if self.key:
+            keys = {self._values(row).get(self.key) for _, row in rows} - {None, ""}
+            self.existing = self._load_by(getattr(self.model, self.key), keys)
+        self.creates: List[dict] = []
+        self.updates: List[dict] = []
+        self.seen: Dict[str, int] = {}
+
+    def plan(self, line: int, row: Mapping[str, str]) -> None:
+        values = self._values(row)
+        label = str(values.get(self.key) if self.key else line)
+        if self.key:
+            key_value = values.get(self.key)
+            if not key_value:
+                raise ValueError(f"{self.key} is required")
+            if key_value in self.seen:
+                self.skip(line, f"{key_value} repeats line {self.seen[key_value]}")
+                return
+            self.seen[key_value] = line
+            existing = self.existing.get(key_value)
+            if existing is not None:
+                changes = {
+                    field_name: values[field_name]
+                    for field_name in self.update_fields
+                    if field_name in values
+                    and values[field_name] != getattr(existing, field_name)
+                }
+                if changes:
+                    self.updates.append({"id": existing.id, **changes})
+                    self.report.updated.append(label)
+                else:
+                    self.report.unchanged += 1
+                return
+        if self.prepare is not None:
+            values = self.prepare(values, row)
+        self.creates.append(values)
+        self.report.created.append(label)
+
+    def write(self) -> None:
+        self._insert(self.model, self.creates)
+        self._update(self.model, self.updates)
+
+
+def _prepare_user(values: dict, row: Mapping[str, str]) -> dict:
+    if not values.get("password"):
+        raise ValueError(f"password is required for {values['email']}")
+    values["password"] = generate_password_hash(values["password"])
+    values["is_admin"] = row.get("is_admin", "0") == "1"
+    values["active"] = row.get("active", "0") == "1"
+    return values
+
+
+def importer_for(kind: str) -> BulkImporter:
+    """Return a fresh importer for one of the admin import types."""
+
+    if kind == "items":
+        return ItemImporter()
+    if kind == "products":
+        return ProductImporter()
+    if kind == "locations":
+        return LocationImporter()
+    if kind == "gl_codes":
+        return RecordImporter(
+            GLCode,
+            {"code": "code", "description": "description"},
+            kind=kind,
+            key="code",
+            update_fields=("description",),
+        )
+    if kind == "users":
+        return RecordImporter(
+            User,
+            {"email": "email", "password": "password"},
+            kind=kind,
+            key="email",
+            prepare=_prepare_user,
+        )
+    if kind in ("customers", "vendors"):
+        model = Customer if kind == "customers" else Vendor
+        return RecordImporter(
+            model,
+            {"first_name": "first_name", "last_name": "last_name"},
+            kind=kind,
+        )
+    raise ValueError(f"Unknown import type: {kind}")
+
+
+def import_file(
+    importer: BulkImporter, path: str, *, dry_run: bool = False
+) -> ImportReport:
+    """Run ``importer`` over the file at ``path``.
+
+    Raises :class:`ImportValidationError` when the file has errors and this
+    is not a dry run.
+    """
+
+    report = importer.run(read_rows(path), dry_run=dry_run)
+    if not dry_run and not report.ok:
+        raise ImportValidationError(report)
+    return report
+
+
+__all__ = [
+    "MAX_ERRORS_SHOWN",
+    "BulkImporter",
+    "ImportIssue",
+    "ImportReport",
+    "ImportValidationError",
+    "ItemImporter",
+    "LocationImporter",
+    "ProductImporter",
+    "RecordImporter",
+    "import_file",
+    "importer_for",
+    "read_rows",
+]
@@ -0,0 +1,204 @@
+"""Close an event with set-based statements.
+
+Closing used to look up the ``LocationStandItem`` of every stand sheet row
+one at a time and then delete each location's terminal sales, losing them.
+:func:`close_event` reads the event's stand sheets and the affected stand
+items with one query each, rolls the closing counts forward with bulk
+inserts, updates and deletes, records the matching ledger movements, moves
+terminal sales into :mod:`app.services.sales_facts` and stores an
+:class:`~app.models.EventCloseSummary`. Nothing is committed.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models import (
+    Event,
+    EventCloseSummary,
+    EventLocation,
+    EventStandSheetItem,
+    Item,
+    Location,
+    LocationStandItem,
+    TerminalSale,
+)
+from app.services import sales_facts
+from app.services.stock_ledger import record_movements
+from app.utils.batching import chunks
+
+
+def _roll_forward_counts(
+    session: Session, event_id: int, location_ids: Sequence[int]
+) -> Tuple[float, float]:
+    """Make stand items match the closing counts; return the variance.
+
+    Counted items take their closing count (zero counts remove the stand
+    item), items left off the sheets are removed. The variance is the
+    closing count minus the expected count, in units and at item cost.
+    """
+
+    sheets = session.execute(
+        select(
+            EventLocation.location_id,
+            EventStandSheetItem.item_id,
+            EventStandSheetItem.closing_count,
+            Item.purchase_gl_code_id,
+            Item.cost,
+        )
+        .join(EventLocation, EventLocation.id == EventStandSheetItem.event_location_id)
+        .join(Item, Item.id == EventStandSheetItem.item_id)
+        .where(EventLocation.event_id == event_id)
+    ).all()
+
+    existing: Dict[Tuple[int, int], Tuple[int, float, Optional[int]]] = {}
+    for chunk in chunks(location_ids):
+        rows = session.execute(
+            select(
+                LocationStandItem.id,
+                LocationStandItem.location_id,
+                LocationStandItem.item_id,
+                LocationStandItem.expected_count,
+                LocationStandItem.purchase_gl_code_id,
+            ).where(LocationStandItem.location_id.in_(chunk))
+        )
+        for record_id, location_id, item_id, expected, gl_code_id in rows:
+            existing[(location_id, item_id)] = (
+                record_id,
+                float(expected or 0.0),
+                gl_code_id,
+            )
+
+    deletes: List[int] = []
+    inserts: List[dict] = []
+    updates: List[dict] = []
+    movements: List[Tuple[int, int, float]] = []
+    variance_quantity = 0.0
+    variance_cost = 0.0
+    counted = set()
+    for location_id, item_id, closing_count, item_gl_code_id, cost in sheets:
+        key = (location_id, item_id)
+        if key in counted:
+            continue
+        counted.add(key)
+        closing = float(closing_count or 0.0)
+        record = existing.get(key)
+        expected = record[1] if record is not None else 0.0
+        variance_quantity += closing - expected
+        variance_cost += (closing - expected) * float(cost or 0.0)
+        if not closing_count:
+            if record is not None:
+                deletes.append(record[0])
+                movements.append((location_id, item_id, -expected))
+            continue
+        if record is None:
+            inserts.append(
+                {
+                    "location_id": location_id,
+                    "item_id": item_id,
+                    "expected_count": closing,
+                    "purchase_gl_code_id": item_gl_code_id,
+                }
+            )
+            movements.append((location_id, item_id, closing))
+            continue
+        record_id, _, gl_code_id = record
+        changes = {"id": record_id, "expected_count": closing}
+        if gl_code_id is None:
+            changes["purchase_gl_code_id"] = item_gl_code_id
+        updates.append(changes)
+        movements.append((location_id, item_id, closing - expected))
+
+    for key, (record_id, expected, _) in existing.items():
+        if key not in counted:
+            deletes.append(record_id)
+            movements.append((key[0], key[1], -expected))
+
+    for chunk in chunks(deletes):
+        session.execute(
+            delete(LocationStandItem)
+            .where(LocationStandItem.id.in_(chunk))
+            .execution_options(synchronize_session=False)
+        )
+    for chunk in chunks(inserts):
+        session.execute(insert(LocationStandItem), chunk)
+    grouped: Dict[Tuple[str, ...], List[dict]] = {}
+    for row in updates:
+        grouped.setdefault(tuple(sorted(row)), []).append(row)
+    for rows in grouped.values():
+        for chunk in chunks(rows):
+            session.execute(update(LocationStandItem), chunk)
+    record_movements(movements)
+    return variance_quantity, variance_cost
+
+
+def close_event(session: Session, event: Event) -> EventCloseSummary:
+    """Close ``event`` and return its stored summary.
+
+    Movements are labelled with the caller's :func:`tag_movements` context.
+    """
+
+    session.flush()
+    event_locations = session.execute(
+        select(EventLocation.id, EventLocation.location_id).where(
+            EventLocation.event_id == event.id
+        )
+    ).all()
+    location_ids = [location_id for _, location_id in event_locations]
+    variance_quantity, variance_cost = _roll_forward_counts(
+        session, event.id, location_ids
+    )
+    sales_facts.archive_event_sales(session, event.id)
+
+    location_totals = sales_facts.event_location_totals(session, event.id)
+    session.execute(
+        delete(EventCloseSummary).where(EventCloseSummary.event_id == event.id)
+    )
+    summary = EventCloseSummary(
+        event_id=event.id,
+        closed_at=datetime.utcnow(),
+        terminal_quantity=sum(entry["quantity"] for entry in location_totals.values()),
+        terminal_amount=sum(entry["amount"] for entry in location_totals.values()),
+        variance_quantity=variance_quantity,
+        variance_cost=variance_cost,
+        location_totals={
+            str(location_id): entry for location_id, entry in location_totals.items()
+        },
+        top_products=sales_facts.event_top_products(session, event.id),
+    )
+    session.add(summary)
+    event.closed = True
+    _forget_bulk_changes(
+        session, {el_id for el_id, _ in event_locations}, set(location_ids)
+    )
+    return summary
+
+
+def _forget_bulk_changes(
+    session: Session, event_location_ids: Set[int], location_ids: Set[int]
+) -> None:
+    # The bulk statements bypass the identity map. Only loaded values are
+    # read here, so expired objects are not refreshed one by one.
+    for state in list(session.identity_map.all_states()):
+        obj = state.obj()
+        if obj is None:
+            continue
+        if isinstance(obj, LocationStandItem):
+            if state.dict.get("location_id") in location_ids:
+                session.expunge(obj)
+        elif isinstance(obj, TerminalSale):
+            if state.dict.get("event_location_id") in event_location_ids:
+                session.expunge(obj)
+        elif isinstance(obj, EventLocation):
+            if state.identity and state.identity[0] in event_location_ids:
+                session.expire(obj, ["terminal_sales"])
+        elif isinstance(obj, Location):
+            if state.identity and state.identity[0] in location_ids:
+                session.expire(obj, ["stand_items"])
+
+
+__all__ = ["close_event"]
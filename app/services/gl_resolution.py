@@ -0,0 +1,155 @@
+"""Set-based resolution of effective purchase GL codes.
+
+A purchase line's GL code is, in order of precedence: the code set on the
+line itself, the location override on ``LocationStandItem`` and finally the
+item's default ``purchase_gl_code``. ``Item.purchase_gl_code_for_location``
+and ``PurchaseInvoiceItem.resolved_purchase_gl_code`` apply those rules one
+row at a time; reports that resolve many lines build a
+:class:`PurchaseGLCodeLookup` instead, which answers every line from two
+queries regardless of how many lines there are.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import and_
+
+from app import db
+from app.models import GLCode, Item, LocationStandItem
+from app.utils.batching import chunks
+
+ItemLocation = Tuple[int, Optional[int]]
+
+
+@dataclass
+class PurchaseGLCodeLookup:
+    """Effective purchase GL codes for a fixed set of items and locations."""
+
+    item_defaults: Dict[int, Optional[int]] = field(default_factory=dict)
+    location_overrides: Dict[ItemLocation, int] = field(default_factory=dict)
+    codes: Dict[int, GLCode] = field(default_factory=dict)
+
+    def for_item(
+        self, item_id: Optional[int], location_id: Optional[int] = None
+    ) -> Optional[GLCode]:
+        """Mirror ``Item.purchase_gl_code_for_location`` without a query."""
+
+        if item_id is None:
+            return None
+        if location_id is not None:
+            override = self.codes.get(
+                self.location_overrides.get((item_id, location_id))
+            )
+            if override is not None:
+                return override
+        return self.codes.get(self.item_defaults.get(item_id))
+
+    def for_invoice_line(
+        self, line, location_id: Optional[int] = None
+    ) -> Optional[GLCode]:
+        """Mirror ``PurchaseInvoiceItem.resolved_purchase_gl_code``."""
+
+        explicit = self.codes.get(line.purchase_gl_code_id)
+        if explicit is not None:
+            return explicit
+        if line.item_id is None:
+            return None
+        return self.for_item(line.item_id, _line_location_id(line, location_id))
+
+
+def _line_location_id(line, location_id: Optional[int]) -> Optional[int]:
+    if line.location_id is not None:
+        return line.location_id
+    if location_id is not None:
+        return location_id
+    invoice = line.invoice
+    return invoice.location_id if invoice is not None else None
+
+
+def load_purchase_gl_codes(
+    pairs: Iterable[ItemLocation],
+    *,
+    gl_code_ids: Iterable[Optional[int]] = (),
+    session=None,
+) -> PurchaseGLCodeLookup:
+    """Resolve GL codes for ``(item_id, location_id)`` pairs in bulk.
+
+    ``location_id`` may be ``None`` to ask for the item default only.
+    ``gl_code_ids`` adds codes referenced directly (such as invoice line
+    overrides) to the lookup so they are loaded in the same query.
+    """
+
+    session = session or db.session
+    pairs = list(pairs)
+    lookup = PurchaseGLCodeLookup()
+    item_ids = sorted({item_id for item_id, _ in pairs if item_id is not None})
+    wanted = {
+        (item_id, location_id)
+        for item_id, location_id in pairs
+        if item_id is not None and location_id is not None
+    }
+    location_ids = sorted({location_id for _, location_id in wanted})
+
+    for chunk in chunks(item_ids):
+        rows = (
+            session.query(
+                Item.id,
+                Item.purchase_gl_code_id,
+                LocationStandItem.location_id,
+                LocationStandItem.purchase_gl_code_id,
+            )
+            .outerjoin(
+                LocationStandItem,
+                and_(
+                    LocationStandItem.item_id == Item.id,
+                    LocationStandItem.location_id.in_(location_ids),
+                    LocationStandItem.purchase_gl_code_id.isnot(None),
+                ),
+            )
+            .filter(Item.id.in_(chunk))
+        )
+        for item_id, default_id, location_id, override_id in rows:
+            lookup.item_defaults[item_id] = default_id
+            if (item_id, location_id) in wanted:
+                lookup.location_overrides[(item_id, location_id)] = override_id
+
+    needed = set(lookup.item_defaults.values())
+    needed.update(lookup.location_overrides.values())
+    needed.update(gl_code_ids)
+    needed.discard(None)
+    for chunk in chunks(sorted(needed)):
+        lookup.codes.update(
+            (code.id, code)
+            for code in session.query(GLCode).filter(GLCode.id.in_(chunk))
+        )
+    return lookup
+
+
+def load_invoice_line_gl_codes(
+    lines: Iterable, location_id: Optional[int] = None, *, session=None
+) -> PurchaseGLCodeLookup:
+    """Build a lookup covering every line in ``lines``.
+
+    ``location_id`` is the fallback used when a line has no location of its
+    own, matching ``resolved_purchase_gl_code(location_id)``.
+    """
+
+    pairs = []
+    explicit_ids = []
+    for line in lines:
+        if line.purchase_gl_code_id is not None:
+            explicit_ids.append(line.purchase_gl_code_id)
+        if line.item_id is not None:
+            pairs.append((line.item_id, _line_location_id(line, location_id)))
+    return load_purchase_gl_codes(
+        pairs, gl_code_ids=explicit_ids, session=session
+    )
+
+
+__all__ = [
+    "PurchaseGLCodeLookup",
+    "load_invoice_line_gl_codes",
+    "load_purchase_gl_codes",
+]
@@ -0,0 +1,59 @@
+"""Deferred imports for heavy dependencies.
+
+``create_app`` imports every blueprint, so a module-level ``import pandas``
+anywhere under a route is paid by every process: gunicorn workers, the
+``flask db upgrade`` in the Docker entrypoint and each CLI script, whether
+or not they ever forecast or render a PDF. Modules that only need such a
+dependency inside functions bind it with :func:`lazy_module` instead::
+
+    np = lazy_module("numpy")
+
+The name behaves like the module, but the import happens on first attribute
+access. Annotations are not evaluated (every user has
+``from __future__ import annotations``), so ``-> np.ndarray`` stays free.
+"""
+
+from __future__ import annotations
+
+import importlib
+import sys
+import types
+
+__all__ = ["LazyModule", "is_loaded", "lazy_module"]
+
+
+class LazyModule(types.ModuleType):
+    """Stand-in for a module that is imported on first attribute access."""
+
+    def _load(self) -> types.ModuleType:
+        module = importlib.import_module(self.__name__)
+        # Later lookups hit the instance dict and skip ``__getattr__``.
+        self.__dict__.update(
+            (key, value)
+            for key, value in module.__dict__.items()
+            if key not in {"__name__", "__spec__", "__loader__"}
+        )
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if is_loaded(self.__name__) else "not loaded"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def lazy_module(name: str) -> types.ModuleType:
+    """Return ``name`` if it is already imported, else a :class:`LazyModule`."""
+
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
+
+
+def is_loaded(name: str) -> bool:
+    return name in sys.modules
@@ -0,0 +1,340 @@
+"""Pooled SMTP delivery.
+
+:func:`app.utils.email.send_email` used to open a new SMTP connection for
+every message, negotiate STARTTLS and log in, send one message and quit.
+Emailing stand sheets to several people paid that handshake once per
+recipient, and a server that dropped an idle or busy connection failed the
+request outright.
+
+:class:`SMTPPool` keeps up to ``MAIL_POOL_SIZE`` authenticated connections
+per worker process and SMTP configuration, and drops any that have sat idle
+for more than ``MAIL_POOL_IDLE_SECONDS``. :func:`send_messages` sends a whole
+batch over one checked-out connection. A message that hits a dropped
+connection or a temporary (4xx) reply is retried on a fresh connection, up to
+``MAIL_SEND_ATTEMPTS`` times. A permanent refusal is recorded against that
+message and the rest of the batch continues. Authentication failures and
+refused connections abort the batch, because every later message would fail
+the same way.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import smtplib
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from email.message import EmailMessage
+from typing import Deque, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from flask import current_app
+
+from app.services.metrics import MAIL_CONNECTIONS, MAIL_MESSAGES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_IDLE_SECONDS = 60.0
+DEFAULT_SEND_ATTEMPTS = 3
+_RETRY_DELAY = 0.2
+
+_pools_lock = threading.Lock()
+
+# Refusals after which smtplib has reset the session for the next message.
+_REFUSALS = (
+    smtplib.SMTPRecipientsRefused,
+    smtplib.SMTPSenderRefused,
+    smtplib.SMTPDataError,
+)
+# Failures every later message of the batch would repeat.
+_FATAL = (
+    smtplib.SMTPAuthenticationError,
+    smtplib.SMTPConnectError,
+    smtplib.SMTPHeloError,
+    smtplib.SMTPNotSupportedError,
+)
+
+
+@dataclass(frozen=True)
+class SMTPSettings:
+    host: str
+    port: int
+    username: str = ""
+    password: str = field(default="", repr=False)
+    use_tls: bool = False
+
+    @classmethod
+    def from_config(cls, config: Mapping) -> "SMTPSettings":
+        """Build settings from the mapping returned by ``_get_smtp_config``."""
+
+        return cls(
+            host=config["host"],
+            port=int(config["port"]),
+            username=config.get("username") or "",
+            password=config.get("password") or "",
+            use_tls=bool(config.get("use_tls")),
+        )
+
+
+@dataclass
+class DeliveryResult:
+    sent: List[str] = field(default_factory=list)
+    failed: List[Tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+
+class MailDeliveryError(smtplib.SMTPException):
+    """Raised when one or more messages of a batch could not be delivered."""
+
+    def __init__(self, failed: Iterable[Tuple[str, str]]):
+        self.failed = list(failed)
+        super().__init__(
+            "Could not deliver to "
+            + ", ".join(f"{recipient} ({reason})" for recipient, reason in self.failed)
+        )
+
+
+def _is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 400 <= exc.smtp_code < 500
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in exc.recipients.values())
+    # smtplib.SMTPException subclasses OSError, so test it after the above.
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+def _recipients(message: EmailMessage) -> str:
+    return ", ".join(
+        str(value)
+        for header in ("To", "Cc", "Bcc")
+        for value in message.get_all(header, [])
+    )
+
+
+class SMTPPool:
+    """Idle authenticated SMTP connections for one set of settings."""
+
+    def __init__(
+        self,
+        settings: SMTPSettings,
+        *,
+        max_idle: int = DEFAULT_POOL_SIZE,
+        idle_timeout: float = DEFAULT_IDLE_SECONDS,
+    ) -> None:
+        self.settings = settings
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.opened = 0
+        self._idle: Deque[Tuple[smtplib.SMTP, float]] = deque()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    # ------------------------------------------------------------------
+    def _connect(self) -> smtplib.SMTP:
+        settings = self.settings
+        connection = smtplib.SMTP(settings.host, settings.port)
+        try:
+            if settings.use_tls:
+                connection.starttls()
+            if settings.username:
+                connection.login(settings.username, settings.password)
+        except BaseException:
+            self._close(connection)
+            raise
+        self.opened += 1
+        MAIL_CONNECTIONS.inc()
+        return connection
+
+    @staticmethod
+    def _close(connection: smtplib.SMTP) -> None:
+        for method in ("quit", "close"):
+            closer = getattr(connection, method, None)
+            if closer is None:
+                continue
+            try:
+                closer()
+                return
+            except Exception:
+                continue
+
+    # ------------------------------------------------------------------
+    def acquire(self) -> smtplib.SMTP:
+        """Return an idle connection, or open and authenticate a new one."""
+
+        if self._pid != os.getpid():
+            # Sockets inherited from the parent are shared with it; never use them.
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._idle.clear()
+                    self._pid = os.getpid()
+        stale = []
+        connection = None
+        with self._lock:
+            cutoff = time.monotonic() - self.idle_timeout
+            # Newest first: once one is stale, every older one is too.
+            while self._idle:
+                candidate, returned_at = self._idle.pop()
+                if returned_at < cutoff:
+                    stale.append(candidate)
+                else:
+                    connection = candidate
+                    break
+        for candidate in stale:
+            self._close(candidate)
+        return connection if connection is not None else self._connect()
+
+    def release(self, connection: smtplib.SMTP) -> None:
+        """Return a healthy connection to the pool."""
+
+        with self._lock:
+            if self._pid == os.getpid() and len(self._idle) < self.max_idle:
+                self._idle.append((connection, time.monotonic()))
+                return
+        self._close(connection)
+
+    def discard(self, connection: smtplib.SMTP) -> None:
+        self._close(connection)
+
+    def idle_count(self) -> int:
+        with self._lock:
+            return len(self._idle)
+
+    def close(self) -> None:
+        """Close every idle connection."""
+
+        with self._lock:
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+        for connection in idle:
+            self._close(connection)
+
+    # ------------------------------------------------------------------
+    def send_messages(
+        self,
+        messages: Iterable[EmailMessage],
+        *,
+        attempts: int = DEFAULT_SEND_ATTEMPTS,
+    ) -> DeliveryResult:
+        """Send ``messages`` over one connection, retrying transient failures.
+
+        Errors from opening or authenticating a connection are raised unless
+        they are transient and retries remain.
+        """
+
+        result = DeliveryResult()
+        connection: Optional[smtplib.SMTP] = None
+        try:
+            for message in messages:
+                recipients = _recipients(message)
+                for attempt in range(1, max(1, attempts) + 1):
+                    try:
+                        if connection is None:
+                            connection = self.acquire()
+                        connection.send_message(message)
+                    except Exception as exc:
+                        transient = _is_transient(exc)
+                        if transient or not isinstance(exc, _REFUSALS):
+                            # The session state is unknown; start over.
+                            if connection is not None:
+                                self.discard(connection)
+                                connection = None
+                        if transient and attempt < attempts:
+                            logger.info(
+                                "Retrying mail to %s after %s (attempt %s)",
+                                recipients,
+                                exc,
+                                attempt,
+                            )
+                            time.sleep(_RETRY_DELAY * attempt)
+                            continue
+                        MAIL_MESSAGES.inc(outcome="failed")
+                        if isinstance(exc, _FATAL) or not isinstance(
+                            exc, smtplib.SMTPException
+                        ):
+                            raise
+                        logger.warning(
+                            "Could not deliver mail to %s: %s", recipients, exc
+                        )
+                        result.failed.append((recipients, str(exc)))
+                        break
+                    else:
+                        MAIL_MESSAGES.inc(outcome="sent")
+                        result.sent.append(recipients)
+                        break
+        finally:
+            if connection is not None:
+                self.release(connection)
+        return result
+
+
+# ----------------------------------------------------------------------
+def get_pool(app=None, settings: Optional[SMTPSettings] = None) -> SMTPPool:
+    """Return this app's pool for ``settings``, creating it on first use."""
+
+    if app is None:
+        app = current_app._get_current_object()
+    if settings is None:
+        from app.utils.email import _get_smtp_config
+
+        settings = SMTPSettings.from_config(_get_smtp_config())
+    pools: Dict[SMTPSettings, SMTPPool] = app.extensions.setdefault("smtp_pools", {})
+    pool = pools.get(settings)
+    if pool is None:
+        with _pools_lock:
+            pool = pools.get(settings)
+            if pool is None:
+                pool = pools[settings] = SMTPPool(
+                    settings,
+                    max_idle=int(
+                        app.config.get("MAIL_POOL_SIZE", DEFAULT_POOL_SIZE)
+                    ),
+                    idle_timeout=float(
+                        app.config.get("MAIL_POOL_IDLE_SECONDS", DEFAULT_IDLE_SECONDS)
+                    ),
+                )
+                atexit.register(pool.close)
+    return pool
+
+
+def send_messages(
+    messages: Iterable[EmailMessage],
+    *,
+    settings: Optional[SMTPSettings] = None,
+    attempts: Optional[int] = None,
+) -> DeliveryResult:
+    """Send ``messages`` as one batch through the current app's pool."""
+
+    app = current_app._get_current_object()
+    if attempts is None:
+        attempts = int(app.config.get("MAIL_SEND_ATTEMPTS", DEFAULT_SEND_ATTEMPTS))
+    return get_pool(app, settings).send_messages(messages, attempts=attempts)
+
+
+def close_pools(app=None) -> None:
+    """Close the idle connections of every pool of ``app``."""
+
+    app = app or current_app._get_current_object()
+    for pool in list(app.extensions.get("smtp_pools", {}).values()):
+        pool.close()
+
+
+__all__ = [
+    "DEFAULT_IDLE_SECONDS",
+    "DEFAULT_POOL_SIZE",
+    "DEFAULT_SEND_ATTEMPTS",
+    "DeliveryResult",
+    "MailDeliveryError",
+    "SMTPPool",
+    "SMTPSettings",
+    "close_pools",
+    "get_pool",
+    "send_messages",
+]
@@ -0,0 +1,382 @@
+"""Set-based synchronisation of location products and stand sheets.
+
+Keeping a location in line with its menu used to walk the ORM graph one
+location at a time: every product's recipe items and each recipe item's item
+were lazily loaded, stand sheet rows were added or deleted individually and
+menu history was flushed and queried per location. Editing a menu shared by
+dozens of stands issued thousands of statements.
+
+The helpers here compute the desired item set once per product set, read the
+affected locations' products and stand sheet rows with one query each and
+apply the difference as bulk ``INSERT``/``UPDATE``/``DELETE`` statements.
+Menu assignment history is written the same way.
+
+Bulk statements bypass the stock ledger's flush hooks, so the stand sheet
+changes are passed to :func:`~app.services.stock_ledger.record_movements`.
+Pending ORM changes are flushed before any reads, and the touched locations,
+menus and assignments are expired afterwards so later attribute access sees
+the new rows. Nothing is committed.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import and_, delete, insert, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from app.models import (
+    Item,
+    Location,
+    LocationStandItem,
+    Menu,
+    MenuAssignment,
+    Product,
+    ProductRecipeItem,
+    location_products,
+    menu_products,
+)
+from app.services.stock_ledger import record_movements
+from app.utils.batching import chunks
+
+# ``expected_count``/``purchase_gl_code_id`` overrides keyed by item id.
+StandValues = Dict[int, Tuple[float, Optional[int]]]
+
+
+def menu_product_ids(session: Session, menu_id: Optional[int]) -> List[int]:
+    """Return the ids of the products on ``menu_id`` (empty for no menu)."""
+
+    if menu_id is None:
+        return []
+    return list(
+        session.execute(
+            select(menu_products.c.product_id)
+            .where(menu_products.c.menu_id == menu_id)
+            .order_by(menu_products.c.product_id)
+        ).scalars()
+    )
+
+
+def countable_items(
+    session: Session, product_ids: Iterable[int]
+) -> Dict[int, Optional[int]]:
+    """Map item id to purchase GL code id for the products' countable items."""
+
+    product_ids = sorted(set(product_ids))
+    items: Dict[int, Optional[int]] = {}
+    for chunk in chunks(product_ids):
+        rows = session.execute(
+            select(ProductRecipeItem.item_id, Item.purchase_gl_code_id)
+            .join(Item, Item.id == ProductRecipeItem.item_id)
+            .where(
+                ProductRecipeItem.product_id.in_(chunk),
+                ProductRecipeItem.countable.is_(True),
+            )
+        )
+        for item_id, gl_code_id in rows:
+            items[item_id] = gl_code_id
+    return items
+
+
+def _sync_products(
+    session: Session, location_ids: Sequence[int], product_ids: Set[int]
+) -> None:
+    existing: Dict[int, Set[int]] = {location_id: set() for location_id in location_ids}
+    for chunk in chunks(location_ids):
+        rows = session.execute(
+            select(
+                location_products.c.location_id, location_products.c.product_id
+            ).where(location_products.c.location_id.in_(chunk))
+        )
+        for location_id, product_id in rows:
+            existing[location_id].add(product_id)
+
+    stale: List[Tuple[int, int]] = []
+    missing: List[dict] = []
+    for location_id in location_ids:
+        current = existing[location_id]
+        stale.extend(
+            (location_id, product_id)
+            for product_id in sorted(current - product_ids)
+        )
+        missing.extend(
+            {"location_id": location_id, "product_id": product_id}
+            for product_id in sorted(product_ids - current)
+        )
+
+    for chunk in chunks(stale):
+        session.execute(
+            delete(location_products).where(
+                tuple_(
+                    location_products.c.location_id,
+                    location_products.c.product_id,
+                ).in_(chunk)
+            )
+        )
+    for chunk in chunks(missing):
+        session.execute(insert(location_products), chunk)
+
+
+def _sync_stand_items(
+    session: Session,
+    location_ids: Sequence[int],
+    desired: Dict[int, Optional[int]],
+    stand_values: Optional[StandValues],
+) -> None:
+    existing: Dict[int, Dict[int, Tuple[int, float, Optional[int]]]] = {
+        location_id: {} for location_id in location_ids
+    }
+    for chunk in chunks(location_ids):
+        rows = session.execute(
+            select(
+                LocationStandItem.id,
+                LocationStandItem.location_id,
+                LocationStandItem.item_id,
+                LocationStandItem.expected_count,
+                LocationStandItem.purchase_gl_code_id,
+            ).where(LocationStandItem.location_id.in_(chunk))
+        )
+        for record_id, location_id, item_id, expected, gl_code_id in rows:
+            existing[location_id][item_id] = (
+                record_id,
+                float(expected or 0.0),
+                gl_code_id,
+            )
+
+    deletes: List[int] = []
+    inserts: List[dict] = []
+    updates: List[dict] = []
+    movements: List[Tuple[int, int, float]] = []
+    for location_id in location_ids:
+        records = existing[location_id]
+        for item_id, (record_id, current_expected, _) in records.items():
+            if item_id not in desired:
+                deletes.append(record_id)
+                movements.append((location_id, item_id, -current_expected))
+        for item_id, gl_code_id in desired.items():
+            expected = None
+            if stand_values is not None and item_id in stand_values:
+                expected, gl_code_id = stand_values[item_id]
+            record = records.get(item_id)
+            if record is None:
+                inserts.append(
+                    {
+                        "location_id": location_id,
+                        "item_id": item_id,
+                        "expected_count": expected or 0.0,
+                        "purchase_gl_code_id": gl_code_id,
+                    }
+                )
+                movements.append((location_id, item_id, expected or 0.0))
+                continue
+            record_id, current_expected, current_gl = record
+            changes = {}
+            if current_gl != gl_code_id:
+                changes["purchase_gl_code_id"] = gl_code_id
+            if expected is not None and current_expected != expected:
+                changes["expected_count"] = expected
+                movements.append((location_id, item_id, expected - current_expected))
+            if changes:
+                changes["id"] = record_id
+                updates.append(changes)
+
+    for chunk in chunks(deletes):
+        session.execute(
+            delete(LocationStandItem)
+            .where(LocationStandItem.id.in_(chunk))
+            .execution_options(synchronize_session=False)
+        )
+    for chunk in chunks(inserts):
+        session.execute(insert(LocationStandItem), chunk)
+    # Group by changed columns so each executemany shares one statement.
+    grouped: Dict[Tuple[str, ...], List[dict]] = {}
+    for row in updates:
+        grouped.setdefault(tuple(sorted(row)), []).append(row)
+    for rows in grouped.values():
+        for chunk in chunks(rows):
+            session.execute(update(LocationStandItem), chunk)
+    record_movements(movements)
+
+
+def _expire(session: Session, location_ids: Iterable[int]) -> None:
+    # Read identities and loaded values only; touching an expired attribute
+    # would reload every object one by one.
+    location_ids = set(location_ids)
+    for state in list(session.identity_map.all_states()):
+        obj = state.obj()
+        if obj is None:
+            continue
+        if isinstance(obj, Location):
+            if state.identity and state.identity[0] in location_ids:
+                session.expire(
+                    obj,
+                    [
+                        "products",
+                        "stand_items",
+                        "current_menu",
+                        "current_menu_id",
+                        "menu_assignments",
+                    ],
+                )
+        elif isinstance(obj, LocationStandItem):
+            if state.dict.get("location_id") in location_ids:
+                session.expunge(obj)
+        elif isinstance(obj, MenuAssignment):
+            if state.dict.get("location_id") in location_ids:
+                session.expire(obj)
+        elif isinstance(obj, Menu):
+            session.expire(obj, ["assignments", "locations", "last_used_at"])
+        elif isinstance(obj, Product):
+            session.expire(obj, ["locations"])
+
+
+def apply_products(
+    session: Session,
+    location_ids: Iterable[int],
+    product_ids: Iterable[int],
+    *,
+    menu_id: Optional[int] = None,
+    stand_values: Optional[StandValues] = None,
+) -> None:
+    """Make each location carry exactly ``product_ids`` and their stand items.
+
+    ``menu_id`` becomes the locations' current menu. ``stand_values`` copies
+    expected counts and GL codes for matching items instead of using the
+    item's purchase GL code.
+    """
+
+    location_ids = sorted(set(location_ids))
+    if not location_ids:
+        return
+    session.flush()
+    product_ids = set(product_ids)
+    desired = countable_items(session, product_ids)
+    _sync_products(session, location_ids, product_ids)
+    _sync_stand_items(session, location_ids, desired, stand_values)
+    for chunk in chunks(location_ids):
+        session.execute(
+            update(Location)
+            .where(Location.id.in_(chunk))
+            .values(current_menu_id=menu_id)
+            .execution_options(synchronize_session=False)
+        )
+    _expire(session, location_ids)
+
+
+def _record_assignments(
+    session: Session, location_ids: Sequence[int], menu_id: Optional[int]
+) -> None:
+    changed: List[int] = []
+    for chunk in chunks(location_ids):
+        rows = session.execute(
+            select(Location.id, Location.current_menu_id).where(
+                Location.id.in_(chunk)
+            )
+        )
+        changed.extend(
+            location_id
+            for location_id, current_menu_id in rows
+            if current_menu_id != menu_id
+        )
+    if not changed:
+        return
+
+    now = datetime.utcnow()
+    for chunk in chunks(changed):
+        conditions = [
+            MenuAssignment.location_id.in_(chunk),
+            MenuAssignment.unassigned_at.is_(None),
+        ]
+        if menu_id is not None:
+            conditions.append(MenuAssignment.menu_id != menu_id)
+        session.execute(
+            update(MenuAssignment)
+            .where(and_(*conditions))
+            .values(unassigned_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    if menu_id is None:
+        return
+    for chunk in chunks(changed):
+        session.execute(
+            insert(MenuAssignment),
+            [
+                {"location_id": location_id, "menu_id": menu_id, "assigned_at": now}
+                for location_id in chunk
+            ],
+        )
+    session.execute(
+        update(Menu)
+        .where(Menu.id == menu_id)
+        .values(last_used_at=now)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def assign_menu(
+    session: Session,
+    location_ids: Iterable[int],
+    menu_id: Optional[int],
+    *,
+    product_ids: Optional[Iterable[int]] = None,
+    stand_values: Optional[StandValues] = None,
+) -> None:
+    """Assign ``menu_id`` (or no menu) to locations and sync their products.
+
+    Locations whose current menu changes get their active assignment closed
+    and, when a menu is given, a new assignment opened. ``product_ids``
+    replaces the menu's products, e.g. when copying a location without a menu.
+    """
+
+    location_ids = sorted(set(location_ids))
+    if not location_ids:
+        return
+    session.flush()
+    _record_assignments(session, location_ids, menu_id)
+    if product_ids is None:
+        product_ids = menu_product_ids(session, menu_id)
+    apply_products(
+        session,
+        location_ids,
+        product_ids,
+        menu_id=menu_id,
+        stand_values=stand_values,
+    )
+
+
+def sync_menu(session: Session, menu_id: int) -> List[int]:
+    """Re-apply ``menu_id`` to every location actively assigned to it.
+
+    Returns the synced location ids.
+    """
+
+    session.flush()
+    location_ids = list(
+        session.execute(
+            select(MenuAssignment.location_id)
+            .join(Location, Location.id == MenuAssignment.location_id)
+            .where(
+                MenuAssignment.menu_id == menu_id,
+                MenuAssignment.unassigned_at.is_(None),
+            )
+            .distinct()
+        ).scalars()
+    )
+    apply_products(
+        session,
+        location_ids,
+        menu_product_ids(session, menu_id),
+        menu_id=menu_id,
+    )
+    return location_ids
+
+
+__all__ = [
+    "StandValues",
+    "apply_products",
+    "assign_menu",
+    "countable_items",
+    "menu_product_ids",
+    "sync_menu",
+]
@@ -0,0 +1,469 @@
+"""In-process Prometheus metrics collectors and text exposition.
+
+The collectors are deliberately tiny: each metric guards its samples with a
+single lock that is held only for a dictionary update, which keeps the hot
+path cheap under both threaded and eventlet workers.  Samples live in the
+worker process, so each gunicorn worker exposes its own series.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+SQL_LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    1.0,
+    5.0,
+)
+_SQL_OPERATIONS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE"})
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    """Base class holding the metric metadata and sample lock."""
+
+    metric_type = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, object]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def collect(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        lines.extend(self.collect())
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    metric_type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only be incremented")
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        key = self._label_values(labels)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            samples = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in samples
+        ]
+
+
+class Gauge(_Metric):
+    """Gauge that is either set explicitly or read from a callback."""
+
+    metric_type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Compute the (unlabelled) value with ``function`` at scrape time."""
+
+        if self.labelnames:
+            raise ValueError("Callback gauges cannot have labels")
+        self._function = function
+
+    def value(self, **labels) -> Optional[float]:
+        if self._function is not None:
+            return float(self._function())
+        key = self._label_values(labels)
+        with self._lock:
+            return self._values.get(key)
+
+    def collect(self) -> List[str]:
+        if self._function is not None:
+            try:
+                samples = [((), float(self._function()))]
+            except Exception:
+                samples = []
+        else:
+            with self._lock:
+                samples = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in samples
+        ]
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram with cumulative exposition."""
+
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name,
+        documentation,
+        labelnames=(),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._label_values(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            sample = self._values.get(key)
+            if sample is None:
+                sample = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            sample[0][index] += 1
+            sample[1][0] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        key = self._label_values(labels)
+        with self._lock:
+            sample = self._values.get(key)
+            return sum(sample[0]) if sample else 0
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            samples = [
+                (key, list(counts), total[0])
+                for key, (counts, total) in sorted(self._values.items())
+            ]
+        lines: List[str] = []
+        bucket_labels = self.labelnames + ("le",)
+        for key, counts, total in samples:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                lines.append(
+                    f"{self.name}_bucket"
+                    f"{_format_labels(bucket_labels, key + (_format_value(bound),))}"
+                    f" {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Ordered collection of metrics rendered together on scrape."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "invoicemanager_http_request_duration_seconds",
+    "Time spent handling HTTP requests by endpoint.",
+    ("endpoint", "method"),
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    "invoicemanager_http_requests_total",
+    "HTTP responses by endpoint and status code.",
+    ("endpoint", "method", "status"),
+)
+SQL_QUERY_DURATION = REGISTRY.histogram(
+    "invoicemanager_sql_query_duration_seconds",
+    "Time spent executing SQL statements by statement type.",
+    ("operation",),
+    buckets=SQL_LATENCY_BUCKETS,
+)
+ACTIVITY_LOG_QUEUE_DEPTH = REGISTRY.gauge(
+    "invoicemanager_activity_log_queue_depth",
+    "Activity log entries buffered but not yet written.",
+)
+ACTIVITY_LOG_ENTRIES = REGISTRY.counter(
+    "invoicemanager_activity_log_entries_total",
+    "Activity log entries by outcome (written, dropped when the queue was full, "
+    "failed to write).",
+    ("outcome",),
+)
+POS_POLL_DURATION = REGISTRY.histogram(
+    "invoicemanager_pos_poll_duration_seconds",
+    "Duration of POS sales mailbox polling cycles.",
+)
+POS_POLL_FAILURES = REGISTRY.counter(
+    "invoicemanager_pos_poll_failures_total",
+    "POS sales mailbox polling cycles that raised an error.",
+)
+POS_POLL_LAST_SUCCESS = REGISTRY.gauge(
+    "invoicemanager_pos_poll_last_success_timestamp_seconds",
+    "Unix time of the last successful POS sales mailbox poll.",
+)
+BACKUP_DURATION = REGISTRY.histogram(
+    "invoicemanager_backup_duration_seconds",
+    "Time spent creating database backups.",
+)
+BACKUP_SIZE = REGISTRY.gauge(
+    "invoicemanager_backup_size_bytes",
+    "Size of the most recently created database backup.",
+)
+PDF_RENDER_DURATION = REGISTRY.histogram(
+    "invoicemanager_pdf_render_duration_seconds",
+    "Time spent rendering stand sheet PDFs.",
+)
+MAIL_CONNECTIONS = REGISTRY.counter(
+    "invoicemanager_mail_connections_total",
+    "Authenticated SMTP connections opened by the mail pool.",
+)
+MAIL_MESSAGES = REGISTRY.counter(
+    "invoicemanager_mail_messages_total",
+    "Email messages by outcome (sent, failed).",
+    ("outcome",),
+)
+RATE_LIMIT_REJECTIONS = REGISTRY.counter(
+    "invoicemanager_rate_limit_rejections_total",
+    "Requests rejected by Flask-Limiter by endpoint.",
+    ("endpoint",),
+)
+
+
+def _current_endpoint() -> str:
+    return request.endpoint or "unmatched"
+
+
+def _activity_queue_depth() -> float:
+    if not has_app_context():
+        return 0.0
+    logger = current_app.extensions.get("activity_logger")
+    return float(logger.queue_depth()) if logger is not None else 0.0
+
+
+ACTIVITY_LOG_QUEUE_DEPTH.set_function(_activity_queue_depth)
+
+
+def record_rate_limit_breach(_limit) -> None:
+    """``Limiter(on_breach=...)`` hook counting rejected requests."""
+
+    try:
+        endpoint = _current_endpoint()
+    except RuntimeError:
+        endpoint = "unmatched"
+    RATE_LIMIT_REJECTIONS.inc(endpoint=endpoint)
+
+
+def _sql_operation(statement: str) -> str:
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return verb if verb in _SQL_OPERATIONS else "OTHER"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_query_start")
+    if not starts:
+        return
+    SQL_QUERY_DURATION.observe(
+        time.perf_counter() - starts.pop(), operation=_sql_operation(statement)
+    )
+
+
+def instrument_engine(engine) -> None:
+    """Attach SQL timing listeners to ``engine`` once."""
+
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def init_app(app) -> None:
+    """Register request timing hooks and SQL listeners for ``app``."""
+
+    app.config.setdefault("METRICS_ENABLED", True)
+    if not app.config["METRICS_ENABLED"]:
+        return
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_request_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        started = g.pop("metrics_request_started", None)
+        if started is not None:
+            endpoint = _current_endpoint()
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - started,
+                endpoint=endpoint,
+                method=request.method,
+            )
+            HTTP_REQUESTS.inc(
+                endpoint=endpoint,
+                method=request.method,
+                status=response.status_code,
+            )
+        return response
+
+    from app import db
+
+    with app.app_context():
+        instrument_engine(db.engine)
+
+
+def render_latest() -> str:
+    """Return every registered metric in Prometheus text format."""
+
+    return REGISTRY.render()
+
+
+__all__ = [
+    "ACTIVITY_LOG_QUEUE_DEPTH",
+    "BACKUP_DURATION",
+    "BACKUP_SIZE",
+    "CONTENT_TYPE_LATEST",
+    "Counter",
+    "Gauge",
+    "HTTP_REQUESTS",
+    "HTTP_REQUEST_DURATION",
+    "Histogram",
+    "MAIL_CONNECTIONS",
+    "MAIL_MESSAGES",
+    "MetricsRegistry",
+    "PDF_RENDER_DURATION",
+    "POS_POLL_DURATION",
+    "POS_POLL_FAILURES",
+    "POS_POLL_LAST_SUCCESS",
+    "RATE_LIMIT_REJECTIONS",
+    "REGISTRY",
+    "SQL_QUERY_DURATION",
+    "init_app",
+    "instrument_engine",
+    "record_rate_limit_breach",
+    "render_latest",
+]
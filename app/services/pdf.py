@@ -3,78 +3,107 @@
 from __future__ import annotations
 
 from io import BytesIO
-from typing import Mapping, Sequence, Tuple
+from typing import TYPE_CHECKING, Mapping, Sequence, Tuple
 
 from flask import current_app, render_template, request
-from pydyf import Stream as PDFStream
-from pydyf import _to_bytes as _pdf_to_bytes
-from pypdf import PdfReader, PdfWriter
-from weasyprint import CSS, HTML
-from weasyprint.formatting_structure.boxes import TableCellBox
+
+from app.services.metrics import PDF_RENDER_DURATION
+
+if TYPE_CHECKING:  # pragma: no cover
+    from weasyprint import CSS as _CSS
 
 PDFPage = Tuple[str, Mapping[str, object]]
 
+# WeasyPrint (with Pillow, fontTools and pydyf) and pypdf are imported by the
+# first render rather than at startup; every process imports this module
+# through the blueprints but only a few ever render a PDF.
+CSS = HTML = PdfReader = PdfWriter = None
+_PDF_NAMES = ("CSS", "HTML", "PdfReader", "PdfWriter")
 
-# WeasyPrint 62 expects ``pydyf.Stream`` to provide a ``transform`` helper, but
-# ``pydyf`` 0.12 removed that method.  When the newer dependency is installed,
-# the PDF rendering path raises ``AttributeError`` and generates blank files.
-# Add a backwards-compatible shim so WeasyPrint can apply page transforms again
-# even with newer ``pydyf`` releases.
-if not hasattr(PDFStream, "transform"):
 
-    def _stream_transform(
-        self, a: float = 1, b: float = 0, c: float = 0, d: float = 1,
-        e: float = 0, f: float = 0,
-    ) -> None:
-        self.stream.append(
-            b" ".join(_pdf_to_bytes(v) for v in (a, b, c, d, e, f)) + b" cm"
-        )
+def _load_pdf_stack() -> None:
+    """Import the PDF libraries into this module on first use."""
 
-    PDFStream.transform = _stream_transform
+    module_globals = globals()
+    if all(module_globals[name] is not None for name in _PDF_NAMES):
+        return
 
-if not hasattr(PDFStream, "push_state"):
+    from pypdf import PdfReader as reader, PdfWriter as writer
+    from weasyprint import CSS as css, HTML as html
 
-    def _stream_push_state(self) -> None:
-        self.stream.append(b"q")
+    _patch_weasyprint()
+    # Keep names a caller (or test) already replaced.
+    for name, value in zip(_PDF_NAMES, (css, html, reader, writer)):
+        if module_globals[name] is None:
+            module_globals[name] = value
 
-    def _stream_pop_state(self) -> None:
-        self.stream.append(b"Q")
 
-    PDFStream.push_state = _stream_push_state
-    PDFStream.pop_state = _stream_pop_state
+def _patch_weasyprint() -> None:
+    from pydyf import Stream as PDFStream
+    from pydyf import _to_bytes as _pdf_to_bytes
+    from weasyprint.formatting_structure.boxes import TableCellBox
 
-if not hasattr(PDFStream, "text_matrix"):
+    # WeasyPrint 62 expects ``pydyf.Stream`` to provide a ``transform`` helper,
+    # but ``pydyf`` 0.12 removed that method.  When the newer dependency is
+    # installed, the PDF rendering path raises ``AttributeError`` and generates
+    # blank files. Add a backwards-compatible shim so WeasyPrint can apply page
+    # transforms again even with newer ``pydyf`` releases.
+    if not hasattr(PDFStream, "transform"):
 
-    def _stream_text_matrix(
-        self, a: float, b: float, c: float, d: float, e: float, f: float
-    ) -> None:
-        # Older pydyf versions exposed ``text_matrix`` while newer ones only
-        # provide ``set_text_matrix``.
-        if hasattr(self, "set_text_matrix"):
-            self.set_text_matrix(a, b, c, d, e, f)
-        else:
+        def _stream_transform(
+            self, a: float = 1, b: float = 0, c: float = 0, d: float = 1,
+            e: float = 0, f: float = 0,
+        ) -> None:
             self.stream.append(
-                b" ".join(_pdf_to_bytes(v) for v in (a, b, c, d, e, f))
-                + b" Tm"
+                b" ".join(_pdf_to_bytes(v) for v in (a, b, c, d, e, f)) + b" cm"
             )
 
-    PDFStream.text_matrix = _stream_text_matrix
+        PDFStream.transform = _stream_transform
+
+    if not hasattr(PDFStream, "push_state"):
+
+        def _stream_push_state(self) -> None:
+            self.stream.append(b"q")
+
+        def _stream_pop_state(self) -> None:
+            self.stream.append(b"Q")
+
+        PDFStream.push_state = _stream_push_state
+        PDFStream.pop_state = _stream_pop_state
 
-# Some WeasyPrint builds omit border radius attributes on ``TableCellBox`` and
-# emit ``AttributeError`` during stand sheet rendering. Align the class with
-# other box types by providing zero-radius defaults when they are missing.
-if not hasattr(TableCellBox, "border_top_left_radius"):
-    TableCellBox.border_top_left_radius = (0, 0)
-    TableCellBox.border_top_right_radius = (0, 0)
-    TableCellBox.border_bottom_left_radius = (0, 0)
-    TableCellBox.border_bottom_right_radius = (0, 0)
+    if not hasattr(PDFStream, "text_matrix"):
+
+        def _stream_text_matrix(
+            self, a: float, b: float, c: float, d: float, e: float, f: float
+        ) -> None:
+            # Older pydyf versions exposed ``text_matrix`` while newer ones only
+            # provide ``set_text_matrix``.
+            if hasattr(self, "set_text_matrix"):
+                self.set_text_matrix(a, b, c, d, e, f)
+            else:
+                self.stream.append(
+                    b" ".join(_pdf_to_bytes(v) for v in (a, b, c, d, e, f))
+                    + b" Tm"
+                )
+
+        PDFStream.text_matrix = _stream_text_matrix
+
+    # Some WeasyPrint builds omit border radius attributes on ``TableCellBox``
+    # and emit ``AttributeError`` during stand sheet rendering. Align the class
+    # with other box types by providing zero-radius defaults when they are
+    # missing.
+    if not hasattr(TableCellBox, "border_top_left_radius"):
+        TableCellBox.border_top_left_radius = (0, 0)
+        TableCellBox.border_top_right_radius = (0, 0)
+        TableCellBox.border_bottom_left_radius = (0, 0)
+        TableCellBox.border_bottom_right_radius = (0, 0)
 
 
 def _render_html_to_pdf(
     html: str,
     *,
     base_url: str | None = None,
-    stylesheets: Sequence[CSS] | None = None,
+    stylesheets: Sequence[_CSS] | None = None,
 ) -> bytes:
     """Render an HTML string to a PDF byte string."""
     resolved_base_url = base_url
@@ -155,6 +184,14 @@ def render_stand_sheet_pdf(
     if not pages:
         raise ValueError("At least one template must be provided")
 
+    _load_pdf_stack()
+    with PDF_RENDER_DURATION.time():
+        return _render_stand_sheet_pages(pages, base_url=base_url)
+
+
+def _render_stand_sheet_pages(
+    pages: Sequence[PDFPage], *, base_url: str | None
+) -> bytes:
     pdf_pages = []
     landscape_stylesheet = CSS(string="@page { size: letter landscape; }")
     for template_name, context in pages:
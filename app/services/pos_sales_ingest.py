@@ -2,9 +2,9 @@
 
 from __future__ import annotations
 
-import hashlib
 import secrets
 from pathlib import Path
+from typing import BinaryIO
 
 from flask import current_app
 from sqlalchemy.exc import IntegrityError
@@ -19,6 +19,7 @@ from app.models import (
     TerminalSaleProductAlias,
     db,
 )
+from app.services import attachment_store
 from app.utils.activity import log_activity
 from app.utils.numeric import coerce_float
 from app.utils.pos_import import (
@@ -307,32 +308,31 @@ def ingest_pos_sales_attachment(
     source_provider: str,
     source_message_id: str,
     filename: str,
-    content: bytes,
-    storage_dir: str | Path,
+    content: bytes | BinaryIO,
+    storage_dir: str | Path | None = None,
 ) -> tuple[PosSalesImport, bool]:
     """Persist and stage a single POS sales attachment.
 
-    Returns ``(sales_import, duplicate)`` where ``duplicate`` indicates an existing
-    idempotent import record was reused.
+    ``content`` is streamed into the attachment store (``storage_dir``
+    overrides ``ATTACHMENT_STORE_FOLDER``); the spreadsheet is parsed from
+    there. Returns ``(sales_import, duplicate)`` where ``duplicate``
+    indicates an existing idempotent import record was reused.
     """
 
     extension = Path(filename).suffix.lower()
     if not extension:
         raise ValueError("Attachment is missing a file extension.")
 
-    attachment_sha256 = hashlib.sha256(content).hexdigest()
-    destination_dir = Path(storage_dir)
-    destination_dir.mkdir(parents=True, exist_ok=True)
-    persisted_path = destination_dir / f"{attachment_sha256}{extension}"
-    if not persisted_path.exists():
-        persisted_path.write_bytes(content)
+    folder = str(storage_dir) if storage_dir else None
+    blob = attachment_store.write_blob(content, folder=folder)
+    attachment_sha256 = blob.sha256
 
     sales_import = PosSalesImport(
         source_provider=source_provider,
         message_id=source_message_id,
         attachment_filename=filename,
         attachment_sha256=attachment_sha256,
-        attachment_storage_path=str(persisted_path),
+        attachment_storage_path=blob.path,
         status="pending",
     )
     db.session.add(sales_import)
@@ -353,7 +353,11 @@ def ingest_pos_sales_attachment(
         raise
 
     try:
-        stage_pos_sales_import(sales_import, str(persisted_path), extension)
+        attachment_store.acquire(db.session, blob, filename=filename)
+        with attachment_store.materialize(
+            attachment_sha256, extension, folder
+        ) as path:
+            stage_pos_sales_import(sales_import, path, extension)
         db.session.commit()
         log_activity(
             f"Received POS sales import {sales_import.id} via {source_provider}"
@@ -366,11 +370,12 @@ def ingest_pos_sales_attachment(
             message_id=f"{source_message_id}:failed:{secrets.token_hex(4)}",
             attachment_filename=filename,
             attachment_sha256=attachment_sha256,
-            attachment_storage_path=str(persisted_path),
+            attachment_storage_path=blob.path,
             status="failed",
             failure_reason="Unable to parse POS spreadsheet attachment.",
         )
         db.session.add(failure)
+        attachment_store.acquire(db.session, blob, filename=filename)
         db.session.commit()
         current_app.logger.exception(
             "Failed to stage inbound POS sales attachment from %s",
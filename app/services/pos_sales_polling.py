@@ -18,6 +18,11 @@ from threading import Event, Thread
 
 from flask import current_app
 
+from app.services.metrics import (
+    POS_POLL_DURATION,
+    POS_POLL_FAILURES,
+    POS_POLL_LAST_SUCCESS,
+)
 from app.services.pos_sales_ingest import ingest_pos_sales_attachment
 from app.utils.activity import log_activity
 
@@ -255,10 +260,6 @@ def run_pos_sales_mailbox_poll_once(app) -> dict[str, int]:
         allowed_extensions = {
             ext if ext.startswith(".") else f".{ext}" for ext in allowed
         }
-        storage_root = Path(
-            app.config.get("MAILGUN_INBOUND_STORAGE_DIR")
-            or os.path.join(app.config["UPLOAD_FOLDER"], "mailgun_inbound")
-        )
 
         result = {"messages": 0, "imports": 0, "duplicates": 0, "errors": 0}
         for message in provider.fetch_unseen_messages():
@@ -273,7 +274,6 @@ def run_pos_sales_mailbox_poll_once(app) -> dict[str, int]:
                         source_message_id=message.message_id,
                         filename=attachment.filename,
                         content=attachment.content,
-                        storage_dir=storage_root,
                     )
                     if duplicate:
                         result["duplicates"] += 1
@@ -305,11 +305,17 @@ def _poll_loop(app, interval_seconds: int) -> None:
         if _stop_event.is_set():
             break
 
+        started = time.perf_counter()
         try:
             run_pos_sales_mailbox_poll_once(app)
         except Exception:
+            POS_POLL_FAILURES.inc()
             with app.app_context():
                 current_app.logger.exception("POS import mailbox poller run failed")
+        else:
+            POS_POLL_LAST_SUCCESS.set(time.time())
+        finally:
+            POS_POLL_DURATION.observe(time.perf_counter() - started)
 
         next_run += interval_seconds
         while next_run <= time.monotonic():
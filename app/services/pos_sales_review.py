@@ -0,0 +1,219 @@
+"""SQL-side helpers for the POS sales import review page.
+
+A season-total department export stages tens of thousands of
+:class:`~app.models.PosSalesImportRow` records. The review page used to load
+every location, row and mapped product of the import, count unresolved rows
+in Python and rebuild name lookups from the whole ``Location`` and
+``Product`` tables on each request.
+
+These helpers keep that work in the database: per-location counts and sums
+come from one ``GROUP BY``, rows are read one filtered page at a time and
+automatic mapping is a correlated ``UPDATE`` per table that tries an exact
+name match and then the terminal sale alias index. Nothing is committed.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import and_, case, func, select, update
+from sqlalchemy.orm import Query, Session, contains_eager
+
+from app.models import (
+    Location,
+    PosSalesImportLocation,
+    PosSalesImportRow,
+    Product,
+    TerminalSaleLocationAlias,
+    TerminalSaleProductAlias,
+)
+
+ROW_FILTERS = {
+    "unmapped": "Unmapped only",
+    "zero_quantity": "Zero quantity",
+    "price_mismatch": "Price mismatch",
+}
+
+# Staged unit prices and product prices are both rounded to cents.
+_PRICE_TOLERANCE = 0.005
+
+
+def _exact_match(model, name_column):
+    return (
+        select(model.id)
+        .where(func.lower(func.trim(model.name)) == func.lower(func.trim(name_column)))
+        .order_by(model.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+def auto_map(session: Session, import_id: int) -> int:
+    """Map unresolved locations and rows of ``import_id``; return the count.
+
+    Each record takes the newest location or product with the same name
+    (case-insensitive), then the alias recorded for its normalized name.
+    """
+
+    import_location = PosSalesImportLocation
+    location_match = func.coalesce(
+        _exact_match(Location, import_location.source_location_name),
+        select(TerminalSaleLocationAlias.location_id)
+        .where(
+            TerminalSaleLocationAlias.normalized_name
+            == import_location.normalized_location_name
+        )
+        .scalar_subquery(),
+    )
+    mapped = session.execute(
+        update(import_location)
+        .where(
+            import_location.import_id == import_id,
+            import_location.location_id.is_(None),
+            location_match.is_not(None),
+        )
+        .values(location_id=location_match)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    row = PosSalesImportRow
+    product_match = func.coalesce(
+        _exact_match(Product, row.source_product_name),
+        select(TerminalSaleProductAlias.product_id)
+        .where(TerminalSaleProductAlias.normalized_name == row.normalized_product_name)
+        .scalar_subquery(),
+    )
+    mapped += session.execute(
+        update(row)
+        .where(
+            row.import_id == import_id,
+            row.product_id.is_(None),
+            product_match.is_not(None),
+        )
+        .values(product_id=product_match)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    return mapped
+
+
+def map_location_name(
+    session: Session, import_id: int, normalized_name: str, location_id: int
+) -> None:
+    """Point every import location sharing ``normalized_name`` at a location."""
+
+    session.execute(
+        update(PosSalesImportLocation)
+        .where(
+            PosSalesImportLocation.import_id == import_id,
+            PosSalesImportLocation.normalized_location_name == normalized_name,
+        )
+        .values(location_id=location_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def map_product_name(
+    session: Session, import_id: int, normalized_name: str, product_id: int
+) -> None:
+    """Point every import row sharing ``normalized_name`` at a product."""
+
+    session.execute(
+        update(PosSalesImportRow)
+        .where(
+            PosSalesImportRow.import_id == import_id,
+            PosSalesImportRow.normalized_product_name == normalized_name,
+        )
+        .values(product_id=product_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def unresolved_counts(session: Session, import_id: int) -> Tuple[int, int]:
+    """Return ``(unmapped locations, unmapped rows)`` for ``import_id``."""
+
+    locations = session.execute(
+        select(func.count(PosSalesImportLocation.id)).where(
+            PosSalesImportLocation.import_id == import_id,
+            PosSalesImportLocation.location_id.is_(None),
+        )
+    ).scalar_one()
+    rows = session.execute(
+        select(func.count(PosSalesImportRow.id)).where(
+            PosSalesImportRow.import_id == import_id,
+            PosSalesImportRow.product_id.is_(None),
+        )
+    ).scalar_one()
+    return locations, rows
+
+
+def location_summaries(session: Session, import_id: int) -> Dict[int, dict]:
+    """Row counts and sums per import location, keyed by its id."""
+
+    row = PosSalesImportRow
+    result = session.execute(
+        select(
+            row.location_import_id,
+            func.count(row.id),
+            func.sum(case((row.product_id.is_(None), 1), else_=0)),
+            func.sum(case((row.is_zero_quantity.is_(True), 1), else_=0)),
+            func.coalesce(func.sum(row.quantity), 0.0),
+            func.coalesce(func.sum(row.computed_line_total), 0.0),
+        )
+        .where(row.import_id == import_id)
+        .group_by(row.location_import_id)
+    )
+    return {
+        location_import_id: {
+            "row_count": row_count,
+            "unresolved_count": int(unresolved or 0),
+            "zero_quantity_count": int(zero_quantity or 0),
+            "quantity": float(quantity),
+            "line_total": float(line_total),
+        }
+        for (
+            location_import_id,
+            row_count,
+            unresolved,
+            zero_quantity,
+            quantity,
+            line_total,
+        ) in result
+    }
+
+
+def rows_query(location_import_id: int, row_filter: Optional[str] = None) -> Query:
+    """Rows of one import location in parse order, optionally filtered.
+
+    ``row_filter`` is one of :data:`ROW_FILTERS`; unknown values are ignored.
+    Mapped products are loaded in the same query.
+    """
+
+    row = PosSalesImportRow
+    query = (
+        row.query.outerjoin(Product, Product.id == row.product_id)
+        .options(contains_eager(row.product))
+        .filter(row.location_import_id == location_import_id)
+    )
+    if row_filter == "unmapped":
+        query = query.filter(row.product_id.is_(None))
+    elif row_filter == "zero_quantity":
+        query = query.filter(row.is_zero_quantity.is_(True))
+    elif row_filter == "price_mismatch":
+        query = query.filter(
+            and_(
+                row.is_zero_quantity.is_(False),
+                func.abs(row.computed_unit_price - Product.price) > _PRICE_TOLERANCE,
+            )
+        )
+    return query.order_by(row.parse_index)
+
+
+__all__ = [
+    "ROW_FILTERS",
+    "auto_map",
+    "location_summaries",
+    "map_location_name",
+    "map_product_name",
+    "rows_query",
+    "unresolved_counts",
+]
@@ -0,0 +1,134 @@
+"""Recipe-driven product costing.
+
+Product costs are derived from their recipes: the sum of
+``item.cost * quantity * unit.factor`` over ``ProductRecipeItem`` rows divided
+by the recipe yield. When item costs change (receiving or reversing purchase
+invoices) only the products whose recipes reference those items are
+recalculated, in a single aggregate query, and every change is recorded in
+``ProductCostHistory``.
+
+Nothing here commits; callers flush the cost updates as part of their own
+transaction.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Sequence
+
+from sqlalchemy import func, insert, update
+from sqlalchemy.orm.util import identity_key
+
+from app import db
+from app.models import Item, ItemUnit, Product, ProductCostHistory, ProductRecipeItem
+from app.utils.batching import chunks
+
+_COST_TOLERANCE = 1e-9
+
+
+def _unique_ids(values: Iterable[int | None]) -> List[int]:
+    return sorted({int(value) for value in values if value is not None})
+
+
+def products_using_items(item_ids: Iterable[int | None]) -> List[int]:
+    """Return ids of products whose recipes include any of ``item_ids``."""
+
+    product_ids: set[int] = set()
+    for chunk in chunks(_unique_ids(item_ids)):
+        product_ids.update(
+            product_id
+            for (product_id,) in db.session.query(ProductRecipeItem.product_id)
+            .filter(ProductRecipeItem.item_id.in_(chunk))
+            .distinct()
+        )
+    return sorted(product_ids)
+
+
+def _recipe_totals(product_ids: Sequence[int]) -> Dict[int, float]:
+    line_cost = (
+        func.coalesce(Item.cost, 0.0)
+        * ProductRecipeItem.quantity
+        * func.coalesce(ItemUnit.factor, 1.0)
+    )
+    totals: Dict[int, float] = {}
+    for chunk in chunks(product_ids):
+        rows = (
+            db.session.query(ProductRecipeItem.product_id, func.sum(line_cost))
+            .join(Item, Item.id == ProductRecipeItem.item_id)
+            .outerjoin(ItemUnit, ItemUnit.id == ProductRecipeItem.unit_id)
+            .filter(ProductRecipeItem.product_id.in_(chunk))
+            .group_by(ProductRecipeItem.product_id)
+        )
+        totals.update((product_id, float(total or 0.0)) for product_id, total in rows)
+    return totals
+
+
+def recalculate_product_costs(
+    product_ids: Iterable[int | None], *, source: str
+) -> Dict[int, float]:
+    """Set ``Product.cost`` from the recipe for each of ``product_ids``.
+
+    Products without recipe lines fall back to a cost of ``0``. Returns the
+    new cost of every product whose cost actually changed.
+    """
+
+    ids = _unique_ids(product_ids)
+    if not ids:
+        return {}
+
+    totals = _recipe_totals(ids)
+    changes: Dict[int, float] = {}
+    history_rows = []
+    for chunk in chunks(ids):
+        rows = db.session.query(
+            Product.id, Product.cost, Product.recipe_yield_quantity
+        ).filter(Product.id.in_(chunk))
+        for product_id, current_cost, yield_quantity in rows:
+            total = totals.get(product_id, 0.0)
+            if not yield_quantity or yield_quantity <= 0:
+                yield_quantity = 1.0
+            new_cost = total / yield_quantity
+            if (
+                current_cost is not None
+                and abs(new_cost - current_cost) <= _COST_TOLERANCE
+            ):
+                continue
+            changes[product_id] = new_cost
+            history_rows.append(
+                {
+                    "product_id": product_id,
+                    "previous_cost": current_cost,
+                    "cost": new_cost,
+                    "source": source,
+                }
+            )
+
+    if not changes:
+        return changes
+
+    db.session.execute(
+        update(Product),
+        [{"id": product_id, "cost": cost} for product_id, cost in changes.items()],
+    )
+    db.session.execute(insert(ProductCostHistory), history_rows)
+
+    # Bulk updates bypass the identity map; refresh any loaded products.
+    for product_id in changes:
+        loaded = db.session.identity_map.get(identity_key(Product, product_id))
+        if loaded is not None:
+            db.session.expire(loaded, ["cost"])
+    return changes
+
+
+def propagate_item_cost_changes(
+    item_ids: Iterable[int | None], *, source: str = "item_cost"
+) -> Dict[int, float]:
+    """Recalculate only the products that depend on the changed items."""
+
+    return recalculate_product_costs(products_using_items(item_ids), source=source)
+
+
+__all__ = [
+    "products_using_items",
+    "propagate_item_cost_changes",
+    "recalculate_product_costs",
+]
@@ -0,0 +1,248 @@
+"""Stored ``Product.last_sold_at``.
+
+The product list's "last sold before" filter used to compute each product's
+last sale on every page load: outer joins from products to invoice lines,
+invoices and terminal sales, grouped per product and filtered with
+``HAVING``. With a large catalog and years of sales that took seconds, and
+it missed sales of closed events, whose terminal sales live on as
+:class:`~app.models.SalesFact` rows. Rendering the column also loaded every
+product's invoice lines and terminal sales.
+
+``Product.last_sold_at`` is now an indexed column holding the latest of:
+
+* the creation date of an invoice with a line for the product;
+* ``TerminalSale.sold_at``;
+* ``SalesFact.last_sold_at`` for archived event sales;
+* ``PosSalesImport.received_at`` for rows of approved POS imports.
+
+Flush hooks (see :func:`install_listeners`) note the products touched by
+ORM writes to those rows, including cascaded deletes, and recompute them
+once the flush is done: new, edited or deleted invoice lines and terminal
+sales, invoices whose date changes and POS imports whose status changes.
+Code that writes sales with bulk statements calls :func:`refresh_last_sold`
+itself. The migration fills the column for existing data, and
+``python scripts/product_last_sold.py refresh`` recomputes every product
+after changes made outside the app.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from sqlalchemy import bindparam, event, select, update
+from sqlalchemy.orm import Session, attributes, object_session
+
+from app import db
+from app.models import (
+    Invoice,
+    InvoiceProduct,
+    PosSalesImport,
+    PosSalesImportLocation,
+    PosSalesImportRow,
+    Product,
+    SalesFact,
+    TerminalSale,
+)
+from app.utils.batching import chunks
+
+_PENDING_KEY = "product_last_sold_pending"
+
+
+def _sources(product_ids: Optional[Sequence[int]]):
+    """One ``(product_id, max(sold))`` query per kind of sale."""
+
+    queries = [
+        select(InvoiceProduct.product_id, db.func.max(Invoice.date_created))
+        .join(Invoice, Invoice.id == InvoiceProduct.invoice_id)
+        .where(InvoiceProduct.product_id.is_not(None))
+        .group_by(InvoiceProduct.product_id),
+        select(TerminalSale.product_id, db.func.max(TerminalSale.sold_at)).group_by(
+            TerminalSale.product_id
+        ),
+        select(SalesFact.product_id, db.func.max(SalesFact.last_sold_at)).group_by(
+            SalesFact.product_id
+        ),
+        select(PosSalesImportRow.product_id, db.func.max(PosSalesImport.received_at))
+        .join(
+            PosSalesImportLocation,
+            PosSalesImportLocation.id == PosSalesImportRow.location_import_id,
+        )
+        .join(PosSalesImport, PosSalesImport.id == PosSalesImportLocation.import_id)
+        .where(
+            PosSalesImport.status == "approved",
+            PosSalesImportRow.product_id.is_not(None),
+            PosSalesImportRow.is_zero_quantity.is_(False),
+        )
+        .group_by(PosSalesImportRow.product_id),
+    ]
+    if product_ids is None:
+        return queries
+    return [
+        query.where(query.selected_columns[0].in_(product_ids)) for query in queries
+    ]
+
+
+def last_sold_by_product(
+    session: Session, product_ids: Optional[Iterable[int]] = None
+) -> Dict[int, datetime]:
+    """Compute the latest sale of ``product_ids`` (every product if ``None``)."""
+
+    connection = session.connection()
+    latest: Dict[int, datetime] = {}
+    if product_ids is None:
+        batches: List[Optional[Sequence[int]]] = [None]
+    else:
+        batches = list(chunks(sorted(set(product_ids))))
+    for batch in batches:
+        for query in _sources(batch):
+            for product_id, sold_at in connection.execute(query):
+                if sold_at is None:
+                    continue
+                current = latest.get(product_id)
+                if current is None or sold_at > current:
+                    latest[product_id] = sold_at
+    return latest
+
+
+def refresh_last_sold(
+    session: Session, product_ids: Optional[Iterable[int]] = None
+) -> int:
+    """Recompute ``Product.last_sold_at``; return how many products changed.
+
+    Pass ``None`` to recompute every product. Only the column is written, so
+    it is safe to call while flushing. Products already loaded in
+    ``session`` see the new values. Nothing is committed.
+    """
+
+    if product_ids is not None:
+        product_ids = sorted(set(product_ids))
+        if not product_ids:
+            return 0
+    latest = last_sold_by_product(session, product_ids)
+
+    connection = session.connection()
+    current = select(Product.id, Product.last_sold_at)
+    batches = [None] if product_ids is None else list(chunks(product_ids))
+    changes = []
+    for batch in batches:
+        query = current if batch is None else current.where(Product.id.in_(batch))
+        for product_id, stored in connection.execute(query):
+            value = latest.get(product_id)
+            if value != stored:
+                changes.append({"product_key": product_id, "value": value})
+    if not changes:
+        return 0
+
+    table = Product.__table__
+    connection.execute(
+        update(table)
+        .where(table.c.id == bindparam("product_key"))
+        .values(last_sold_at=bindparam("value")),
+        changes,
+    )
+    for change in changes:
+        product = session.identity_map.get(
+            session.identity_key(Product, change["product_key"])
+        )
+        if product is not None:
+            attributes.set_committed_value(product, "last_sold_at", change["value"])
+    return len(changes)
+
+
+# ----------------------------------------------------------------------
+def _pending(target) -> Optional[Set[int]]:
+    session = object_session(target)
+    if session is None:
+        return None
+    return session.info.setdefault(_PENDING_KEY, set())
+
+
+def _changed(target, attr: str) -> bool:
+    return attributes.get_history(target, attr).has_changes()
+
+
+def _sale_written(mapper, connection, target) -> None:
+    pending = _pending(target)
+    if pending is not None and target.product_id:
+        pending.add(target.product_id)
+
+
+def _sale_updated(mapper, connection, target) -> None:
+    pending = _pending(target)
+    if pending is None:
+        return
+    dated_by = "sold_at" if isinstance(target, TerminalSale) else "invoice_id"
+    moved = _changed(target, "product_id")
+    if not (moved or _changed(target, dated_by)):
+        return
+    if target.product_id:
+        pending.add(target.product_id)
+    if moved:
+        # The row still holds the product the line is moving away from.
+        table = mapper.local_table
+        previous = connection.execute(
+            select(table.c.product_id).where(table.c.id == target.id)
+        ).scalar()
+        if previous:
+            pending.add(previous)
+
+
+def _invoice_updated(mapper, connection, target) -> None:
+    pending = _pending(target)
+    if pending is None or not _changed(target, "date_created"):
+        return
+    pending.update(
+        connection.execute(
+            select(InvoiceProduct.product_id).where(
+                InvoiceProduct.invoice_id == target.id,
+                InvoiceProduct.product_id.is_not(None),
+            )
+        ).scalars()
+    )
+
+
+def _import_updated(mapper, connection, target) -> None:
+    pending = _pending(target)
+    if pending is None or not _changed(target, "status"):
+        return
+    pending.update(
+        connection.execute(
+            select(PosSalesImportRow.product_id).where(
+                PosSalesImportRow.import_id == target.id,
+                PosSalesImportRow.product_id.is_not(None),
+            )
+        ).scalars()
+    )
+
+
+def _after_flush(session, flush_context) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        refresh_last_sold(session, pending)
+
+
+def _clear_pending(session, *args) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def install_listeners() -> None:
+    """Attach the flush hooks that keep the column current (idempotent)."""
+
+    if event.contains(db.session, "after_flush", _after_flush):
+        return
+    for model in (InvoiceProduct, TerminalSale):
+        event.listen(model, "after_insert", _sale_written)
+        event.listen(model, "before_update", _sale_updated)
+        event.listen(model, "after_delete", _sale_written)
+    event.listen(Invoice, "after_update", _invoice_updated)
+    event.listen(PosSalesImport, "after_update", _import_updated)
+    event.listen(db.session, "after_flush", _after_flush)
+    event.listen(db.session, "after_rollback", _clear_pending)
+
+
+__all__ = [
+    "install_listeners",
+    "last_sold_by_product",
+    "refresh_last_sold",
+]
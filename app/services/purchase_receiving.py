@@ -0,0 +1,130 @@
+"""Apply received purchase invoice lines to inventory in bulk.
+
+Receiving updates, for every line, the item's weighted average cost and
+on-hand quantity and the destination location's expected count. Rather than
+querying and flushing line by line, :func:`receive_invoice_lines` preloads
+the items, units, on-hand totals and stand records for the whole invoice,
+computes every line in memory (in order, so repeated items compound exactly
+as they would sequentially) and hands the stock changes to
+:class:`~app.services.stock_adjustments.StockAdjustments`, which writes them
+as atomic, batched statements.
+
+Nothing here commits; the caller owns the transaction.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Mapping, Sequence
+
+from sqlalchemy import func
+
+from app import db
+from app.models import Item, ItemUnit, LocationStandItem, PurchaseInvoiceItem
+from app.services.stock_adjustments import StockAdjustments
+from app.utils.batching import chunks
+
+
+def _load_by_id(model, ids: Iterable[int]) -> Dict[int, object]:
+    loaded = {}
+    for chunk in chunks(sorted(set(ids))):
+        loaded.update((obj.id, obj) for obj in model.query.filter(model.id.in_(chunk)))
+    return loaded
+
+
+def _load_on_hand(item_ids: Sequence[int]) -> Dict[int, float]:
+    totals: Dict[int, float] = {}
+    for chunk in chunks(item_ids):
+        totals.update(
+            db.session.query(
+                LocationStandItem.item_id, func.sum(LocationStandItem.expected_count)
+            )
+            .filter(LocationStandItem.item_id.in_(chunk))
+            .group_by(LocationStandItem.item_id)
+        )
+    return {item_id: total or 0 for item_id, total in totals.items()}
+
+
+def receive_invoice_lines(
+    invoice, entries: Sequence[Mapping]
+) -> List[PurchaseInvoiceItem]:
+    """Add ``entries`` to ``invoice`` and apply them to inventory.
+
+    Each entry is a mapping with ``item_id``, ``unit_id``, ``quantity``,
+    ``cost``, ``container_deposit``, ``deposit_provided``, ``gl_code_id`` and
+    ``location_id`` (``None`` to use the invoice location), already in the
+    order the lines should be stored. Returns the new invoice lines.
+    """
+
+    items = _load_by_id(Item, (entry["item_id"] for entry in entries))
+    units = _load_by_id(
+        ItemUnit, (entry["unit_id"] for entry in entries if entry["unit_id"])
+    )
+    item_ids = sorted(items)
+    on_hand = _load_on_hand(item_ids)
+    adjustments = StockAdjustments(fill_purchase_gl_codes=True)
+
+    lines: List[PurchaseInvoiceItem] = []
+    for order_index, entry in enumerate(entries):
+        item_obj = items.get(entry["item_id"])
+        unit_obj = units.get(entry["unit_id"]) if entry["unit_id"] else None
+
+        prev_cost = item_obj.cost if item_obj and item_obj.cost else 0.0
+        quantity = entry["quantity"]
+        cost = entry["cost"]
+        container_deposit = entry.get("container_deposit", 0.0)
+
+        lines.append(
+            PurchaseInvoiceItem(
+                invoice_id=invoice.id,
+                item_id=item_obj.id if item_obj else None,
+                unit_id=unit_obj.id if unit_obj else None,
+                item_name=item_obj.name if item_obj else "",
+                unit_name=unit_obj.name if unit_obj else None,
+                quantity=quantity,
+                cost=cost,
+                container_deposit=container_deposit,
+                prev_cost=prev_cost,
+                position=order_index,
+                purchase_gl_code_id=entry["gl_code_id"],
+                location_id=entry["location_id"],
+            )
+        )
+
+        if not item_obj:
+            continue
+
+        factor = unit_obj.factor if unit_obj and unit_obj.factor else 1
+        prev_qty = on_hand.get(item_obj.id, 0)
+        new_qty = quantity * factor
+        total_qty = prev_qty + new_qty
+
+        # Cost per base unit for the newly received stock
+        cost_per_unit = cost / factor if factor else cost
+        prev_total_cost = prev_qty * prev_cost
+        new_total_cost = cost_per_unit * new_qty
+        if total_qty > 0:
+            weighted_cost = (prev_total_cost + new_total_cost) / total_qty
+        else:
+            weighted_cost = cost_per_unit
+
+        item_obj.cost = weighted_cost
+        on_hand[item_obj.id] = total_qty
+
+        adjustments.adjust_location(
+            entry["location_id"] or invoice.location_id, item_obj.id, new_qty
+        )
+
+        if entry.get("deposit_provided"):
+            item_obj.container_deposit = (
+                container_deposit / factor if factor else container_deposit
+            )
+
+    db.session.add_all(lines)
+    # Item.quantity mirrors the stand record total, as it did when the new
+    # quantity was computed from the preloaded sum.
+    adjustments.recount_items(items)
+    adjustments.apply()
+    return lines
+
+
+__all__ = ["receive_invoice_lines"]
@@ -0,0 +1,368 @@
+"""Precomputed purchase order recommendations.
+
+Running the demand forecast for every item and location on each request is
+expensive, and the recommendations page (and the scripts that poll its JSON
+feed) mostly ask for the same default settings. :func:`refresh_recommendations`
+runs the default forecast once and stores it as a
+:class:`~app.models.PurchaseRecommendationRun`; a background thread refreshes
+it once a day at ``PURCHASE_RECOMMENDATION_REFRESH_HOUR``.
+
+Stored lines hold the lookback history only. Open purchase order totals,
+location/item filters, demand multipliers and lead times are applied when
+serving, so a purchase order placed this morning is netted off straight away.
+Requests for a different lookback or forecast method fall back to a live
+forecast. Both cover the locations from :func:`active_location_ids` only.
+"""
+
+from __future__ import annotations
+
+import datetime as _dt
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.orm import joinedload, with_expression
+
+from app import db
+from app.models import (
+    Item,
+    Location,
+    PurchaseRecommendationLine,
+    PurchaseRecommendationRun,
+)
+from app.utils.batching import chunks
+from app.utils.forecasting import (
+    DemandForecastingHelper,
+    ForecastRecommendation,
+)
+from app.utils.periodic import start_periodic_job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOOKBACK_DAYS = 30
+DEFAULT_LEAD_TIME_DAYS = 3
+DEFAULT_METHOD = "average"
+
+# A run older than this is treated as missing, so a stopped refresh thread
+# cannot leave buyers looking at old numbers.
+STALE_AFTER = _dt.timedelta(hours=36)
+
+
+def active_location_ids(
+    location_ids: Optional[Sequence[int]] = None,
+) -> List[int]:
+    """Return the ids of locations that are not archived.
+
+    With ``location_ids`` the result is limited to those locations.
+    """
+
+    statement = select(Location.id).where(Location.archived.is_(False))
+    if location_ids:
+        statement = statement.where(Location.id.in_(list(location_ids)))
+    return list(db.session.scalars(statement.order_by(Location.id)))
+
+
+def refresh_recommendations(
+    *, lookback_days: int = DEFAULT_LOOKBACK_DAYS
+) -> PurchaseRecommendationRun:
+    """Forecast every active item and location and store the result.
+
+    Earlier runs are deleted. Nothing is committed.
+    """
+
+    generated_at = _dt.datetime.utcnow()
+    location_ids = active_location_ids()
+    helper = DemandForecastingHelper(
+        lookback_days=lookback_days, lead_time_days=DEFAULT_LEAD_TIME_DAYS
+    )
+    recommendations = (
+        helper.build_recommendations(location_ids=location_ids)
+        if location_ids
+        else []
+    )
+    rows = [
+        _line_values(rec) for rec in recommendations if not rec.item.archived
+    ]
+
+    run = PurchaseRecommendationRun(
+        generated_at=generated_at,
+        lookback_days=lookback_days,
+        method=DEFAULT_METHOD,
+        line_count=len(rows),
+    )
+    db.session.add(run)
+    db.session.flush()
+    for chunk in chunks(rows):
+        for row in chunk:
+            row["run_id"] = run.id
+        db.session.execute(insert(PurchaseRecommendationLine), chunk)
+
+    stale_runs = select(PurchaseRecommendationRun.id).where(
+        PurchaseRecommendationRun.id != run.id
+    )
+    db.session.execute(
+        delete(PurchaseRecommendationLine).where(
+            PurchaseRecommendationLine.run_id.in_(stale_runs)
+        )
+    )
+    db.session.execute(
+        delete(PurchaseRecommendationRun).where(
+            PurchaseRecommendationRun.id != run.id
+        )
+    )
+    return run
+
+
+def _line_values(rec: ForecastRecommendation) -> dict:
+    history = rec.history
+    return {
+        "item_id": rec.item.id,
+        "location_id": rec.location.id,
+        "sales_qty": history["sales_qty"],
+        "transfer_in_qty": history["transfer_in_qty"],
+        "transfer_out_qty": history["transfer_out_qty"],
+        "invoice_qty": history["invoice_qty"],
+        "base_consumption": rec.base_consumption,
+        "default_unit_id": rec.default_unit_id,
+        "last_activity_at": history.get("last_activity_ts"),
+    }
+
+
+def current_run(
+    *,
+    lookback_days: int = DEFAULT_LOOKBACK_DAYS,
+    method: str = DEFAULT_METHOD,
+    now: Optional[_dt.datetime] = None,
+) -> Optional[PurchaseRecommendationRun]:
+    """Return the latest fresh run matching the settings, if any."""
+
+    now = now or _dt.datetime.utcnow()
+    return (
+        PurchaseRecommendationRun.query.filter(
+            PurchaseRecommendationRun.lookback_days == lookback_days,
+            PurchaseRecommendationRun.method == method,
+            PurchaseRecommendationRun.generated_at >= now - STALE_AFTER,
+        )
+        .order_by(PurchaseRecommendationRun.generated_at.desc())
+        .first()
+    )
+
+
+def stored_recommendations_query(
+    run: PurchaseRecommendationRun,
+    *,
+    location_ids: Optional[Sequence[int]] = None,
+    item_ids: Optional[Sequence[int]] = None,
+    multiplier: float = 1.0,
+):
+    """Return a select of ``run``'s lines in recommendation order.
+
+    Lines are ordered as :meth:`DemandForecastingHelper.build_recommendations`
+    orders them for the same ``multiplier``.
+    """
+
+    line = PurchaseRecommendationLine
+    open_po, open_po_qty, _incoming, recommended = _line_figures(
+        item_ids, multiplier
+    )
+    statement = _filter_lines(
+        select(line),
+        open_po,
+        run,
+        location_ids=location_ids,
+        item_ids=item_ids,
+    )
+    return statement.options(
+        with_expression(line.open_po_qty, open_po_qty),
+        joinedload(line.item),
+        joinedload(line.location),
+    ).order_by(recommended.desc(), line.base_consumption.desc(), line.id)
+
+
+def stored_recommendation_totals(
+    run: PurchaseRecommendationRun,
+    *,
+    location_ids: Optional[Sequence[int]] = None,
+    item_ids: Optional[Sequence[int]] = None,
+    multiplier: float = 1.0,
+) -> List[dict]:
+    """Return per item totals of every line :func:`stored_recommendations_query`
+    selects, in the shape of :func:`recommendation_totals`."""
+
+    line = PurchaseRecommendationLine
+    open_po, _open_po_qty, incoming, recommended = _line_figures(
+        item_ids, multiplier
+    )
+    total_recommended = func.sum(recommended)
+    statement = _filter_lines(
+        select(
+            Item.name,
+            func.sum(line.base_consumption),
+            func.sum(incoming),
+            total_recommended,
+        ).select_from(line),
+        open_po,
+        run,
+        location_ids=location_ids,
+        item_ids=item_ids,
+    )
+    return [
+        {
+            "label": name,
+            "recommended": float(recommended_qty or 0.0),
+            "consumption": float(consumption or 0.0),
+            "incoming": float(incoming_qty or 0.0),
+        }
+        for name, consumption, incoming_qty, recommended_qty in db.session.execute(
+            statement.group_by(line.item_id, Item.name).order_by(
+                total_recommended.desc(), Item.name
+            )
+        )
+    ]
+
+
+def recommendation_totals(
+    recommendations: Iterable[ForecastRecommendation],
+) -> List[dict]:
+    """Sum recommendation figures per item for the recommendations chart."""
+
+    totals: Dict[int, dict] = {}
+    for rec in recommendations:
+        entry = totals.setdefault(
+            rec.item.id,
+            {
+                "label": rec.item.name,
+                "recommended": 0.0,
+                "consumption": 0.0,
+                "incoming": 0.0,
+            },
+        )
+        entry["recommended"] += rec.recommended_quantity
+        entry["consumption"] += rec.base_consumption
+        entry["incoming"] += (
+            rec.history["transfer_in_qty"]
+            + rec.history["invoice_qty"]
+            + rec.history["open_po_qty"]
+        )
+    return sorted(
+        totals.values(),
+        key=lambda entry: (-entry["recommended"], entry["label"]),
+    )
+
+
+def _line_figures(item_ids: Optional[Sequence[int]], multiplier: float):
+    """Return the open order subquery and the per line open order, incoming
+    and recommended quantity expressions."""
+
+    line = PurchaseRecommendationLine
+    open_po = (
+        DemandForecastingHelper(db.session).open_po_totals(item_ids).subquery()
+    )
+    open_po_qty = func.coalesce(open_po.c.quantity, 0.0)
+    incoming = line.transfer_in_qty + line.invoice_qty + open_po_qty
+    shortfall = line.base_consumption * multiplier - incoming
+    recommended = case((shortfall > 0, shortfall), else_=0.0)
+    return open_po, open_po_qty, incoming, recommended
+
+
+def _filter_lines(
+    statement,
+    open_po,
+    run: PurchaseRecommendationRun,
+    *,
+    location_ids: Optional[Sequence[int]],
+    item_ids: Optional[Sequence[int]],
+):
+    line = PurchaseRecommendationLine
+    # Items and locations archived since the run are left out, as a live
+    # forecast would leave them out.
+    statement = (
+        statement.outerjoin(open_po, open_po.c.item_id == line.item_id)
+        .join(Item, Item.id == line.item_id)
+        .join(Location, Location.id == line.location_id)
+        .where(
+            line.run_id == run.id,
+            Item.archived.is_(False),
+            Location.archived.is_(False),
+        )
+    )
+    if location_ids:
+        statement = statement.where(line.location_id.in_(list(location_ids)))
+    if item_ids:
+        statement = statement.where(line.item_id.in_(list(item_ids)))
+    return statement
+
+
+def as_recommendations(
+    lines: Iterable[PurchaseRecommendationLine],
+    *,
+    multiplier: float = 1.0,
+    lead_time_days: int = DEFAULT_LEAD_TIME_DAYS,
+) -> List[ForecastRecommendation]:
+    """Turn lines from :func:`stored_recommendations_query` into
+    :class:`ForecastRecommendation` objects."""
+
+    suggested_date = _dt.date.today() + _dt.timedelta(days=lead_time_days)
+    recommendations = []
+    for line in lines:
+        adjusted_demand = line.base_consumption * multiplier
+        open_po_qty = float(line.open_po_qty or 0.0)
+        incoming = line.transfer_in_qty + line.invoice_qty + open_po_qty
+        recommendations.append(
+            ForecastRecommendation(
+                item=line.item,
+                location=line.location,
+                history={
+                    "sales_qty": line.sales_qty,
+                    "transfer_in_qty": line.transfer_in_qty,
+                    "transfer_out_qty": line.transfer_out_qty,
+                    "invoice_qty": line.invoice_qty,
+                    "open_po_qty": open_po_qty,
+                    "last_activity_ts": line.last_activity_at,
+                },
+                base_consumption=line.base_consumption,
+                adjusted_demand=adjusted_demand,
+                recommended_quantity=max(adjusted_demand - incoming, 0.0),
+                suggested_delivery_date=suggested_date,
+                default_unit_id=line.default_unit_id,
+            )
+        )
+    return recommendations
+
+
+def _refresh_job(app) -> None:
+    run = refresh_recommendations()
+    db.session.commit()
+    logger.info(
+        "Stored %s purchase recommendations in run %s",
+        run.line_count,
+        run.id,
+    )
+
+
+def start_recommendation_refresh_thread(app) -> None:
+    """Start or restart the nightly recommendation refresh thread."""
+
+    start_periodic_job(
+        app,
+        "purchase-recommendations",
+        "PURCHASE_RECOMMENDATION_REFRESH_HOUR",
+        _refresh_job,
+        daily=True,
+    )
+
+
+__all__ = [
+    "DEFAULT_LEAD_TIME_DAYS",
+    "DEFAULT_LOOKBACK_DAYS",
+    "DEFAULT_METHOD",
+    "STALE_AFTER",
+    "active_location_ids",
+    "as_recommendations",
+    "current_run",
+    "recommendation_totals",
+    "refresh_recommendations",
+    "start_recommendation_refresh_thread",
+    "stored_recommendation_totals",
+    "stored_recommendations_query",
+]
@@ -0,0 +1,183 @@
+"""Server-side storage for report results and wizard state.
+
+Large structures used to travel in the signed session cookie (or in signed
+hidden form fields), which bloats every request and breaks once the cookie
+passes the browser limit. The result store keeps the payload in the
+``result_store_entry`` table instead; the session only holds an opaque token.
+
+Entries belong to the user who created them, expire after
+``RESULT_STORE_TTL_HOURS`` and are purged whenever a new entry is written.
+Writes use their own short transaction so the caller's session is left
+alone.
+"""
+
+from __future__ import annotations
+
+import datetime as _dt
+from secrets import token_urlsafe
+from typing import Any, Optional
+
+from flask import current_app, session
+from flask_login import current_user
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import ResultStoreEntry, TerminalSalesResolutionState
+from app.services import terminal_sales_staging
+
+DEFAULT_TTL_HOURS = 12
+
+
+def _ttl() -> _dt.timedelta:
+    hours = current_app.config.get("RESULT_STORE_TTL_HOURS") or DEFAULT_TTL_HOURS
+    return _dt.timedelta(hours=float(hours))
+
+
+def _user_id() -> Optional[int]:
+    if current_user and current_user.is_authenticated:
+        return current_user.id
+    return None
+
+
+def _state_session() -> Session:
+    return Session(bind=db.session.get_bind())
+
+
+def put(namespace: str, payload: Any, *, token: Optional[str] = None) -> str:
+    """Store ``payload`` and return its token.
+
+    Passing the ``token`` of an entry the current user stored in the same
+    namespace replaces its payload and renews its expiry.
+    """
+
+    now = _dt.datetime.utcnow()
+    user_id = _user_id()
+    with _state_session() as state_session:
+        entry = None
+        if token:
+            entry = state_session.scalars(
+                select(ResultStoreEntry).where(ResultStoreEntry.token == token)
+            ).one_or_none()
+            if entry is not None and (
+                entry.namespace != namespace or entry.user_id != user_id
+            ):
+                # Never overwrite somebody else's entry; start a new one.
+                entry = None
+                token = None
+        if entry is None:
+            token = token or token_urlsafe(24)
+            entry = ResultStoreEntry(
+                token=token, namespace=namespace, user_id=user_id
+            )
+            state_session.add(entry)
+        entry.payload = payload
+        entry.expires_at = now + _ttl()
+        purge_expired(state_session, now=now)
+        state_session.commit()
+    return token
+
+
+def get(namespace: str, token: Optional[str]) -> Optional[Any]:
+    """Return the payload stored under ``token``, or ``None``.
+
+    Entries from another namespace or user, and expired entries, are treated
+    as missing.
+    """
+
+    if not token:
+        return None
+    entry = db.session.scalars(
+        select(ResultStoreEntry)
+        .where(
+            ResultStoreEntry.token == token,
+            ResultStoreEntry.namespace == namespace,
+            ResultStoreEntry.expires_at > _dt.datetime.utcnow(),
+        )
+        # Entries are written in a separate session; skip stale identities.
+        .execution_options(populate_existing=True)
+    ).one_or_none()
+    if entry is None or entry.user_id != _user_id():
+        return None
+    return entry.payload
+
+
+def discard(token: Optional[str]) -> None:
+    """Delete the entry stored under ``token``, if any."""
+
+    if not token:
+        return
+    with _state_session() as state_session:
+        state_session.execute(
+            delete(ResultStoreEntry).where(ResultStoreEntry.token == token)
+        )
+        state_session.commit()
+
+
+def purge_expired(
+    state_session: Optional[Session] = None, *, now: Optional[_dt.datetime] = None
+) -> int:
+    """Delete expired entries and abandoned terminal sales upload state.
+
+    Staged rows left without a terminal sales state are dropped as well.
+    Returns the number of entries and state rows removed. Commits only when
+    it opened its own session.
+    """
+
+    now = now or _dt.datetime.utcnow()
+    own_session = state_session is None
+    if own_session:
+        state_session = _state_session()
+    try:
+        removed = state_session.execute(
+            delete(ResultStoreEntry).where(ResultStoreEntry.expires_at <= now)
+        ).rowcount
+        removed += state_session.execute(
+            delete(TerminalSalesResolutionState).where(
+                TerminalSalesResolutionState.updated_at <= now - _ttl()
+            )
+        ).rowcount
+        terminal_sales_staging.discard_orphans(state_session)
+        if own_session:
+            state_session.commit()
+    finally:
+        if own_session:
+            state_session.close()
+    return removed
+
+
+def save_in_session(key: str, namespace: str, payload: Any) -> str:
+    """Store ``payload`` and keep only its token in ``session[key]``.
+
+    The entry the session pointed at before is replaced.
+    """
+
+    token = put(namespace, payload, token=session.get(key))
+    session[key] = token
+    session.modified = True
+    return token
+
+
+def load_from_session(key: str, namespace: str) -> Optional[Any]:
+    """Return the payload referenced by ``session[key]``, if still stored."""
+
+    return get(namespace, session.get(key))
+
+
+def clear_from_session(key: str) -> None:
+    """Forget ``session[key]`` and delete the entry it referenced."""
+
+    discard(session.pop(key, None))
+    session.modified = True
+
+
+__all__ = [
+    "DEFAULT_TTL_HOURS",
+    "clear_from_session",
+    "discard",
+    "get",
+    "load_from_session",
+    "purge_expired",
+    "put",
+    "save_in_session",
+]
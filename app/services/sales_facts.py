@@ -0,0 +1,233 @@
+"""Append-only sales facts for closed events.
+
+``TerminalSale`` rows only live while an event is open: closing an event used
+to delete them, so item-level sales history disappeared with it. Closing now
+first copies them into :class:`~app.models.SalesFact`, summed per sale date,
+location and product, with one ``INSERT ... SELECT``. The amount is frozen at
+the product price in effect at close.
+
+Reports that look back past open events read the facts through the helpers
+below instead of the raw sales. Nothing is committed.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, literal, select, union_all
+from sqlalchemy.orm import Session, contains_eager
+
+from app.models import (
+    EventLocation,
+    Location,
+    Product,
+    SalesFact,
+    TerminalSale,
+)
+
+TOP_PRODUCT_COUNT = 5
+
+
+def archive_event_sales(session: Session, event_id: int) -> int:
+    """Move the terminal sales of ``event_id`` into facts; return rows moved."""
+
+    sale = TerminalSale
+    day = func.date(sale.sold_at)
+    event_location_ids = select(EventLocation.id).where(
+        EventLocation.event_id == event_id
+    )
+    summed = (
+        select(
+            day,
+            EventLocation.location_id,
+            sale.product_id,
+            literal(event_id),
+            func.sum(sale.quantity),
+            func.sum(sale.quantity * func.coalesce(Product.price, 0.0)),
+            func.max(sale.sold_at),
+            literal(datetime.utcnow(), type_=SalesFact.archived_at.type),
+        )
+        .join(EventLocation, EventLocation.id == sale.event_location_id)
+        .outerjoin(Product, Product.id == sale.product_id)
+        .where(sale.event_location_id.in_(event_location_ids))
+        .group_by(day, EventLocation.location_id, sale.product_id)
+    )
+    session.execute(
+        insert(SalesFact).from_select(
+            [
+                "sale_date",
+                "location_id",
+                "product_id",
+                "event_id",
+                "quantity",
+                "amount",
+                "last_sold_at",
+                "archived_at",
+            ],
+            summed,
+        )
+    )
+    return session.execute(
+        delete(sale)
+        .where(sale.event_location_id.in_(event_location_ids))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def event_location_totals(session: Session, event_id: int) -> Dict[int, dict]:
+    """Archived quantity and amount of ``event_id`` keyed by location id."""
+
+    rows = session.execute(
+        select(
+            SalesFact.location_id,
+            Location.name,
+            func.sum(SalesFact.quantity),
+            func.sum(SalesFact.amount),
+        )
+        .join(Location, Location.id == SalesFact.location_id)
+        .where(SalesFact.event_id == event_id)
+        .group_by(SalesFact.location_id, Location.name)
+    )
+    return {
+        location_id: {
+            "name": name,
+            "quantity": float(quantity or 0.0),
+            "amount": float(amount or 0.0),
+        }
+        for location_id, name, quantity, amount in rows
+    }
+
+
+def event_top_products(
+    session: Session, event_id: int, limit: int = TOP_PRODUCT_COUNT
+) -> List[dict]:
+    """The best selling products of ``event_id`` by archived quantity."""
+
+    quantity = func.sum(SalesFact.quantity)
+    rows = session.execute(
+        select(SalesFact.product_id, Product.name, quantity, func.sum(SalesFact.amount))
+        .join(Product, Product.id == SalesFact.product_id)
+        .where(SalesFact.event_id == event_id)
+        .group_by(SalesFact.product_id, Product.name)
+        .order_by(quantity.desc(), Product.name)
+        .limit(limit)
+    )
+    return [
+        {
+            "product_id": product_id,
+            "name": name,
+            "quantity": float(total or 0.0),
+            "amount": float(amount or 0.0),
+        }
+        for product_id, name, total, amount in rows
+    ]
+
+
+def event_sales(session: Session, event_id: int) -> List[SalesFact]:
+    """Facts archived for ``event_id`` with their products loaded."""
+
+    return (
+        session.query(SalesFact)
+        .join(Product, Product.id == SalesFact.product_id)
+        .options(contains_eager(SalesFact.product))
+        .filter(SalesFact.event_id == event_id)
+        .order_by(SalesFact.location_id, SalesFact.product_id, SalesFact.sale_date)
+        .all()
+    )
+
+
+def product_location_sales(
+    session: Session, start: date, end: date
+) -> List[Tuple[int, int, float, Optional[datetime]]]:
+    """``(product_id, location_id, quantity, last sale)`` between two dates.
+
+    Open events contribute their live terminal sales and closed events their
+    archived facts.
+    """
+
+    live = (
+        select(
+            TerminalSale.product_id.label("product_id"),
+            EventLocation.location_id.label("location_id"),
+            TerminalSale.quantity.label("quantity"),
+            TerminalSale.sold_at.label("last_sale"),
+        )
+        .join(EventLocation, TerminalSale.event_location_id == EventLocation.id)
+        .where(TerminalSale.sold_at >= start, TerminalSale.sold_at <= end)
+    )
+    archived = select(
+        SalesFact.product_id,
+        SalesFact.location_id,
+        SalesFact.quantity,
+        SalesFact.last_sold_at,
+    ).where(
+        SalesFact.sale_date >= _as_date(start),
+        SalesFact.sale_date <= _as_date(end),
+    )
+    combined = union_all(live, archived).subquery("sales")
+    rows = session.execute(
+        select(
+            combined.c.product_id,
+            combined.c.location_id,
+            func.sum(combined.c.quantity),
+            func.max(combined.c.last_sale),
+        ).group_by(combined.c.product_id, combined.c.location_id)
+    )
+    return [
+        (product_id, location_id, float(quantity or 0.0), _as_datetime(last_sale))
+        for product_id, location_id, quantity, last_sale in rows
+    ]
+
+
+def event_sales_amounts(start: datetime, end: datetime):
+    """Subquery of ``(event_id, location_id, amount)`` sold between two times.
+
+    Live terminal sales are priced at the current product price; archived
+    facts keep the amount frozen at close.
+    """
+
+    live = (
+        select(
+            EventLocation.event_id.label("event_id"),
+            EventLocation.location_id.label("location_id"),
+            (
+                func.coalesce(TerminalSale.quantity, 0)
+                * func.coalesce(Product.price, 0)
+            ).label("amount"),
+        )
+        .join(EventLocation, TerminalSale.event_location_id == EventLocation.id)
+        .outerjoin(Product, Product.id == TerminalSale.product_id)
+        .where(TerminalSale.sold_at >= start, TerminalSale.sold_at <= end)
+    )
+    archived = select(
+        SalesFact.event_id, SalesFact.location_id, SalesFact.amount
+    ).where(
+        SalesFact.event_id.is_not(None),
+        SalesFact.sale_date >= _as_date(start),
+        SalesFact.sale_date <= _as_date(end),
+    )
+    return union_all(live, archived).subquery("event_sales")
+
+
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _as_datetime(value) -> Optional[datetime]:
+    """Normalise ``MAX()`` over a union, which SQLite returns as text."""
+
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+__all__ = [
+    "TOP_PRODUCT_COUNT",
+    "archive_event_sales",
+    "event_location_totals",
+    "event_sales_amounts",
+    "event_sales",
+    "event_top_products",
+    "product_location_sales",
+]
@@ -0,0 +1,303 @@
+"""Atomic, batched stock adjustments.
+
+Stock balances used to be changed by loading a row, adding to the value in
+Python and writing the result back, so two requests adjusting the same item
+at the same time could overwrite each other. :class:`StockAdjustments`
+collects the deltas for a request and applies them in the database instead:
+
+* stand records with one ``INSERT ... ON CONFLICT DO UPDATE SET
+  expected_count = expected_count + excluded.expected_count`` statement, which
+  also creates missing rows;
+* items and products with one ``UPDATE ... SET quantity = quantity + CASE id
+  ... END`` statement per table.
+
+Both statements return the resulting balances, which are used to fill in the
+before/after values of each :class:`StockChange`, refresh objects already in
+the session and write the stock ledger. Nothing here commits.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app import db
+from app.models import Item, LocationStandItem, Product
+from app.services.stock_ledger import record_movements
+from app.utils.batching import chunks
+
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+StandKey = Tuple[int, int]
+
+
+@dataclass
+class StockChange:
+    """One requested delta; ``before``/``after`` are set by ``apply``.
+
+    ``location_id`` is ``None`` for a change to ``Item.quantity``.
+    ``record_id`` is the ``LocationStandItem`` id for stand changes.
+    """
+
+    item_id: int
+    quantity: float
+    location_id: Optional[int] = None
+    record_id: Optional[int] = None
+    before: Optional[float] = None
+    after: Optional[float] = None
+
+
+class StockAdjustments:
+    """Collect stock deltas and apply them atomically in the database.
+
+    ``fill_purchase_gl_codes`` copies the item's purchase GL code onto
+    existing stand records that have none, as receiving does. New stand
+    records always start with the item's code.
+    """
+
+    def __init__(self, *, fill_purchase_gl_codes: bool = False) -> None:
+        self.fill_purchase_gl_codes = fill_purchase_gl_codes
+        self._stand_changes: List[StockChange] = []
+        self._item_changes: List[StockChange] = []
+        self._product_deltas: Dict[int, float] = {}
+        self._recount_item_ids: set[int] = set()
+
+    def __bool__(self) -> bool:
+        return bool(
+            self._stand_changes
+            or self._item_changes
+            or self._product_deltas
+            or self._recount_item_ids
+        )
+
+    def adjust_location(
+        self, location_id: int, item_id: int, quantity: float
+    ) -> StockChange:
+        """Add ``quantity`` to an item's expected count at a location."""
+
+        change = StockChange(item_id, float(quantity), location_id=location_id)
+        self._stand_changes.append(change)
+        return change
+
+    def adjust_item(self, item_id: int, quantity: float) -> StockChange:
+        """Add ``quantity`` to ``Item.quantity``."""
+
+        change = StockChange(item_id, float(quantity))
+        self._item_changes.append(change)
+        return change
+
+    def adjust_product(self, product_id: int, quantity: float) -> None:
+        """Add ``quantity`` to ``Product.quantity``."""
+
+        self._product_deltas[product_id] = self._product_deltas.get(
+            product_id, 0.0
+        ) + float(quantity)
+
+    def recount_items(self, item_ids: Iterable[int]) -> None:
+        """Reset ``Item.quantity`` to the sum of the item's stand records.
+
+        Runs after the stand record changes, in the same statement batch.
+        """
+
+        self._recount_item_ids.update(item_ids)
+
+    def apply(self) -> None:
+        """Write every collected change and record it in the stock ledger."""
+
+        session = db.session()
+        # Pending ORM changes must reach the database before the deltas are
+        # added on top of them.
+        session.flush()
+        movements: List[Tuple[Optional[int], int, float]] = []
+        movements.extend(self._apply_stand_changes(session))
+        movements.extend(self._apply_item_changes(session))
+        movements.extend(self._apply_recounts(session))
+        self._apply_product_deltas(session)
+        record_movements(movements)
+        self._stand_changes.clear()
+        self._item_changes.clear()
+        self._product_deltas.clear()
+        self._recount_item_ids.clear()
+
+    def _apply_stand_changes(self, session):
+        totals: Dict[StandKey, float] = {}
+        for change in self._stand_changes:
+            key = (change.location_id, change.item_id)
+            totals[key] = totals.get(key, 0.0) + change.quantity
+        if not totals:
+            return []
+
+        gl_codes = _item_gl_codes(session, sorted({key[1] for key in totals}))
+        table = LocationStandItem.__table__
+        statement = _upsert(session)(table)
+        if self.fill_purchase_gl_codes:
+            purchase_gl_code_id = func.coalesce(
+                table.c.purchase_gl_code_id, statement.excluded.purchase_gl_code_id
+            )
+        else:
+            purchase_gl_code_id = table.c.purchase_gl_code_id
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.location_id, table.c.item_id],
+            set_={
+                "expected_count": table.c.expected_count
+                + statement.excluded.expected_count,
+                "purchase_gl_code_id": purchase_gl_code_id,
+            },
+        ).returning(
+            table.c.id, table.c.location_id, table.c.item_id, table.c.expected_count
+        )
+        rows = [
+            {
+                "location_id": location_id,
+                "item_id": item_id,
+                "expected_count": quantity,
+                "purchase_gl_code_id": gl_codes.get(item_id),
+            }
+            for (location_id, item_id), quantity in totals.items()
+        ]
+        balances: Dict[StandKey, Tuple[int, float]] = {}
+        for record_id, location_id, item_id, expected_count in session.execute(
+            statement, rows
+        ):
+            balances[(location_id, item_id)] = (record_id, float(expected_count))
+
+        for record_id, expected_count in balances.values():
+            _sync(
+                session, LocationStandItem, record_id, "expected_count", expected_count
+            )
+        _fill_changes(
+            self._stand_changes,
+            lambda change: (change.location_id, change.item_id),
+            {key: value for key, (_, value) in balances.items()},
+            totals,
+        )
+        for change in self._stand_changes:
+            balance = balances.get((change.location_id, change.item_id))
+            if balance is not None:
+                change.record_id = balance[0]
+        return [
+            (location_id, item_id, quantity)
+            for (location_id, item_id), quantity in totals.items()
+        ]
+
+    def _apply_item_changes(self, session):
+        totals: Dict[int, float] = {}
+        for change in self._item_changes:
+            totals[change.item_id] = totals.get(change.item_id, 0.0) + change.quantity
+        balances = _add_quantities(session, Item, totals)
+        _fill_changes(
+            self._item_changes, lambda change: change.item_id, balances, totals
+        )
+        return [
+            (None, item_id, quantity)
+            for item_id, quantity in totals.items()
+            if item_id in balances
+        ]
+
+    def _apply_recounts(self, session):
+        item_ids = sorted(self._recount_item_ids)
+        if not item_ids:
+            return []
+        table = Item.__table__
+        stand = LocationStandItem.__table__
+        on_hand = (
+            select(func.coalesce(func.sum(stand.c.expected_count), 0.0))
+            .where(stand.c.item_id == table.c.id)
+            .scalar_subquery()
+        )
+        movements = []
+        for chunk in chunks(item_ids):
+            # The stand records were written above, so this transaction
+            # already holds the write lock; reading the old totals here is
+            # only used to label the ledger delta.
+            previous = dict(
+                session.execute(
+                    select(table.c.id, table.c.quantity).where(table.c.id.in_(chunk))
+                ).all()
+            )
+            result = session.execute(
+                update(table)
+                .where(table.c.id.in_(chunk))
+                .values(quantity=on_hand)
+                .returning(table.c.id, table.c.quantity)
+            )
+            for item_id, quantity in result:
+                quantity = float(quantity or 0.0)
+                _sync(session, Item, item_id, "quantity", quantity)
+                movements.append(
+                    (None, item_id, quantity - float(previous.get(item_id) or 0.0))
+                )
+        return movements
+
+    def _apply_product_deltas(self, session) -> None:
+        _add_quantities(session, Product, self._product_deltas)
+
+
+def _upsert(session):
+    dialect = session.get_bind().dialect.name
+    try:
+        return _UPSERT_DIALECTS[dialect]
+    except KeyError:  # pragma: no cover - only SQLite and PostgreSQL are used
+        raise NotImplementedError(
+            f"Stock adjustments do not support the {dialect} dialect"
+        ) from None
+
+
+def _item_gl_codes(session, item_ids: Sequence[int]) -> Dict[int, Optional[int]]:
+    codes: Dict[int, Optional[int]] = {}
+    for chunk in chunks(item_ids):
+        codes.update(
+            session.execute(
+                select(Item.id, Item.purchase_gl_code_id).where(Item.id.in_(chunk))
+            ).all()
+        )
+    return codes
+
+
+def _add_quantities(session, model, totals: Dict[int, float]) -> Dict[int, float]:
+    """Add ``totals`` to ``model.quantity`` in one UPDATE per chunk."""
+
+    table = model.__table__
+    balances: Dict[int, float] = {}
+    for chunk in chunks(sorted(totals)):
+        delta = case({row_id: totals[row_id] for row_id in chunk}, value=table.c.id)
+        result = session.execute(
+            update(table)
+            .where(table.c.id.in_(chunk))
+            .values(quantity=func.coalesce(table.c.quantity, 0.0) + delta)
+            .returning(table.c.id, table.c.quantity)
+        )
+        for row_id, quantity in result:
+            balances[row_id] = float(quantity)
+            _sync(session, model, row_id, "quantity", balances[row_id])
+    return balances
+
+
+def _sync(session, model, row_id: int, attr: str, value: float) -> None:
+    obj = session.identity_map.get(session.identity_key(model, row_id))
+    if obj is not None:
+        set_committed_value(obj, attr, value)
+
+
+def _fill_changes(changes, key_for, balances, totals) -> None:
+    """Derive each change's before/after from the final balance.
+
+    Changes to the same row are applied in the order they were requested,
+    starting from the balance the database held when the statement ran.
+    """
+
+    running = {key: balance - totals[key] for key, balance in balances.items()}
+    for change in changes:
+        key = key_for(change)
+        if key not in running:
+            continue
+        change.before = running[key]
+        running[key] += change.quantity
+        change.after = running[key]
+
+
+__all__ = ["StockAdjustments", "StockChange"]
@@ -0,0 +1,538 @@
+"""Append-only perpetual inventory ledger.
+
+Every change to ``LocationStandItem.expected_count`` or ``Item.quantity`` made
+through the ORM is written to ``StockMovement`` as a signed delta when the
+session flushes, so mutation paths do not have to remember to log anything.
+Routes call :func:`tag_movements` (or wrap a block in :func:`movement_context`)
+to label the rows with a movement type and the document that caused them.
+
+``StockSnapshot`` checkpoints carry every balance forward up to a movement id.
+Quantities at any point in time are answered from the latest snapshot taken
+at or before that time plus the movements recorded after it, and
+:func:`verify_balances` compares the ledger with the live columns.
+"""
+
+from __future__ import annotations
+
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from flask import g, has_request_context
+from sqlalchemy import event, func, inspect, insert, null
+from sqlalchemy.orm import attributes
+
+from app import db
+from app.models import (
+    Item,
+    LocationStandItem,
+    StockMovement,
+    StockSnapshot,
+    StockSnapshotLine,
+)
+from app.utils.batching import chunks
+from app.utils.periodic import start_periodic_job
+
+logger = logging.getLogger(__name__)
+
+BalanceKey = Tuple[Optional[int], int]
+
+DEFAULT_MOVEMENT_TYPE = "adjustment"
+OPENING_MOVEMENT_TYPE = "opening"
+
+_CONTEXT_KEY = "stock_movement_context"
+_QUANTITY_TOLERANCE = 1e-9
+
+# (model, attribute holding the balance, attribute holding the location)
+_TRACKED = (
+    (LocationStandItem, "expected_count", "location_id"),
+    (Item, "quantity", None),
+)
+
+
+@dataclass(frozen=True)
+class MovementContext:
+    movement_type: str
+    reference_type: Optional[str] = None
+    reference_id: Optional[str] = None
+    user_id: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class BalanceDrift:
+    """A balance whose live column disagrees with the ledger."""
+
+    location_id: Optional[int]
+    item_id: int
+    ledger_quantity: float
+    recorded_quantity: float
+
+    @property
+    def difference(self) -> float:
+        return self.recorded_quantity - self.ledger_quantity
+
+
+def _reference(reference_id: int | str | None) -> Optional[str]:
+    return None if reference_id is None else str(reference_id)
+
+
+def tag_movements(
+    movement_type: str,
+    *,
+    reference_type: Optional[str] = None,
+    reference_id: int | str | None = None,
+    user_id: Optional[int] = None,
+) -> MovementContext:
+    """Label stock changes flushed until the current transaction ends."""
+
+    context = MovementContext(
+        movement_type=movement_type,
+        reference_type=reference_type,
+        reference_id=_reference(reference_id),
+        user_id=user_id,
+    )
+    db.session().info[_CONTEXT_KEY] = context
+    return context
+
+
+def _clear_context(session, *args) -> None:
+    session.info.pop(_CONTEXT_KEY, None)
+
+
+@contextmanager
+def movement_context(
+    movement_type: str,
+    *,
+    reference_type: Optional[str] = None,
+    reference_id: int | str | None = None,
+    user_id: Optional[int] = None,
+) -> Iterator[MovementContext]:
+    """Tag stock changes made inside the block.
+
+    The session is flushed when the block exits normally so the movements are
+    recorded with this context rather than whatever is active at commit time.
+    """
+
+    session = db.session()
+    context = MovementContext(
+        movement_type=movement_type,
+        reference_type=reference_type,
+        reference_id=_reference(reference_id),
+        user_id=user_id,
+    )
+    previous = session.info.get(_CONTEXT_KEY)
+    session.info[_CONTEXT_KEY] = context
+    try:
+        yield context
+        session.flush()
+    finally:
+        if previous is None:
+            session.info.pop(_CONTEXT_KEY, None)
+        else:
+            session.info[_CONTEXT_KEY] = previous
+
+
+def _current_user_id() -> Optional[int]:
+    # Read the identity key rather than ``user.id`` so an expired user is not
+    # refreshed in the middle of a flush.
+    if not has_request_context():
+        return None
+    user = g.get("_login_user")
+    if user is None or not getattr(user, "is_authenticated", False):
+        return None
+    try:
+        identity = inspect(user).identity
+    except Exception:
+        return None
+    return identity[0] if identity else None
+
+
+def _balance_change(obj, state, attr: str) -> Optional[float]:
+    if state in ("new", "deleted"):
+        value = float(getattr(obj, attr) or 0.0)
+        return value if state == "new" else -value
+    history = attributes.get_history(obj, attr)
+    if not history.added or not history.deleted:
+        return None
+    return float(history.added[0] or 0.0) - float(history.deleted[0] or 0.0)
+
+
+def _before_flush(session, flush_context, instances) -> None:
+    # Load balances of rows about to be deleted while they still exist.
+    for obj in session.deleted:
+        for model, attr, _location_attr in _TRACKED:
+            if isinstance(obj, model):
+                getattr(obj, attr)
+
+
+def _movement_rows(
+    session, changes: Iterable[Tuple[Optional[int], int, float]]
+) -> List[dict]:
+    context = session.info.get(_CONTEXT_KEY) or MovementContext(
+        DEFAULT_MOVEMENT_TYPE
+    )
+    user_id = context.user_id
+    if user_id is None:
+        user_id = _current_user_id()
+    occurred_at = datetime.utcnow()
+    return [
+        {
+            "location_id": location_id,
+            "item_id": item_id,
+            "quantity": quantity,
+            "movement_type": context.movement_type,
+            "reference_type": context.reference_type,
+            "reference_id": context.reference_id,
+            "user_id": user_id,
+            "occurred_at": occurred_at,
+        }
+        for location_id, item_id, quantity in changes
+        if abs(quantity) >= _QUANTITY_TOLERANCE
+    ]
+
+
+def _after_flush(session, flush_context) -> None:
+    changes = []
+    for state, objects in (
+        ("new", session.new),
+        ("dirty", session.dirty),
+        ("deleted", session.deleted),
+    ):
+        for obj in objects:
+            for model, attr, location_attr in _TRACKED:
+                if not isinstance(obj, model):
+                    continue
+                quantity = _balance_change(obj, state, attr)
+                if quantity is None:
+                    continue
+                changes.append(
+                    (
+                        getattr(obj, location_attr) if location_attr else None,
+                        obj.item_id if location_attr else obj.id,
+                        quantity,
+                    )
+                )
+    rows = _movement_rows(session, changes)
+    if rows:
+        session.connection().execute(insert(StockMovement.__table__), rows)
+
+
+def _keep_previous_value(target, value, oldvalue, initiator) -> None:
+    pass
+
+
+def install_listeners() -> None:
+    """Attach the flush hooks that write the ledger (idempotent)."""
+
+    if event.contains(db.session, "after_flush", _after_flush):
+        return
+    # ``active_history`` makes SQLAlchemy load the previous value before an
+    # expired attribute is overwritten, so every update has a known delta.
+    for model, attr, _location_attr in _TRACKED:
+        event.listen(
+            getattr(model, attr),
+            "set",
+            _keep_previous_value,
+            active_history=True,
+        )
+    event.listen(db.session, "before_flush", _before_flush)
+    event.listen(db.session, "after_flush", _after_flush)
+    event.listen(db.session, "after_commit", _clear_context)
+    event.listen(db.session, "after_rollback", _clear_context)
+
+
+def record_movement(
+    item_id: int,
+    quantity: float,
+    *,
+    location_id: Optional[int] = None,
+    movement_type: str = DEFAULT_MOVEMENT_TYPE,
+    reference_type: Optional[str] = None,
+    reference_id: int | str | None = None,
+    user_id: Optional[int] = None,
+) -> None:
+    """Append a movement for a change made outside the ORM unit of work.
+
+    Only needed alongside bulk ``UPDATE``/``DELETE`` statements, which bypass
+    the flush hooks.
+    """
+
+    if abs(quantity) < _QUANTITY_TOLERANCE:
+        return
+    db.session.add(
+        StockMovement(
+            location_id=location_id,
+            item_id=item_id,
+            quantity=quantity,
+            movement_type=movement_type,
+            reference_type=reference_type,
+            reference_id=_reference(reference_id),
+            user_id=user_id if user_id is not None else _current_user_id(),
+        )
+    )
+
+
+def record_movements(
+    changes: Iterable[Tuple[Optional[int], int, float]],
+) -> None:
+    """Append ``(location_id, item_id, quantity)`` movements in one statement.
+
+    The rows are labelled with the active :func:`tag_movements` context, as if
+    they had been flushed through the ORM.
+    """
+
+    session = db.session()
+    rows = _movement_rows(session, changes)
+    if rows:
+        session.connection().execute(insert(StockMovement.__table__), rows)
+
+
+def _latest_snapshot(
+    as_of: Optional[datetime] = None,
+) -> Optional[StockSnapshot]:
+    query = StockSnapshot.query
+    if as_of is not None:
+        query = query.filter(StockSnapshot.snapshot_at <= as_of)
+    return query.order_by(
+        StockSnapshot.snapshot_at.desc(), StockSnapshot.id.desc()
+    ).first()
+
+
+def _add_balances(
+    balances: Dict[BalanceKey, float], rows: Iterable[Tuple]
+) -> None:
+    for location_id, item_id, quantity in rows:
+        key = (location_id, item_id)
+        balances[key] = balances.get(key, 0.0) + float(quantity or 0.0)
+
+
+def _filtered(query, location_column, item_column, location_ids, item_ids):
+    if location_ids is not None:
+        query = query.filter(location_column.in_(list(location_ids)))
+    if item_ids is not None:
+        query = query.filter(item_column.in_(list(item_ids)))
+    return query
+
+
+def _ledger_balances(
+    snapshot: Optional[StockSnapshot],
+    *,
+    as_of: Optional[datetime] = None,
+    max_movement_id: Optional[int] = None,
+    location_ids: Optional[List[int]] = None,
+    item_ids: Optional[List[int]] = None,
+) -> Dict[BalanceKey, float]:
+    balances: Dict[BalanceKey, float] = {}
+    last_movement_id = 0
+    if snapshot is not None:
+        last_movement_id = snapshot.last_movement_id
+        _add_balances(
+            balances,
+            _filtered(
+                db.session.query(
+                    StockSnapshotLine.location_id,
+                    StockSnapshotLine.item_id,
+                    StockSnapshotLine.quantity,
+                ).filter(StockSnapshotLine.snapshot_id == snapshot.id),
+                StockSnapshotLine.location_id,
+                StockSnapshotLine.item_id,
+                location_ids,
+                item_ids,
+            ),
+        )
+
+    delta = db.session.query(
+        StockMovement.location_id,
+        StockMovement.item_id,
+        func.sum(StockMovement.quantity),
+    ).filter(StockMovement.id > last_movement_id)
+    if max_movement_id is not None:
+        delta = delta.filter(StockMovement.id <= max_movement_id)
+    if as_of is not None:
+        delta = delta.filter(StockMovement.occurred_at <= as_of)
+    delta = _filtered(
+        delta,
+        StockMovement.location_id,
+        StockMovement.item_id,
+        location_ids,
+        item_ids,
+    ).group_by(StockMovement.location_id, StockMovement.item_id)
+    _add_balances(balances, delta)
+
+    return {
+        key: quantity
+        for key, quantity in balances.items()
+        if abs(quantity) >= _QUANTITY_TOLERANCE
+    }
+
+
+def balances_as_of(
+    as_of: Optional[datetime] = None,
+    *,
+    location_ids: Optional[Iterable[int]] = None,
+    item_ids: Optional[Iterable[int]] = None,
+) -> Dict[BalanceKey, float]:
+    """Return on-hand quantities keyed by ``(location_id, item_id)``.
+
+    ``location_id`` is ``None`` for item-wide balances, which are omitted when
+    ``location_ids`` is given. Starts from the newest snapshot taken at or
+    before ``as_of`` (now when omitted) and applies only later movements.
+    """
+
+    return _ledger_balances(
+        _latest_snapshot(as_of),
+        as_of=as_of,
+        location_ids=list(location_ids) if location_ids is not None else None,
+        item_ids=list(item_ids) if item_ids is not None else None,
+    )
+
+
+def current_balances(**filters) -> Dict[BalanceKey, float]:
+    """Return the ledger's current balances (see :func:`balances_as_of`)."""
+
+    return balances_as_of(None, **filters)
+
+
+def create_snapshot(as_of: Optional[datetime] = None) -> StockSnapshot:
+    """Checkpoint every ledger balance recorded so far.
+
+    The snapshot is added to the session but not committed.
+    """
+
+    db.session.flush()
+    snapshot_at = as_of or datetime.utcnow()
+    last_movement_id = (
+        db.session.query(func.max(StockMovement.id))
+        .filter(StockMovement.occurred_at <= snapshot_at)
+        .scalar()
+        or 0
+    )
+    balances = _ledger_balances(
+        _latest_snapshot(snapshot_at), max_movement_id=last_movement_id
+    )
+
+    snapshot = StockSnapshot(
+        snapshot_at=snapshot_at, last_movement_id=last_movement_id
+    )
+    db.session.add(snapshot)
+    db.session.flush()
+    lines = [
+        {
+            "snapshot_id": snapshot.id,
+            "location_id": location_id,
+            "item_id": item_id,
+            "quantity": quantity,
+        }
+        for (location_id, item_id), quantity in balances.items()
+    ]
+    for chunk in chunks(lines):
+        db.session.execute(insert(StockSnapshotLine), chunk)
+    return snapshot
+
+
+def _recorded_balances() -> Dict[BalanceKey, float]:
+    recorded: Dict[BalanceKey, float] = {}
+    _add_balances(
+        recorded,
+        db.session.query(
+            LocationStandItem.location_id,
+            LocationStandItem.item_id,
+            LocationStandItem.expected_count,
+        ),
+    )
+    _add_balances(
+        recorded,
+        db.session.query(null(), Item.id, Item.quantity),
+    )
+    return recorded
+
+
+def verify_balances() -> List[BalanceDrift]:
+    """Compare ledger balances with the live quantity columns."""
+
+    ledger = current_balances()
+    recorded = _recorded_balances()
+    drifts = []
+    for key in sorted(
+        set(ledger) | set(recorded),
+        key=lambda k: (k[1], k[0] is None, k[0] or 0),
+    ):
+        ledger_quantity = ledger.get(key, 0.0)
+        recorded_quantity = recorded.get(key, 0.0)
+        if abs(ledger_quantity - recorded_quantity) >= _QUANTITY_TOLERANCE:
+            drifts.append(
+                BalanceDrift(
+                    location_id=key[0],
+                    item_id=key[1],
+                    ledger_quantity=ledger_quantity,
+                    recorded_quantity=recorded_quantity,
+                )
+            )
+    return drifts
+
+
+def reconcile_balances(movement_type: str = OPENING_MOVEMENT_TYPE) -> int:
+    """Append movements that bring the ledger in line with live balances.
+
+    Used to seed opening balances for data loaded outside the ORM. Returns the
+    number of movements written; nothing is committed.
+    """
+
+    drifts = verify_balances()
+    if not drifts:
+        return 0
+    user_id = _current_user_id()
+    occurred_at = datetime.utcnow()
+    rows = [
+        {
+            "location_id": drift.location_id,
+            "item_id": drift.item_id,
+            "quantity": drift.difference,
+            "movement_type": movement_type,
+            "user_id": user_id,
+            "occurred_at": occurred_at,
+        }
+        for drift in drifts
+    ]
+    for chunk in chunks(rows):
+        db.session.execute(insert(StockMovement), chunk)
+    return len(rows)
+
+
+def _snapshot_job(app) -> None:
+    snapshot = create_snapshot()
+    db.session.commit()
+    logger.info(
+        "Created stock snapshot %s up to movement %s",
+        snapshot.id,
+        snapshot.last_movement_id,
+    )
+
+
+def start_stock_snapshot_thread(app) -> None:
+    """Start or restart the periodic stock snapshot thread."""
+
+    start_periodic_job(
+        app, "stock-snapshot", "STOCK_SNAPSHOT_INTERVAL_HOURS", _snapshot_job
+    )
+
+
+__all__ = [
+    "BalanceDrift",
+    "DEFAULT_MOVEMENT_TYPE",
+    "MovementContext",
+    "OPENING_MOVEMENT_TYPE",
+    "balances_as_of",
+    "create_snapshot",
+    "current_balances",
+    "install_listeners",
+    "movement_context",
+    "reconcile_balances",
+    "record_movement",
+    "record_movements",
+    "start_stock_snapshot_thread",
+    "tag_movements",
+    "verify_balances",
+]
@@ -0,0 +1,249 @@
+"""Parse terminal sales PDF reports.
+
+The upload wizard used to run pdfplumber's full layout analysis
+(``extract_text``) over every page, which groups individual characters into
+words and lines and is by far the slowest step of an upload: about 50 ms per
+page, and much more for long multi-stand reports. It then throws the layout
+away and matches the lines with simple rules.
+
+:func:`parse_terminal_sales_pdf` reads only the text-showing operators
+through pypdf and keeps one word box per text fragment (its baseline and left
+edge). Fragments whose baselines are within :data:`LINE_TOLERANCE` points
+form a line, read left to right. The same rules are then applied: a line that
+does not start with a digit names a location, and ``<n> <product> <price> <x>
+<quantity> ...`` is an item of the current location.
+
+Documents with at least ``TERMINAL_SALES_PDF_PARALLEL_PAGES`` pages are
+split into page ranges that a process pool of ``TERMINAL_SALES_PDF_WORKERS``
+parses in parallel. Parsing is CPU-bound, so the single eventlet worker would
+otherwise stall every other request while it runs. The pool is started by the
+first large document, which is parsed here while the workers come up, and
+whenever the pool fails or times out the pages are parsed in this process.
+
+Results are cached in this process by the file's sha256 (see
+:mod:`app.services.attachment_store`) for ``TERMINAL_SALES_PDF_CACHE_SIZE``
+files. Re-uploading a report, or retrying the wizard, does not parse it again.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+# Bump when the output of the parser changes so cached results are dropped.
+PARSER_VERSION = 1
+LINE_TOLERANCE = 3.0
+DEFAULT_CACHE_SIZE = 32
+DEFAULT_PARALLEL_PAGES = 16
+DEFAULT_WORKERS = 2
+_POOL_TIMEOUT = 120
+
+# (location, product, quantity) as written in the report.
+SalesLine = Tuple[str, str, str]
+
+_cache: "OrderedDict[Tuple[str, int], Tuple[SalesLine, ...]]" = OrderedDict()
+_cache_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_ready: List[Future] = []
+_pool_lock = threading.Lock()
+
+
+def _config(name: str, default):
+    if has_app_context():
+        value = current_app.config.get(name)
+        if value is not None:
+            return value
+    return default
+
+
+# ----------------------------------------------------------------------
+def _page_lines(page) -> List[str]:
+    """Return the text lines of ``page`` from top to bottom."""
+
+    fragments = []
+
+    def visit(text, cm, tm, _font, _size):
+        if not text or not text.strip():
+            return
+        x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+        y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+        for offset, part in enumerate(text.splitlines()):
+            if part.strip():
+                # Text pypdf joined across line breaks keeps the first origin.
+                fragments.append((y - offset, x, part.strip()))
+
+    page.extract_text(visitor_text=visit)
+
+    lines: List[List[Tuple[float, str]]] = []
+    baseline = None
+    for y, x, text in sorted(fragments, key=lambda item: (-item[0], item[1])):
+        if baseline is None or baseline - y > LINE_TOLERANCE:
+            lines.append([])
+            baseline = y
+        lines[-1].append((x, text))
+    return [" ".join(text for _, text in sorted(line)) for line in lines]
+
+
+def _read_pages(path: str, pages: Sequence[int]) -> List[List[str]]:
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    return [_page_lines(reader.pages[index]) for index in pages]
+
+
+def _page_count(path: str) -> int:
+    from pypdf import PdfReader
+
+    return len(PdfReader(path).pages)
+
+
+def parse_lines(lines: Iterable[str]) -> List[SalesLine]:
+    """Apply the terminal report rules to text lines."""
+
+    rows: List[SalesLine] = []
+    current_loc = None
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if not line[0].isdigit():
+            current_loc = line
+            continue
+        if current_loc is None:
+            continue
+        parts = line.split()
+        idx = 1
+        while idx < len(parts) and not parts[idx].replace(".", "", 1).isdigit():
+            idx += 1
+        if idx + 2 < len(parts):
+            rows.append((current_loc, " ".join(parts[1:idx]), parts[idx + 2]))
+    return rows
+
+
+# ----------------------------------------------------------------------
+def _warm_up() -> bool:
+    return True
+
+
+def _ready_pool(workers: int) -> Optional[ProcessPoolExecutor]:
+    """Return the pool once its workers have started, else ``None``.
+
+    The first call starts the workers in the background; spawning them
+    imports the app and takes seconds, longer than parsing a report here.
+    """
+
+    global _pool, _pool_ready
+
+    with _pool_lock:
+        if _pool is None:
+            # Spawned workers do not inherit the app's threads, sockets or locks.
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _pool_ready = [_pool.submit(_warm_up) for _ in range(workers)]
+        if all(future.done() for future in _pool_ready):
+            return _pool
+    return None
+
+
+def shutdown_pool() -> None:
+    """Stop the worker processes; the next large document starts new ones."""
+
+    global _pool, _pool_ready
+
+    with _pool_lock:
+        pool, _pool, _pool_ready = _pool, None, []
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _extract_lines(path: str) -> List[str]:
+    count = _page_count(path)
+    workers = int(_config("TERMINAL_SALES_PDF_WORKERS", DEFAULT_WORKERS))
+    threshold = int(
+        _config("TERMINAL_SALES_PDF_PARALLEL_PAGES", DEFAULT_PARALLEL_PAGES)
+    )
+    if workers > 1 and count >= max(2, threshold):
+        size = -(-count // workers)
+        chunks = [
+            list(range(start, min(start + size, count)))
+            for start in range(0, count, size)
+        ]
+        try:
+            pool = _ready_pool(workers)
+            if pool is not None:
+                results = list(
+                    pool.map(
+                        _read_pages,
+                        [path] * len(chunks),
+                        chunks,
+                        timeout=_POOL_TIMEOUT,
+                    )
+                )
+                return [line for chunk in results for page in chunk for line in page]
+        except (BrokenProcessPool, OSError, RuntimeError):
+            # TimeoutError is an OSError.
+            logger.warning(
+                "PDF worker pool unavailable; parsing %s pages in process",
+                count,
+                exc_info=True,
+            )
+            shutdown_pool()
+    return [line for page in _read_pages(path, range(count)) for line in page]
+
+
+def parse_terminal_sales_pdf(
+    path: str, *, sha256: Optional[str] = None
+) -> List[SalesLine]:
+    """Return the ``(location, product, quantity)`` lines of a report.
+
+    Pass the file's ``sha256`` to use the cache. Errors from reading the PDF
+    (for example :class:`pypdf.errors.PdfReadError`) propagate.
+    """
+
+    key = (sha256, PARSER_VERSION) if sha256 else None
+    if key is not None:
+        with _cache_lock:
+            cached = _cache.get(key)
+            if cached is not None:
+                _cache.move_to_end(key)
+                return list(cached)
+
+    rows = parse_lines(_extract_lines(path))
+
+    size = int(_config("TERMINAL_SALES_PDF_CACHE_SIZE", DEFAULT_CACHE_SIZE))
+    if key is not None and size > 0:
+        with _cache_lock:
+            _cache[key] = tuple(rows)
+            _cache.move_to_end(key)
+            while len(_cache) > size:
+                _cache.popitem(last=False)
+    return rows
+
+
+def clear_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
+
+
+__all__ = [
+    "DEFAULT_CACHE_SIZE",
+    "DEFAULT_PARALLEL_PAGES",
+    "DEFAULT_WORKERS",
+    "LINE_TOLERANCE",
+    "PARSER_VERSION",
+    "SalesLine",
+    "clear_cache",
+    "parse_lines",
+    "parse_terminal_sales_pdf",
+    "shutdown_pool",
+]
@@ -0,0 +1,399 @@
+"""Staged rows for the terminal sales upload wizard.
+
+The wizard used to keep every pending sale and location total inside the
+JSON payload of :class:`~app.models.TerminalSalesResolutionState`, so each
+step re-serialised and rewrote the whole upload. Pending sales and totals now
+live in :class:`~app.models.TerminalSalesStagedSale` and
+:class:`~app.models.TerminalSalesStagedTotal` rows keyed by the state row.
+The parsed upload rows are staged the same way in
+:class:`~app.models.TerminalSalesStagedRow` and regrouped per location with
+SQL by :func:`summarize_rows`. The JSON payload keeps the wizard's own
+bookkeeping (mapping, issue queue, stage).
+
+Steps read staged rows only when they need them, and :func:`stage` writes
+only the positions whose values changed.
+
+SQLite does not enforce the ``ON DELETE CASCADE`` on the state foreign key
+unless asked to, so callers that delete state rows in bulk follow up with
+:func:`discard_orphans`.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models import (
+    TerminalSalesResolutionState,
+    TerminalSalesStagedRow,
+    TerminalSalesStagedSale,
+    TerminalSalesStagedTotal,
+)
+from app.utils.batching import chunks
+from app.utils.numeric import coerce_float
+from app.utils.pos_import import append_unique_price, combine_terminal_sales_totals
+
+STAGED_KEYS = ("pending_sales", "pending_totals")
+
+_STAGED_MODELS = (
+    TerminalSalesStagedRow,
+    TerminalSalesStagedSale,
+    TerminalSalesStagedTotal,
+)
+
+
+def _int_or_none(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _text_or_none(value) -> Optional[str]:
+    if value is None:
+        return None
+    return str(value)
+
+
+def _sale_row(state_id: int, position: int, entry: dict) -> Optional[dict]:
+    event_location_id = _int_or_none(entry.get("event_location_id"))
+    if event_location_id is None:
+        return None
+    return {
+        "state_id": state_id,
+        "position": position,
+        "event_location_id": event_location_id,
+        "product_id": _int_or_none(entry.get("product_id")),
+        "product_name": _text_or_none(entry.get("product_name")),
+        "source_name": _text_or_none(entry.get("source_name")),
+        "normalized_name": _text_or_none(entry.get("normalized_name")),
+        "product_price": coerce_float(entry.get("product_price")),
+        "quantity": coerce_float(entry.get("quantity")) or 0.0,
+    }
+
+
+def _total_row(state_id: int, position: int, entry: dict) -> Optional[dict]:
+    event_location_id = _int_or_none(entry.get("event_location_id"))
+    if event_location_id is None:
+        return None
+    variance_details = entry.get("variance_details")
+    return {
+        "state_id": state_id,
+        "position": position,
+        "event_location_id": event_location_id,
+        "source_location": _text_or_none(entry.get("source_location")),
+        "total_quantity": coerce_float(entry.get("total_quantity")),
+        "total_amount": coerce_float(entry.get("total_amount")),
+        "net_including_tax_total": coerce_float(
+            entry.get("net_including_tax_total")
+        ),
+        "discount_total": coerce_float(entry.get("discount_total")),
+        "variance_details": variance_details or None,
+    }
+
+
+def _upload_row(state_id: int, position: int, entry: dict) -> Optional[dict]:
+    location = entry.get("location")
+    if not location:
+        return None
+    return {
+        "state_id": state_id,
+        "position": position,
+        "location": str(location),
+        "product": _text_or_none(entry.get("product")),
+        "is_location_total": bool(entry.get("is_location_total")),
+        "quantity": coerce_float(entry.get("quantity")),
+        "price": coerce_float(entry.get("price")),
+        "raw_price": coerce_float(entry.get("raw_price")),
+        "amount": coerce_float(entry.get("amount")),
+        "net_including_tax_total": coerce_float(
+            entry.get("net_including_tax_total")
+        ),
+        "discount_total": coerce_float(entry.get("discount_total")),
+    }
+
+
+def _insert(session: Session, model, rows: List[dict]) -> None:
+    for chunk in chunks(rows):
+        session.execute(insert(model), chunk)
+
+
+def _sync(session: Session, model, state_id: int, rows: List[dict]) -> None:
+    """Make the rows of ``model`` staged for ``state_id`` equal ``rows``.
+
+    Rows are matched on ``position``: unchanged positions are left alone,
+    changed ones are updated by primary key, new ones are inserted and
+    positions no longer present are deleted.
+    """
+
+    if not rows:
+        session.execute(delete(model).where(model.state_id == state_id))
+        return
+    columns = [
+        column.key
+        for column in model.__table__.columns
+        if column.key not in ("id", "state_id")
+    ]
+    existing = {
+        row.position: row
+        for row in session.execute(
+            select(model.id, *(getattr(model, key) for key in columns)).where(
+                model.state_id == state_id
+            )
+        )
+    }
+    inserts: List[dict] = []
+    updates: List[dict] = []
+    for row in rows:
+        current = existing.pop(row["position"], None)
+        if current is None:
+            inserts.append(row)
+        elif any(getattr(current, key) != row[key] for key in columns):
+            updates.append({"id": current.id, **row})
+    stale_ids = [row.id for row in existing.values()]
+    for chunk in chunks(stale_ids):
+        session.execute(delete(model).where(model.id.in_(chunk)))
+    for chunk in chunks(updates):
+        session.execute(update(model), chunk)
+    _insert(session, model, inserts)
+
+
+def _build_rows(state_id: int, build, entries) -> List[dict]:
+    rows = []
+    for position, entry in enumerate(entries or []):
+        if not isinstance(entry, dict):
+            continue
+        row = build(state_id, position, entry)
+        if row is not None:
+            rows.append(row)
+    return rows
+
+
+def stage(
+    session: Session,
+    state_id: int,
+    pending_sales: Optional[Sequence[dict]],
+    pending_totals: Optional[Sequence[dict]],
+) -> None:
+    """Stage ``pending_sales`` and ``pending_totals`` for ``state_id``.
+
+    Entries are keyed by their position in the lists, and only positions
+    whose values differ from what is staged are written. Entries without a
+    usable ``event_location_id`` are dropped, as applying them would skip
+    them anyway. Nothing is committed.
+    """
+
+    for model, build, entries in (
+        (TerminalSalesStagedSale, _sale_row, pending_sales),
+        (TerminalSalesStagedTotal, _total_row, pending_totals),
+    ):
+        _sync(session, model, state_id, _build_rows(state_id, build, entries))
+
+
+def stage_rows(session: Session, state_id: int, rows: Optional[Sequence[dict]]) -> None:
+    """Stage the parsed upload ``rows`` for ``state_id``.
+
+    Rows without a location are dropped. Nothing is committed.
+    """
+
+    _sync(
+        session,
+        TerminalSalesStagedRow,
+        state_id,
+        _build_rows(state_id, _upload_row, rows),
+    )
+
+
+def summarize_rows(session: Session, state_id: int) -> Dict[str, dict]:
+    """Group the upload rows staged for ``state_id`` by location.
+
+    Returns the same structure as
+    :func:`app.utils.pos_import.group_terminal_sales_rows`, with the sums
+    computed by the database.
+    """
+
+    row = TerminalSalesStagedRow
+    in_state = row.state_id == state_id
+    product_rows = and_(
+        in_state, row.product.is_not(None), row.is_location_total.is_(False)
+    )
+
+    grouped: Dict[str, dict] = {}
+    for location, net, net_count, discount, discount_count in session.execute(
+        select(
+            row.location,
+            func.sum(row.net_including_tax_total),
+            func.count(row.net_including_tax_total),
+            func.sum(row.discount_total),
+            func.count(row.discount_total),
+        )
+        .where(in_state)
+        .group_by(row.location)
+        .order_by(func.min(row.position))
+    ):
+        grouped[location] = {
+            "products": {},
+            "total": 0.0,
+            "total_amount": 0.0,
+            "net_including_tax_total": net if net_count else None,
+            "discount_total": discount if discount_count else None,
+        }
+
+    raw_amounts: Dict[str, float] = {}
+    for (
+        location,
+        product,
+        quantity,
+        amount,
+        net,
+        net_count,
+        discount,
+        discount_count,
+    ) in session.execute(
+        select(
+            row.location,
+            row.product,
+            func.sum(row.quantity),
+            func.sum(row.amount),
+            func.sum(row.net_including_tax_total),
+            func.count(row.net_including_tax_total),
+            func.sum(row.discount_total),
+            func.count(row.discount_total),
+        )
+        .where(product_rows)
+        .group_by(row.location, row.product)
+        .order_by(func.min(row.position))
+    ):
+        location_entry = grouped[location]
+        location_entry["products"][product] = {
+            "quantity": quantity or 0.0,
+            "prices": [],
+            "spreadsheet_prices": [],
+            "amount": amount or 0.0,
+            "net_including_tax_total": net if net_count else None,
+            "discount_total": discount if discount_count else None,
+        }
+        location_entry["total"] += quantity or 0.0
+        raw_amounts[location] = raw_amounts.get(location, 0.0) + (amount or 0.0)
+
+    # Distinct price pairs in upload order; near-equal prices collapse as in
+    # the in-memory grouping.
+    for location, product, price, raw_price in session.execute(
+        select(row.location, row.product, row.price, row.raw_price)
+        .where(
+            product_rows, or_(row.price.is_not(None), row.raw_price.is_not(None))
+        )
+        .group_by(row.location, row.product, row.price, row.raw_price)
+        .order_by(func.min(row.position))
+    ):
+        product_entry = grouped[location]["products"][product]
+        append_unique_price(product_entry["prices"], price)
+        if raw_price is not None:
+            append_unique_price(product_entry["prices"], raw_price)
+            append_unique_price(product_entry["spreadsheet_prices"], raw_price)
+
+    # The last location total row with a value overrides the summed figures.
+    overrides: Dict[str, Dict[str, float]] = {}
+    for column in (row.quantity, row.amount):
+        latest = (
+            select(row.location, func.max(row.position).label("position"))
+            .where(in_state, row.is_location_total.is_(True), column.is_not(None))
+            .group_by(row.location)
+            .subquery()
+        )
+        for location, value in session.execute(
+            select(row.location, column).join(
+                latest,
+                and_(
+                    row.location == latest.c.location,
+                    row.position == latest.c.position,
+                ),
+            ).where(in_state)
+        ):
+            overrides.setdefault(location, {})[column.key] = value
+
+    for location, data in grouped.items():
+        override = overrides.get(location, {})
+        if "quantity" in override:
+            data["total"] = override["quantity"]
+        if "amount" in override:
+            data["total_amount"] = override["amount"]
+        elif data["net_including_tax_total"] is not None:
+            data["total_amount"] = combine_terminal_sales_totals(
+                data["net_including_tax_total"], data["discount_total"]
+            )
+        else:
+            data["total_amount"] = raw_amounts.get(location, 0.0)
+    return grouped
+
+
+def load(session: Session, state_id: int) -> Tuple[List[dict], List[dict]]:
+    """Return ``(pending_sales, pending_totals)`` staged for ``state_id``."""
+
+    sale = TerminalSalesStagedSale
+    sales = [
+        dict(row._mapping)
+        for row in session.execute(
+            select(
+                sale.event_location_id,
+                sale.product_id,
+                sale.product_name,
+                sale.source_name,
+                sale.normalized_name,
+                sale.product_price,
+                sale.quantity,
+            )
+            .where(sale.state_id == state_id)
+            .order_by(sale.position)
+        )
+    ]
+    total = TerminalSalesStagedTotal
+    totals = [
+        dict(row._mapping)
+        for row in session.execute(
+            select(
+                total.event_location_id,
+                total.source_location,
+                total.total_quantity,
+                total.total_amount,
+                total.net_including_tax_total,
+                total.discount_total,
+                total.variance_details,
+            )
+            .where(total.state_id == state_id)
+            .order_by(total.position)
+        )
+    ]
+    return sales, totals
+
+
+def clear(session: Session, state_id: int) -> None:
+    """Delete everything staged for ``state_id``."""
+
+    for model in _STAGED_MODELS:
+        session.execute(delete(model).where(model.state_id == state_id))
+
+
+def discard_orphans(session: Session) -> int:
+    """Delete staged rows whose state row is gone; return the row count."""
+
+    live_states = select(TerminalSalesResolutionState.id)
+    removed = 0
+    for model in _STAGED_MODELS:
+        removed += session.execute(
+            delete(model).where(model.state_id.not_in(live_states))
+        ).rowcount
+    return removed
+
+
+__all__ = [
+    "STAGED_KEYS",
+    "clear",
+    "discard_orphans",
+    "load",
+    "stage",
+    "stage_rows",
+    "summarize_rows",
+]
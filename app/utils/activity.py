@@ -1,72 +1,176 @@
-"""Activity logging utilities with batching support."""
+"""Activity logging utilities with batching support.
+
+Entries are handed to one long-lived writer thread per app and process
+through a bounded queue. The writer inserts whatever has accumulated with a
+single multi-row ``INSERT`` once ``ACTIVITY_LOG_BATCH_SIZE`` entries are
+waiting or ``ACTIVITY_LOG_FLUSH_INTERVAL`` seconds have passed since the
+oldest one arrived, so request threads never touch the SQLite write lock for
+logging and no thread is started per entry.
+
+When the queue is full :func:`log_activity` waits up to
+``ACTIVITY_LOG_ENQUEUE_TIMEOUT`` seconds for room and then drops the entry,
+counting it in :attr:`_ActivityLogger.dropped`. Pending entries are written
+on interpreter exit. Only ``threading`` and ``queue`` primitives are used, so
+the writer becomes a green thread under eventlet's monkey patching.
+"""
 
 from __future__ import annotations
 
 import atexit
+import logging
+import os
+import queue
 import threading
+import time
+from datetime import datetime
 from typing import List, Optional
 
 from flask import current_app
 from flask_login import current_user
+from sqlalchemy import insert
 
 from app.models import ActivityLog, db
+from app.services.metrics import ACTIVITY_LOG_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+_WRITE_ATTEMPTS = 3
+_logger_lock = threading.Lock()
+
+
+class _FlushRequest:
+    """Queue marker asking the writer to write everything before it."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+
+
+_STOP = object()
 
 
 class _ActivityLogger:
-    """Internal helper that buffers and flushes activity logs."""
+    """Internal helper that buffers activity logs for a writer thread."""
 
     def __init__(
-        self, app, flush_interval: float = 0.1, batch_size: int = 20
+        self,
+        app,
+        flush_interval: float = 0.25,
+        batch_size: int = 200,
+        max_queue: int = 10000,
+        enqueue_timeout: float = 0.05,
     ) -> None:
         self.app = app
         self.flush_interval = flush_interval
         self.batch_size = batch_size
-        self._queue: List[ActivityLog] = []
+        self.max_queue = max_queue
+        self.enqueue_timeout = enqueue_timeout
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
         self._lock = threading.Lock()
-        self._timer: Optional[threading.Timer] = None
-        atexit.register(self.flush)
+        self._start_writer()
+        atexit.register(self.close)
+
+    # ------------------------------------------------------------------
+    def _start_writer(self) -> None:
+        self._pid = os.getpid()
+        self._queue: "queue.Queue" = queue.Queue(maxsize=self.max_queue)
+        self._thread = threading.Thread(
+            target=self._run, daemon=True, name="activity-log-writer"
+        )
+        self._thread.start()
 
     # ------------------------------------------------------------------
     def log(self, activity: str, user_id: Optional[int]) -> None:
-        entry = ActivityLog(user_id=user_id, activity=activity)
-        with self._lock:
-            self._queue.append(entry)
-            if len(self._queue) >= self.batch_size:
-                self._flush_unlocked()
-            else:
-                self._start_timer_unlocked()
+        if self._pid != os.getpid():
+            # Forked after the writer started; the thread did not come along.
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._start_writer()
+        entry = {
+            "user_id": user_id,
+            "activity": activity,
+            "timestamp": datetime.utcnow(),
+        }
+        try:
+            self._queue.put(entry, timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            ACTIVITY_LOG_ENTRIES.inc(outcome="dropped")
+            logger.warning("Activity log queue full; dropped entry %r", activity)
 
     # ------------------------------------------------------------------
-    def _start_timer_unlocked(self) -> None:
-        if self._timer:
-            self._timer.cancel()
-        self._timer = threading.Timer(self.flush_interval, self.flush)
-        self._timer.daemon = True
-        self._timer.start()
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
 
     # ------------------------------------------------------------------
-    def _flush_unlocked(self) -> None:
-        logs = list(self._queue)
-        self._queue.clear()
-        if self._timer:
-            self._timer.cancel()
-            self._timer = None
-        try:
-            with self.app.app_context():
-                db.session.bulk_save_objects(logs)
-                db.session.commit()
-        except Exception:
-            # Swallow errors to avoid crashing the application during shutdown
-            pass
+    def _run(self) -> None:
+        pending: List[dict] = []
+        deadline = None
+        while True:
+            try:
+                if pending:
+                    item = self._queue.get(
+                        timeout=max(0.0, deadline - time.monotonic())
+                    )
+                else:
+                    item = self._queue.get()
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, dict):
+                if not pending:
+                    deadline = time.monotonic() + self.flush_interval
+                pending.append(item)
+                if len(pending) < self.batch_size and time.monotonic() < deadline:
+                    continue
+            if pending:
+                self._write(pending)
+                pending = []
+            if isinstance(item, _FlushRequest):
+                item.done.set()
+            elif item is _STOP:
+                return
 
     # ------------------------------------------------------------------
-    def flush(self) -> None:
-        with self._lock:
-            if not self._queue:
-                if self._timer:
-                    self._timer = None
+    def _write(self, rows: List[dict]) -> None:
+        for attempt in range(1, _WRITE_ATTEMPTS + 1):
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as connection:
+                        connection.execute(insert(ActivityLog.__table__).values(rows))
+                self.written += len(rows)
+                ACTIVITY_LOG_ENTRIES.inc(len(rows), outcome="written")
                 return
-            self._flush_unlocked()
+            except Exception:
+                if attempt == _WRITE_ATTEMPTS:
+                    self.failed += len(rows)
+                    ACTIVITY_LOG_ENTRIES.inc(len(rows), outcome="failed")
+                    logger.exception(
+                        "Could not write %s activity log entries", len(rows)
+                    )
+                    return
+                time.sleep(0.05 * attempt)
+
+    # ------------------------------------------------------------------
+    def flush(self, timeout: float = 5.0) -> None:
+        """Block until entries logged so far are written."""
+
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        request = _FlushRequest()
+        self._queue.put(request)
+        request.done.wait(timeout)
+
+    # ------------------------------------------------------------------
+    def close(self, timeout: float = 5.0) -> None:
+        """Write pending entries and stop the writer."""
+
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
 
 
 # ----------------------------------------------------------------------
@@ -74,7 +178,18 @@ def _get_logger() -> _ActivityLogger:
     app = current_app._get_current_object()
     logger = app.extensions.get("activity_logger")
     if logger is None:
-        logger = app.extensions["activity_logger"] = _ActivityLogger(app)
+        with _logger_lock:
+            logger = app.extensions.get("activity_logger")
+            if logger is None:
+                logger = app.extensions["activity_logger"] = _ActivityLogger(
+                    app,
+                    flush_interval=app.config.get("ACTIVITY_LOG_FLUSH_INTERVAL", 0.25),
+                    batch_size=app.config.get("ACTIVITY_LOG_BATCH_SIZE", 200),
+                    max_queue=app.config.get("ACTIVITY_LOG_QUEUE_SIZE", 10000),
+                    enqueue_timeout=app.config.get(
+                        "ACTIVITY_LOG_ENQUEUE_TIMEOUT", 0.05
+                    ),
+                )
     return logger
 
 
@@ -16,6 +16,7 @@ from sqlalchemy import inspect
 
 from app import db
 from app.models import Setting
+from app.services.metrics import BACKUP_DURATION, BACKUP_SIZE
 from app.utils.activity import log_activity
 
 BACKUP_SCHEMA_VERSION = "2026.03"
@@ -226,6 +227,7 @@ def create_backup(*, initiated_by_system: bool = False):
         When ``True`` the activity log will record that the system created a
         backup (as opposed to a user triggered backup).
     """
+    started = time.perf_counter()
     ensure_backup_schema_marker()
     backups_dir = current_app.config["BACKUP_FOLDER"]
     os.makedirs(backups_dir, exist_ok=True)
@@ -264,6 +266,8 @@ def create_backup(*, initiated_by_system: bool = False):
             os.remove(temp_path)
         raise
 
+    BACKUP_DURATION.observe(time.perf_counter() - started)
+    BACKUP_SIZE.set(os.path.getsize(backup_path))
     logger.info("Created backup %s", filename)
     if initiated_by_system:
         log_activity(f"System automatically created backup {filename}")
@@ -0,0 +1,21 @@
+"""Split large statements into batches.
+
+SQLite allows a limited number of bound parameters per statement, so long
+``IN (...)`` lists, ``CASE`` maps and multi-row inserts are issued in slices
+of at most :data:`CHUNK_SIZE` values.
+"""
+
+from __future__ import annotations
+
+from typing import Iterator, Sequence, TypeVar
+
+T = TypeVar("T")
+
+CHUNK_SIZE = 500
+
+
+def chunks(values: Sequence[T], size: int = CHUNK_SIZE) -> Iterator[Sequence[T]]:
+    """Yield consecutive slices of ``values`` holding at most ``size`` items."""
+
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
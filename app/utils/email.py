@@ -1,10 +1,14 @@
 import os
-import smtplib
+import re
+import smtplib  # noqa: F401 - tests replace ``smtplib.SMTP`` through this module
 from email.message import EmailMessage
-from typing import Optional, Sequence, Tuple
+from typing import List, Optional, Sequence, Tuple
 
 from flask import current_app
 
+from app.services import mail
+from app.services.mail import MailDeliveryError
+
 
 Attachment = Tuple[str, bytes, str]
 
@@ -63,18 +67,25 @@ def _get_smtp_config():
     }
 
 
-def send_email(
+def split_addresses(value: str) -> List[str]:
+    """Split a comma or semicolon separated recipient list, dropping blanks."""
+
+    seen = dict.fromkeys(
+        part.strip() for part in re.split(r"[,;]", value or "") if part.strip()
+    )
+    return list(seen)
+
+
+def build_message(
+    from_address: str,
     to_address: str,
     subject: str,
     body: str,
     attachments: Optional[Sequence[Attachment]] = None,
-):
-    """Send an email using SMTP settings from Flask configuration."""
-    smtp_config = _get_smtp_config()
-
+) -> EmailMessage:
     msg = EmailMessage()
     msg["Subject"] = subject
-    msg["From"] = smtp_config["from_address"]
+    msg["From"] = from_address
     msg["To"] = to_address
     msg.set_content(body)
 
@@ -91,10 +102,34 @@ def send_email(
                 subtype=subtype,
                 filename=filename,
             )
+    return msg
+
 
-    with smtplib.SMTP(smtp_config["host"], smtp_config["port"]) as server:
-        if smtp_config["use_tls"]:
-            server.starttls()
-        if smtp_config["username"]:
-            server.login(smtp_config["username"], smtp_config["password"])
-        server.send_message(msg)
+def send_email(
+    to_address: str,
+    subject: str,
+    body: str,
+    attachments: Optional[Sequence[Attachment]] = None,
+):
+    """Send an email using SMTP settings from Flask configuration.
+
+    ``to_address`` may list several recipients separated by commas or
+    semicolons; each gets their own copy and all copies go out over one
+    pooled connection (see :mod:`app.services.mail`). Raises
+    :class:`~app.services.mail.MailDeliveryError` if any copy was refused.
+    """
+    smtp_config = _get_smtp_config()
+    recipients = split_addresses(to_address) or [to_address]
+
+    messages = [
+        build_message(
+            smtp_config["from_address"], recipient, subject, body, attachments
+        )
+        for recipient in recipients
+    ]
+    result = mail.send_messages(
+        messages, settings=mail.SMTPSettings.from_config(smtp_config)
+    )
+    if result.failed:
+        raise MailDeliveryError(result.failed)
+    return result
@@ -6,7 +6,7 @@ import datetime as _dt
 from dataclasses import dataclass
 from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
 
-from sqlalchemy import func
+from sqlalchemy import func, literal_column, null, select
 from sqlalchemy.orm import Session, selectinload
 
 from app import db
@@ -15,16 +15,21 @@ from app.models import (
     Item,
     ItemUnit,
     Location,
-    Product,
     ProductRecipeItem,
     PurchaseInvoice,
     PurchaseInvoiceItem,
     PurchaseOrder,
     PurchaseOrderItem,
+    SalesFact,
     TerminalSale,
     Transfer,
     TransferItem,
 )
+from app.services.gl_resolution import load_purchase_gl_codes
+from app.services.lazy_imports import lazy_module
+from app.utils import forecast_engine
+
+np = lazy_module("numpy")
 
 
 @dataclass(frozen=True)
@@ -41,6 +46,38 @@ class ForecastRecommendation:
     default_unit_id: Optional[int]
 
 
+FORECAST_METHODS = ("average", "smoothing")
+
+HISTORY_FIELDS = ("sales_qty", "transfer_in_qty", "transfer_out_qty", "invoice_qty")
+
+DailyHistory = Dict[Tuple[int, int], Dict[_dt.date, Dict[str, float]]]
+
+
+def _as_date(value) -> _dt.date:
+    """Normalise a ``date()`` bucket, which SQLite returns as text."""
+
+    if isinstance(value, _dt.datetime):
+        return value.date()
+    if isinstance(value, _dt.date):
+        return value
+    return _dt.date.fromisoformat(str(value)[:10])
+
+
+def _as_datetime(value) -> Optional[_dt.datetime]:
+    """Normalise ``MAX(sold_at)``, which SQLite may return as text."""
+
+    if value is None or isinstance(value, _dt.datetime):
+        return value
+    return _dt.datetime.fromisoformat(str(value))
+
+
+def _default_unit_id(item: Item) -> Optional[int]:
+    for unit in item.units:
+        if unit.receiving_default:
+            return unit.id
+    return item.units[0].id if item.units else None
+
+
 def _coalesce_factor(column):
     """Return a SQL expression that coalesces unit factors to 1."""
 
@@ -70,102 +107,167 @@ class DemandForecastingHelper:
     # ------------------------------------------------------------------
     # Data extractors
     # ------------------------------------------------------------------
-    def _terminal_sales_totals(
-        self, location_ids: Optional[Sequence[int]], item_ids: Optional[Sequence[int]]
-    ) -> Iterable[Tuple[int, int, float, _dt.datetime]]:
+    def _history_sources(
+        self,
+        location_ids: Optional[Sequence[int]],
+        item_ids: Optional[Sequence[int]],
+        by_day: bool,
+    ) -> List:
+        """Return one SELECT per history source with a shared column layout.
+
+        Every source yields ``item_id``, ``location_id``, ``day``, one
+        quantity per :data:`HISTORY_FIELDS` entry (zero for the fields it does
+        not feed) and ``last_activity``. Quantities are already converted to
+        base units.
+        """
+
+        def columns(item_id, location_id, day, field, quantity, last=None):
+            values = [
+                item_id.label("item_id"),
+                location_id.label("location_id"),
+                (day if by_day else null()).label("day"),
+            ]
+            for name in HISTORY_FIELDS:
+                values.append(
+                    (quantity if name == field else literal_column("0.0")).label(name)
+                )
+            values.append(
+                (last if last is not None else null()).label("last_activity")
+            )
+            return values
+
+        def filtered(query, location_column, item_column):
+            if location_ids:
+                query = query.where(location_column.in_(location_ids))
+            if item_ids:
+                query = query.where(item_column.in_(item_ids))
+            return query
+
         factor = _coalesce_factor(ItemUnit.factor)
-        query = (
-            self.session.query(
-                ProductRecipeItem.item_id.label("item_id"),
-                EventLocation.location_id.label("location_id"),
-                func.sum(
-                    TerminalSale.quantity
-                    * ProductRecipeItem.quantity
-                    * factor
-                ).label("quantity"),
-                func.max(TerminalSale.sold_at).label("last_activity"),
+        sales = filtered(
+            select(
+                *columns(
+                    ProductRecipeItem.item_id,
+                    EventLocation.location_id,
+                    func.date(TerminalSale.sold_at),
+                    "sales_qty",
+                    TerminalSale.quantity * ProductRecipeItem.quantity * factor,
+                    TerminalSale.sold_at,
+                )
             )
+            .select_from(TerminalSale)
             .join(EventLocation, TerminalSale.event_location_id == EventLocation.id)
-            .join(Product, TerminalSale.product_id == Product.id)
-            .join(ProductRecipeItem, ProductRecipeItem.product_id == Product.id)
+            .join(ProductRecipeItem, ProductRecipeItem.product_id == TerminalSale.product_id)
             .outerjoin(ItemUnit, ProductRecipeItem.unit_id == ItemUnit.id)
-            .filter(TerminalSale.sold_at >= self._since)
-            .group_by(ProductRecipeItem.item_id, EventLocation.location_id)
+            .where(TerminalSale.sold_at >= self._since),
+            EventLocation.location_id,
+            ProductRecipeItem.item_id,
         )
 
-        if location_ids:
-            query = query.filter(EventLocation.location_id.in_(location_ids))
-        if item_ids:
-            query = query.filter(ProductRecipeItem.item_id.in_(item_ids))
-
-        return query
-
-    def _transfer_totals(
-        self, location_ids: Optional[Sequence[int]], item_ids: Optional[Sequence[int]]
-    ) -> Tuple[Iterable[Tuple[int, int, float]], Iterable[Tuple[int, int, float]]]:
-        base_query = (
-            self.session.query(
-                TransferItem.item_id,
-                Transfer.from_location_id,
-                Transfer.to_location_id,
-                TransferItem.quantity,
+        archived_sales = filtered(
+            select(
+                *columns(
+                    ProductRecipeItem.item_id,
+                    SalesFact.location_id,
+                    SalesFact.sale_date,
+                    "sales_qty",
+                    SalesFact.quantity * ProductRecipeItem.quantity * factor,
+                    SalesFact.last_sold_at,
+                )
             )
-            .join(Transfer, TransferItem.transfer_id == Transfer.id)
-            .filter(Transfer.date_created >= self._since)
+            .select_from(SalesFact)
+            .join(ProductRecipeItem, ProductRecipeItem.product_id == SalesFact.product_id)
+            .outerjoin(ItemUnit, ProductRecipeItem.unit_id == ItemUnit.id)
+            .where(SalesFact.sale_date >= self._since.date()),
+            SalesFact.location_id,
+            ProductRecipeItem.item_id,
         )
 
-        if location_ids:
-            base_query = base_query.filter(
-                Transfer.from_location_id.in_(location_ids)
-                | Transfer.to_location_id.in_(location_ids)
+        transfers = []
+        for field, location_column in (
+            ("transfer_in_qty", Transfer.to_location_id),
+            ("transfer_out_qty", Transfer.from_location_id),
+        ):
+            transfers.append(
+                filtered(
+                    select(
+                        *columns(
+                            TransferItem.item_id,
+                            location_column,
+                            func.date(Transfer.date_created),
+                            field,
+                            TransferItem.quantity,
+                        )
+                    )
+                    .select_from(TransferItem)
+                    .join(Transfer, TransferItem.transfer_id == Transfer.id)
+                    .where(Transfer.date_created >= self._since)
+                    .where(location_column.isnot(None)),
+                    location_column,
+                    TransferItem.item_id,
+                )
             )
-        if item_ids:
-            base_query = base_query.filter(TransferItem.item_id.in_(item_ids))
-
-        incoming = {}
-        outgoing = {}
-        for item_id, from_loc, to_loc, quantity in base_query:
-            if to_loc is not None:
-                if not location_ids or to_loc in location_ids:
-                    incoming.setdefault((item_id, to_loc), 0.0)
-                    incoming[(item_id, to_loc)] += float(quantity)
-            if from_loc is not None:
-                if not location_ids or from_loc in location_ids:
-                    outgoing.setdefault((item_id, from_loc), 0.0)
-                    outgoing[(item_id, from_loc)] += float(quantity)
-
-        return incoming.items(), outgoing.items()
-
-    def _invoice_totals(
-        self, location_ids: Optional[Sequence[int]], item_ids: Optional[Sequence[int]]
-    ) -> Iterable[Tuple[int, int, float]]:
-        factor = _coalesce_factor(ItemUnit.factor)
+
         effective_location = func.coalesce(
             PurchaseInvoiceItem.location_id, PurchaseInvoice.location_id
         )
-
-        query = (
-            self.session.query(
-                PurchaseInvoiceItem.item_id,
-                effective_location.label("location_id"),
-                func.sum(PurchaseInvoiceItem.quantity * factor).label("quantity"),
+        invoices = filtered(
+            select(
+                *columns(
+                    PurchaseInvoiceItem.item_id,
+                    effective_location,
+                    PurchaseInvoice.received_date,
+                    "invoice_qty",
+                    PurchaseInvoiceItem.quantity * _coalesce_factor(ItemUnit.factor),
+                )
             )
+            .select_from(PurchaseInvoiceItem)
             .join(PurchaseInvoice, PurchaseInvoiceItem.invoice_id == PurchaseInvoice.id)
             .outerjoin(ItemUnit, PurchaseInvoiceItem.unit_id == ItemUnit.id)
-            .filter(PurchaseInvoice.received_date >= self._since)
-            .group_by(PurchaseInvoiceItem.item_id, effective_location)
+            .where(PurchaseInvoice.received_date >= self._since),
+            effective_location,
+            PurchaseInvoiceItem.item_id,
         )
+        return [sales, archived_sales, *transfers, invoices]
 
-        if location_ids:
-            query = query.filter(effective_location.in_(location_ids))
-        if item_ids:
-            query = query.filter(PurchaseInvoiceItem.item_id.in_(item_ids))
+    def _history_rows(
+        self,
+        location_ids: Optional[Sequence[int]],
+        item_ids: Optional[Sequence[int]],
+        by_day: bool,
+    ) -> Iterable:
+        """Yield grouped history rows, one per series bucket and source.
+
+        Each source is summed per ``(item_id, location_id)`` (and day when
+        ``by_day`` is set) in SQL, so the amount of Python work depends on the
+        number of series rather than on the number of source lines.
+        """
+
+        for source in self._history_sources(location_ids, item_ids, by_day):
+            history = source.subquery("history")
+            group_by = [history.c.item_id, history.c.location_id]
+            if by_day:
+                group_by.append(history.c.day)
+            statement = (
+                select(
+                    history.c.item_id,
+                    history.c.location_id,
+                    history.c.day if by_day else null().label("day"),
+                    *(
+                        func.sum(history.c[name]).label(name)
+                        for name in HISTORY_FIELDS
+                    ),
+                    func.max(history.c.last_activity).label("last_activity"),
+                )
+                .where(history.c.item_id.isnot(None))
+                .where(history.c.location_id.isnot(None))
+                .group_by(*group_by)
+            )
+            yield from self.session.execute(statement)
 
-        return query
+    def open_po_totals(self, item_ids: Optional[Sequence[int]] = None):
+        """Return a query of base-unit quantity on unreceived orders by item."""
 
-    def _open_po_totals(
-        self, item_ids: Optional[Sequence[int]]
-    ) -> Iterable[Tuple[int, float]]:
         factor = _coalesce_factor(ItemUnit.factor)
         query = (
             self.session.query(
@@ -184,6 +286,34 @@ class DemandForecastingHelper:
     # ------------------------------------------------------------------
     # Public API
     # ------------------------------------------------------------------
+    def daily_history(
+        self,
+        *,
+        location_ids: Optional[Sequence[int]] = None,
+        item_ids: Optional[Sequence[int]] = None,
+    ) -> DailyHistory:
+        """Return per-day base-unit quantities by ``(item_id, location_id)``.
+
+        Each day maps the :data:`HISTORY_FIELDS` that had activity that day
+        to their totals; days without activity are omitted.
+        """
+
+        history: DailyHistory = {}
+        for row in self._history_rows(location_ids, item_ids, by_day=True):
+            quantities = [
+                (field, float(row[index]))
+                for index, field in enumerate(HISTORY_FIELDS, start=3)
+                if row[index]
+            ]
+            if row.day is None or not quantities:
+                continue
+            bucket = history.setdefault((row.item_id, row.location_id), {}).setdefault(
+                _as_date(row.day), {}
+            )
+            for field, quantity in quantities:
+                bucket[field] = bucket.get(field, 0.0) + quantity
+        return history
+
     def build_recommendations(
         self,
         *,
@@ -193,57 +323,57 @@ class DemandForecastingHelper:
         weather_multiplier: float = 1.0,
         promo_multiplier: float = 1.0,
         purchase_gl_code_ids: Optional[Sequence[int]] = None,
+        method: str = "average",
+        horizon_days: Optional[int] = None,
     ) -> List[ForecastRecommendation]:
-        """Return forecast recommendations for the supplied filters."""
-
+        """Return forecast recommendations for the supplied filters.
+
+        ``method="average"`` projects the lookback window's consumption
+        forward unchanged. ``method="smoothing"`` forecasts the next
+        ``horizon_days`` (default: the lookback length, so incoming stock
+        compares like for like) with :mod:`app.utils.forecast_engine`. Either
+        way the what-if multipliers scale the demand.
+        """
+
+        if method not in FORECAST_METHODS:
+            raise ValueError(f"Unknown forecast method: {method}")
+        by_day = method == "smoothing"
+        # (key, day, demand) rows for the smoothing model.
+        daily: List[Tuple[Tuple[int, int], object, float]] = []
         data: Dict[Tuple[int, int], Dict[str, float]] = {}
-
-        def entry_for(key: Tuple[int, int]) -> Dict[str, float]:
-            record = data.setdefault(
-                key,
-                {
+        for row in self._history_rows(location_ids, item_ids, by_day=by_day):
+            key = (row.item_id, row.location_id)
+            entry = data.get(key)
+            if entry is None:
+                entry = data[key] = {
                     "sales_qty": 0.0,
                     "transfer_in_qty": 0.0,
                     "transfer_out_qty": 0.0,
                     "invoice_qty": 0.0,
                     "open_po_qty": 0.0,
                     "last_activity_ts": None,
-                },
-            )
-            return record
-
-        # Terminal sales
-        for item_id, location_id, quantity, last_activity in self._terminal_sales_totals(
-            location_ids, item_ids
-        ):
-            if item_id is None or location_id is None:
-                continue
-            entry = entry_for((item_id, location_id))
-            entry["sales_qty"] += float(quantity or 0.0)
-            if last_activity is not None:
-                current = entry.get("last_activity_ts")
+                }
+            for index, field in enumerate(HISTORY_FIELDS, start=3):
+                if row[index]:
+                    entry[field] += float(row[index])
+            if by_day and (row.sales_qty or row.transfer_out_qty):
+                daily.append(
+                    (
+                        key,
+                        _as_date(row.day),
+                        float(row.sales_qty or 0.0)
+                        + float(row.transfer_out_qty or 0.0),
+                    )
+                )
+            if row.last_activity is not None:
+                last_activity = _as_datetime(row.last_activity)
+                current = entry["last_activity_ts"]
                 if current is None or last_activity > current:
                     entry["last_activity_ts"] = last_activity
 
-        # Transfers
-        incoming, outgoing = self._transfer_totals(location_ids, item_ids)
-        for (item_id, location_id), quantity in incoming:
-            entry = entry_for((item_id, location_id))
-            entry["transfer_in_qty"] += float(quantity)
-        for (item_id, location_id), quantity in outgoing:
-            entry = entry_for((item_id, location_id))
-            entry["transfer_out_qty"] += float(quantity)
-
-        # Purchase invoices
-        for item_id, location_id, quantity in self._invoice_totals(location_ids, item_ids):
-            if item_id is None or location_id is None:
-                continue
-            entry = entry_for((item_id, location_id))
-            entry["invoice_qty"] += float(quantity or 0.0)
-
         # Open purchase orders (global by item)
         open_po_map: Dict[int, float] = {}
-        for item_id, quantity in self._open_po_totals(item_ids):
+        for item_id, quantity in self.open_po_totals(item_ids):
             if item_id is None:
                 continue
             open_po_map[item_id] = open_po_map.get(item_id, 0.0) + float(quantity or 0.0)
@@ -273,59 +403,145 @@ class DemandForecastingHelper:
             .filter(Location.id.in_(location_ids_needed))
         }
 
+        purchase_gl_codes = (
+            load_purchase_gl_codes(data.keys(), session=self.session)
+            if purchase_gl_code_ids
+            else None
+        )
+
+        default_units = {
+            item_id: _default_unit_id(item) for item_id, item in items.items()
+        }
+
         multiplier = attendance_multiplier * weather_multiplier * promo_multiplier
         today = _dt.date.today()
         suggested_date = today + _dt.timedelta(days=self.lead_time_days)
 
-        recommendations: List[ForecastRecommendation] = []
-        for (item_id, location_id), history in data.items():
-            item = items.get(item_id)
-            location = locations.get(location_id)
-            if item is None or location is None:
+        keys: List[Tuple[int, int]] = []
+        for item_id, location_id in data:
+            if item_id not in items or location_id not in locations:
                 continue
-
             if purchase_gl_code_ids:
-                effective_code = item.purchase_gl_code_for_location(location.id)
+                effective_code = purchase_gl_codes.for_item(item_id, location_id)
                 if (
                     effective_code is None
                     or effective_code.id not in purchase_gl_code_ids
                 ):
                     continue
+            keys.append((item_id, location_id))
+        if not keys:
+            return []
 
-            base_consumption = history["sales_qty"] + history["transfer_out_qty"]
-            adjusted_demand = base_consumption * multiplier
-            incoming = (
-                history["transfer_in_qty"] + history["invoice_qty"] + history["open_po_qty"]
+        def column(field: str) -> np.ndarray:
+            return np.fromiter(
+                (data[key][field] for key in keys), dtype=float, count=len(keys)
             )
-            recommended_quantity = max(adjusted_demand - incoming, 0.0)
-
-            default_unit_id = None
-            for unit in item.units:
-                if unit.receiving_default:
-                    default_unit_id = unit.id
-                    break
-            if default_unit_id is None and item.units:
-                default_unit_id = item.units[0].id
-
-            recommendations.append(
-                ForecastRecommendation(
-                    item=item,
-                    location=location,
-                    history=history,
-                    base_consumption=base_consumption,
-                    adjusted_demand=adjusted_demand,
-                    recommended_quantity=recommended_quantity,
-                    suggested_delivery_date=suggested_date,
-                    default_unit_id=default_unit_id,
-                )
+
+        base_consumption = column("sales_qty") + column("transfer_out_qty")
+        incoming = (
+            column("transfer_in_qty") + column("invoice_qty") + column("open_po_qty")
+        )
+        if by_day:
+            demand = self._smoothed_demand(
+                keys, daily, horizon_days or self.lookback_days
+            )
+        else:
+            demand = base_consumption
+        adjusted_demand = demand * multiplier
+        recommended_quantity = np.maximum(adjusted_demand - incoming, 0.0)
+        # Largest recommendation first, then largest consumption.
+        order = np.lexsort((-base_consumption, -recommended_quantity))
+
+        return [
+            ForecastRecommendation(
+                item=items[keys[index][0]],
+                location=locations[keys[index][1]],
+                history=data[keys[index]],
+                base_consumption=float(base_consumption[index]),
+                adjusted_demand=float(adjusted_demand[index]),
+                recommended_quantity=float(recommended_quantity[index]),
+                suggested_delivery_date=suggested_date,
+                default_unit_id=default_units[keys[index][0]],
+            )
+            for index in order
+        ]
+
+    def _history_window(self) -> Tuple[_dt.date, _dt.date]:
+        return self._since.date(), _dt.datetime.utcnow().date()
+
+    def demand_matrix(
+        self,
+        *,
+        location_ids: Optional[Sequence[int]] = None,
+        item_ids: Optional[Sequence[int]] = None,
+    ) -> forecast_engine.DemandMatrix:
+        """Return the lookback window as a daily demand matrix.
+
+        Demand is terminal sales plus transfers out, with event days taken
+        from the ``Event`` calendar.
+        """
+
+        history = self.daily_history(location_ids=location_ids, item_ids=item_ids)
+        records = (
+            (
+                key,
+                day,
+                quantities.get("sales_qty", 0.0)
+                + quantities.get("transfer_out_qty", 0.0),
             )
+            for key, days in history.items()
+            for day, quantities in days.items()
+        )
+        return self._matrix(list(history), records)
+
+    def _matrix(self, keys, records) -> forecast_engine.DemandMatrix:
+        start, end = self._history_window()
+        event_days = forecast_engine.event_days_by_location(
+            self.session, start, end, {location_id for _, location_id in keys}
+        )
+        return forecast_engine.DemandMatrix.from_records(
+            records, start, end, keys=keys, event_days=event_days
+        )
 
-        recommendations.sort(
-            key=lambda rec: (rec.recommended_quantity, rec.base_consumption),
-            reverse=True,
+    def _smoothed_demand(self, keys, records, horizon_days: int) -> np.ndarray:
+        matrix = self._matrix(keys, records)
+        model = forecast_engine.fit(matrix)
+        future_start = matrix.start + _dt.timedelta(days=matrix.days)
+        future_events = forecast_engine.event_mask(
+            keys,
+            future_start,
+            horizon_days,
+            forecast_engine.event_days_by_location(
+                self.session,
+                future_start,
+                future_start + _dt.timedelta(days=horizon_days - 1),
+                {location_id for _, location_id in keys},
+            ),
+        )
+        return model.forecast(horizon_days, future_events).sum(axis=1)
+
+    def backtest(
+        self,
+        *,
+        holdout_days: int = 14,
+        location_ids: Optional[Sequence[int]] = None,
+        item_ids: Optional[Sequence[int]] = None,
+        alpha: float = forecast_engine.DEFAULT_ALPHA,
+    ) -> forecast_engine.BacktestResult:
+        """Score the smoothing model on the last ``holdout_days`` of history."""
+
+        return forecast_engine.backtest(
+            self.demand_matrix(location_ids=location_ids, item_ids=item_ids),
+            holdout_days,
+            alpha=alpha,
         )
-        return recommendations
 
 
-__all__ = ["DemandForecastingHelper", "ForecastRecommendation"]
+__all__ = [
+    "DailyHistory",
+    "DemandForecastingHelper",
+    "FORECAST_METHODS",
+    "ForecastRecommendation",
+    "HISTORY_FIELDS",
+]
 
@@ -5,6 +5,7 @@ from __future__ import annotations
 from typing import Any, Dict, List, Mapping, Tuple, Union
 
 from flask import request
+from flask_sqlalchemy.pagination import Pagination
 
 PAGINATION_SIZES: Tuple[int, ...] = (25, 50, 100, 250, 500, 1000)
 
@@ -77,3 +78,18 @@ def build_pagination_args(
             else:
                 args[key] = str(value)
     return args
+
+
+class ListPagination(Pagination):
+    """Paginate an in-memory sequence with the Flask-SQLAlchemy interface.
+
+    Pass the full sequence as ``items=``; templates can use it like the
+    result of ``query.paginate``.
+    """
+
+    def _query_items(self) -> List[Any]:
+        items = self._query_args["items"]
+        return list(items[self._query_offset : self._query_offset + self.per_page])
+
+    def _query_count(self) -> int:
+        return len(self._query_args["items"])
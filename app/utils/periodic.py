@@ -0,0 +1,128 @@
+"""Background threads that run a maintenance job on a schedule.
+
+Each job is a daemon thread named after the job. Starting a job that is
+already running stops the old thread first, so the app factory can be called
+again (tests, config reloads) without piling up threads. Each run gets its
+own app context; a failing run is rolled back and logged and the thread
+carries on with the next one.
+"""
+
+from __future__ import annotations
+
+import datetime as _dt
+import logging
+import os
+import time
+from threading import Event, Thread
+from typing import Callable, Dict, Tuple
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# Shortest interval between two runs of an interval job.
+MIN_INTERVAL_SECONDS = 60
+
+Job = Callable[[object], None]
+
+_jobs: Dict[str, Tuple[Thread, Event]] = {}
+
+
+def _seconds_until(hour: int, now: _dt.datetime) -> float:
+    next_run = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += _dt.timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+def _run(app, name: str, fn: Job) -> None:
+    with app.app_context():
+        try:
+            fn(app)
+        except Exception:
+            db.session.rollback()
+            logger.exception("Background job %s failed", name)
+
+
+def _interval_loop(
+    app, name: str, fn: Job, interval: int, stop_event: Event
+) -> None:
+    next_run = time.monotonic() + interval
+    while True:
+        remaining = next_run - time.monotonic()
+        if remaining > 0:
+            if stop_event.wait(remaining):
+                break
+        elif stop_event.is_set():
+            break
+
+        _run(app, name, fn)
+
+        next_run += interval
+        current_time = time.monotonic()
+        while next_run <= current_time:
+            next_run += interval
+
+
+def _daily_loop(app, name: str, fn: Job, hour: int, stop_event: Event) -> None:
+    while not stop_event.wait(_seconds_until(hour, _dt.datetime.now())):
+        _run(app, name, fn)
+
+
+def stop_periodic_job(name: str) -> None:
+    """Stop the job ``name`` if it is running and wait for its thread."""
+
+    job = _jobs.pop(name, None)
+    if job is None:
+        return
+    thread, stop_event = job
+    stop_event.set()
+    if thread.is_alive():
+        thread.join()
+
+
+def start_periodic_job(
+    app, name: str, interval_key: str, fn: Job, *, daily: bool = False
+) -> bool:
+    """Start or restart the background job ``name`` running ``fn(app)``.
+
+    ``app.config[interval_key]`` is the number of hours between runs, or with
+    ``daily`` the hour of the day (0-23) of the single daily run. A missing
+    or out of range value leaves the job stopped. Returns whether a thread
+    was started.
+    """
+
+    if hasattr(app, "_get_current_object"):
+        app = app._get_current_object()
+
+    stop_periodic_job(name)
+
+    value = app.config.get(interval_key)
+    if daily:
+        if value is None or not 0 <= value <= 23:
+            return False
+        target, schedule = _daily_loop, int(value)
+    else:
+        interval_hours = float(value or 0)
+        if interval_hours <= 0:
+            return False
+        target = _interval_loop
+        schedule = max(MIN_INTERVAL_SECONDS, int(interval_hours * 3600))
+
+    # Avoid duplicate threads from the debug reloader parent process.
+    if app.debug and os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+        return False
+
+    stop_event = Event()
+    thread = Thread(
+        target=target,
+        args=(app, name, fn, schedule, stop_event),
+        daemon=True,
+        name=name,
+    )
+    _jobs[name] = (thread, stop_event)
+    thread.start()
+    return True
+
+
+__all__ = ["MIN_INTERVAL_SECONDS", "start_periodic_job", "stop_periodic_job"]
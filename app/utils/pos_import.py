@@ -402,7 +402,7 @@ def extract_terminal_sales_location(row: Sequence[object]) -> str | None:
     return None
 
 
-def _append_unique_price(prices: list[float], candidate: float | None) -> None:
+def append_unique_price(prices: list[float], candidate: float | None) -> None:
     """Append ``candidate`` to ``prices`` unless an equivalent value exists."""
 
     if candidate is None:
@@ -467,11 +467,11 @@ def group_terminal_sales_rows(row_data: Iterable[dict]) -> dict[str, dict]:
             )
             product_entry["quantity"] += qty
             if price is not None:
-                _append_unique_price(product_entry["prices"], price)
+                append_unique_price(product_entry["prices"], price)
             raw_price = coerce_float(entry.get("raw_price"))
             if raw_price is not None:
-                _append_unique_price(product_entry["prices"], raw_price)
-                _append_unique_price(
+                append_unique_price(product_entry["prices"], raw_price)
+                append_unique_price(
                     product_entry["spreadsheet_prices"], raw_price
                 )
             if amount is not None:
@@ -1,6 +1,7 @@
 import os
 
-from twilio.rest import Client
+# The Twilio SDK is imported on the first send; most processes never send.
+Client = None
 
 
 def send_sms(to_number: str, body: str):
@@ -10,5 +11,8 @@ def send_sms(to_number: str, body: str):
     from_number = os.getenv("TWILIO_PHONE_NUMBER")
     if not (account_sid and auth_token and from_number):
         raise RuntimeError("Twilio settings not configured")
-    client = Client(account_sid, auth_token)
+    client_class = Client
+    if client_class is None:
+        from twilio.rest import Client as client_class
+    client = client_class(account_sid, auth_token)
     client.messages.create(to=to_number, from_=from_number, body=body)
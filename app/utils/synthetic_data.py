@@ -0,0 +1,1031 @@
+"""Deterministic synthetic dataset generator for load and benchmark runs.
+
+The generator fills an (ideally empty) database with a realistic shape of
+catalog, purchasing, sales and event data.  Row contents depend only on the
+random ``seed`` and the selected :class:`DatasetScale`; every date is anchored
+to ``end_date`` so repeated runs on the same day produce identical databases.
+
+Rows are written with chunked Core ``INSERT`` statements and explicit primary
+keys, which keeps production-sized scales (tens of thousands of items and
+products, hundreds of locations and several years of history) practical to
+build on a laptop.
+"""
+
+from __future__ import annotations
+
+import random
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models import (
+    ActivityLog,
+    Customer,
+    Event,
+    EventLocation,
+    GLCode,
+    Invoice,
+    InvoiceProduct,
+    Item,
+    ItemUnit,
+    Location,
+    LocationStandItem,
+    Menu,
+    MenuAssignment,
+    PosSalesImport,
+    PosSalesImportLocation,
+    PosSalesImportRow,
+    Product,
+    ProductRecipeItem,
+    PurchaseInvoice,
+    PurchaseInvoiceItem,
+    PurchaseOrder,
+    PurchaseOrderItem,
+    TerminalSale,
+    Transfer,
+    TransferItem,
+    User,
+    Vendor,
+    location_products,
+    menu_products,
+)
+from app.services.product_last_sold import refresh_last_sold
+from app.services.stock_ledger import create_snapshot, reconcile_balances
+from app.utils.pos_import import normalize_pos_alias
+
+DEFAULT_SEED = 20240601
+SYNTHETIC_USER_PASSWORD = "synthetic-pass"
+INSERT_CHUNK_SIZE = 2000
+
+_ITEM_WORDS = (
+    "Bun", "Patty", "Cheese", "Fries", "Cola", "Lager", "Pretzel", "Nacho",
+    "Salsa", "Popcorn", "Hotdog", "Relish", "Cup", "Lid", "Napkin", "Water",
+    "Coffee", "Donut", "Pizza", "Dough", "Sauce", "Wings", "Candy", "Ice",
+)
+_BASE_UNITS = ("each", "gram", "ounce", "milliliter")
+_PRODUCT_WORDS = (
+    "Combo", "Basket", "Deluxe", "Classic", "Large", "Small", "Pint",
+    "Platter", "Bucket", "Special",
+)
+_EVENT_TYPES = ("hockey", "concert", "inventory", "other")
+
+
+@dataclass(frozen=True)
+class DatasetScale:
+    """Row volumes used to build a synthetic dataset."""
+
+    name: str
+    items: int
+    products: int
+    locations: int
+    vendors: int
+    customers: int
+    users: int
+    days: int
+    invoices_per_day: int
+    purchase_invoices_per_week: int
+    lines_per_purchase_invoice: int
+    open_purchase_orders: int
+    transfers_per_day: int
+    events_per_month: int
+    locations_per_event: int
+    products_per_location: int
+    menus: int
+    activity_logs_per_day: int
+    pos_imports: int
+
+
+SCALES: Dict[str, DatasetScale] = {
+    "tiny": DatasetScale(
+        name="tiny",
+        items=120,
+        products=80,
+        locations=6,
+        vendors=4,
+        customers=10,
+        users=4,
+        days=45,
+        invoices_per_day=2,
+        purchase_invoices_per_week=3,
+        lines_per_purchase_invoice=12,
+        open_purchase_orders=2,
+        transfers_per_day=2,
+        events_per_month=4,
+        locations_per_event=4,
+        products_per_location=20,
+        menus=2,
+        activity_logs_per_day=20,
+        pos_imports=2,
+    ),
+    "small": DatasetScale(
+        name="small",
+        items=1500,
+        products=900,
+        locations=25,
+        vendors=12,
+        customers=60,
+        users=20,
+        days=180,
+        invoices_per_day=8,
+        purchase_invoices_per_week=12,
+        lines_per_purchase_invoice=40,
+        open_purchase_orders=10,
+        transfers_per_day=10,
+        events_per_month=6,
+        locations_per_event=12,
+        products_per_location=60,
+        menus=6,
+        activity_logs_per_day=150,
+        pos_imports=6,
+    ),
+    "medium": DatasetScale(
+        name="medium",
+        items=8000,
+        products=5000,
+        locations=120,
+        vendors=30,
+        customers=250,
+        users=80,
+        days=365,
+        invoices_per_day=25,
+        purchase_invoices_per_week=40,
+        lines_per_purchase_invoice=80,
+        open_purchase_orders=30,
+        transfers_per_day=40,
+        events_per_month=8,
+        locations_per_event=30,
+        products_per_location=80,
+        menus=15,
+        activity_logs_per_day=600,
+        pos_imports=20,
+    ),
+    "large": DatasetScale(
+        name="large",
+        items=30000,
+        products=18000,
+        locations=320,
+        vendors=60,
+        customers=800,
+        users=250,
+        days=3 * 365,
+        invoices_per_day=60,
+        purchase_invoices_per_week=120,
+        lines_per_purchase_invoice=120,
+        open_purchase_orders=60,
+        transfers_per_day=120,
+        events_per_month=10,
+        locations_per_event=60,
+        products_per_location=120,
+        menus=40,
+        activity_logs_per_day=2500,
+        pos_imports=40,
+    ),
+}
+
+
+def get_scale(name: str) -> DatasetScale:
+    """Return the named :class:`DatasetScale` or raise ``ValueError``."""
+
+    try:
+        return SCALES[name]
+    except KeyError as exc:
+        choices = ", ".join(sorted(SCALES))
+        raise ValueError(f"Unknown dataset scale {name!r}; choose from {choices}") from exc
+
+
+class _TableWriter:
+    """Allocate primary keys and insert rows in chunks for one table."""
+
+    def __init__(self, table, *, allocate_ids: bool = True) -> None:
+        self.table = table
+        self.rows: List[dict] = []
+        self.count = 0
+        self._next_id = None
+        if allocate_ids:
+            current = db.session.execute(
+                db.select(func.max(table.c.id))
+            ).scalar()
+            self._next_id = int(current or 0) + 1
+
+    def next_id(self) -> int:
+        value = self._next_id
+        self._next_id += 1
+        return value
+
+    def add(self, row: dict) -> None:
+        self.rows.append(row)
+        if len(self.rows) >= INSERT_CHUNK_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.rows:
+            return
+        db.session.execute(self.table.insert(), self.rows)
+        self.count += len(self.rows)
+        self.rows = []
+
+
+class SyntheticDataGenerator:
+    """Build a deterministic synthetic dataset for a given scale."""
+
+    def __init__(
+        self,
+        scale: DatasetScale,
+        *,
+        seed: int = DEFAULT_SEED,
+        end_date: Optional[date] = None,
+        progress: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        self.scale = scale
+        self.seed = seed
+        self.end_date = end_date or date.today()
+        self.start_date = self.end_date - timedelta(days=scale.days - 1)
+        self.rng = random.Random(seed)
+        self._progress = progress
+        self.counts: Dict[str, int] = {}
+
+        self.gl_code_ids: List[int] = []
+        self.user_ids: List[int] = []
+        self.vendor_ids: List[int] = []
+        self.customer_ids: List[int] = []
+        self.location_ids: List[int] = []
+        self.location_names: Dict[int, str] = {}
+        self.item_ids: List[int] = []
+        self.active_item_ids: List[int] = []
+        self.item_names: Dict[int, str] = {}
+        self.item_costs: Dict[int, float] = {}
+        self.item_units: Dict[int, List[tuple[int, str, float]]] = {}
+        self.product_ids: List[int] = []
+        self.product_names: Dict[int, str] = {}
+        self.product_prices: Dict[int, float] = {}
+        self.product_recipes: Dict[int, List[tuple[int, float]]] = {}
+        self.location_product_ids: Dict[int, List[int]] = {}
+
+    # ------------------------------------------------------------------
+    def _log(self, message: str) -> None:
+        if self._progress is not None:
+            self._progress(message)
+
+    def _finish(self, label: str, writer: _TableWriter) -> None:
+        writer.flush()
+        self.counts[label] = self.counts.get(label, 0) + writer.count
+        writer.count = 0
+
+    def _days(self) -> Iterable[date]:
+        for offset in range(self.scale.days):
+            yield self.start_date + timedelta(days=offset)
+
+    def _timestamp(self, day: date) -> datetime:
+        return datetime.combine(day, datetime.min.time()) + timedelta(
+            seconds=self.rng.randint(8 * 3600, 23 * 3600)
+        )
+
+    # ------------------------------------------------------------------
+    def generate(self) -> Dict[str, int]:
+        """Insert the dataset and return the number of rows per table."""
+
+        steps = (
+            self._generate_reference_data,
+            self._generate_locations,
+            self._generate_items,
+            self._generate_products,
+            self._generate_location_assignments,
+            self._generate_invoices,
+            self._generate_purchasing,
+            self._generate_transfers,
+            self._generate_events,
+            self._generate_pos_imports,
+            self._generate_activity_logs,
+            self._generate_stock_ledger,
+            self._generate_product_last_sold,
+        )
+        for step in steps:
+            self._log(step.__name__.replace("_generate_", "").replace("_", " "))
+            step()
+            db.session.commit()
+        return dict(self.counts)
+
+    # ------------------------------------------------------------------
+    def _generate_reference_data(self) -> None:
+        existing_codes = {
+            code for (code,) in db.session.query(GLCode.code).all()
+        }
+        gl_codes = _TableWriter(GLCode.__table__)
+        for index in range(40):
+            code = str(6000 + index * 10)
+            if code in existing_codes:
+                continue
+            row_id = gl_codes.next_id()
+            gl_codes.add(
+                {"id": row_id, "code": code, "description": f"Synthetic GL {code}"}
+            )
+            self.gl_code_ids.append(row_id)
+        self._finish("gl_code", gl_codes)
+
+        password = generate_password_hash(SYNTHETIC_USER_PASSWORD)
+        users = _TableWriter(User.__table__)
+        for index in range(self.scale.users):
+            row_id = users.next_id()
+            users.add(
+                {
+                    "id": row_id,
+                    "email": f"synthetic-user-{index:04d}@example.com",
+                    "password": password,
+                    "is_admin": index == 0,
+                    "active": True,
+                    "favorites": "",
+                    "notify_transfers": False,
+                    "items_per_page": 20,
+                }
+            )
+            self.user_ids.append(row_id)
+        self._finish("user", users)
+
+        vendors = _TableWriter(Vendor.__table__)
+        for index in range(self.scale.vendors):
+            row_id = vendors.next_id()
+            vendors.add(
+                {
+                    "id": row_id,
+                    "first_name": f"Vendor{index:03d}",
+                    "last_name": "Supply",
+                    "gst_exempt": False,
+                    "pst_exempt": False,
+                    "archived": False,
+                }
+            )
+            self.vendor_ids.append(row_id)
+        self._finish("vendor", vendors)
+
+        customers = _TableWriter(Customer.__table__)
+        for index in range(self.scale.customers):
+            row_id = customers.next_id()
+            customers.add(
+                {
+                    "id": row_id,
+                    "first_name": f"Customer{index:04d}",
+                    "last_name": "Account",
+                    "gst_exempt": index % 7 == 0,
+                    "pst_exempt": index % 5 == 0,
+                    "archived": False,
+                }
+            )
+            self.customer_ids.append(row_id)
+        self._finish("customer", customers)
+
+    def _generate_locations(self) -> None:
+        locations = _TableWriter(Location.__table__)
+        for index in range(self.scale.locations):
+            row_id = locations.next_id()
+            name = f"Synthetic Stand {index + 1:04d}"
+            locations.add(
+                {
+                    "id": row_id,
+                    "name": name,
+                    "archived": False,
+                    "is_spoilage": index == self.scale.locations - 1,
+                    "current_menu_id": None,
+                }
+            )
+            self.location_ids.append(row_id)
+            self.location_names[row_id] = name
+        self._finish("location", locations)
+
+    def _generate_items(self) -> None:
+        items = _TableWriter(Item.__table__)
+        units = _TableWriter(ItemUnit.__table__)
+        for index in range(self.scale.items):
+            row_id = items.next_id()
+            base_unit = self.rng.choice(_BASE_UNITS)
+            word = _ITEM_WORDS[index % len(_ITEM_WORDS)]
+            name = f"{word} {index + 1:06d}"
+            cost = round(self.rng.uniform(0.05, 12.0), 4)
+            items.add(
+                {
+                    "id": row_id,
+                    "name": name,
+                    "base_unit": base_unit,
+                    "upc": f"9{self.seed % 1000:03d}{index + 1:08d}",
+                    "gl_code": None,
+                    "gl_code_id": self.rng.choice(self.gl_code_ids),
+                    "purchase_gl_code_id": self.rng.choice(self.gl_code_ids),
+                    "quantity": 0.0,
+                    "cost": cost,
+                    "container_deposit": 0.0,
+                    "archived": index % 97 == 0,
+                }
+            )
+            self.item_ids.append(row_id)
+            if index % 97 != 0:
+                self.active_item_ids.append(row_id)
+            self.item_names[row_id] = name
+            self.item_costs[row_id] = cost
+
+            base_unit_id = units.next_id()
+            units.add(
+                {
+                    "id": base_unit_id,
+                    "item_id": row_id,
+                    "name": base_unit,
+                    "factor": 1.0,
+                    "receiving_default": index % 2 == 0,
+                    "transfer_default": True,
+                }
+            )
+            item_units = [(base_unit_id, base_unit, 1.0)]
+            if index % 2 == 1:
+                case_id = units.next_id()
+                factor = float(self.rng.choice((6, 12, 24, 48)))
+                units.add(
+                    {
+                        "id": case_id,
+                        "item_id": row_id,
+                        "name": "case",
+                        "factor": factor,
+                        "receiving_default": True,
+                        "transfer_default": False,
+                    }
+                )
+                item_units.append((case_id, "case", factor))
+            self.item_units[row_id] = item_units
+        self._finish("item", items)
+        self._finish("item_unit", units)
+
+    def _generate_products(self) -> None:
+        products = _TableWriter(Product.__table__)
+        recipes = _TableWriter(ProductRecipeItem.__table__)
+        for index in range(self.scale.products):
+            row_id = products.next_id()
+            name = (
+                f"{_PRODUCT_WORDS[index % len(_PRODUCT_WORDS)]} "
+                f"{_ITEM_WORDS[(index // len(_PRODUCT_WORDS)) % len(_ITEM_WORDS)]} "
+                f"{index + 1:06d}"
+            )
+            recipe: List[tuple[int, float]] = []
+            cost = 0.0
+            for item_id in self.rng.sample(self.active_item_ids, self.rng.randint(1, 4)):
+                unit_id, _unit_name, factor = self.item_units[item_id][0]
+                quantity = float(self.rng.randint(1, 3))
+                recipes.add(
+                    {
+                        "id": recipes.next_id(),
+                        "product_id": row_id,
+                        "item_id": item_id,
+                        "unit_id": unit_id,
+                        "quantity": quantity,
+                        "countable": True,
+                    }
+                )
+                recipe.append((item_id, quantity * factor))
+                cost += self.item_costs[item_id] * quantity * factor
+            price = round(max(cost * self.rng.uniform(2.5, 4.0), 1.0), 2)
+            gl_code_id = self.rng.choice(self.gl_code_ids)
+            products.add(
+                {
+                    "id": row_id,
+                    "name": name,
+                    "gl_code": None,
+                    "price": price,
+                    "invoice_sale_price": price,
+                    "cost": round(cost, 4),
+                    "gl_code_id": gl_code_id,
+                    "sales_gl_code_id": gl_code_id,
+                    "quantity": 0.0,
+                    "recipe_yield_quantity": 1.0,
+                    "recipe_yield_unit": None,
+                }
+            )
+            self.product_ids.append(row_id)
+            self.product_names[row_id] = name
+            self.product_prices[row_id] = price
+            self.product_recipes[row_id] = recipe
+        self._finish("product", products)
+        self._finish("product_recipe_item", recipes)
+
+    def _generate_location_assignments(self) -> None:
+        menus = _TableWriter(Menu.__table__)
+        menu_product_rows = _TableWriter(menu_products, allocate_ids=False)
+        assignments = _TableWriter(MenuAssignment.__table__)
+        location_product_rows = _TableWriter(location_products, allocate_ids=False)
+        stand_items = _TableWriter(LocationStandItem.__table__)
+
+        per_location = min(self.scale.products_per_location, len(self.product_ids))
+        menu_products_map: Dict[int, List[int]] = {}
+        created_at = datetime.combine(self.start_date, datetime.min.time())
+        for index in range(self.scale.menus):
+            menu_id = menus.next_id()
+            menus.add(
+                {
+                    "id": menu_id,
+                    "name": f"Synthetic Menu {index + 1:03d}",
+                    "description": "Generated menu",
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                    "last_used_at": None,
+                }
+            )
+            selected = sorted(self.rng.sample(self.product_ids, per_location))
+            menu_products_map[menu_id] = selected
+            for product_id in selected:
+                menu_product_rows.add({"menu_id": menu_id, "product_id": product_id})
+        self._finish("menu", menus)
+        self._finish("menu_products", menu_product_rows)
+
+        menu_ids = sorted(menu_products_map)
+        for index, location_id in enumerate(self.location_ids):
+            menu_id = menu_ids[index % len(menu_ids)] if menu_ids else None
+            if menu_id is not None:
+                product_ids = menu_products_map[menu_id]
+                db.session.execute(
+                    Location.__table__.update()
+                    .where(Location.__table__.c.id == location_id)
+                    .values(current_menu_id=menu_id)
+                )
+                assignments.add(
+                    {
+                        "id": assignments.next_id(),
+                        "menu_id": menu_id,
+                        "location_id": location_id,
+                        "assigned_at": created_at,
+                        "unassigned_at": None,
+                    }
+                )
+            else:
+                product_ids = sorted(self.rng.sample(self.product_ids, per_location))
+            self.location_product_ids[location_id] = product_ids
+
+            seen_items = set()
+            for product_id in product_ids:
+                location_product_rows.add(
+                    {"location_id": location_id, "product_id": product_id}
+                )
+                for item_id, _quantity in self.product_recipes[product_id]:
+                    if item_id in seen_items:
+                        continue
+                    seen_items.add(item_id)
+                    stand_items.add(
+                        {
+                            "id": stand_items.next_id(),
+                            "location_id": location_id,
+                            "item_id": item_id,
+                            "expected_count": float(self.rng.randint(0, 400)),
+                            "purchase_gl_code_id": None,
+                        }
+                    )
+        self._finish("menu_assignment", assignments)
+        self._finish("location_products", location_product_rows)
+        self._finish("location_stand_item", stand_items)
+
+    def _generate_invoices(self) -> None:
+        invoices = _TableWriter(Invoice.__table__, allocate_ids=False)
+        lines = _TableWriter(InvoiceProduct.__table__)
+        sequence = 0
+        for day in self._days():
+            for _ in range(self.scale.invoices_per_day):
+                sequence += 1
+                invoice_id = f"SY{sequence:07d}"
+                created = self._timestamp(day)
+                is_paid = day < self.end_date - timedelta(days=30)
+                invoices.add(
+                    {
+                        "id": invoice_id,
+                        "user_id": self.rng.choice(self.user_ids),
+                        "customer_id": self.rng.choice(self.customer_ids),
+                        "date_created": created,
+                        "is_paid": is_paid,
+                        "paid_at": created + timedelta(days=14) if is_paid else None,
+                    }
+                )
+                for product_id in self.rng.sample(
+                    self.product_ids, self.rng.randint(1, 5)
+                ):
+                    quantity = float(self.rng.randint(1, 20))
+                    unit_price = self.product_prices[product_id]
+                    subtotal = round(quantity * unit_price, 2)
+                    lines.add(
+                        {
+                            "id": lines.next_id(),
+                            "invoice_id": invoice_id,
+                            "quantity": quantity,
+                            "product_id": product_id,
+                            "product_name": self.product_names[product_id],
+                            "unit_price": unit_price,
+                            "line_subtotal": subtotal,
+                            "line_gst": round(subtotal * 0.05, 2),
+                            "line_pst": round(subtotal * 0.07, 2),
+                            "override_gst": None,
+                            "override_pst": None,
+                        }
+                    )
+        self._finish("invoice", invoices)
+        self._finish("invoice_product", lines)
+
+    def _purchase_lines(self) -> List[tuple[int, int, str, float]]:
+        lines = []
+        for item_id in self.rng.sample(
+            self.active_item_ids,
+            min(self.scale.lines_per_purchase_invoice, len(self.active_item_ids)),
+        ):
+            unit_id, unit_name, factor = self.rng.choice(self.item_units[item_id])
+            lines.append((item_id, unit_id, unit_name, factor))
+        return lines
+
+    def _generate_purchasing(self) -> None:
+        orders = _TableWriter(PurchaseOrder.__table__)
+        order_items = _TableWriter(PurchaseOrderItem.__table__)
+        invoices = _TableWriter(PurchaseInvoice.__table__)
+        invoice_items = _TableWriter(PurchaseInvoiceItem.__table__)
+
+        weeks = max(1, self.scale.days // 7)
+        for week in range(weeks):
+            week_start = self.start_date + timedelta(days=week * 7)
+            for _ in range(self.scale.purchase_invoices_per_week):
+                vendor_id = self.rng.choice(self.vendor_ids)
+                user_id = self.rng.choice(self.user_ids)
+                location_id = self.rng.choice(self.location_ids)
+                received = week_start + timedelta(days=self.rng.randint(0, 6))
+                received = min(received, self.end_date)
+                order_id = orders.next_id()
+                orders.add(
+                    {
+                        "id": order_id,
+                        "vendor_id": vendor_id,
+                        "user_id": user_id,
+                        "vendor_name": f"Vendor{vendor_id} Supply",
+                        "order_number": f"PO-{order_id:07d}",
+                        "order_date": received - timedelta(days=3),
+                        "expected_date": received,
+                        "expected_total_cost": None,
+                        "delivery_charge": 0.0,
+                        "received": True,
+                    }
+                )
+                invoice_id = invoices.next_id()
+                invoices.add(
+                    {
+                        "id": invoice_id,
+                        "purchase_order_id": order_id,
+                        "user_id": user_id,
+                        "location_id": location_id,
+                        "vendor_name": f"Vendor{vendor_id} Supply",
+                        "location_name": self.location_names[location_id],
+                        "received_date": received,
+                        "invoice_number": f"INV-{invoice_id:07d}",
+                        "department": None,
+                        "gst": 0.0,
+                        "pst": 0.0,
+                        "delivery_charge": 0.0,
+                    }
+                )
+                for position, (item_id, unit_id, unit_name, factor) in enumerate(
+                    self._purchase_lines()
+                ):
+                    quantity = float(self.rng.randint(1, 30))
+                    cost = round(self.item_costs[item_id] * factor * self.rng.uniform(0.9, 1.1), 4)
+                    order_items.add(
+                        {
+                            "id": order_items.next_id(),
+                            "purchase_order_id": order_id,
+                            "position": position,
+                            "product_id": None,
+                            "unit_id": unit_id,
+                            "item_id": item_id,
+                            "quantity": quantity,
+                            "unit_cost": cost,
+                        }
+                    )
+                    invoice_items.add(
+                        {
+                            "id": invoice_items.next_id(),
+                            "invoice_id": invoice_id,
+                            "position": position,
+                            "item_id": item_id,
+                            "unit_id": unit_id,
+                            "item_name": self.item_names[item_id],
+                            "unit_name": unit_name,
+                            "quantity": quantity,
+                            "cost": cost,
+                            "container_deposit": 0.0,
+                            "prev_cost": self.item_costs[item_id],
+                            "location_id": (
+                                self.rng.choice(self.location_ids)
+                                if position % 10 == 9
+                                else None
+                            ),
+                            "purchase_gl_code_id": None,
+                        }
+                    )
+
+        for _ in range(self.scale.open_purchase_orders):
+            vendor_id = self.rng.choice(self.vendor_ids)
+            order_id = orders.next_id()
+            orders.add(
+                {
+                    "id": order_id,
+                    "vendor_id": vendor_id,
+                    "user_id": self.rng.choice(self.user_ids),
+                    "vendor_name": f"Vendor{vendor_id} Supply",
+                    "order_number": f"PO-{order_id:07d}",
+                    "order_date": self.end_date - timedelta(days=2),
+                    "expected_date": self.end_date + timedelta(days=2),
+                    "expected_total_cost": None,
+                    "delivery_charge": 0.0,
+                    "received": False,
+                }
+            )
+            for position, (item_id, unit_id, _unit_name, factor) in enumerate(
+                self._purchase_lines()
+            ):
+                order_items.add(
+                    {
+                        "id": order_items.next_id(),
+                        "purchase_order_id": order_id,
+                        "position": position,
+                        "product_id": None,
+                        "unit_id": unit_id,
+                        "item_id": item_id,
+                        "quantity": float(self.rng.randint(1, 30)),
+                        "unit_cost": round(self.item_costs[item_id] * factor, 4),
+                    }
+                )
+        self._finish("purchase_order", orders)
+        self._finish("purchase_order_item", order_items)
+        self._finish("purchase_invoice", invoices)
+        self._finish("purchase_invoice_item", invoice_items)
+
+    def _generate_transfers(self) -> None:
+        transfers = _TableWriter(Transfer.__table__)
+        transfer_lines = _TableWriter(TransferItem.__table__)
+        if len(self.location_ids) < 2:
+            return
+        for day in self._days():
+            for _ in range(self.scale.transfers_per_day):
+                from_id, to_id = self.rng.sample(self.location_ids, 2)
+                created = self._timestamp(day)
+                completed = day < self.end_date - timedelta(days=2)
+                user_id = self.rng.choice(self.user_ids)
+                transfer_id = transfers.next_id()
+                transfers.add(
+                    {
+                        "id": transfer_id,
+                        "from_location_id": from_id,
+                        "to_location_id": to_id,
+                        "user_id": user_id,
+                        "date_created": created,
+                        "completed": completed,
+                        "from_location_name": self.location_names[from_id],
+                        "to_location_name": self.location_names[to_id],
+                    }
+                )
+                for item_id in self.rng.sample(self.active_item_ids, self.rng.randint(1, 8)):
+                    unit_id, _unit_name, factor = self.rng.choice(self.item_units[item_id])
+                    unit_quantity = float(self.rng.randint(1, 10))
+                    base_quantity = unit_quantity * factor
+                    transfer_lines.add(
+                        {
+                            "id": transfer_lines.next_id(),
+                            "transfer_id": transfer_id,
+                            "item_id": item_id,
+                            "quantity": base_quantity,
+                            "completed_quantity": base_quantity if completed else 0.0,
+                            "completed_at": created if completed else None,
+                            "completed_by_id": user_id if completed else None,
+                            "unit_id": unit_id,
+                            "unit_quantity": unit_quantity,
+                            "base_quantity": base_quantity,
+                            "item_name": self.item_names[item_id],
+                        }
+                    )
+        self._finish("transfer", transfers)
+        self._finish("transfer_item", transfer_lines)
+
+    def _generate_events(self) -> None:
+        events = _TableWriter(Event.__table__)
+        event_locations = _TableWriter(EventLocation.__table__)
+        sales = _TableWriter(TerminalSale.__table__)
+
+        months = max(1, self.scale.days // 30)
+        total_events = months * self.scale.events_per_month
+        per_event = min(self.scale.locations_per_event, len(self.location_ids))
+        for index in range(total_events):
+            # Spread events evenly so the most recent ones are still open.
+            offset = min(
+                self.scale.days - 1,
+                index * self.scale.days // total_events + self.rng.randint(0, 2),
+            )
+            start = self.start_date + timedelta(days=offset)
+            end = min(start + timedelta(days=self.rng.randint(0, 2)), self.end_date)
+            event_type = self.rng.choice(_EVENT_TYPES)
+            if index == total_events - 1:
+                # Event-day load tests scan UPCs, which needs an open
+                # inventory event.
+                event_type = "inventory"
+            event_id = events.next_id()
+            events.add(
+                {
+                    "id": event_id,
+                    "name": f"Synthetic Event {event_id:05d}",
+                    "start_date": start,
+                    "end_date": end,
+                    "closed": end < self.end_date - timedelta(days=14),
+                    "event_type": event_type,
+                    "estimated_sales": None,
+                }
+            )
+            for location_id in self.rng.sample(self.location_ids, per_event):
+                event_location_id = event_locations.next_id()
+                event_locations.add(
+                    {
+                        "id": event_location_id,
+                        "event_id": event_id,
+                        "location_id": location_id,
+                        "opening_count": 0.0,
+                        "closing_count": 0.0,
+                        "confirmed": False,
+                        "notes": None,
+                    }
+                )
+                offered = self.location_product_ids.get(location_id) or []
+                sold_count = min(len(offered), max(1, len(offered) // 2))
+                for product_id in self.rng.sample(offered, sold_count):
+                    sales.add(
+                        {
+                            "id": sales.next_id(),
+                            "event_location_id": event_location_id,
+                            "product_id": product_id,
+                            "quantity": float(self.rng.randint(1, 150)),
+                            "sold_at": self._timestamp(end),
+                        }
+                    )
+        self._finish("event", events)
+        self._finish("event_location", event_locations)
+        self._finish("terminal_sale", sales)
+
+    def _generate_pos_imports(self) -> None:
+        imports = _TableWriter(PosSalesImport.__table__)
+        import_locations = _TableWriter(PosSalesImportLocation.__table__)
+        import_rows = _TableWriter(PosSalesImportRow.__table__)
+        per_import = min(10, len(self.location_ids))
+        for index in range(self.scale.pos_imports):
+            received = datetime.combine(
+                self.end_date - timedelta(days=index), datetime.min.time()
+            ) + timedelta(hours=6)
+            import_id = imports.next_id()
+            imports.add(
+                {
+                    "id": import_id,
+                    "source_provider": "synthetic",
+                    "message_id": f"<synthetic-{self.seed}-{index}@example.com>",
+                    "attachment_filename": f"sales-{index:04d}.xls",
+                    "attachment_sha256": f"{self.seed:016x}{index:048x}",
+                    "attachment_storage_path": None,
+                    "received_at": received,
+                    "status": "pending",
+                    "created_at": received,
+                    "updated_at": received,
+                }
+            )
+            for location_index, location_id in enumerate(
+                self.rng.sample(self.location_ids, per_import)
+            ):
+                location_import_id = import_locations.next_id()
+                location_name = self.location_names[location_id]
+                total_quantity = 0.0
+                total_amount = 0.0
+                offered = self.location_product_ids.get(location_id) or []
+                for row_index, product_id in enumerate(offered):
+                    quantity = float(self.rng.randint(0, 60))
+                    price = self.product_prices[product_id]
+                    line_total = round(quantity * price, 2)
+                    total_quantity += quantity
+                    total_amount += line_total
+                    name = self.product_names[product_id]
+                    import_rows.add(
+                        {
+                            "id": import_rows.next_id(),
+                            "import_id": import_id,
+                            "location_import_id": location_import_id,
+                            "source_product_code": str(product_id),
+                            "source_product_name": name,
+                            "normalized_product_name": normalize_pos_alias(name),
+                            "product_id": product_id,
+                            "quantity": quantity,
+                            "net_inc": line_total,
+                            "discount_raw": None,
+                            "discount_abs": 0.0,
+                            "computed_line_total": line_total,
+                            "computed_unit_price": price,
+                            "parse_index": row_index,
+                            "is_zero_quantity": quantity == 0,
+                            "created_at": received,
+                            "updated_at": received,
+                        }
+                    )
+                import_locations.add(
+                    {
+                        "id": location_import_id,
+                        "import_id": import_id,
+                        "source_location_name": location_name,
+                        "normalized_location_name": normalize_pos_alias(location_name),
+                        "location_id": location_id,
+                        "total_quantity": total_quantity,
+                        "net_inc": round(total_amount, 2),
+                        "discounts_abs": 0.0,
+                        "computed_total": round(total_amount, 2),
+                        "parse_index": location_index,
+                        "created_at": received,
+                        "updated_at": received,
+                    }
+                )
+        self._finish("pos_sales_import", imports)
+        self._finish("pos_sales_import_location", import_locations)
+        self._finish("pos_sales_import_row", import_rows)
+
+    def _generate_activity_logs(self) -> None:
+        logs = _TableWriter(ActivityLog.__table__)
+        actions = (
+            "Viewed dashboard",
+            "Updated stand sheet for location {location}",
+            "Created transfer {number}",
+            "Received invoice {number}",
+            "Edited item {number}",
+        )
+        for day in self._days():
+            for _ in range(self.scale.activity_logs_per_day):
+                template = self.rng.choice(actions)
+                logs.add(
+                    {
+                        "id": logs.next_id(),
+                        "user_id": self.rng.choice(self.user_ids),
+                        "activity": template.format(
+                            location=self.rng.choice(self.location_ids),
+                            number=self.rng.randint(1, 99999),
+                        ),
+                        "timestamp": self._timestamp(day),
+                    }
+                )
+        self._finish("activity_log", logs)
+
+    def _generate_stock_ledger(self) -> None:
+        # Rows were bulk inserted, so seed the ledger with opening balances
+        # and checkpoint them for point-in-time lookups.
+        self.counts["stock_movement"] = self.counts.get(
+            "stock_movement", 0
+        ) + reconcile_balances()
+        create_snapshot()
+
+    def _generate_product_last_sold(self) -> None:
+        # Sales were bulk inserted too, bypassing the flush hooks.
+        refresh_last_sold(db.session)
+
+
+def generate_synthetic_dataset(
+    scale: DatasetScale | str = "small",
+    *,
+    seed: int = DEFAULT_SEED,
+    end_date: Optional[date] = None,
+    progress: Optional[Callable[[str], None]] = None,
+) -> Dict[str, int]:
+    """Populate the current database with a synthetic dataset.
+
+    Args:
+        scale: A :class:`DatasetScale` or the name of one of :data:`SCALES`.
+        seed: Seed for the pseudo-random generator.  The same seed and scale
+            always produce the same rows.
+        end_date: Last day of generated history (defaults to today).
+        progress: Optional callback receiving a short label per stage.
+
+    Returns:
+        A mapping of table name to the number of inserted rows.
+    """
+
+    if isinstance(scale, str):
+        scale = get_scale(scale)
+    generator = SyntheticDataGenerator(
+        scale, seed=seed, end_date=end_date, progress=progress
+    )
+    return generator.generate()
+
+
+def describe_scale(scale: DatasetScale | str) -> Dict[str, object]:
+    """Return a JSON-serializable description of ``scale``."""
+
+    if isinstance(scale, str):
+        scale = get_scale(scale)
+    return asdict(scale)
+
+
+__all__ = [
+    "DEFAULT_SEED",
+    "DatasetScale",
+    "SCALES",
+    "SYNTHETIC_USER_PASSWORD",
+    "SyntheticDataGenerator",
+    "describe_scale",
+    "generate_synthetic_dataset",
+    "get_scale",
+]
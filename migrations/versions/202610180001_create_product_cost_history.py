@@ -0,0 +1,66 @@
+"""create product cost history
+
+Revision ID: 202610180001
+Revises: 202603260006
+Create Date: 2026-10-18 00:01:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "202610180001"
+down_revision = "202603260006"
+branch_labels = None
+depends_on = None
+
+
+TABLE_NAME = "product_cost_history"
+
+
+def _has_table(table_name: str, bind) -> bool:
+    inspector = sa.inspect(bind)
+    return inspector.has_table(table_name)
+
+
+def upgrade():
+    bind = op.get_bind()
+    if _has_table(TABLE_NAME, bind):
+        return
+
+    op.create_table(
+        TABLE_NAME,
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("previous_cost", sa.Float(), nullable=True),
+        sa.Column("cost", sa.Float(), nullable=False),
+        sa.Column("source", sa.String(length=50), nullable=False),
+        sa.Column(
+            "changed_at",
+            sa.DateTime(),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.ForeignKeyConstraint(
+            ["product_id"],
+            ["product.id"],
+            name="fk_product_cost_history_product",
+            ondelete="CASCADE",
+        ),
+    )
+    op.create_index(
+        "ix_product_cost_history_product_changed",
+        TABLE_NAME,
+        ["product_id", "changed_at"],
+        unique=False,
+    )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if not _has_table(TABLE_NAME, bind):
+        return
+
+    op.drop_index("ix_product_cost_history_product_changed", table_name=TABLE_NAME)
+    op.drop_table(TABLE_NAME)
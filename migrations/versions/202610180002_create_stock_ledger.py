@@ -0,0 +1,173 @@
+"""create stock movement ledger and snapshots
+
+Revision ID: 202610180002
+Revises: 202610180001
+Create Date: 2026-10-18 00:02:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "202610180002"
+down_revision = "202610180001"
+branch_labels = None
+depends_on = None
+
+
+MOVEMENT_TABLE = "stock_movement"
+SNAPSHOT_TABLE = "stock_snapshot"
+SNAPSHOT_LINE_TABLE = "stock_snapshot_line"
+
+
+def _has_table(table_name: str, bind) -> bool:
+    inspector = sa.inspect(bind)
+    return inspector.has_table(table_name)
+
+
+def _seed_opening_balances(bind) -> None:
+    """Record existing balances so the ledger starts in agreement."""
+
+    if _has_table("location_stand_item", bind):
+        op.execute(
+            sa.text(
+                f"""
+                INSERT INTO {MOVEMENT_TABLE}
+                    (location_id, item_id, quantity, movement_type, occurred_at)
+                SELECT location_id, item_id, expected_count, 'opening', CURRENT_TIMESTAMP
+                FROM location_stand_item
+                WHERE expected_count IS NOT NULL AND expected_count != 0
+                """
+            )
+        )
+    if _has_table("item", bind):
+        op.execute(
+            sa.text(
+                f"""
+                INSERT INTO {MOVEMENT_TABLE}
+                    (location_id, item_id, quantity, movement_type, occurred_at)
+                SELECT NULL, id, quantity, 'opening', CURRENT_TIMESTAMP
+                FROM item
+                WHERE quantity IS NOT NULL AND quantity != 0
+                """
+            )
+        )
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    if not _has_table(MOVEMENT_TABLE, bind):
+        op.create_table(
+            MOVEMENT_TABLE,
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("location_id", sa.Integer(), nullable=True),
+            sa.Column("item_id", sa.Integer(), nullable=False),
+            sa.Column("quantity", sa.Float(), nullable=False),
+            sa.Column("movement_type", sa.String(length=32), nullable=False),
+            sa.Column("reference_type", sa.String(length=32), nullable=True),
+            sa.Column("reference_id", sa.String(length=64), nullable=True),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column(
+                "occurred_at",
+                sa.DateTime(),
+                nullable=False,
+                server_default=sa.func.now(),
+            ),
+            sa.ForeignKeyConstraint(
+                ["location_id"],
+                ["location.id"],
+                name="fk_stock_movement_location",
+            ),
+            sa.ForeignKeyConstraint(
+                ["item_id"], ["item.id"], name="fk_stock_movement_item"
+            ),
+            sa.ForeignKeyConstraint(
+                ["user_id"], ["user.id"], name="fk_stock_movement_user"
+            ),
+        )
+        op.create_index(
+            "ix_stock_movement_location_item_occurred",
+            MOVEMENT_TABLE,
+            ["location_id", "item_id", "occurred_at"],
+            unique=False,
+        )
+        op.create_index(
+            "ix_stock_movement_item_occurred",
+            MOVEMENT_TABLE,
+            ["item_id", "occurred_at"],
+            unique=False,
+        )
+        op.create_index(
+            "ix_stock_movement_occurred",
+            MOVEMENT_TABLE,
+            ["occurred_at"],
+            unique=False,
+        )
+        _seed_opening_balances(bind)
+
+    if not _has_table(SNAPSHOT_TABLE, bind):
+        op.create_table(
+            SNAPSHOT_TABLE,
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("snapshot_at", sa.DateTime(), nullable=False),
+            sa.Column("last_movement_id", sa.Integer(), nullable=False),
+            sa.Column(
+                "created_at",
+                sa.DateTime(),
+                nullable=False,
+                server_default=sa.func.now(),
+            ),
+        )
+        op.create_index(
+            "ix_stock_snapshot_snapshot_at",
+            SNAPSHOT_TABLE,
+            ["snapshot_at"],
+            unique=False,
+        )
+
+    if not _has_table(SNAPSHOT_LINE_TABLE, bind):
+        op.create_table(
+            SNAPSHOT_LINE_TABLE,
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("snapshot_id", sa.Integer(), nullable=False),
+            sa.Column("location_id", sa.Integer(), nullable=True),
+            sa.Column("item_id", sa.Integer(), nullable=False),
+            sa.Column("quantity", sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(
+                ["snapshot_id"],
+                [f"{SNAPSHOT_TABLE}.id"],
+                name="fk_stock_snapshot_line_snapshot",
+                ondelete="CASCADE",
+            ),
+        )
+        op.create_index(
+            "ix_stock_snapshot_line_snapshot_location_item",
+            SNAPSHOT_LINE_TABLE,
+            ["snapshot_id", "location_id", "item_id"],
+            unique=False,
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    if _has_table(SNAPSHOT_LINE_TABLE, bind):
+        op.drop_index(
+            "ix_stock_snapshot_line_snapshot_location_item",
+            table_name=SNAPSHOT_LINE_TABLE,
+        )
+        op.drop_table(SNAPSHOT_LINE_TABLE)
+
+    if _has_table(SNAPSHOT_TABLE, bind):
+        op.drop_index("ix_stock_snapshot_snapshot_at", table_name=SNAPSHOT_TABLE)
+        op.drop_table(SNAPSHOT_TABLE)
+
+    if _has_table(MOVEMENT_TABLE, bind):
+        op.drop_index("ix_stock_movement_occurred", table_name=MOVEMENT_TABLE)
+        op.drop_index("ix_stock_movement_item_occurred", table_name=MOVEMENT_TABLE)
+        op.drop_index(
+            "ix_stock_movement_location_item_occurred", table_name=MOVEMENT_TABLE
+        )
+        op.drop_table(MOVEMENT_TABLE)
@@ -0,0 +1,111 @@
+"""create precomputed purchase recommendation tables
+
+Revision ID: 202610180003
+Revises: 202610180002
+Create Date: 2026-10-18 00:03:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "202610180003"
+down_revision = "202610180002"
+branch_labels = None
+depends_on = None
+
+
+RUN_TABLE = "purchase_recommendation_run"
+LINE_TABLE = "purchase_recommendation_line"
+
+
+def _has_table(table_name: str, bind) -> bool:
+    inspector = sa.inspect(bind)
+    return inspector.has_table(table_name)
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    if not _has_table(RUN_TABLE, bind):
+        op.create_table(
+            RUN_TABLE,
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("generated_at", sa.DateTime(), nullable=False),
+            sa.Column("lookback_days", sa.Integer(), nullable=False),
+            sa.Column(
+                "method",
+                sa.String(length=20),
+                nullable=False,
+                server_default="average",
+            ),
+            sa.Column("line_count", sa.Integer(), nullable=False),
+        )
+        op.create_index(
+            "ix_purchase_recommendation_run_generated_at",
+            RUN_TABLE,
+            ["generated_at"],
+            unique=False,
+        )
+
+    if not _has_table(LINE_TABLE, bind):
+        op.create_table(
+            LINE_TABLE,
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("run_id", sa.Integer(), nullable=False),
+            sa.Column("item_id", sa.Integer(), nullable=False),
+            sa.Column("location_id", sa.Integer(), nullable=False),
+            sa.Column("sales_qty", sa.Float(), nullable=False),
+            sa.Column("transfer_in_qty", sa.Float(), nullable=False),
+            sa.Column("transfer_out_qty", sa.Float(), nullable=False),
+            sa.Column("invoice_qty", sa.Float(), nullable=False),
+            sa.Column("base_consumption", sa.Float(), nullable=False),
+            sa.Column("default_unit_id", sa.Integer(), nullable=True),
+            sa.Column("last_activity_at", sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(
+                ["run_id"],
+                [f"{RUN_TABLE}.id"],
+                name="fk_purchase_recommendation_line_run",
+                ondelete="CASCADE",
+            ),
+            sa.ForeignKeyConstraint(
+                ["item_id"], ["item.id"], name="fk_purchase_recommendation_line_item"
+            ),
+            sa.ForeignKeyConstraint(
+                ["location_id"],
+                ["location.id"],
+                name="fk_purchase_recommendation_line_location",
+            ),
+        )
+        op.create_index(
+            "ix_purchase_recommendation_line_run_location",
+            LINE_TABLE,
+            ["run_id", "location_id"],
+            unique=False,
+        )
+        op.create_index(
+            "ix_purchase_recommendation_line_run_item",
+            LINE_TABLE,
+            ["run_id", "item_id"],
+            unique=False,
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    if _has_table(LINE_TABLE, bind):
+        op.drop_index(
+            "ix_purchase_recommendation_line_run_item", table_name=LINE_TABLE
+        )
+        op.drop_index(
+            "ix_purchase_recommendation_line_run_location", table_name=LINE_TABLE
+        )
+        op.drop_table(LINE_TABLE)
+
+    if _has_table(RUN_TABLE, bind):
+        op.drop_index(
+            "ix_purchase_recommendation_run_generated_at", table_name=RUN_TABLE
+        )
+        op.drop_table(RUN_TABLE)
@@ -0,0 +1,63 @@
+"""create server-side result store
+
+Revision ID: 202610180004
+Revises: 202610180003
+Create Date: 2026-10-18 00:04:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "202610180004"
+down_revision = "202610180003"
+branch_labels = None
+depends_on = None
+
+
+TABLE = "result_store_entry"
+
+
+def _has_table(table_name: str, bind) -> bool:
+    inspector = sa.inspect(bind)
+    return inspector.has_table(table_name)
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    if not _has_table(TABLE, bind):
+        op.create_table(
+            TABLE,
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("token", sa.String(length=64), nullable=False),
+            sa.Column("namespace", sa.String(length=64), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column("payload", sa.JSON(), nullable=False),
+            sa.Column(
+                "created_at",
+                sa.DateTime(),
+                nullable=False,
+                server_default=sa.func.now(),
+            ),
+            sa.Column("expires_at", sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(
+                ["user_id"], ["user.id"], name="fk_result_store_entry_user"
+            ),
+            sa.UniqueConstraint("token", name="uq_result_store_entry_token"),
+        )
+        op.create_index(
+            "ix_result_store_entry_expires_at",
+            TABLE,
+            ["expires_at"],
+            unique=False,
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    if _has_table(TABLE, bind):
+        op.drop_index("ix_result_store_entry_expires_at", table_name=TABLE)
+        op.drop_table(TABLE)
@@ -0,0 +1,100 @@
+"""create terminal sales staging tables
+
+Revision ID: 202610180005
+Revises: 202610180004
+Create Date: 2026-10-18 00:05:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "202610180005"
+down_revision = "202610180004"
+branch_labels = None
+depends_on = None
+
+
+SALES_TABLE = "terminal_sales_staged_sale"
+TOTALS_TABLE = "terminal_sales_staged_total"
+STATE_TABLE = "terminal_sales_resolution_state"
+
+
+def _has_table(table_name: str, bind) -> bool:
+    inspector = sa.inspect(bind)
+    return inspector.has_table(table_name)
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    if not _has_table(SALES_TABLE, bind):
+        op.create_table(
+            SALES_TABLE,
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("state_id", sa.Integer(), nullable=False),
+            sa.Column("position", sa.Integer(), nullable=False),
+            sa.Column("event_location_id", sa.Integer(), nullable=False),
+            sa.Column("product_id", sa.Integer(), nullable=True),
+            sa.Column("product_name", sa.String(length=255), nullable=True),
+            sa.Column("source_name", sa.String(length=255), nullable=True),
+            sa.Column("normalized_name", sa.String(length=255), nullable=True),
+            sa.Column("product_price", sa.Float(), nullable=True),
+            sa.Column("quantity", sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(
+                ["state_id"],
+                [f"{STATE_TABLE}.id"],
+                name="fk_terminal_sales_staged_sale_state",
+                ondelete="CASCADE",
+            ),
+        )
+        op.create_index(
+            "ix_terminal_sales_staged_sale_state_position",
+            SALES_TABLE,
+            ["state_id", "position"],
+            unique=False,
+        )
+
+    if not _has_table(TOTALS_TABLE, bind):
+        op.create_table(
+            TOTALS_TABLE,
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("state_id", sa.Integer(), nullable=False),
+            sa.Column("position", sa.Integer(), nullable=False),
+            sa.Column("event_location_id", sa.Integer(), nullable=False),
+            sa.Column("source_location", sa.String(length=255), nullable=True),
+            sa.Column("total_quantity", sa.Float(), nullable=True),
+            sa.Column("total_amount", sa.Float(), nullable=True),
+            sa.Column("net_including_tax_total", sa.Float(), nullable=True),
+            sa.Column("discount_total", sa.Float(), nullable=True),
+            sa.Column("variance_details", sa.JSON(), nullable=True),
+            sa.ForeignKeyConstraint(
+                ["state_id"],
+                [f"{STATE_TABLE}.id"],
+                name="fk_terminal_sales_staged_total_state",
+                ondelete="CASCADE",
+            ),
+        )
+        op.create_index(
+            "ix_terminal_sales_staged_total_state_position",
+            TOTALS_TABLE,
+            ["state_id", "position"],
+            unique=False,
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    if _has_table(TOTALS_TABLE, bind):
+        op.drop_index(
+            "ix_terminal_sales_staged_total_state_position", table_name=TOTALS_TABLE
+        )
+        op.drop_table(TOTALS_TABLE)
+
+    if _has_table(SALES_TABLE, bind):
+        op.drop_index(
+            "ix_terminal_sales_staged_sale_state_position", table_name=SALES_TABLE
+        )
+        op.drop_table(SALES_TABLE)
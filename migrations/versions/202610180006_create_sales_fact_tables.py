@@ -0,0 +1,104 @@
+"""create sales fact and event close summary tables
+
+Revision ID: 202610180006
+Revises: 202610180005
+Create Date: 2026-10-18 00:06:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "202610180006"
+down_revision = "202610180005"
+branch_labels = None
+depends_on = None
+
+
+FACT_TABLE = "sales_fact"
+SUMMARY_TABLE = "event_close_summary"
+
+
+def _has_table(table_name: str, bind) -> bool:
+    inspector = sa.inspect(bind)
+    return inspector.has_table(table_name)
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    if not _has_table(FACT_TABLE, bind):
+        op.create_table(
+            FACT_TABLE,
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("sale_date", sa.Date(), nullable=False),
+            sa.Column("location_id", sa.Integer(), nullable=False),
+            sa.Column("product_id", sa.Integer(), nullable=False),
+            sa.Column("event_id", sa.Integer(), nullable=True),
+            sa.Column("quantity", sa.Float(), nullable=False),
+            sa.Column("amount", sa.Float(), nullable=False),
+            sa.Column("last_sold_at", sa.DateTime(), nullable=True),
+            sa.Column("archived_at", sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(
+                ["location_id"], ["location.id"], name="fk_sales_fact_location"
+            ),
+            sa.ForeignKeyConstraint(
+                ["product_id"], ["product.id"], name="fk_sales_fact_product"
+            ),
+            sa.ForeignKeyConstraint(
+                ["event_id"],
+                ["event.id"],
+                name="fk_sales_fact_event",
+                ondelete="SET NULL",
+            ),
+        )
+        op.create_index(
+            "ix_sales_fact_date_location_product",
+            FACT_TABLE,
+            ["sale_date", "location_id", "product_id"],
+            unique=False,
+        )
+        op.create_index(
+            "ix_sales_fact_product_date",
+            FACT_TABLE,
+            ["product_id", "sale_date"],
+            unique=False,
+        )
+        op.create_index(
+            "ix_sales_fact_event", FACT_TABLE, ["event_id"], unique=False
+        )
+
+    if not _has_table(SUMMARY_TABLE, bind):
+        op.create_table(
+            SUMMARY_TABLE,
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("event_id", sa.Integer(), nullable=False),
+            sa.Column("closed_at", sa.DateTime(), nullable=False),
+            sa.Column("terminal_quantity", sa.Float(), nullable=False),
+            sa.Column("terminal_amount", sa.Float(), nullable=False),
+            sa.Column("variance_quantity", sa.Float(), nullable=False),
+            sa.Column("variance_cost", sa.Float(), nullable=False),
+            sa.Column("location_totals", sa.JSON(), nullable=True),
+            sa.Column("top_products", sa.JSON(), nullable=True),
+            sa.ForeignKeyConstraint(
+                ["event_id"],
+                ["event.id"],
+                name="fk_event_close_summary_event",
+                ondelete="CASCADE",
+            ),
+            sa.UniqueConstraint("event_id", name="uq_event_close_summary_event"),
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    if _has_table(SUMMARY_TABLE, bind):
+        op.drop_table(SUMMARY_TABLE)
+
+    if _has_table(FACT_TABLE, bind):
+        op.drop_index("ix_sales_fact_event", table_name=FACT_TABLE)
+        op.drop_index("ix_sales_fact_product_date", table_name=FACT_TABLE)
+        op.drop_index("ix_sales_fact_date_location_product", table_name=FACT_TABLE)
+        op.drop_table(FACT_TABLE)
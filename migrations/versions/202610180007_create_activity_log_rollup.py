@@ -0,0 +1,71 @@
+"""index activity log timestamps and create daily activity rollups
+
+Revision ID: 202610180007
+Revises: 202610180006
+Create Date: 2026-10-18 00:07:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "202610180007"
+down_revision = "202610180006"
+branch_labels = None
+depends_on = None
+
+
+LOG_TABLE = "activity_log"
+ROLLUP_TABLE = "activity_log_rollup"
+
+
+def _has_table(table_name: str, bind) -> bool:
+    inspector = sa.inspect(bind)
+    return inspector.has_table(table_name)
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    if _has_table(LOG_TABLE, bind):
+        op.create_index(
+            "ix_activity_log_timestamp",
+            LOG_TABLE,
+            ["timestamp"],
+            if_not_exists=True,
+        )
+
+    if not _has_table(ROLLUP_TABLE, bind):
+        op.create_table(
+            ROLLUP_TABLE,
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("day", sa.Date(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column("action", sa.String(length=64), nullable=False),
+            sa.Column("count", sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(
+                ["user_id"],
+                ["user.id"],
+                name="fk_activity_log_rollup_user",
+                ondelete="SET NULL",
+            ),
+        )
+        op.create_index(
+            "ix_activity_log_rollup_day_user_action",
+            ROLLUP_TABLE,
+            ["day", "user_id", "action"],
+            unique=False,
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    if _has_table(ROLLUP_TABLE, bind):
+        op.drop_index("ix_activity_log_rollup_day_user_action", table_name=ROLLUP_TABLE)
+        op.drop_table(ROLLUP_TABLE)
+    if _has_table(LOG_TABLE, bind):
+        op.drop_index(
+            "ix_activity_log_timestamp", table_name=LOG_TABLE, if_exists=True
+        )
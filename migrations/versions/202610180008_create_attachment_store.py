@@ -0,0 +1,84 @@
+"""create the attachment table and reference columns for stored uploads
+
+Revision ID: 202610180008
+Revises: 202610180007
+Create Date: 2026-10-18 00:08:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "202610180008"
+down_revision = "202610180007"
+branch_labels = None
+depends_on = None
+
+
+ATTACHMENT_TABLE = "attachment"
+REFERENCE_COLUMNS = (
+    ("purchase_order", "source_attachment_sha256"),
+    ("terminal_sales_resolution_state", "attachment_sha256"),
+)
+
+
+def _has_table(table_name: str, bind) -> bool:
+    inspector = sa.inspect(bind)
+    return inspector.has_table(table_name)
+
+
+def _has_column(table_name: str, column_name: str, bind) -> bool:
+    inspector = sa.inspect(bind)
+    if not inspector.has_table(table_name):
+        return False
+    return column_name in {
+        column["name"] for column in inspector.get_columns(table_name)
+    }
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    if not _has_table(ATTACHMENT_TABLE, bind):
+        op.create_table(
+            ATTACHMENT_TABLE,
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("sha256", sa.String(length=64), nullable=False),
+            sa.Column("filename", sa.String(length=255), nullable=True),
+            sa.Column("size", sa.Integer(), nullable=False),
+            sa.Column("stored_size", sa.Integer(), nullable=False),
+            sa.Column(
+                "ref_count", sa.Integer(), nullable=False, server_default="0"
+            ),
+            sa.Column(
+                "created_at",
+                sa.DateTime(),
+                nullable=False,
+                server_default=sa.func.now(),
+            ),
+            sa.Column(
+                "last_referenced_at",
+                sa.DateTime(),
+                nullable=False,
+                server_default=sa.func.now(),
+            ),
+            sa.UniqueConstraint("sha256", name="uq_attachment_sha256"),
+        )
+
+    for table, column in REFERENCE_COLUMNS:
+        if not _has_table(table, bind) or _has_column(table, column, bind):
+            continue
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column(column, sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    for table, column in REFERENCE_COLUMNS:
+        if _has_column(table, column, bind):
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.drop_column(column)
+    if _has_table(ATTACHMENT_TABLE, bind):
+        op.drop_table(ATTACHMENT_TABLE)
@@ -0,0 +1,106 @@
+"""add a stored, indexed last sold timestamp to products
+
+Revision ID: 202610180009
+Revises: 202610180008
+Create Date: 2026-10-18 00:09:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "202610180009"
+down_revision = "202610180008"
+branch_labels = None
+depends_on = None
+
+
+INDEXES = (
+    ("ix_product_last_sold_at", "product", ["last_sold_at"]),
+    ("ix_terminal_sale_product_sold_at", "terminal_sale", ["product_id", "sold_at"]),
+    ("ix_invoice_product_product_id", "invoice_product", ["product_id"]),
+)
+
+# Latest sale of ``product.id`` per source, with the tables each one reads.
+# Mirrors app.services.product_last_sold.
+SOURCES = (
+    (
+        ("invoice_product", "invoice"),
+        "SELECT MAX(invoice.date_created) FROM invoice_product"
+        " JOIN invoice ON invoice.id = invoice_product.invoice_id"
+        " WHERE invoice_product.product_id = product.id",
+    ),
+    (
+        ("terminal_sale",),
+        "SELECT MAX(terminal_sale.sold_at) FROM terminal_sale"
+        " WHERE terminal_sale.product_id = product.id",
+    ),
+    (
+        ("sales_fact",),
+        "SELECT MAX(sales_fact.last_sold_at) FROM sales_fact"
+        " WHERE sales_fact.product_id = product.id",
+    ),
+    (
+        ("pos_sales_import_row", "pos_sales_import_location", "pos_sales_import"),
+        "SELECT MAX(pos_sales_import.received_at) FROM pos_sales_import_row"
+        " JOIN pos_sales_import_location"
+        " ON pos_sales_import_location.id = pos_sales_import_row.location_import_id"
+        " JOIN pos_sales_import"
+        " ON pos_sales_import.id = pos_sales_import_location.import_id"
+        " WHERE pos_sales_import_row.product_id = product.id"
+        " AND pos_sales_import.status = 'approved'"
+        " AND NOT pos_sales_import_row.is_zero_quantity",
+    ),
+)
+
+
+def _has_table(table_name: str, bind) -> bool:
+    inspector = sa.inspect(bind)
+    return inspector.has_table(table_name)
+
+
+def _has_column(table_name: str, column_name: str, bind) -> bool:
+    inspector = sa.inspect(bind)
+    if not inspector.has_table(table_name):
+        return False
+    return column_name in {
+        column["name"] for column in inspector.get_columns(table_name)
+    }
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    if not _has_table("product", bind):
+        return
+    if not _has_column("product", "last_sold_at", bind):
+        with op.batch_alter_table("product") as batch_op:
+            batch_op.add_column(sa.Column("last_sold_at", sa.DateTime(), nullable=True))
+
+    for name, table, columns in INDEXES:
+        if _has_table(table, bind):
+            op.create_index(name, table, columns, if_not_exists=True)
+
+    # Raise each product to the latest sale of every source in turn.
+    for tables, latest in SOURCES:
+        if not all(_has_table(table, bind) for table in tables):
+            continue
+        op.execute(
+            sa.text(
+                f"UPDATE product SET last_sold_at = ({latest})"
+                f" WHERE ({latest}) IS NOT NULL"
+                f" AND (last_sold_at IS NULL OR ({latest}) > last_sold_at)"
+            )
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    for name, table, _columns in INDEXES:
+        if _has_table(table, bind):
+            op.drop_index(name, table_name=table, if_exists=True)
+    if _has_column("product", "last_sold_at", bind):
+        with op.batch_alter_table("product") as batch_op:
+            batch_op.drop_column("last_sold_at")
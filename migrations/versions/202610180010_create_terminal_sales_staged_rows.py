@@ -0,0 +1,73 @@
+"""stage parsed terminal sales upload rows
+
+Revision ID: 202610180010
+Revises: 202610180009
+Create Date: 2026-10-18 00:10:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "202610180010"
+down_revision = "202610180009"
+branch_labels = None
+depends_on = None
+
+
+ROWS_TABLE = "terminal_sales_staged_row"
+STATE_TABLE = "terminal_sales_resolution_state"
+
+
+def _has_table(table_name: str, bind) -> bool:
+    inspector = sa.inspect(bind)
+    return inspector.has_table(table_name)
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    if not _has_table(ROWS_TABLE, bind):
+        op.create_table(
+            ROWS_TABLE,
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("state_id", sa.Integer(), nullable=False),
+            sa.Column("position", sa.Integer(), nullable=False),
+            sa.Column("location", sa.String(length=255), nullable=False),
+            sa.Column("product", sa.String(length=255), nullable=True),
+            sa.Column(
+                "is_location_total",
+                sa.Boolean(),
+                nullable=False,
+                server_default=sa.text("0"),
+            ),
+            sa.Column("quantity", sa.Float(), nullable=True),
+            sa.Column("price", sa.Float(), nullable=True),
+            sa.Column("raw_price", sa.Float(), nullable=True),
+            sa.Column("amount", sa.Float(), nullable=True),
+            sa.Column("net_including_tax_total", sa.Float(), nullable=True),
+            sa.Column("discount_total", sa.Float(), nullable=True),
+            sa.ForeignKeyConstraint(
+                ["state_id"],
+                [f"{STATE_TABLE}.id"],
+                name="fk_terminal_sales_staged_row_state",
+                ondelete="CASCADE",
+            ),
+        )
+        op.create_index(
+            "ix_terminal_sales_staged_row_state_position",
+            ROWS_TABLE,
+            ["state_id", "position"],
+            unique=False,
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    if _has_table(ROWS_TABLE, bind):
+        op.drop_index(
+            "ix_terminal_sales_staged_row_state_position", table_name=ROWS_TABLE
+        )
+        op.drop_table(ROWS_TABLE)
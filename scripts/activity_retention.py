@@ -0,0 +1,86 @@
+"""Archive old activity log entries or search the archive.
+
+Examples::
+
+    python scripts/activity_retention.py archive
+    python scripts/activity_retention.py archive --days 30 --batch-size 1000
+    python scripts/activity_retention.py search --activity "Closed event" --start 2025-01-01
+
+``archive`` uses ``ACTIVITY_LOG_RETENTION_DAYS`` unless ``--days`` is given
+and commits after every batch, so it can be interrupted and rerun.
+"""
+
+from pathlib import Path
+import argparse
+import datetime
+import sys
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from app import create_app
+from app.services.activity_retention import (
+    DEFAULT_BATCH_SIZE,
+    SEARCH_LIMIT,
+    archive_activity,
+    search_archive,
+)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    archive = subcommands.add_parser("archive", help="Archive old entries now.")
+    archive.add_argument("--days", type=int, help="Keep this many days of activity.")
+    archive.add_argument("--batch-size", type=int)
+    search = subcommands.add_parser("search", help="Print archived entries.")
+    search.add_argument("--user", type=int, dest="user_id")
+    search.add_argument("--activity")
+    search.add_argument("--start", type=datetime.date.fromisoformat)
+    search.add_argument("--end", type=datetime.date.fromisoformat)
+    search.add_argument("--limit", type=int, default=SEARCH_LIMIT)
+    args = parser.parse_args(argv)
+
+    app, _ = create_app([])
+    folder = app.config["ACTIVITY_ARCHIVE_FOLDER"]
+    with app.app_context():
+        if args.command == "archive":
+            days = (
+                args.days
+                if args.days is not None
+                else app.config["ACTIVITY_LOG_RETENTION_DAYS"]
+            )
+            if days <= 0:
+                print("Activity log retention is disabled.")
+                return 0
+            cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+            result = archive_activity(
+                folder,
+                cutoff,
+                batch_size=args.batch_size
+                or app.config.get("ACTIVITY_LOG_PURGE_BATCH_SIZE")
+                or DEFAULT_BATCH_SIZE,
+            )
+            print(
+                f"Archived {result.archived} entries older than "
+                f"{cutoff:%Y-%m-%d %H:%M} into {len(result.files)} file(s) in {folder}."
+            )
+            return 0
+
+        entries = search_archive(
+            folder,
+            user_id=args.user_id,
+            activity=args.activity,
+            start=args.start,
+            end=args.end,
+            limit=args.limit,
+        )
+        for entry in entries:
+            user = entry.user_email or entry.user_id or "system"
+            print(f"{entry.timestamp:%Y-%m-%d %H:%M:%S}\t{user}\t{entry.activity}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,62 @@
+"""Maintain the content-addressed attachment store.
+
+Examples::
+
+    python scripts/attachment_store.py gc
+    python scripts/attachment_store.py gc --grace-hours 0
+    python scripts/attachment_store.py recount
+
+``gc`` recounts references, then removes stored files nothing has referred
+to for ``ATTACHMENT_GC_GRACE_HOURS`` (or ``--grace-hours``).
+"""
+
+from pathlib import Path
+import argparse
+import datetime
+import sys
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from app import create_app, db
+from app.services.attachment_store import (
+    collect_garbage,
+    recount_references,
+    store_folder,
+)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    gc = subcommands.add_parser("gc", help="Remove unreferenced files now.")
+    gc.add_argument("--grace-hours", type=float)
+    subcommands.add_parser("recount", help="Recount references only.")
+    args = parser.parse_args(argv)
+
+    app, _ = create_app([])
+    with app.app_context():
+        if args.command == "recount":
+            changed = recount_references(db.session)
+            db.session.commit()
+            print(f"Corrected the reference count of {changed} attachment(s).")
+            return 0
+
+        grace_hours = (
+            args.grace_hours
+            if args.grace_hours is not None
+            else app.config["ATTACHMENT_GC_GRACE_HOURS"]
+        )
+        result = collect_garbage(
+            db.session, grace=datetime.timedelta(hours=grace_hours)
+        )
+        print(
+            f"Removed {result.removed} file(s), {result.freed_bytes} bytes, from "
+            f"{store_folder(app)}; corrected {result.recounted} reference count(s)."
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
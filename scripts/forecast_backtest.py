@@ -0,0 +1,61 @@
+"""Score the seasonal smoothing forecast against recent history.
+
+Examples::
+
+    python scripts/forecast_backtest.py
+    python scripts/forecast_backtest.py --lookback 180 --holdout 28
+    python scripts/forecast_backtest.py --location 4 --alpha 0.2
+
+The model is fitted on the lookback window minus the holdout and compared
+with what actually sold in the holdout days. ``baseline`` is the score of
+the plain lookback average the recommendations page uses by default.
+"""
+
+from pathlib import Path
+import argparse
+import sys
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from app import create_app
+from app.utils.forecast_engine import DEFAULT_ALPHA
+from app.utils.forecasting import DemandForecastingHelper
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lookback", type=int, default=90, help="History days.")
+    parser.add_argument("--holdout", type=int, default=14, help="Days to score.")
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA)
+    parser.add_argument("--location", type=int, action="append", dest="locations")
+    parser.add_argument("--item", type=int, action="append", dest="items")
+    args = parser.parse_args(argv)
+
+    app, _ = create_app([])
+    with app.app_context():
+        helper = DemandForecastingHelper(lookback_days=args.lookback)
+        try:
+            result = helper.backtest(
+                holdout_days=args.holdout,
+                location_ids=args.locations,
+                item_ids=args.items,
+                alpha=args.alpha,
+            )
+        except ValueError as exc:
+            print(exc, file=sys.stderr)
+            return 2
+    print(
+        f"series={result.series} holdout_days={result.holdout_days} "
+        f"actual={result.actual_total:g}"
+    )
+    print(
+        f"mae={result.mae:.4f} wape={result.wape:.4f} bias={result.bias:+.4f} "
+        f"baseline_wape={result.baseline_wape:.4f}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
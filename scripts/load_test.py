@@ -0,0 +1,656 @@
+"""Replay an event-day request mix against a running instance.
+
+Virtual stand managers log in as the synthetic users created by
+``scripts/generate_synthetic_data.py`` and repeatedly scan UPCs, save stand
+sheets, upload terminal sales, pull bulk stand sheets, load the dashboard and
+search items. The run reports throughput, latency percentiles and the rate of
+``database is locked`` failures per scenario so gunicorn/eventlet/SQLite
+changes can be compared with numbers.
+
+The harness mutates data: point the server at a scratch database and disable
+login rate limiting for the run::
+
+    DATABASE_PATH=/tmp/load.db python scripts/generate_synthetic_data.py --scale medium --create-schema
+    DATABASE_PATH=/tmp/load.db RATELIMIT_ENABLED=0 SESSION_COOKIE_SECURE=0 gunicorn -c gunicorn.conf.py run:app
+    DATABASE_PATH=/tmp/load.db python scripts/load_test.py --users 40 --duration 120 --json load.json
+
+Targets (events, stands, UPCs, users) are discovered read-only from
+``DATABASE_PATH``. Only the Python standard library is required; terminal
+sales uploads generate a PDF with ``reportlab`` unless ``--sales-file`` is
+given.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from http.cookiejar import CookieJar
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import argparse
+import json
+import math
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from app.utils.synthetic_data import SYNTHETIC_USER_PASSWORD
+
+DEFAULT_MIX = {
+    "scan_counts": 35,
+    "stand_sheet_save": 15,
+    "upload_terminal_sales": 5,
+    "bulk_stand_sheets": 5,
+    "dashboard": 20,
+    "item_search": 20,
+}
+LOCKED_MARKER = b"database is locked"
+_CSRF_RE = re.compile(
+    rb'name=["\']csrf_token["\'][^>]*value=["\']([^"\']+)["\']', re.IGNORECASE
+)
+
+
+# ----------------------------------------------------------------------
+# Target discovery
+# ----------------------------------------------------------------------
+@dataclass
+class Stand:
+    location_id: int
+    name: str
+    item_ids: List[int]
+
+
+@dataclass
+class EventTarget:
+    event_id: int
+    event_type: str
+    stands: List[Stand]
+
+
+@dataclass
+class Workload:
+    users: List[str]
+    event: EventTarget
+    scan_event: Optional[EventTarget]
+    upcs: List[str]
+    search_terms: List[str]
+    product_names: List[str]
+
+
+def _database_path(explicit: Optional[str]) -> str:
+    path = explicit or os.getenv("DATABASE_PATH") or str(Path.cwd() / "inventory.db")
+    if os.path.isdir(path):
+        path = os.path.join(path, "inventory.db")
+    if not os.path.exists(path):
+        raise SystemExit(f"Database not found at {path}; set DATABASE_PATH.")
+    return path
+
+
+def _load_event(conn, event_id: int) -> EventTarget:
+    row = conn.execute(
+        "SELECT id, event_type FROM event WHERE id = ?", (event_id,)
+    ).fetchone()
+    if row is None:
+        raise SystemExit(f"Event {event_id} does not exist.")
+    stands = []
+    for location_id, name in conn.execute(
+        "SELECT el.location_id, l.name FROM event_location el "
+        "JOIN location l ON l.id = el.location_id "
+        "WHERE el.event_id = ? AND NOT el.confirmed ORDER BY el.id",
+        (event_id,),
+    ):
+        item_ids = [
+            item_id
+            for (item_id,) in conn.execute(
+                "SELECT item_id FROM location_stand_item WHERE location_id = ? "
+                "ORDER BY item_id",
+                (location_id,),
+            )
+        ]
+        stands.append(Stand(location_id, name, item_ids))
+    if not stands:
+        raise SystemExit(f"Event {event_id} has no unconfirmed stands.")
+    return EventTarget(row[0], row[1], stands)
+
+
+def _busiest_open_event(conn, event_type: Optional[str] = None) -> Optional[int]:
+    sql = (
+        "SELECT e.id FROM event e JOIN event_location el ON el.event_id = e.id "
+        "WHERE NOT e.closed AND NOT el.confirmed"
+    )
+    params: Tuple = ()
+    if event_type:
+        sql += " AND e.event_type = ?"
+        params = (event_type,)
+    sql += " GROUP BY e.id ORDER BY COUNT(el.id) DESC, e.id DESC LIMIT 1"
+    row = conn.execute(sql, params).fetchone()
+    return row[0] if row else None
+
+
+def discover_workload(database: str, event_id: Optional[int]) -> Workload:
+    """Read users and event-day targets from the server's database."""
+
+    conn = sqlite3.connect(f"file:{database}?mode=ro", uri=True)
+    try:
+        users = [
+            email
+            for (email,) in conn.execute(
+                "SELECT email FROM user WHERE email LIKE 'synthetic-user-%' "
+                "AND active ORDER BY id"
+            )
+        ]
+        if not users:
+            raise SystemExit(
+                "No synthetic users found; run scripts/generate_synthetic_data.py."
+            )
+        event_id = event_id or _busiest_open_event(conn)
+        if event_id is None:
+            raise SystemExit("No open events with unconfirmed stands were found.")
+        event = _load_event(conn, event_id)
+        if event.event_type == "inventory":
+            scan_event = event
+        else:
+            scan_event_id = _busiest_open_event(conn, "inventory")
+            scan_event = _load_event(conn, scan_event_id) if scan_event_id else None
+
+        stand_item_ids = sorted(
+            {item_id for stand in event.stands for item_id in stand.item_ids}
+        )[:5000]
+        upcs = []
+        if stand_item_ids:
+            placeholders = ",".join("?" for _ in stand_item_ids)
+            upcs = [
+                upc
+                for (upc,) in conn.execute(
+                    f"SELECT upc FROM item WHERE id IN ({placeholders}) "
+                    "AND upc IS NOT NULL AND upc != ''",
+                    stand_item_ids,
+                )
+            ]
+        search_terms = sorted(
+            {
+                name.split()[0]
+                for (name,) in conn.execute(
+                    "SELECT name FROM item WHERE NOT archived ORDER BY id LIMIT 500"
+                )
+                if name.split()
+            }
+        )
+        product_names = [
+            name
+            for (name,) in conn.execute(
+                "SELECT p.name FROM product p JOIN location_products lp "
+                "ON lp.product_id = p.id WHERE lp.location_id = ? LIMIT 40",
+                (event.stands[0].location_id,),
+            )
+        ]
+    finally:
+        conn.close()
+    return Workload(users, event, scan_event, upcs, search_terms, product_names)
+
+
+# ----------------------------------------------------------------------
+# HTTP session
+# ----------------------------------------------------------------------
+@dataclass
+class Result:
+    scenario: str
+    seconds: float
+    status: int
+    locked: bool
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    """Cookie-aware client holding one logged-in user's session."""
+
+    def __init__(self, base_url: str, timeout: float) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.cookies = CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect()
+        )
+        self.csrf_token = ""
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        data: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Tuple[int, bytes, Dict[str, str]]:
+        req = urllib.request.Request(
+            self.base_url + path, data=data, method=method, headers=headers or {}
+        )
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                return response.status, response.read(), dict(response.headers)
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read() or b"", dict(exc.headers or {})
+
+    def get(self, path: str, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post_form(self, path: str, fields: Dict[str, object]):
+        body = urllib.parse.urlencode(
+            {"csrf_token": self.csrf_token, **fields}
+        ).encode()
+        return self.request(
+            "POST",
+            path,
+            data=body,
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+
+    def post_json(self, path: str, payload: Dict[str, object]):
+        return self.request(
+            "POST",
+            path,
+            data=json.dumps(payload).encode(),
+            headers={
+                "Content-Type": "application/json",
+                "Accept": "application/json",
+                "X-CSRFToken": self.csrf_token,
+            },
+        )
+
+    def post_multipart(self, path: str, fields: Dict[str, str], files):
+        boundary = uuid.uuid4().hex
+        body = BytesIO()
+        for name, value in {"csrf_token": self.csrf_token, **fields}.items():
+            body.write(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"'
+                f"\r\n\r\n{value}\r\n".encode()
+            )
+        for name, (filename, content, content_type) in files.items():
+            body.write(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; '
+                f'filename="{filename}"\r\nContent-Type: {content_type}\r\n\r\n'.encode()
+            )
+            body.write(content)
+            body.write(b"\r\n")
+        body.write(f"--{boundary}--\r\n".encode())
+        return self.request(
+            "POST",
+            path,
+            data=body.getvalue(),
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        )
+
+    def refresh_csrf(self, body: bytes) -> None:
+        match = _CSRF_RE.search(body)
+        if match:
+            self.csrf_token = match.group(1).decode()
+
+    def login(self, email: str, password: str, deadline: float) -> None:
+        while True:
+            status, body, headers = self.get("/auth/login")
+            self.refresh_csrf(body)
+            if status == 200:
+                status, body, headers = self.post_form(
+                    "/auth/login", {"email": email, "password": password}
+                )
+                location = headers.get("Location", "")
+                if status in (301, 302, 303) and "/auth/login" not in location:
+                    return
+                if status != 429:
+                    raise RuntimeError(f"Login failed for {email} (HTTP {status})")
+            elif status != 429:
+                raise RuntimeError(f"Login page returned HTTP {status}")
+            if time.monotonic() >= deadline:
+                raise RuntimeError(f"Login for {email} kept hitting the rate limit")
+            time.sleep(float(headers.get("Retry-After", 5) or 5))
+
+
+# ----------------------------------------------------------------------
+# Scenarios
+# ----------------------------------------------------------------------
+def build_sales_pdf(workload: Workload, rng: random.Random) -> bytes:
+    """Render a terminal sales export the upload parser understands."""
+
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+    y = 750
+    names = workload.product_names or ["Synthetic Product"]
+    for stand in workload.event.stands:
+        for line in [stand.name] + [
+            f"{index} {name} {rng.uniform(2, 12):.2f} 0.00 {rng.randint(1, 40)}"
+            for index, name in enumerate(rng.sample(names, min(8, len(names))), 1)
+        ]:
+            if y < 40:
+                pdf.showPage()
+                y = 750
+            pdf.drawString(40, y, line)
+            y -= 14
+    pdf.save()
+    return buffer.getvalue()
+
+
+class VirtualUser(threading.Thread):
+    """Thread that logs in once and replays the weighted scenario mix."""
+
+    def __init__(
+        self,
+        index: int,
+        args,
+        workload: Workload,
+        mix: Dict[str, int],
+        sales_file: Optional[Tuple[str, bytes]],
+        results: List[Result],
+        results_lock: threading.Lock,
+        stop_at: float,
+    ) -> None:
+        super().__init__(name=f"vu-{index}", daemon=True)
+        self.rng = random.Random(args.seed + index)
+        self.email = workload.users[index % len(workload.users)]
+        self.args = args
+        self.workload = workload
+        self.sales_file = sales_file
+        self.results = results
+        self.results_lock = results_lock
+        self.stop_at = stop_at
+        self.errors: List[str] = []
+        self.session = HttpSession(args.base_url, args.timeout)
+        self.scenarios: Dict[str, Callable[[], Tuple[int, bytes]]] = {
+            "scan_counts": self.scan_counts,
+            "stand_sheet_save": self.stand_sheet_save,
+            "upload_terminal_sales": self.upload_terminal_sales,
+            "bulk_stand_sheets": self.bulk_stand_sheets,
+            "dashboard": self.dashboard,
+            "item_search": self.item_search,
+        }
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+
+    # Scenario implementations ------------------------------------------
+    def scan_counts(self):
+        target = self.workload.scan_event
+        stand = self.rng.choice(target.stands)
+        path = f"/events/{target.event_id}/locations/{stand.location_id}/scan_counts"
+        if not self.session.csrf_token:
+            _, body, _ = self.session.get(path)
+            self.session.refresh_csrf(body)
+        status, body, _ = self.session.post_json(
+            path, {"upc": self.rng.choice(self.workload.upcs), "quantity": 1}
+        )
+        return status, body
+
+    def stand_sheet_save(self):
+        event = self.workload.event
+        stand = self.rng.choice(event.stands)
+        path = f"/events/{event.event_id}/stand_sheet/{stand.location_id}"
+        status, body, _ = self.session.get(path)
+        if status != 200:
+            return status, body
+        self.session.refresh_csrf(body)
+        fields: Dict[str, object] = {"notes": "load test"}
+        for item_id in stand.item_ids:
+            opening = self.rng.randint(0, 48)
+            fields[f"open_{item_id}"] = opening
+            fields[f"close_{item_id}"] = self.rng.randint(0, opening)
+        status, body, _ = self.session.post_form(path, fields)
+        return status, body
+
+    def upload_terminal_sales(self):
+        path = f"/events/{self.workload.event.event_id}/sales/upload"
+        status, body, _ = self.session.get(path)
+        if status != 200:
+            return status, body
+        self.session.refresh_csrf(body)
+        filename, content = self.sales_file
+        content_type = (
+            "application/pdf" if filename.endswith(".pdf") else "application/vnd.ms-excel"
+        )
+        status, body, _ = self.session.post_multipart(
+            path,
+            {"program": "idealpos"},
+            {"file": (filename, content, content_type)},
+        )
+        return status, body
+
+    def bulk_stand_sheets(self):
+        status, body, _ = self.session.get(
+            f"/events/{self.workload.event.event_id}/stand_sheets"
+        )
+        return status, body
+
+    def dashboard(self):
+        status, body, _ = self.session.get("/")
+        return status, body
+
+    def item_search(self):
+        term = urllib.parse.quote(self.rng.choice(self.workload.search_terms))
+        status, body, _ = self.session.get(f"/items?name_query={term}")
+        return status, body
+
+    # Thread body -------------------------------------------------------
+    def run(self) -> None:
+        try:
+            self.session.login(self.email, self.args.password, self.stop_at)
+        except Exception as exc:
+            self.errors.append(str(exc))
+            return
+        while time.monotonic() < self.stop_at:
+            scenario = self.rng.choices(self.names, weights=self.weights)[0]
+            started = time.perf_counter()
+            try:
+                status, body = self.scenarios[scenario]()
+            except Exception as exc:  # network errors count as failures
+                status, body = 0, str(exc).encode()
+            elapsed = time.perf_counter() - started
+            result = Result(scenario, elapsed, status, LOCKED_MARKER in body)
+            with self.results_lock:
+                self.results.append(result)
+            if self.args.think_time:
+                time.sleep(self.rng.uniform(0, 2 * self.args.think_time))
+
+
+# ----------------------------------------------------------------------
+# Reporting
+# ----------------------------------------------------------------------
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Return the nearest-rank percentile of an already sorted list."""
+
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+@dataclass
+class ScenarioSummary:
+    requests: int = 0
+    errors: int = 0
+    locked: int = 0
+    latencies: List[float] = field(default_factory=list)
+
+    def as_dict(self, duration: float) -> Dict[str, float]:
+        values = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "throughput_rps": round(self.requests / duration, 2) if duration else 0,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.requests, 4) if self.requests else 0,
+            "locked_errors": self.locked,
+            "locked_rate": round(self.locked / self.requests, 4) if self.requests else 0,
+            "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+            "p90_ms": round(percentile(values, 0.90) * 1000, 1),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+            "max_ms": round(values[-1] * 1000, 1) if values else 0,
+        }
+
+
+def summarize(results: List[Result], duration: float) -> Dict[str, Dict]:
+    summaries: Dict[str, ScenarioSummary] = {}
+    total = ScenarioSummary()
+    for result in results:
+        for summary in (summaries.setdefault(result.scenario, ScenarioSummary()), total):
+            summary.requests += 1
+            summary.latencies.append(result.seconds)
+            # Redirects are the normal outcome of form posts.
+            if result.status == 0 or result.status >= 400:
+                summary.errors += 1
+            if result.locked:
+                summary.locked += 1
+    return {
+        "scenarios": {
+            name: summaries[name].as_dict(duration) for name in sorted(summaries)
+        },
+        "total": total.as_dict(duration),
+    }
+
+
+def _count_locked_log_lines(path: Optional[str]) -> int:
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path, "rb") as handle:
+        return handle.read().count(LOCKED_MARKER)
+
+
+def print_report(report: Dict[str, Dict]) -> None:
+    columns = (
+        "requests",
+        "throughput_rps",
+        "error_rate",
+        "locked_errors",
+        "p50_ms",
+        "p95_ms",
+        "p99_ms",
+        "max_ms",
+    )
+    print(f"{'scenario':<24}" + "".join(f"{column:>15}" for column in columns))
+    for name, values in report["scenarios"].items():
+        print(f"{name:<24}" + "".join(f"{values[column]:>15}" for column in columns))
+    total = report["total"]
+    print(f"{'total':<24}" + "".join(f"{total[column]:>15}" for column in columns))
+
+
+def _parse_mix(value: str) -> Dict[str, int]:
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, (chunk.strip() for chunk in value.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX or not weight.isdigit():
+            raise argparse.ArgumentTypeError(f"Invalid mix entry: {part}")
+        mix[name] = int(weight)
+    return mix
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--database", help="Server database (defaults to DATABASE_PATH).")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users.")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds to run.")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="Seconds to start all users.")
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=0.5,
+        help="Mean pause between a user's requests in seconds.",
+    )
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--event-id", type=int, help="Event to target (defaults to the busiest open event).")
+    parser.add_argument(
+        "--mix",
+        type=_parse_mix,
+        default=dict(DEFAULT_MIX),
+        help="Override scenario weights, e.g. scan_counts=50,upload_terminal_sales=0.",
+    )
+    parser.add_argument("--sales-file", type=Path, help="Terminal sales .xls/.pdf to upload.")
+    parser.add_argument("--password", default=SYNTHETIC_USER_PASSWORD)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--error-log",
+        default=str(Path.cwd() / "logs" / "errors.log"),
+        help="Server error log scanned for 'database is locked' entries.",
+    )
+    parser.add_argument("--json", type=Path, help="Write the report as JSON to this path.")
+    args = parser.parse_args(argv)
+
+    workload = discover_workload(_database_path(args.database), args.event_id)
+    mix = dict(args.mix)
+    if workload.scan_event is None or not workload.upcs:
+        print("No open inventory event with UPCs; disabling scan_counts.")
+        mix["scan_counts"] = 0
+    sales_file = None
+    if mix["upload_terminal_sales"]:
+        if args.sales_file:
+            sales_file = (args.sales_file.name, args.sales_file.read_bytes())
+        else:
+            try:
+                sales_file = (
+                    "load-test-sales.pdf",
+                    build_sales_pdf(workload, random.Random(args.seed)),
+                )
+            except ImportError:
+                print("reportlab is unavailable; disabling upload_terminal_sales.")
+                mix["upload_terminal_sales"] = 0
+    mix = {name: weight for name, weight in mix.items() if weight > 0}
+    if not mix:
+        raise SystemExit("Every scenario weight is zero.")
+
+    locked_before = _count_locked_log_lines(args.error_log)
+    results: List[Result] = []
+    results_lock = threading.Lock()
+    started = time.monotonic()
+    stop_at = started + args.ramp_up + args.duration
+    users = []
+    for index in range(args.users):
+        user = VirtualUser(
+            index, args, workload, mix, sales_file, results, results_lock, stop_at
+        )
+        users.append(user)
+        user.start()
+        if args.users > 1:
+            time.sleep(args.ramp_up / args.users)
+    for user in users:
+        user.join()
+    elapsed = time.monotonic() - started
+
+    report = summarize(results, elapsed)
+    report["run"] = {
+        "base_url": args.base_url,
+        "users": args.users,
+        "seconds": round(elapsed, 1),
+        "event_id": workload.event.event_id,
+        "mix": mix,
+        "login_failures": [error for user in users for error in user.errors],
+        "locked_errors_in_server_log": _count_locked_log_lines(args.error_log)
+        - locked_before,
+    }
+    print_report(report)
+    print(
+        f"'database is locked' in server log: "
+        f"{report['run']['locked_errors_in_server_log']}"
+    )
+    if report["run"]["login_failures"]:
+        print(f"{len(report['run']['login_failures'])} virtual users failed to log in.")
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+    return 0 if results else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,59 @@
+"""Recompute or check the stored last sold timestamp of products.
+
+Examples::
+
+    python scripts/product_last_sold.py refresh
+    python scripts/product_last_sold.py refresh --product 12 --product 40
+    python scripts/product_last_sold.py verify
+
+The app keeps ``Product.last_sold_at`` current as sales are written.
+``refresh`` recomputes it after sales were changed outside the app (for
+example by a restore or a manual SQL fix). ``verify`` exits non-zero when any
+stored value disagrees with the sales.
+"""
+
+from pathlib import Path
+import argparse
+import sys
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from app import create_app, db
+from app.models import Product
+from app.services.product_last_sold import last_sold_by_product, refresh_last_sold
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    refresh = subcommands.add_parser("refresh", help="Recompute stored values.")
+    refresh.add_argument("--product", type=int, action="append", dest="products")
+    subcommands.add_parser("verify", help="Compare stored values and sales.")
+    args = parser.parse_args(argv)
+
+    app, _ = create_app([])
+    with app.app_context():
+        if args.command == "refresh":
+            changed = refresh_last_sold(db.session, args.products)
+            db.session.commit()
+            print(f"Updated {changed} product(s).")
+            return 0
+
+        latest = last_sold_by_product(db.session)
+        stale = [
+            (product_id, stored, latest.get(product_id))
+            for product_id, stored in db.session.execute(
+                db.select(Product.id, Product.last_sold_at).order_by(Product.id)
+            )
+            if stored != latest.get(product_id)
+        ]
+        for product_id, stored, expected in stale:
+            print(f"product={product_id} stored={stored} expected={expected}")
+        print(f"{len(stale)} product(s) out of date.")
+        return 1 if stale else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
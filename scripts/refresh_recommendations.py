@@ -0,0 +1,39 @@
+"""Precompute purchase order recommendations now.
+
+Examples::
+
+    python scripts/refresh_recommendations.py
+
+The application refreshes the stored recommendations nightly; use this after
+a large import or to prime a new install without waiting for the next run.
+"""
+
+from pathlib import Path
+import argparse
+import sys
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from app import create_app, db
+from app.services.purchase_recommendations import refresh_recommendations
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args(argv)
+
+    app, _ = create_app([])
+    with app.app_context():
+        run = refresh_recommendations()
+        db.session.commit()
+        print(
+            f"Stored {run.line_count} recommendation(s) in run {run.id} "
+            f"at {run.generated_at:%Y-%m-%d %H:%M:%S}."
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
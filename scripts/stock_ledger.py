@@ -0,0 +1,88 @@
+"""Verify, checkpoint or query the perpetual stock ledger.
+
+Examples::
+
+    python scripts/stock_ledger.py verify
+    python scripts/stock_ledger.py snapshot
+    python scripts/stock_ledger.py as-of 2026-06-30T23:59 --location 4
+    python scripts/stock_ledger.py reconcile
+
+``verify`` exits non-zero when any live balance disagrees with the ledger.
+``reconcile`` appends opening movements for balances that were changed
+outside the ORM (for example by a restore or a manual SQL fix).
+"""
+
+from pathlib import Path
+import argparse
+import datetime
+import json
+import sys
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from app import create_app, db
+from app.services.stock_ledger import (
+    balances_as_of,
+    create_snapshot,
+    reconcile_balances,
+    verify_balances,
+)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("verify", help="Compare ledger and live balances.")
+    subcommands.add_parser("snapshot", help="Checkpoint current balances.")
+    subcommands.add_parser("reconcile", help="Seed ledger from live balances.")
+    as_of = subcommands.add_parser("as-of", help="Print balances at a time.")
+    as_of.add_argument("when", type=datetime.datetime.fromisoformat)
+    as_of.add_argument("--location", type=int, action="append", dest="locations")
+    as_of.add_argument("--item", type=int, action="append", dest="items")
+    args = parser.parse_args(argv)
+
+    app, _ = create_app([])
+    with app.app_context():
+        if args.command == "verify":
+            drifts = verify_balances()
+            for drift in drifts:
+                print(
+                    f"location={drift.location_id} item={drift.item_id} "
+                    f"ledger={drift.ledger_quantity:g} "
+                    f"recorded={drift.recorded_quantity:g}"
+                )
+            print(f"{len(drifts)} balance(s) out of agreement.")
+            return 1 if drifts else 0
+
+        if args.command == "snapshot":
+            snapshot = create_snapshot()
+            db.session.commit()
+            print(
+                f"Snapshot {snapshot.id} at {snapshot.snapshot_at:%Y-%m-%d %H:%M:%S} "
+                f"covers movements up to {snapshot.last_movement_id}."
+            )
+            return 0
+
+        if args.command == "reconcile":
+            written = reconcile_balances()
+            db.session.commit()
+            print(f"Recorded {written} opening movement(s).")
+            return 0
+
+        balances = balances_as_of(
+            args.when, location_ids=args.locations, item_ids=args.items
+        )
+        rows = [
+            {"location_id": location_id, "item_id": item_id, "quantity": quantity}
+            for (location_id, item_id), quantity in sorted(
+                balances.items(), key=lambda entry: (entry[0][0] or 0, entry[0][1])
+            )
+        ]
+        print(json.dumps(rows, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
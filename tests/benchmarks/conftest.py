@@ -0,0 +1,143 @@
+"""Fixtures for the hot-path benchmark suite.
+
+Benchmarks are skipped during the regular test run. Enable them with
+``--benchmark-only`` (or ``RUN_BENCHMARKS=1``) and persist results with
+pytest-benchmark's ``--benchmark-json`` / ``--benchmark-autosave`` options::
+
+    pytest tests/benchmarks --benchmark-only --benchmark-json=bench.json
+
+``BENCHMARK_SCALE`` selects the synthetic dataset size (``tiny``, ``small``,
+``medium`` or ``large``; default ``small``) and ``BENCHMARK_SEED`` overrides
+the generator seed.
+"""
+
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from app import create_admin_user, create_app, db
+from app.models import Setting
+from app.utils.synthetic_data import (
+    DEFAULT_SEED,
+    describe_scale,
+    generate_synthetic_dataset,
+)
+from app.utils.units import (
+    DEFAULT_BASE_UNIT_CONVERSIONS,
+    serialize_conversion_setting,
+)
+from tests.utils import login
+
+try:  # pragma: no cover - depends on the optional dev dependency
+    import pytest_benchmark  # noqa: F401
+except ImportError:  # pragma: no cover
+    HAS_PYTEST_BENCHMARK = False
+else:
+    HAS_PYTEST_BENCHMARK = True
+
+
+def _benchmarks_enabled(config) -> bool:
+    if os.getenv("RUN_BENCHMARKS", "").strip().lower() in {"1", "true", "yes"}:
+        return True
+    try:
+        return bool(config.getoption("benchmark_only"))
+    except ValueError:
+        return False
+
+
+def pytest_collection_modifyitems(config, items):
+    if HAS_PYTEST_BENCHMARK and _benchmarks_enabled(config):
+        return
+    reason = (
+        "pytest-benchmark is not installed"
+        if not HAS_PYTEST_BENCHMARK
+        else "benchmarks run with --benchmark-only or RUN_BENCHMARKS=1"
+    )
+    skip = pytest.mark.skip(reason=reason)
+    benchmark_dir = os.path.dirname(__file__)
+    for item in items:
+        if str(item.fspath).startswith(benchmark_dir):
+            item.add_marker(skip)
+
+
+@pytest.fixture(scope="session")
+def benchmark_dataset():
+    """Return the scale name, seed and row counts for the benchmark dataset."""
+
+    return {
+        "scale": os.getenv("BENCHMARK_SCALE", "small"),
+        "seed": int(os.getenv("BENCHMARK_SEED", DEFAULT_SEED)),
+    }
+
+
+@pytest.fixture(scope="session")
+def benchmark_app(tmp_path_factory, benchmark_dataset):
+    """Create one application with a synthetic dataset for the whole session."""
+
+    os.environ.setdefault("SECRET_KEY", "testsecret")
+    os.environ.setdefault("ADMIN_EMAIL", "admin@example.com")
+    os.environ.setdefault("ADMIN_PASS", "adminpass")
+
+    workdir = tmp_path_factory.mktemp("benchmarks")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        app, _ = create_app(["--demo"])
+    finally:
+        os.chdir(cwd)
+    app.config.update(
+        {"TESTING": True, "WTF_CSRF_ENABLED": False, "RATELIMIT_ENABLED": False}
+    )
+
+    with app.app_context():
+        db.create_all()
+        create_admin_user()
+        db.session.add_all(
+            [
+                Setting(name="GST", value=""),
+                Setting(name="DEFAULT_TIMEZONE", value="UTC"),
+                Setting(
+                    name="BASE_UNIT_CONVERSIONS",
+                    value=serialize_conversion_setting(
+                        DEFAULT_BASE_UNIT_CONVERSIONS
+                    ),
+                ),
+            ]
+        )
+        db.session.commit()
+        benchmark_dataset["rows"] = generate_synthetic_dataset(
+            benchmark_dataset["scale"], seed=benchmark_dataset["seed"]
+        )
+        benchmark_dataset["definition"] = describe_scale(benchmark_dataset["scale"])
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def app(benchmark_app):
+    """Route the shared fixtures (``gl_codes``, ``client``) to the session app."""
+
+    with benchmark_app.app_context():
+        yield benchmark_app
+
+
+@pytest.fixture(scope="session")
+def admin_client(benchmark_app):
+    """Return a test client logged in as the seeded administrator."""
+
+    client = benchmark_app.test_client()
+    with benchmark_app.app_context():
+        login(client, os.environ["ADMIN_EMAIL"], os.environ["ADMIN_PASS"])
+    return client
+
+
+@pytest.fixture
+def record_dataset(benchmark, benchmark_dataset):
+    """Attach dataset metadata to each saved benchmark result."""
+
+    benchmark.extra_info["dataset_scale"] = benchmark_dataset["scale"]
+    benchmark.extra_info["dataset_seed"] = benchmark_dataset["seed"]
+    benchmark.extra_info["dataset_rows"] = benchmark_dataset.get("rows", {})
+    return benchmark
@@ -0,0 +1,222 @@
+"""Timing benchmarks for the request paths that dominate production load."""
+
+from __future__ import annotations
+
+import os
+from datetime import date, timedelta
+
+from app import db
+from app.models import Event, EventLocation, PosSalesImport, Product, PurchaseOrder
+from app.routes.event_routes import _apply_pending_sales
+from app.services.purchase_recommendations import refresh_recommendations
+from app.utils.activity import flush_activity_logs
+from app.utils.backup import create_backup, restore_backup
+from app.utils.forecasting import DemandForecastingHelper
+
+
+def _busiest_open_event_id() -> int:
+    row = (
+        db.session.query(Event.id, db.func.count(EventLocation.id).label("stands"))
+        .join(EventLocation, EventLocation.event_id == Event.id)
+        .filter(Event.closed.is_(False))
+        .group_by(Event.id)
+        .order_by(db.desc("stands"), Event.id.desc())
+        .first()
+    )
+    assert row is not None, "synthetic dataset has no open events"
+    return row.id
+
+
+def test_dashboard(record_dataset, admin_client):
+    response = record_dataset(admin_client.get, "/")
+    assert response.status_code == 200
+
+
+def test_view_items(record_dataset, admin_client):
+    response = record_dataset(admin_client.get, "/items?per_page=100")
+    assert response.status_code == 200
+
+
+def test_item_search(record_dataset, admin_client):
+    response = record_dataset(admin_client.get, "/items?name_query=Cola")
+    assert response.status_code == 200
+
+
+def test_bulk_stand_sheets(record_dataset, admin_client, app):
+    event_id = _busiest_open_event_id()
+    response = record_dataset(admin_client.get, f"/events/{event_id}/stand_sheets")
+    assert response.status_code == 200
+
+
+def test_inventory_variance_report(record_dataset, admin_client):
+    end = date.today()
+    start = end - timedelta(days=90)
+    response = record_dataset(
+        admin_client.post,
+        "/reports/inventory-variance",
+        data={"start_date": start.isoformat(), "end_date": end.isoformat()},
+    )
+    assert response.status_code == 200
+
+
+def test_forecast_history_year(record_dataset, app):
+    # A year of transfers, terminal sales and invoices, aggregated into
+    # daily buckets in SQL.
+    helper = DemandForecastingHelper(lookback_days=365)
+    recommendations = record_dataset(helper.build_recommendations)
+    assert recommendations
+
+
+def test_forecast_smoothing_year(record_dataset, app):
+    # Same history, fitted with the vectorised seasonal smoothing model.
+    helper = DemandForecastingHelper(lookback_days=365)
+    recommendations = record_dataset(
+        helper.build_recommendations, method="smoothing", horizon_days=30
+    )
+    assert recommendations
+
+
+def test_purchase_order_recommendations(record_dataset, admin_client):
+    response = record_dataset(
+        admin_client.get, "/purchase_orders/recommendations?lookback_days=365"
+    )
+    assert response.status_code == 200
+
+
+def test_purchase_order_recommendations_precomputed(record_dataset, admin_client):
+    # The JSON feed polled by ordering scripts, served from the nightly run.
+    run = refresh_recommendations()
+    db.session.commit()
+    try:
+        response = record_dataset(
+            admin_client.get, "/purchase_orders/recommendations?format=json"
+        )
+        assert response.status_code == 200
+        assert response.get_json()["meta"]["source"] == "precomputed"
+    finally:
+        db.session.delete(db.session.merge(run))
+        db.session.commit()
+
+
+def test_apply_terminal_sales_upload(record_dataset, app):
+    # Every stand of the busiest open event reports every product, as a
+    # full multi-stand terminal export would.
+    event_id = _busiest_open_event_id()
+    stand_ids = [
+        el_id
+        for (el_id,) in db.session.query(EventLocation.id).filter(
+            EventLocation.event_id == event_id
+        )
+    ]
+    products = db.session.query(Product.id, Product.name).limit(200).all()
+    pending_sales = [
+        {
+            "event_location_id": el_id,
+            "product_id": product_id,
+            "product_name": name,
+            "normalized_name": name.lower(),
+            "quantity": float(index % 7 + 1),
+        }
+        for el_id in stand_ids
+        for index, (product_id, name) in enumerate(products)
+    ]
+    pending_totals = [
+        {"event_location_id": el_id, "total_quantity": 1.0} for el_id in stand_ids
+    ]
+
+    def apply():
+        try:
+            return _apply_pending_sales(
+                pending_sales, pending_totals, link_products_to_locations=True
+            )
+        finally:
+            db.session.rollback()
+
+    updated = record_dataset(apply)
+    assert updated
+
+
+def test_pos_import_approval(record_dataset, admin_client, app):
+    pending_ids = [
+        import_id
+        for (import_id,) in db.session.query(PosSalesImport.id)
+        .filter(PosSalesImport.status == "pending")
+        .order_by(PosSalesImport.id)
+        .all()
+    ]
+    assert pending_ids, "synthetic dataset has no pending POS imports"
+    queue = list(pending_ids)
+
+    def setup():
+        return (queue.pop(0),), {}
+
+    def approve(import_id):
+        return admin_client.post(
+            f"/controlpanel/sales-imports/{import_id}",
+            data={"action": "approve_import"},
+        )
+
+    record_dataset.pedantic(
+        approve, setup=setup, rounds=min(3, len(pending_ids)), iterations=1
+    )
+    approved = db.session.get(PosSalesImport, pending_ids[0])
+    db.session.refresh(approved)
+    assert approved.status == "approved"
+
+
+def test_receive_invoice(record_dataset, admin_client, app):
+    open_orders = (
+        PurchaseOrder.query.filter(PurchaseOrder.received.is_(False))
+        .order_by(PurchaseOrder.id)
+        .all()
+    )
+    assert open_orders, "synthetic dataset has no open purchase orders"
+    location_id = (
+        db.session.query(EventLocation.location_id).order_by(EventLocation.id).first()[0]
+    )
+    payloads = []
+    for order in open_orders:
+        data = {
+            "received_date": date.today().isoformat(),
+            "invoice_number": f"BENCH-{order.id}",
+            "gst": 0,
+            "pst": 0,
+            "delivery_charge": 0,
+            "location_id": location_id,
+        }
+        for index, line in enumerate(order.items):
+            data.update(
+                {
+                    f"items-{index}-item": line.item_id,
+                    f"items-{index}-unit": line.unit_id,
+                    f"items-{index}-quantity": line.quantity,
+                    f"items-{index}-cost": line.unit_cost or 1.0,
+                    f"items-{index}-position": index,
+                    f"items-{index}-location_id": 0,
+                }
+            )
+        payloads.append((order.id, data))
+    queue = list(payloads)
+
+    def setup():
+        return queue.pop(0), {}
+
+    def receive(order_id, data):
+        return admin_client.post(f"/purchase_orders/{order_id}/receive", data=data)
+
+    record_dataset.pedantic(
+        receive, setup=setup, rounds=min(3, len(payloads)), iterations=1
+    )
+    first_order = db.session.get(PurchaseOrder, payloads[0][0])
+    db.session.refresh(first_order)
+    assert first_order.received
+
+
+def test_restore_backup(record_dataset, app):
+    # Pending activity rows would otherwise race the restore's bulk inserts.
+    flush_activity_logs()
+    filename = create_backup()
+    path = os.path.join(app.config["BACKUP_FOLDER"], filename)
+
+    record_dataset.pedantic(restore_backup, args=(path,), rounds=1, iterations=1)
+    assert db.session.query(PurchaseOrder.id).count() > 0
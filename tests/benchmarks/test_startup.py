@@ -0,0 +1,42 @@
+"""Startup time and resident memory of a fresh application process.
+
+Each round starts a new interpreter that runs ``create_app`` the way a
+gunicorn worker, ``flask db upgrade`` or a script does. The peak RSS of the
+child processes is stored in ``extra_info``.
+"""
+
+from __future__ import annotations
+
+import os
+import resource
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+_SCRIPT = "from app import create_app\ncreate_app([])\n"
+
+
+def test_create_app_startup(benchmark, tmp_path):
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(
+            filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")])
+        ),
+    )
+    env.setdefault("SECRET_KEY", "testsecret")
+
+    def start():
+        subprocess.run(
+            [sys.executable, "-c", _SCRIPT],
+            cwd=tmp_path,
+            env=env,
+            check=True,
+            capture_output=True,
+        )
+
+    benchmark.pedantic(start, rounds=5, iterations=1, warmup_rounds=1)
+    # ru_maxrss is the largest child so far, in KiB on Linux.
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    benchmark.extra_info["max_rss_mib"] = round(children.ru_maxrss / 1024, 1)
@@ -0,0 +1,222 @@
+import datetime
+
+from app import db
+from app.models import (
+    GLCode,
+    Item,
+    ItemUnit,
+    Location,
+    LocationStandItem,
+    PurchaseInvoice,
+    PurchaseInvoiceItem,
+    PurchaseOrder,
+    User,
+    Vendor,
+)
+from app.services.purchase_receiving import receive_invoice_lines
+
+
+def _receive_line_by_line(invoice, entries):
+    """The original per-line receive loop, kept as the reference behaviour."""
+
+    for order_index, entry in enumerate(entries):
+        item_obj = db.session.get(Item, entry["item_id"])
+        unit_obj = (
+            db.session.get(ItemUnit, entry["unit_id"]) if entry["unit_id"] else None
+        )
+        prev_cost = item_obj.cost if item_obj and item_obj.cost else 0.0
+        quantity = entry["quantity"]
+        cost = entry["cost"]
+        container_deposit = entry.get("container_deposit", 0.0)
+        db.session.add(
+            PurchaseInvoiceItem(
+                invoice_id=invoice.id,
+                item_id=item_obj.id if item_obj else None,
+                unit_id=unit_obj.id if unit_obj else None,
+                item_name=item_obj.name if item_obj else "",
+                unit_name=unit_obj.name if unit_obj else None,
+                quantity=quantity,
+                cost=cost,
+                container_deposit=container_deposit,
+                prev_cost=prev_cost,
+                position=order_index,
+                purchase_gl_code_id=entry["gl_code_id"],
+                location_id=entry["location_id"],
+            )
+        )
+        if item_obj:
+            factor = unit_obj.factor if unit_obj and unit_obj.factor else 1
+            prev_qty = (
+                db.session.query(db.func.sum(LocationStandItem.expected_count))
+                .filter(LocationStandItem.item_id == item_obj.id)
+                .scalar()
+                or 0
+            )
+            new_qty = quantity * factor
+            total_qty = prev_qty + new_qty
+            cost_per_unit = cost / factor if factor else cost
+            if total_qty > 0:
+                weighted_cost = (prev_qty * prev_cost + cost_per_unit * new_qty) / total_qty
+            else:
+                weighted_cost = cost_per_unit
+            item_obj.quantity = total_qty
+            item_obj.cost = weighted_cost
+            line_location_id = entry["location_id"] or invoice.location_id
+            record = LocationStandItem.query.filter_by(
+                location_id=line_location_id, item_id=item_obj.id
+            ).first()
+            if not record:
+                record = LocationStandItem(
+                    location_id=line_location_id,
+                    item_id=item_obj.id,
+                    expected_count=0,
+                    purchase_gl_code_id=item_obj.purchase_gl_code_id,
+                )
+                db.session.add(record)
+            elif (
+                record.purchase_gl_code_id is None
+                and item_obj.purchase_gl_code_id is not None
+            ):
+                record.purchase_gl_code_id = item_obj.purchase_gl_code_id
+            record.expected_count += quantity * factor
+            if entry.get("deposit_provided"):
+                item_obj.container_deposit = (
+                    container_deposit / factor if factor else container_deposit
+                )
+            db.session.flush()
+
+
+def _entry(item_id, unit_id, quantity, cost, location_id=None, **extra):
+    entry = {
+        "item_id": item_id,
+        "unit_id": unit_id,
+        "quantity": quantity,
+        "cost": cost,
+        "container_deposit": 0.0,
+        "deposit_provided": False,
+        "gl_code_id": None,
+        "location_id": location_id,
+    }
+    entry.update(extra)
+    return entry
+
+
+def _state(invoice_id):
+    db.session.flush()
+    items = [
+        (item.id, item.quantity, item.cost, item.container_deposit)
+        for item in Item.query.order_by(Item.id)
+    ]
+    records = [
+        (r.location_id, r.item_id, r.expected_count, r.purchase_gl_code_id)
+        for r in LocationStandItem.query.order_by(
+            LocationStandItem.location_id, LocationStandItem.item_id
+        )
+    ]
+    lines = [
+        (
+            line.position,
+            line.item_id,
+            line.unit_id,
+            line.item_name,
+            line.unit_name,
+            line.quantity,
+            line.cost,
+            line.prev_cost,
+            line.location_id,
+            line.purchase_gl_code_id,
+        )
+        for line in PurchaseInvoiceItem.query.filter_by(invoice_id=invoice_id)
+        .order_by(PurchaseInvoiceItem.position)
+    ]
+    return items, records, lines
+
+
+def _rounded(rows):
+    return [
+        tuple(round(value, 9) if isinstance(value, float) else value for value in row)
+        for row in rows
+    ]
+
+
+def test_bulk_receive_matches_line_by_line_receive(app):
+    with app.app_context():
+        gl = GLCode(code="520001")
+        user = User(email="receiver@example.com", password="x", active=True)
+        vendor = Vendor(first_name="Sys", last_name="Co")
+        main = Location(name="Main")
+        bar = Location(name="Bar")
+        patio = Location(name="Patio")
+        db.session.add_all([gl, user, vendor, main, bar, patio])
+        db.session.flush()
+
+        buns = Item(name="Buns", base_unit="each", cost=0.5, quantity=30)
+        syrup = Item(
+            name="Syrup", base_unit="ml", cost=0.01, purchase_gl_code_id=gl.id
+        )
+        lids = Item(name="Lids", base_unit="each", cost=0.0)
+        db.session.add_all([buns, syrup, lids])
+        db.session.flush()
+        bun_each = ItemUnit(item_id=buns.id, name="each", factor=1)
+        bun_case = ItemUnit(item_id=buns.id, name="case", factor=12)
+        syrup_jug = ItemUnit(item_id=syrup.id, name="jug", factor=3785)
+        broken = ItemUnit(item_id=lids.id, name="sleeve", factor=0)
+        db.session.add_all([bun_each, bun_case, syrup_jug, broken])
+        db.session.add_all(
+            [
+                LocationStandItem(location_id=main.id, item_id=buns.id, expected_count=20),
+                LocationStandItem(location_id=bar.id, item_id=buns.id, expected_count=10),
+                LocationStandItem(location_id=bar.id, item_id=syrup.id, expected_count=500),
+            ]
+        )
+        po = PurchaseOrder(
+            vendor_id=vendor.id,
+            user_id=user.id,
+            order_date=datetime.date(2026, 5, 1),
+            expected_date=datetime.date(2026, 5, 2),
+        )
+        db.session.add(po)
+        db.session.flush()
+        invoice = PurchaseInvoice(
+            purchase_order_id=po.id,
+            user_id=user.id,
+            location_id=main.id,
+            received_date=datetime.date(2026, 5, 2),
+        )
+        db.session.add(invoice)
+        db.session.commit()
+        invoice_id = invoice.id
+        new_records = {(patio.id, buns.id), (patio.id, syrup.id)}
+
+        entries = [
+            _entry(buns.id, bun_case.id, 2, 6.0),
+            _entry(buns.id, bun_each.id, 5, 0.4, location_id=patio.id),
+            _entry(
+                syrup.id,
+                syrup_jug.id,
+                1.5,
+                45.0,
+                location_id=bar.id,
+                container_deposit=2.0,
+                deposit_provided=True,
+                gl_code_id=gl.id,
+            ),
+            _entry(syrup.id, None, 250, 0.02, location_id=patio.id),
+            _entry(buns.id, bun_case.id, 1, 7.2, location_id=bar.id),
+            _entry(lids.id, broken.id, 3, 1.0),
+            _entry(999999, None, 4, 1.0),
+        ]
+
+        _receive_line_by_line(db.session.get(PurchaseInvoice, invoice_id), entries)
+        expected = _state(invoice_id)
+        db.session.rollback()
+
+        receive_invoice_lines(db.session.get(PurchaseInvoice, invoice_id), entries)
+        actual = _state(invoice_id)
+        db.session.rollback()
+
+    for actual_rows, expected_rows in zip(actual, expected):
+        assert _rounded(actual_rows) == _rounded(expected_rows)
+    _, records, lines = actual
+    assert len(lines) == len(entries)
+    assert {(record[0], record[1]) for record in records} >= new_records
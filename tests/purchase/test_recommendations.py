@@ -1,4 +1,5 @@
 import datetime
+import json
 import re
 
 import pytest
@@ -17,12 +18,17 @@ from app.models import (
     PurchaseInvoiceItem,
     PurchaseOrder,
     PurchaseOrderItem,
+    PurchaseRecommendationRun,
     TerminalSale,
     Transfer,
     TransferItem,
     User,
     Vendor,
 )
+from app.services.purchase_recommendations import (
+    STALE_AFTER,
+    refresh_recommendations,
+)
 from app.utils.forecasting import DemandForecastingHelper
 from tests.utils import login
 
@@ -200,6 +206,43 @@ def test_forecasting_helper_aggregates_sources(app):
         assert rec.default_unit_id == ctx["unit_id"]
 
 
+def test_forecasting_daily_history_buckets_by_day(app):
+    ctx = _seed_forecasting_data(app)
+    with app.app_context():
+        yesterday = (
+            datetime.datetime.utcnow() - datetime.timedelta(days=1)
+        ).date()
+        helper = DemandForecastingHelper(lookback_days=30)
+        history = helper.daily_history(location_ids=[ctx["location_id"]])
+        days = history[(ctx["item_id"], ctx["location_id"])]
+        assert days[yesterday]["sales_qty"] == pytest.approx(10)
+        assert days[yesterday]["transfer_out_qty"] == pytest.approx(2)
+        assert days[yesterday]["transfer_in_qty"] == pytest.approx(1)
+        assert days[datetime.date.today()]["invoice_qty"] == pytest.approx(2)
+
+
+def test_forecasting_smoothing_method_forecasts_horizon(app):
+    ctx = _seed_forecasting_data(app)
+    with app.app_context():
+        helper = DemandForecastingHelper(lookback_days=30, lead_time_days=2)
+        (rec,) = helper.build_recommendations(
+            location_ids=[ctx["location_id"]], method="smoothing", horizon_days=7
+        )
+        assert rec.base_consumption == pytest.approx(12)
+        # A single day of demand smoothed over a month forecasts well below
+        # the lookback total.
+        assert 0 < rec.adjusted_demand < rec.base_consumption
+        assert rec.recommended_quantity == pytest.approx(
+            max(rec.adjusted_demand - 6, 0.0)
+        )
+
+        result = helper.backtest(holdout_days=7, location_ids=[ctx["location_id"]])
+        assert result.series == 1
+
+        with pytest.raises(ValueError):
+            helper.build_recommendations(method="bogus")
+
+
 def test_recommendations_route_json_and_seed(client, app):
     ctx = _seed_forecasting_data(app)
     order_date = datetime.date.today().isoformat()
@@ -213,6 +256,13 @@ def test_recommendations_route_json_and_seed(client, app):
         payload = json_resp.get_json()
         assert payload["data"]
         assert payload["data"][0]["recommended_quantity"] == pytest.approx(6)
+        assert payload["meta"]["method"] == "average"
+
+        smoothed = client.get(
+            "/purchase_orders/recommendations?format=json&method=smoothing"
+        ).get_json()
+        assert smoothed["meta"]["method"] == "smoothing"
+        assert smoothed["data"][0]["base_consumption"] == pytest.approx(12)
 
         response = client.post(
             "/purchase_orders/recommendations",
@@ -259,3 +309,141 @@ def test_recommendations_route_json_and_seed(client, app):
         assert po is not None
         assert po.received is False
         assert po.items[0].quantity == pytest.approx(override_qty)
+
+
+def test_recommendations_served_from_precomputed_run(client, app):
+    ctx = _seed_forecasting_data(app)
+    with app.app_context():
+        live = DemandForecastingHelper().build_recommendations(
+            attendance_multiplier=1.5
+        )
+        expected = [
+            (
+                rec.item.id,
+                rec.location.id,
+                pytest.approx(rec.base_consumption),
+                pytest.approx(rec.adjusted_demand),
+                pytest.approx(rec.recommended_quantity),
+                pytest.approx(rec.history["open_po_qty"]),
+            )
+            for rec in live
+        ]
+        run = refresh_recommendations()
+        db.session.commit()
+        assert run.line_count == len(live)
+        # A second refresh replaces the first.
+        run_id = refresh_recommendations().id
+        db.session.commit()
+        assert run_id != run.id
+
+    def _rows(payload):
+        return [
+            (
+                row["item_id"],
+                row["location_id"],
+                row["base_consumption"],
+                row["adjusted_demand"],
+                row["recommended_quantity"],
+                row["history"]["open_po_qty"],
+            )
+            for row in payload["data"]
+        ]
+
+    with client:
+        login(client, ctx["user_email"], "pass")
+        payload = client.get(
+            "/purchase_orders/recommendations?format=json&attendance_multiplier=1.5"
+        ).get_json()
+        assert payload["meta"]["source"] == "precomputed"
+        assert _rows(payload) == expected
+
+        paged = client.get(
+            "/purchase_orders/recommendations?format=json&per_page=25"
+            f"&location_id={ctx['location_id']}"
+        ).get_json()
+        assert paged["meta"]["total"] == 1
+        assert paged["data"][0]["recommended_quantity"] == pytest.approx(6)
+
+        # Orders placed after the run are netted off straight away.
+        with app.app_context():
+            po = PurchaseOrder.query.filter_by(received=False).one()
+            db.session.add(
+                PurchaseOrderItem(
+                    purchase_order_id=po.id,
+                    item_id=ctx["item_id"],
+                    unit_id=ctx["unit_id"],
+                    quantity=4,
+                )
+            )
+            db.session.commit()
+        payload = client.get(
+            "/purchase_orders/recommendations?format=json"
+            f"&location_id={ctx['location_id']}"
+        ).get_json()
+        assert payload["data"][0]["history"]["open_po_qty"] == pytest.approx(7)
+        assert payload["data"][0]["recommended_quantity"] == pytest.approx(2)
+
+        custom = client.get(
+            "/purchase_orders/recommendations?format=json&lookback_days=14"
+        ).get_json()
+        assert custom["meta"]["source"] == "live"
+
+        html = client.get("/purchase_orders/recommendations").get_data(as_text=True)
+        assert "Precomputed" in html
+
+    with app.app_context():
+        run = db.session.get(PurchaseRecommendationRun, run_id)
+        run.generated_at -= STALE_AFTER
+        db.session.commit()
+    with client:
+        payload = client.get(
+            "/purchase_orders/recommendations?format=json"
+        ).get_json()
+        assert payload["meta"]["source"] == "live"
+
+
+def test_recommendation_chart_and_locations_match_across_sources(client, app):
+    ctx = _seed_forecasting_data(app)
+    with app.app_context():
+        refresh_recommendations()
+        db.session.commit()
+
+    def _chart(html):
+        return json.loads(re.search(r"const rows = (.*);", html).group(1))
+
+    with client:
+        login(client, ctx["user_email"], "pass")
+        full = client.get("/purchase_orders/recommendations?format=json").get_json()
+        assert len(full["data"]) == 2
+        total = sum(row["recommended_quantity"] for row in full["data"])
+
+        # The chart sums every line, not only the page being shown.
+        for query in ("page=2", "page=2&lookback_days=14"):
+            html = client.get(f"/purchase_orders/recommendations?{query}")
+            (row,) = _chart(html.get_data(as_text=True))
+            assert row["label"] == "Widget"
+            assert row["recommended"] == pytest.approx(total)
+
+        with app.app_context():
+            db.session.get(Item, ctx["item_id"]).archived = True
+            db.session.commit()
+        for query in ("", "&lookback_days=14"):
+            payload = client.get(
+                f"/purchase_orders/recommendations?format=json{query}"
+            ).get_json()
+            assert payload["data"] == []
+        html = client.get("/purchase_orders/recommendations")
+        assert _chart(html.get_data(as_text=True)) == []
+
+        with app.app_context():
+            db.session.get(Item, ctx["item_id"]).archived = False
+            Location.query.filter_by(name="Warehouse").one().archived = True
+            db.session.commit()
+        for query, source in (("", "precomputed"), ("&lookback_days=14", "live")):
+            payload = client.get(
+                f"/purchase_orders/recommendations?format=json{query}"
+            ).get_json()
+            assert payload["meta"]["source"] == source
+            assert {row["location_id"] for row in payload["data"]} == {
+                ctx["location_id"]
+            }
@@ -1,11 +1,15 @@
 import os
+import threading
 from datetime import datetime, timedelta
 
 from flask import url_for
+from sqlalchemy import event as sa_event
 from werkzeug.security import generate_password_hash
 
 from app import db
-from app.models import ActivityLog, User
+from app.models import ActivityLog, ActivityLogRollup, User
+from app.services import activity_retention
+from app.utils.activity import _ActivityLogger
 from tests.utils import login
 
 
@@ -128,3 +132,129 @@ def test_activity_log_filters(client, app):
         assert b"Beta user action" in resp.data
         assert b"Alpha admin action" not in resp.data
         assert b"Gamma system event" not in resp.data
+
+
+def test_retention_archives_old_activity_in_batches(client, app):
+    admin_email = os.getenv("ADMIN_EMAIL", "admin@example.com")
+    admin_pass = os.getenv("ADMIN_PASS", "adminpass")
+    old_day = datetime(2024, 3, 1, 9, 0, 0)
+
+    with app.app_context():
+        admin_id = User.query.filter_by(email=admin_email).first().id
+        db.session.add_all(
+            [
+                ActivityLog(
+                    user_id=admin_id,
+                    activity=f"Edited item {index}",
+                    timestamp=old_day + timedelta(minutes=index),
+                )
+                for index in range(7)
+            ]
+            + [
+                ActivityLog(
+                    user_id=None,
+                    activity="System automatically created backup old.db",
+                    timestamp=old_day + timedelta(days=1),
+                ),
+                ActivityLog(user_id=admin_id, activity="Edited item recent"),
+            ]
+        )
+        db.session.commit()
+
+        folder = app.config["ACTIVITY_ARCHIVE_FOLDER"]
+        result = activity_retention.archive_activity(
+            folder, datetime(2024, 6, 1), batch_size=3
+        )
+        assert result.archived == 8
+        assert len(result.files) == 2
+
+        remaining = [log.activity for log in ActivityLog.query]
+        assert "Edited item recent" in remaining
+        assert not any(activity.startswith("Edited item 0") for activity in remaining)
+
+        rollups = {
+            (rollup.day, rollup.user_id, rollup.action): rollup.count
+            for rollup in ActivityLogRollup.query
+        }
+        assert rollups == {
+            (old_day.date(), admin_id, "Edited item"): 7,
+            ((old_day + timedelta(days=1)).date(), None, "System automatically"): 1,
+        }
+
+        entries = activity_retention.search_archive(folder, activity="item 6")
+        assert [entry.activity for entry in entries] == ["Edited item 6"]
+        assert entries[0].user_email == admin_email
+        system = activity_retention.search_archive(folder, system_only=True)
+        assert [entry.activity for entry in system] == [
+            "System automatically created backup old.db"
+        ]
+
+    with client:
+        login(client, admin_email, admin_pass)
+        resp = client.get("/controlpanel/activity/archive?activity=item+4")
+        assert resp.status_code == 200
+        assert b"Edited item 4" in resp.data
+        assert b"Edited item 5" not in resp.data
+        assert b"Edited item recent" not in resp.data
+
+
+def test_activity_writer_batches_inserts_into_one_statement(app):
+    inserts = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO activity_log "):
+            inserts.append(statement)
+
+    with app.app_context():
+        ActivityLog.query.delete()
+        db.session.commit()
+        engine = db.engine
+        writer = _ActivityLogger(app, flush_interval=30, batch_size=50)
+        sa_event.listen(engine, "before_cursor_execute", _capture)
+        try:
+            for index in range(50):
+                writer.log(f"Batched entry {index}", None)
+            writer.flush()
+        finally:
+            sa_event.remove(engine, "before_cursor_execute", _capture)
+            writer.close()
+
+        assert len(inserts) == 1
+        assert writer.written == 50
+        assert ActivityLog.query.count() == 50
+
+
+def test_activity_writer_drops_entries_when_queue_is_full(app):
+    release = threading.Event()
+    with app.app_context():
+        ActivityLog.query.delete()
+        db.session.commit()
+        writer = _ActivityLogger(
+            app, flush_interval=30, batch_size=1, max_queue=2, enqueue_timeout=0.01
+        )
+        write = writer._write
+
+        def slow_write(rows):
+            release.wait(5)
+            write(rows)
+
+        writer._write = slow_write
+        try:
+            writer.log("First", None)
+            # Wait until the writer is blocked on the first entry.
+            for _ in range(100):
+                if writer.queue_depth() == 0:
+                    break
+                threading.Event().wait(0.01)
+            for name in ("Second", "Third", "Fourth"):
+                writer.log(name, None)
+            assert writer.dropped == 1
+        finally:
+            release.set()
+            writer.close()
+
+        assert sorted(log.activity for log in ActivityLog.query) == [
+            "First",
+            "Second",
+            "Third",
+        ]
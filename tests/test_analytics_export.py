@@ -0,0 +1,153 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models import (
+    Customer,
+    Invoice,
+    InvoiceProduct,
+    Item,
+    Product,
+    StockMovement,
+    User,
+)
+from app.services.analytics_export import export_all, load_state
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def _add_invoice(invoice_id, user, customer, product, created, quantity):
+    invoice = Invoice(
+        id=invoice_id,
+        user_id=user.id,
+        customer_id=customer.id,
+        date_created=created,
+    )
+    db.session.add(invoice)
+    db.session.add(
+        InvoiceProduct(
+            invoice_id=invoice_id,
+            product_id=product.id,
+            product_name=product.name,
+            quantity=quantity,
+            unit_price=5.0,
+            line_subtotal=5.0 * quantity,
+            line_gst=0.25 * quantity,
+            line_pst=0.35 * quantity,
+        )
+    )
+
+
+def _read(folder, table):
+    return pq.read_table(os.path.join(folder, table)).to_pylist()
+
+
+def test_export_writes_partitions_and_only_new_rows(app, tmp_path):
+    folder = str(tmp_path / "export")
+    with app.app_context():
+        user = User(
+            email="export@example.com",
+            password=generate_password_hash("pass"),
+            active=True,
+        )
+        customer = Customer(first_name="Ex", last_name="Port")
+        product = Product(name="Export Soda", price=5.0, cost=1.0)
+        item = Item(name="Export Cups", base_unit="each")
+        db.session.add_all([user, customer, product, item])
+        db.session.flush()
+        _add_invoice("EXP001", user, customer, product, datetime(2026, 8, 3), 2)
+        _add_invoice("EXP002", user, customer, product, datetime(2026, 9, 14), 3)
+        db.session.add_all(
+            [
+                StockMovement(
+                    item_id=item.id,
+                    quantity=5,
+                    movement_type="purchase",
+                    occurred_at=datetime(2026, 8, 1),
+                ),
+                StockMovement(
+                    item_id=item.id,
+                    quantity=-2,
+                    movement_type="transfer",
+                    occurred_at=datetime(2026, 9, 2),
+                ),
+            ]
+        )
+        db.session.commit()
+
+        results = {
+            result.table: result
+            for result in export_all(
+                db.session, folder, tables=["invoice_lines", "stock_movements"]
+            )
+        }
+        assert results["invoice_lines"].partitions == ["2026-08", "2026-09"]
+        assert results["stock_movements"].rows == 2
+        assert os.path.exists(
+            os.path.join(folder, "invoice_lines", "month=2026-09", "part-0.parquet")
+        )
+        lines = _read(folder, "invoice_lines")
+        assert sorted(row["quantity"] for row in lines) == [2.0, 3.0]
+        assert {str(row["month"]) for row in lines} == {"2026-08", "2026-09"}
+        first_mark = load_state(folder)["stock_movements"]["high_water"]
+
+        # A second run without changes writes no append-only rows.
+        results = {
+            result.table: result
+            for result in export_all(db.session, folder, tables=["stock_movements"])
+        }
+        assert results["stock_movements"].rows == 0
+
+        movement = StockMovement(
+            item_id=item.id,
+            quantity=1,
+            movement_type="adjustment",
+            occurred_at=datetime(2026, 9, 20),
+        )
+        db.session.add(movement)
+        db.session.commit()
+        results = {
+            result.table: result
+            for result in export_all(db.session, folder, tables=["stock_movements"])
+        }
+        assert results["stock_movements"].rows == 1
+        assert results["stock_movements"].partitions == ["2026-09"]
+        assert load_state(folder)["stock_movements"]["high_water"] == movement.id
+        assert movement.id > first_mark
+        ids = [row["id"] for row in _read(folder, "stock_movements")]
+        assert len(ids) == len(set(ids)) == 3
+
+
+def test_export_refreshes_recent_document_months(app, tmp_path):
+    folder = str(tmp_path / "export")
+    with app.app_context():
+        user = User(
+            email="export-refresh@example.com",
+            password=generate_password_hash("pass"),
+            active=True,
+        )
+        customer = Customer(first_name="Re", last_name="Fresh")
+        product = Product(name="Refresh Soda", price=5.0, cost=1.0)
+        db.session.add_all([user, customer, product])
+        db.session.flush()
+        _add_invoice(
+            "REF001",
+            user,
+            customer,
+            product,
+            datetime.utcnow() - timedelta(days=3),
+            2,
+        )
+        db.session.commit()
+
+        export_all(db.session, folder, tables=["invoice_lines"])
+        line = InvoiceProduct.query.filter_by(invoice_id="REF001").one()
+        line.quantity = 7
+        db.session.commit()
+
+        export_all(db.session, folder, tables=["invoice_lines"])
+        assert [row["quantity"] for row in _read(folder, "invoice_lines")] == [7.0]
+        assert load_state(folder)["invoice_lines"]["high_water"] == line.id
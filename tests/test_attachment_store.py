@@ -0,0 +1,110 @@
+import gzip
+import io
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from app import db
+from app.models import Attachment, PosSalesImport
+from app.services import attachment_store
+from app.services.pos_sales_ingest import ingest_pos_sales_attachment
+
+
+def _age(path, hours=48):
+    stamp = (datetime.now() - timedelta(hours=hours)).timestamp()
+    os.utime(path, (stamp, stamp))
+
+
+def test_write_blob_streams_compresses_and_deduplicates(app, tmp_path):
+    folder = str(tmp_path / "store")
+    content = b"location,product,qty\n" * 5000
+
+    with app.app_context():
+        first = attachment_store.write_blob(io.BytesIO(content), folder=folder)
+        second = attachment_store.write_blob(content, folder=folder)
+
+        assert first == second
+        assert first.size == len(content)
+        assert first.stored_size < first.size
+        assert first.path == attachment_store.blob_path(first.sha256, folder)
+        with gzip.open(first.path, "rb") as handle:
+            assert handle.read() == content
+        stored = [name for _, _, names in os.walk(folder) for name in names]
+        assert stored == [f"{first.sha256}.gz"]
+
+        with attachment_store.materialize(first.sha256, ".csv", folder) as path:
+            assert path.endswith(".csv")
+            assert Path(path).read_bytes() == content
+        assert not os.path.exists(path)
+
+
+def test_references_are_counted_and_unreferenced_blobs_collected(app, tmp_path):
+    folder = str(tmp_path / "store")
+    with app.app_context():
+        kept = attachment_store.write_blob(b"kept", folder=folder)
+        dropped = attachment_store.write_blob(b"dropped", folder=folder)
+        stray = attachment_store.write_blob(b"rolled back", folder=folder)
+        attachment_store.acquire(db.session, kept, filename="kept.xls")
+        attachment_store.acquire(db.session, kept, filename="kept.xls")
+        attachment_store.acquire(db.session, dropped, filename="dropped.xls")
+        db.session.add(
+            PosSalesImport(
+                source_provider="test",
+                message_id="<kept>",
+                attachment_filename="kept.xls",
+                attachment_sha256=kept.sha256,
+                status="pending",
+            )
+        )
+        db.session.commit()
+
+        counts = dict(db.session.query(Attachment.sha256, Attachment.ref_count))
+        assert counts == {kept.sha256: 2, dropped.sha256: 1}
+
+        # Young files survive even without references.
+        result = attachment_store.collect_garbage(db.session, folder=folder)
+        assert result.recounted == 2
+        assert result.removed == 0
+
+        db.session.query(Attachment).update(
+            {"last_referenced_at": datetime.utcnow() - timedelta(days=3)}
+        )
+        db.session.commit()
+        for blob in (kept, dropped, stray):
+            _age(blob.path)
+        result = attachment_store.collect_garbage(db.session, folder=folder)
+
+        assert result.removed == 2
+        assert result.freed_bytes == dropped.stored_size + stray.stored_size
+        assert os.path.exists(kept.path)
+        assert not os.path.exists(dropped.path)
+        assert not os.path.exists(stray.path)
+        assert dict(db.session.query(Attachment.sha256, Attachment.ref_count)) == {
+            kept.sha256: 1
+        }
+
+
+def test_pos_ingest_keeps_one_blob_per_distinct_attachment(app, tmp_path):
+    spreadsheet = Path(__file__).resolve().parents[1] / "game_sales.xls"
+    folder = tmp_path / "store"
+
+    with app.app_context():
+        imports = []
+        for index in range(3):
+            with spreadsheet.open("rb") as handle:
+                sales_import, _ = ingest_pos_sales_attachment(
+                    source_provider="mailgun",
+                    source_message_id=f"<message-{index}>",
+                    filename="game_sales.xls",
+                    content=handle,
+                    storage_dir=folder,
+                )
+            imports.append(sales_import)
+
+        assert len({sales_import.id for sales_import in imports}) == 3
+        assert len({sales_import.attachment_sha256 for sales_import in imports}) == 1
+        attachment = Attachment.query.one()
+        assert attachment.ref_count == 3
+        assert attachment.size == spreadsheet.stat().st_size
+        assert Path(imports[0].attachment_storage_path).exists()
+        assert len(list(folder.rglob("*.gz"))) == 1
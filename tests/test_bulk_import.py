@@ -0,0 +1,271 @@
+import os
+from io import BytesIO
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.models import (
+    Item,
+    ItemUnit,
+    Location,
+    LocationStandItem,
+    Menu,
+    Product,
+    ProductCostHistory,
+    ProductRecipeItem,
+)
+from app.services.bulk_import import (
+    BulkImporter,
+    ImportValidationError,
+    ItemImporter,
+    LocationImporter,
+    ProductImporter,
+    import_file,
+)
+from tests.utils import login
+
+
+def _write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+def test_item_dry_run_reports_without_writing(tmp_path, app):
+    with app.app_context():
+        db.session.add(Item(name="Buns", base_unit="each", cost=0.2))
+        db.session.commit()
+        before = Item.query.count()
+
+        path = _write(
+            tmp_path,
+            "items.csv",
+            "name,base_unit,cost\n"
+            "Buns,each,0.25\n"
+            "Patties,each,0.5\n"
+            "Patties,each,0.6\n"
+            "Ketchup,gram,abc\n",
+        )
+        report = import_file(ItemImporter(), path, dry_run=True)
+
+        assert report.created == ["Patties"]
+        assert report.updated == ["Buns"]
+        assert [issue.line for issue in report.skipped] == [4]
+        assert [str(issue) for issue in report.errors] == [
+            "Line 5: cost must be a number, got 'abc'"
+        ]
+        assert Item.query.count() == before
+
+        with pytest.raises(ImportValidationError):
+            import_file(ItemImporter(), path)
+        db.session.rollback()
+        assert Item.query.count() == before
+
+
+def test_item_import_prefetches_and_bulk_writes(tmp_path, app):
+    lines = ["name,base_unit,cost,upc,units"]
+    lines += [
+        f"Vendor Item {idx},each,{idx / 10},UPC{idx:05d},each:1;case:12"
+        for idx in range(300)
+    ]
+    path = _write(tmp_path, "catalog.csv", "\n".join(lines) + "\n")
+
+    with app.app_context():
+        db.session.add(Item(name="Vendor Item 0", base_unit="each", cost=5.0))
+        db.session.commit()
+
+        statements = []
+
+        def _capture(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", _capture)
+        try:
+            report = import_file(ItemImporter(), path)
+            db.session.commit()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", _capture)
+
+        assert len(report.created) == 299
+        assert report.updated == ["Vendor Item 0"]
+        # A fixed number of statements, not one per row.
+        assert len(statements) < 15
+
+        updated = Item.query.filter_by(name="Vendor Item 0").one()
+        assert updated.cost == 0.0
+        assert updated.upc == "UPC00000"
+        created = Item.query.filter_by(name="Vendor Item 12").one()
+        assert created.cost == pytest.approx(1.2)
+        assert {unit.name: unit.factor for unit in created.units} == {
+            "each": 1.0,
+            "case": 12.0,
+        }
+        assert [u.name for u in created.units if u.receiving_default] == ["each"]
+
+
+def test_item_import_recosts_dependent_products(tmp_path, app):
+    with app.app_context():
+        buns = Item(name="Buns", base_unit="each", cost=0.2)
+        patties = Item(name="Patties", base_unit="each", cost=1.0)
+        burger = Product(name="Burger", price=8.0, cost=1.2)
+        burger.recipe_items.extend(
+            [
+                ProductRecipeItem(item=buns, quantity=1),
+                ProductRecipeItem(item=patties, quantity=1),
+            ]
+        )
+        db.session.add(burger)
+        db.session.commit()
+
+        path = _write(
+            tmp_path,
+            "items.csv",
+            "name,base_unit,cost\nBuns,each,0.3\nPatties,each,1.0\n",
+        )
+        import_file(ItemImporter(), path)
+        db.session.commit()
+
+        assert burger.cost == pytest.approx(1.3)
+        history = ProductCostHistory.query.filter_by(product_id=burger.id).one()
+        assert history.previous_cost == pytest.approx(1.2)
+        assert history.cost == pytest.approx(1.3)
+        assert history.source == "item_import"
+
+
+def test_product_import_validates_recipes_before_writing(tmp_path, app):
+    with app.app_context():
+        buns = Item(name="Buns", base_unit="each")
+        db.session.add(buns)
+        db.session.flush()
+        db.session.add(ItemUnit(item_id=buns.id, name="each", factor=1))
+        db.session.add(Product(name="Fries", price=2.0, cost=1.0))
+        db.session.commit()
+
+        bad = _write(
+            tmp_path,
+            "bad.csv",
+            "name,price,cost,recipe\n"
+            "Burger,5.99,3,Buns:1:each\n"
+            "Hot Dog,4.00,2,Wieners:1\n"
+            "Slider,,1,\n",
+        )
+        report = import_file(ProductImporter(), bad, dry_run=True)
+        assert [str(issue) for issue in report.errors] == [
+            "Line 3: Unknown item: Wieners",
+            "Line 4: price is required for Slider",
+        ]
+        with pytest.raises(ImportValidationError):
+            import_file(ProductImporter(), bad)
+        db.session.rollback()
+        assert Product.query.filter_by(name="Burger").first() is None
+
+        good = _write(
+            tmp_path,
+            "good.csv",
+            "name,price,cost,recipe\n"
+            "Burger,5.99,3,Buns:2:each\n"
+            "Fries,2.50,,\n",
+        )
+        report = import_file(ProductImporter(), good)
+        db.session.commit()
+        assert report.created == ["Burger"]
+        assert report.updated == ["Fries"]
+
+        burger = Product.query.filter_by(name="Burger").one()
+        recipe = ProductRecipeItem.query.filter_by(product_id=burger.id).one()
+        assert (recipe.item_id, recipe.quantity) == (buns.id, 2.0)
+        fries = Product.query.filter_by(name="Fries").one()
+        assert (fries.price, fries.invoice_sale_price, fries.cost) == (2.5, 2.5, 1.0)
+
+
+def test_location_import_links_products_to_existing_locations(tmp_path, app):
+    with app.app_context():
+        burger = Product(name="Burger", price=1.0, cost=0.5)
+        fries = Product(name="Fries", price=1.0, cost=0.5)
+        stand = Location(name="Stand 1")
+        stand.products = [burger]
+        db.session.add_all([burger, fries, stand])
+        db.session.commit()
+
+        path = _write(
+            tmp_path,
+            "locs.csv",
+            "name,products\nStand 1,Burger;Fries\nStand 2,Fries\n",
+        )
+        report = import_file(LocationImporter(), path)
+        db.session.commit()
+
+        assert report.created == ["Stand 2"]
+        assert report.updated == ["Stand 1"]
+        db.session.expire_all()
+        assert {p.name for p in Location.query.filter_by(name="Stand 1").one().products} == {
+            "Burger",
+            "Fries",
+        }
+        assert [p.name for p in Location.query.filter_by(name="Stand 2").one().products] == [
+            "Fries"
+        ]
+
+
+
+def test_location_import_adds_stand_items_and_respects_menus(tmp_path, app):
+    with app.app_context():
+        oil = Item(name="Fry Oil", base_unit="each")
+        fries = Product(name="Fries", price=1.0, cost=0.5)
+        fries.recipe_items.append(
+            ProductRecipeItem(item=oil, quantity=1, countable=True)
+        )
+        stand = Location(name="Stand 1")
+        menu_stand = Location(name="Menu Stand", current_menu=Menu(name="Concessions"))
+        db.session.add_all([oil, fries, stand, menu_stand])
+        db.session.commit()
+
+        path = _write(tmp_path, "locs.csv", "name,products\nMenu Stand,Fries\n")
+        with pytest.raises(ImportValidationError, match="follows a menu"):
+            import_file(LocationImporter(), path)
+
+        path = _write(tmp_path, "locs.csv", "name,products\nStand 1,Fries\n")
+        report = import_file(LocationImporter(), path)
+        db.session.commit()
+
+        assert report.updated == ["Stand 1"]
+        assert [
+            row.item_id
+            for row in LocationStandItem.query.filter_by(location_id=stand.id)
+        ] == [oil.id]
+
+def test_admin_import_preview_does_not_write(client, app):
+    admin_email = os.getenv("ADMIN_EMAIL", "admin@example.com")
+    admin_pass = os.getenv("ADMIN_PASS", "adminpass")
+    data = {
+        "items-file": (
+            BytesIO(b"name,base_unit,cost\nPreview Widget,each,1.5\n"),
+            "items.csv",
+        ),
+        "items-dry_run": "y",
+    }
+    with client:
+        login(client, admin_email, admin_pass)
+        resp = client.post(
+            "/controlpanel/import/items",
+            data=data,
+            content_type="multipart/form-data",
+        )
+        assert resp.status_code == 200
+        assert b"Would import 1 items." in resp.data
+        assert b"Preview Widget" in resp.data
+    with app.app_context():
+        assert Item.query.filter_by(name="Preview Widget").first() is None
+
+
+def test_importers_must_implement_every_pass():
+    class Incomplete(BulkImporter):
+        def prefetch(self, rows):
+            pass
+
+        def plan(self, line, row):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,181 @@
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from sqlalchemy import event as sa_event
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models import (
+    Event,
+    EventCloseSummary,
+    EventLocation,
+    EventStandSheetItem,
+    Item,
+    ItemUnit,
+    Location,
+    LocationStandItem,
+    Product,
+    ProductRecipeItem,
+    SalesFact,
+    TerminalSale,
+    User,
+)
+from app.services import sales_facts
+from tests.utils import login
+
+
+@contextmanager
+def count_statements(app):
+    statements = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    sa_event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        yield statements
+    finally:
+        sa_event.remove(engine, "before_cursor_execute", _capture)
+
+
+def _setup_event(app, location_count):
+    with app.app_context():
+        user = User(
+            email="close-facts@example.com",
+            password=generate_password_hash("pass"),
+            active=True,
+        )
+        kept = Item(name="Cups", base_unit="each", cost=0.5)
+        emptied = Item(name="Lids", base_unit="each", cost=0.25)
+        product = Product(name="Soda", price=4.0, cost=1.0)
+        event = Event(
+            name="Fact Event",
+            start_date=date(2026, 6, 1),
+            end_date=date(2026, 6, 2),
+        )
+        db.session.add_all([user, kept, emptied, product, event])
+        db.session.commit()
+        unit = ItemUnit(
+            item_id=kept.id,
+            name="each",
+            factor=1,
+            receiving_default=True,
+            transfer_default=True,
+        )
+        db.session.add(unit)
+        db.session.flush()
+        db.session.add(
+            ProductRecipeItem(
+                product_id=product.id,
+                item_id=kept.id,
+                unit_id=unit.id,
+                quantity=1,
+                countable=True,
+            )
+        )
+        for index in range(location_count):
+            location = Location(name=f"Fact Stand {index:02d}")
+            location.products.append(product)
+            db.session.add(location)
+            db.session.flush()
+            db.session.add_all(
+                [
+                    LocationStandItem(
+                        location_id=location.id, item_id=kept.id, expected_count=10
+                    ),
+                    LocationStandItem(
+                        location_id=location.id, item_id=emptied.id, expected_count=4
+                    ),
+                ]
+            )
+            event_location = EventLocation(
+                event_id=event.id, location_id=location.id, confirmed=True
+            )
+            db.session.add(event_location)
+            db.session.flush()
+            db.session.add_all(
+                [
+                    EventStandSheetItem(
+                        event_location_id=event_location.id,
+                        item_id=kept.id,
+                        opening_count=10,
+                        closing_count=7,
+                    ),
+                    EventStandSheetItem(
+                        event_location_id=event_location.id,
+                        item_id=emptied.id,
+                        opening_count=4,
+                        closing_count=0,
+                    ),
+                    TerminalSale(
+                        event_location_id=event_location.id,
+                        product_id=product.id,
+                        quantity=2,
+                        sold_at=datetime(2026, 6, 1, 12, 0),
+                    ),
+                    TerminalSale(
+                        event_location_id=event_location.id,
+                        product_id=product.id,
+                        quantity=1,
+                        sold_at=datetime(2026, 6, 1, 18, 30),
+                    ),
+                ]
+            )
+        db.session.commit()
+        return event.id, kept.id, emptied.id, product.id
+
+
+def test_close_event_archives_sales_and_stores_summary(app, client):
+    event_id, kept_id, emptied_id, product_id = _setup_event(app, 30)
+
+    with client:
+        login(client, "close-facts@example.com", "pass")
+        with count_statements(app) as statements:
+            response = client.get(f"/events/{event_id}/close")
+        assert response.status_code == 302
+
+    # Reconciling, archiving and summarising is independent of stand count.
+    assert len(statements) < 25
+
+    with app.app_context():
+        assert db.session.get(Event, event_id).closed
+        assert TerminalSale.query.count() == 0
+        facts = SalesFact.query.filter_by(event_id=event_id).all()
+        assert len(facts) == 30
+        assert {fact.sale_date for fact in facts} == {date(2026, 6, 1)}
+        assert all(fact.quantity == 3 and fact.amount == 12.0 for fact in facts)
+        assert all(
+            fact.last_sold_at == datetime(2026, 6, 1, 18, 30) for fact in facts
+        )
+
+        assert LocationStandItem.query.filter_by(item_id=emptied_id).count() == 0
+        kept_counts = {
+            record.expected_count
+            for record in LocationStandItem.query.filter_by(item_id=kept_id)
+        }
+        assert kept_counts == {7}
+
+        summary = EventCloseSummary.query.filter_by(event_id=event_id).one()
+        assert summary.terminal_quantity == 90
+        assert summary.terminal_amount == 360.0
+        assert summary.variance_quantity == 30 * (-3 - 4)
+        assert summary.variance_cost == 30 * (-3 * 0.5 - 4 * 0.25)
+        assert len(summary.location_totals) == 30
+        assert summary.top_products == [
+            {"product_id": product_id, "name": "Soda", "quantity": 90.0, "amount": 360.0}
+        ]
+
+        rows = sales_facts.product_location_sales(
+            db.session, date(2026, 6, 1), date(2026, 6, 2)
+        )
+        assert len(rows) == 30
+        assert {row[2] for row in rows} == {3.0}
+
+    with client:
+        login(client, "close-facts@example.com", "pass")
+        report = client.get(f"/events/{event_id}/close-report")
+        assert report.status_code == 200
+        assert b"Fact Stand 00" in report.data
+        assert b"12.00" in report.data
@@ -36,6 +36,7 @@ from app.models import (
     TerminalSale,
     TerminalSaleLocationAlias,
     TerminalSaleProductAlias,
+    TerminalSalesStagedRow,
     User,
 )
 from app.routes.event_routes import (
@@ -47,6 +48,21 @@ from app.utils.units import DEFAULT_BASE_UNIT_CONVERSIONS, convert_quantity
 from tests.utils import login
 
 
+def _staged_upload_rows(app):
+    with app.app_context():
+        return [
+            {
+                "location": row.location,
+                "product": row.product,
+                "quantity": row.quantity,
+                "amount": row.amount,
+            }
+            for row in TerminalSalesStagedRow.query.order_by(
+                TerminalSalesStagedRow.position
+            )
+        ]
+
+
 def setup_upload_env(app):
     with app.app_context():
         user = User(
@@ -937,7 +953,8 @@ def test_upload_sales_pdf_with_inline_image(client, app):
     payload_match = re.search(r'name="payload" value="([^"]+)"', body)
     assert payload_match
     payload = json.loads(unescape(payload_match.group(1)))
-    rows = payload.get("rows") or []
+    assert "rows" not in payload
+    rows = _staged_upload_rows(app)
     assert rows
     assert any(
         row.get("location") == "Popcorn East"
@@ -1106,8 +1123,7 @@ def test_upload_sales_with_annotated_quantities(client, app, sticky_bun_sales_by
         assert match
         payload = unescape(match.group(1))
 
-    payload_data = json.loads(payload)
-    rows = payload_data.get("rows", [])
+    rows = _staged_upload_rows(app)
     assert len(rows) == 2
     sticky_row = next(row for row in rows if row["product"] == "Sticky Bun")
     muffin_row = next(row for row in rows if row["product"] == "Muffin")
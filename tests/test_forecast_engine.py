@@ -0,0 +1,107 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from app.utils.forecast_engine import (
+    DemandMatrix,
+    backtest,
+    event_mask,
+    fit,
+)
+
+# A Monday, so column ``n`` falls on weekday ``n % 7``.
+START = datetime.date(2026, 1, 5)
+WEEKLY = [4, 4, 4, 4, 8, 12, 4]
+
+
+def _history(days, demand_for_day, keys=((1, 1),)):
+    return {
+        key: {
+            START + datetime.timedelta(days=offset): {"sales_qty": demand_for_day(offset)}
+            for offset in range(days)
+        }
+        for key in keys
+    }
+
+
+def test_matrix_sums_fields_and_ignores_days_outside_window():
+    history = {
+        (1, 1): {
+            START: {"sales_qty": 2, "transfer_out_qty": 1, "invoice_qty": 9},
+            START + datetime.timedelta(days=2): {"sales_qty": 5},
+            START - datetime.timedelta(days=1): {"sales_qty": 100},
+        },
+        (2, 1): {},
+    }
+    matrix = DemandMatrix.from_history(
+        history, START, START + datetime.timedelta(days=3)
+    )
+    assert matrix.keys == [(1, 1), (2, 1)]
+    assert matrix.values.tolist() == [[3, 0, 5, 0], [0, 0, 0, 0]]
+    assert not matrix.event_days.any()
+
+
+def test_fit_recovers_weekday_pattern():
+    history = _history(84, lambda day: WEEKLY[day % 7])
+    end = START + datetime.timedelta(days=83)
+    model = fit(DemandMatrix.from_history(history, START, end))
+
+    forecast = model.forecast(7)[0]
+    # The next day is a Monday again.
+    assert model.next_weekday == 0
+    assert forecast.sum() == pytest.approx(sum(WEEKLY), rel=0.01)
+    # Shrinkage keeps the indices a little closer to 1 than the raw ratios.
+    assert forecast == pytest.approx(WEEKLY, rel=0.15)
+    assert forecast.argmax() == 5
+    assert forecast[5] > forecast[4] > forecast[0]
+
+
+def test_event_days_lift_forecast_on_scheduled_events():
+    event_days = {
+        1: {START + datetime.timedelta(days=offset) for offset in range(0, 56, 7)}
+    }
+    history = _history(
+        56, lambda day: 15 if day % 7 == 0 else 5, keys=((1, 1), (1, 2))
+    )
+    matrix = DemandMatrix.from_history(
+        history,
+        START,
+        START + datetime.timedelta(days=55),
+        event_days=event_days,
+    )
+    assert matrix.event_days[0].sum() == 8
+    assert not matrix.event_days[1].any()
+
+    model = fit(matrix)
+    assert model.event_lift[0] > 2
+    assert model.event_lift[1] == 1.0
+
+    future_start = START + datetime.timedelta(days=56)
+    future_events = {1: {future_start + datetime.timedelta(days=1)}}
+    mask = event_mask(matrix.keys, future_start, 3, future_events)
+    forecast = model.forecast(3, mask)
+    # Location 1 has an event on the second (non-Monday) day.
+    assert forecast[0, 1] > 2 * forecast[0, 2]
+    assert forecast[1, 1] == pytest.approx(forecast[1, 2])
+
+
+def test_backtest_beats_plain_average_on_seasonal_demand():
+    rng = np.random.default_rng(7)
+    noise = rng.normal(0, 0.5, size=140)
+    trend = np.linspace(1, 1.5, 140)
+    history = _history(
+        140, lambda day: max(0.0, WEEKLY[day % 7] * trend[day] + noise[day])
+    )
+    matrix = DemandMatrix.from_history(
+        history, START, START + datetime.timedelta(days=139)
+    )
+
+    result = backtest(matrix, holdout_days=14)
+    assert result.series == 1
+    assert result.holdout_days == 14
+    assert result.wape < result.baseline_wape
+    assert abs(result.bias) < 0.15
+
+    with pytest.raises(ValueError):
+        backtest(matrix, holdout_days=140)
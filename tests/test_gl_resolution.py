@@ -0,0 +1,148 @@
+import datetime
+
+from sqlalchemy import event
+
+from app import db
+from app.models import (
+    GLCode,
+    Item,
+    Location,
+    LocationStandItem,
+    PurchaseInvoice,
+    PurchaseInvoiceItem,
+    PurchaseOrder,
+    User,
+    Vendor,
+)
+from app.services.gl_resolution import (
+    load_invoice_line_gl_codes,
+    load_purchase_gl_codes,
+)
+
+
+class _QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._count)
+
+
+def _setup_items(count):
+    default_gl = GLCode(code="510001")
+    override_gl = GLCode(code="510002")
+    line_gl = GLCode(code="510003")
+    first = Location(name="First")
+    second = Location(name="Second")
+    db.session.add_all([default_gl, override_gl, line_gl, first, second])
+    db.session.flush()
+    items = []
+    for index in range(count):
+        item = Item(
+            name=f"GL Item {index}",
+            base_unit="each",
+            purchase_gl_code_id=default_gl.id if index % 3 else None,
+        )
+        db.session.add(item)
+        items.append(item)
+    db.session.flush()
+    for index, item in enumerate(items):
+        db.session.add(
+            LocationStandItem(
+                location_id=first.id,
+                item_id=item.id,
+                purchase_gl_code_id=override_gl.id if index % 2 else None,
+            )
+        )
+    db.session.commit()
+    return items, (first.id, second.id), line_gl.id
+
+
+def test_lookup_matches_per_item_resolution(app):
+    with app.app_context():
+        items, location_ids, _ = _setup_items(6)
+        pairs = [
+            (item.id, location_id)
+            for item in items
+            for location_id in (*location_ids, None)
+        ]
+        lookup = load_purchase_gl_codes(pairs)
+        for item in items:
+            assert lookup.for_item(item.id) == item.purchase_gl_code
+            for location_id in location_ids:
+                assert lookup.for_item(
+                    item.id, location_id
+                ) == item.purchase_gl_code_for_location(location_id)
+
+
+def test_invoice_lines_resolve_in_constant_queries(app):
+    with app.app_context():
+        items, (first_id, second_id), line_gl_id = _setup_items(30)
+        user = User(email="gl@example.com", password="x", active=True)
+        vendor = Vendor(first_name="GL", last_name="Vendor")
+        db.session.add_all([user, vendor])
+        db.session.flush()
+        po = PurchaseOrder(
+            vendor_id=vendor.id,
+            user_id=user.id,
+            order_date=datetime.date(2026, 1, 1),
+            expected_date=datetime.date(2026, 1, 2),
+        )
+        db.session.add(po)
+        db.session.flush()
+        invoice = PurchaseInvoice(
+            purchase_order_id=po.id,
+            user_id=user.id,
+            location_id=first_id,
+            received_date=datetime.date(2026, 1, 2),
+        )
+        db.session.add(invoice)
+        db.session.flush()
+        for index, item in enumerate(items):
+            db.session.add(
+                PurchaseInvoiceItem(
+                    invoice_id=invoice.id,
+                    item_id=item.id,
+                    item_name=item.name,
+                    quantity=1,
+                    cost=1,
+                    position=index,
+                    location_id=second_id if index % 4 == 0 else None,
+                    purchase_gl_code_id=line_gl_id if index % 5 == 0 else None,
+                )
+            )
+        db.session.add(
+            PurchaseInvoiceItem(
+                invoice_id=invoice.id,
+                item_name="Deleted item",
+                quantity=1,
+                cost=1,
+                position=len(items),
+            )
+        )
+        db.session.commit()
+        invoice_id = invoice.id
+
+        invoice = db.session.get(PurchaseInvoice, invoice_id)
+        lines = list(invoice.items)
+        expected = [line.resolved_purchase_gl_code() for line in lines]
+
+        db.session.expire_all()
+        invoice = db.session.get(PurchaseInvoice, invoice_id)
+        lines = list(invoice.items)
+        with _QueryCounter(db.engine) as counter:
+            lookup = load_invoice_line_gl_codes(lines)
+            resolved = [lookup.for_invoice_line(line) for line in lines]
+
+        assert [gl.id if gl else None for gl in resolved] == [
+            gl.id if gl else None for gl in expected
+        ]
+        assert counter.count <= 2
@@ -0,0 +1,62 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from app.services.lazy_imports import LazyModule, lazy_module
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+HEAVY_MODULES = (
+    "numpy",
+    "openpyxl",
+    "pandas",
+    "pdfplumber",
+    "PIL",
+    "pypdf",
+    "twilio",
+    "weasyprint",
+    "xlrd",
+)
+
+
+def test_create_app_does_not_import_heavy_dependencies(tmp_path):
+    script = (
+        "import json, sys\n"
+        "from app import create_app\n"
+        "create_app([])\n"
+        f"print(json.dumps([name for name in {HEAVY_MODULES!r} "
+        "if name in sys.modules]))\n"
+    )
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(
+            filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")])
+        ),
+        SECRET_KEY="testsecret",
+        ADMIN_EMAIL="admin@example.com",
+        ADMIN_PASS="adminpass",
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
+
+
+def test_lazy_module_imports_on_first_attribute_access():
+    name = "json.tool"
+    sys.modules.pop(name, None)
+    module = lazy_module(name)
+    assert isinstance(module, LazyModule)
+    assert name not in sys.modules
+
+    assert callable(module.main)
+    assert name in sys.modules
+    assert lazy_module(name) is sys.modules[name]
@@ -0,0 +1,192 @@
+import base64
+import re
+import socket
+import socketserver
+import threading
+
+import pytest
+
+from app.services import mail
+from app.utils.email import MailDeliveryError, send_email
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+            server.sockets.append(self.connection)
+        self._reply("220 localhost test SMTP")
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode().rstrip("\r\n").partition(" ")
+            command = command.upper()
+            if command == "EHLO":
+                self.wfile.write(b"250-localhost\r\n250 AUTH PLAIN\r\n")
+            elif command == "HELO":
+                self._reply("250 localhost")
+            elif command == "AUTH":
+                credentials = base64.b64decode(argument.split()[-1]).split(b"\0")
+                server.logins.append(tuple(part.decode() for part in credentials[1:]))
+                self._reply("235 Authentication successful")
+            elif command == "MAIL":
+                recipients = []
+                self._reply("250 OK")
+            elif command == "RCPT":
+                address = re.search(r"<([^>]*)>", argument).group(1)
+                reply = server.refusal(address)
+                if reply:
+                    self._reply(reply)
+                else:
+                    recipients.append(address)
+                    self._reply("250 OK")
+            elif command == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if data in (b".\r\n", b""):
+                        break
+                    lines.append(data)
+                with server.lock:
+                    server.messages.append((recipients, b"".join(lines)))
+                self._reply("250 Queued")
+            elif command in ("RSET", "NOOP"):
+                recipients = []
+                self._reply("250 OK")
+            elif command == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class _SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.sockets = []
+        self.logins = []
+        self.messages = []
+        self.refused = {}
+        self.deferred = {}
+
+    def refusal(self, address):
+        with self.lock:
+            if self.deferred.get(address):
+                self.deferred[address] -= 1
+                return "451 Try again later"
+            return self.refused.get(address)
+
+    def drop_connections(self):
+        with self.lock:
+            sockets, self.sockets = self.sockets, []
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def recipients(self):
+        return [address for addresses, _ in self.messages for address in addresses]
+
+
+@pytest.fixture
+def smtp_server(app, monkeypatch):
+    server = _SMTPServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    for key in (
+        "SMTP_HOST",
+        "SMTP_PORT",
+        "SMTP_USERNAME",
+        "SMTP_PASSWORD",
+        "SMTP_SENDER",
+        "SMTP_USE_TLS",
+    ):
+        monkeypatch.delenv(key, raising=False)
+    app.config.update(
+        SMTP_HOST="127.0.0.1",
+        SMTP_PORT=server.server_address[1],
+        SMTP_USERNAME="mailer",
+        SMTP_PASSWORD="secret",
+        SMTP_SENDER="stands@example.com",
+    )
+    monkeypatch.setattr(mail, "_RETRY_DELAY", 0)
+    yield server
+    with app.app_context():
+        mail.close_pools()
+    server.shutdown()
+    server.server_close()
+
+
+def _send(to_address):
+    return send_email(
+        to_address=to_address,
+        subject="Stand sheets",
+        body="Attached.",
+        attachments=[("sheet.pdf", b"%PDF-1.4", "application/pdf")],
+    )
+
+
+def test_batch_reuses_one_authenticated_connection(app, smtp_server):
+    addresses = [f"stand{index}@example.com" for index in range(5)]
+
+    with app.app_context():
+        result = _send(", ".join(addresses))
+        _send("manager@example.com; stand0@example.com")
+
+    assert result.sent == addresses
+    assert smtp_server.connections == 1
+    assert smtp_server.logins == [("mailer", "secret")]
+    assert smtp_server.recipients() == addresses + [
+        "manager@example.com",
+        "stand0@example.com",
+    ]
+    # Every recipient gets a copy addressed only to them.
+    assert b"To: stand3@example.com\r\n" in smtp_server.messages[3][1]
+    assert b"stand2@example.com" not in smtp_server.messages[3][1]
+
+
+def test_dropped_and_idle_connections_are_replaced(app, smtp_server):
+    with app.app_context():
+        _send("first@example.com")
+        smtp_server.drop_connections()
+        _send("second@example.com")
+        assert smtp_server.connections == 2
+
+        mail.get_pool().idle_timeout = 0
+        _send("third@example.com")
+        assert smtp_server.connections == 3
+
+    assert smtp_server.recipients() == [
+        "first@example.com",
+        "second@example.com",
+        "third@example.com",
+    ]
+
+
+def test_refusals_fail_only_their_message_and_deferrals_retry(app, smtp_server):
+    smtp_server.refused["gone@example.com"] = "550 No such user"
+    smtp_server.deferred["busy@example.com"] = 1
+
+    with app.app_context():
+        with pytest.raises(MailDeliveryError) as excinfo:
+            _send("a@example.com, gone@example.com, busy@example.com")
+
+    assert [recipient for recipient, _ in excinfo.value.failed] == [
+        "gone@example.com"
+    ]
+    assert smtp_server.recipients() == ["a@example.com", "busy@example.com"]
+    # The permanent refusal kept the session; the deferral retried on a new one.
+    assert smtp_server.connections == 2
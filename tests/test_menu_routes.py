@@ -1,3 +1,5 @@
+from sqlalchemy import event
+
 from tests.test_location_routes import setup_data
 
 from app import db
@@ -7,9 +9,12 @@ from app.models import (
     Location,
     LocationStandItem,
     Menu,
+    MenuAssignment,
     Product,
     ProductRecipeItem,
 )
+from app.services import menu_sync
+from app.services.stock_ledger import verify_balances
 from tests.utils import login
 
 
@@ -89,3 +94,95 @@ def test_menu_edit_syncs_location_stand_sheet(client, app):
         stand_items = LocationStandItem.query.filter_by(location_id=location.id).all()
         assert len(stand_items) == 1
         assert stand_items[0].item.name == "Sugar"
+
+
+def test_menu_sync_uses_set_based_statements(app):
+    from app.utils.menu_assignments import set_locations_menu, sync_menu_locations
+
+    _, prod1_id, menu_id = setup_data(app)
+    with app.app_context():
+        menu = db.session.get(Menu, menu_id)
+        flour = Item.query.filter_by(name="Flour").one()
+        stands = [Location(name=f"Stand {idx}") for idx in range(60)]
+        db.session.add_all(stands)
+        db.session.flush()
+        set_locations_menu(stands, menu)
+        db.session.commit()
+        assert LocationStandItem.query.count() == 60
+        assert MenuAssignment.query.filter_by(
+            menu_id=menu_id, unassigned_at=None
+        ).count() == 60
+
+        eggs = Item(name="Eggs", base_unit="each")
+        db.session.add(eggs)
+        db.session.flush()
+        muffin = Product(name="Muffin", price=2.0, cost=1.0)
+        muffin.recipe_items.append(
+            ProductRecipeItem(item_id=eggs.id, quantity=2, countable=True)
+        )
+        db.session.add(muffin)
+        menu.products = [muffin]
+        db.session.commit()
+
+        statements = []
+
+        def _capture(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", _capture)
+        try:
+            sync_menu_locations(menu)
+            db.session.commit()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", _capture)
+
+        # One pass per statement kind, not one per stand.
+        assert len(statements) < 15
+        rows = LocationStandItem.query.all()
+        assert len(rows) == 60
+        assert {row.item_id for row in rows} == {eggs.id}
+        assert {p.id for p in stands[0].products} == {muffin.id}
+        assert flour.id not in {row.item_id for row in stands[-1].stand_items}
+
+        set_locations_menu(stands[:10], None)
+        db.session.commit()
+        assert LocationStandItem.query.count() == 50
+        assert MenuAssignment.query.filter_by(
+            menu_id=menu_id, unassigned_at=None
+        ).count() == 50
+        assert stands[0].current_menu is None
+        assert stands[0].products == []
+        assert prod1_id not in {p.id for p in stands[20].products}
+
+
+def test_bulk_stand_sheet_changes_reach_the_stock_ledger(app):
+    _, _prod1_id, menu_id = setup_data(app)
+    with app.app_context():
+        flour = Item.query.filter_by(name="Flour").one()
+        source, copy = Location(name="Source"), Location(name="Copy")
+        db.session.add_all([source, copy])
+        db.session.flush()
+        menu_sync.assign_menu(db.session, [source.id], menu_id)
+        db.session.commit()
+        stand_item = LocationStandItem.query.filter_by(
+            location_id=source.id, item_id=flour.id
+        ).one()
+        stand_item.expected_count = 40.0
+        db.session.commit()
+        assert verify_balances() == []
+
+        # Copying a location carries its expected counts over.
+        menu_sync.assign_menu(
+            db.session,
+            [copy.id],
+            menu_id,
+            stand_values={flour.id: (40.0, flour.purchase_gl_code_id)},
+        )
+        db.session.commit()
+        assert verify_balances() == []
+
+        # Dropping every product removes the stand items and their stock.
+        menu_sync.apply_products(db.session, [source.id, copy.id], [])
+        db.session.commit()
+        assert LocationStandItem.query.count() == 0
+        assert verify_balances() == []
@@ -0,0 +1,99 @@
+import os
+
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models import User
+from app.services.metrics import Histogram, MetricsRegistry, RATE_LIMIT_REJECTIONS
+from app.utils.backup import create_backup
+from tests.utils import login
+
+
+def test_metrics_requires_authentication(client):
+    resp = client.get("/metrics")
+    assert resp.status_code == 401
+
+
+def test_metrics_rejects_non_admin(client, app):
+    with app.app_context():
+        db.session.add(
+            User(
+                email="viewer@example.com",
+                password=generate_password_hash("pass"),
+                active=True,
+            )
+        )
+        db.session.commit()
+    with client:
+        login(client, "viewer@example.com", "pass")
+        assert client.get("/metrics").status_code == 403
+
+
+def test_metrics_accepts_bearer_token(client, app):
+    app.config["METRICS_TOKEN"] = "scrape-secret"
+    assert (
+        client.get(
+            "/metrics", headers={"Authorization": "Bearer wrong"}
+        ).status_code
+        == 401
+    )
+
+    client.get("/auth/login")
+    resp = client.get(
+        "/metrics", headers={"Authorization": "Bearer scrape-secret"}
+    )
+    assert resp.status_code == 200
+    assert resp.content_type.startswith("text/plain; version=0.0.4")
+    body = resp.get_data(as_text=True)
+    assert "# TYPE invoicemanager_http_request_duration_seconds histogram" in body
+    assert (
+        'invoicemanager_http_request_duration_seconds_count{endpoint="auth.login",'
+        'method="GET"}' in body
+    )
+    assert 'invoicemanager_sql_query_duration_seconds_count{operation="SELECT"}' in body
+    assert "invoicemanager_activity_log_queue_depth " in body
+
+
+def test_metrics_visible_to_admin_and_record_backups(client, app):
+    with app.app_context():
+        create_backup()
+    with client:
+        login(client, os.environ["ADMIN_EMAIL"], os.environ["ADMIN_PASS"])
+        resp = client.get("/metrics")
+    assert resp.status_code == 200
+    body = resp.get_data(as_text=True)
+    assert "invoicemanager_backup_duration_seconds_count " in body
+    size_line = next(
+        line
+        for line in body.splitlines()
+        if line.startswith("invoicemanager_backup_size_bytes ")
+    )
+    assert float(size_line.split()[1]) > 0
+
+
+def test_rate_limit_breaches_are_counted(client, app):
+    app.config["RATELIMIT_ENABLED"] = True
+    before = RATE_LIMIT_REJECTIONS.value(endpoint="auth.login")
+    for _ in range(6):
+        resp = client.post(
+            "/auth/login", data={"email": "nobody@example.com", "password": "x"}
+        )
+    assert resp.status_code == 429
+    assert RATE_LIMIT_REJECTIONS.value(endpoint="auth.login") == before + 1
+
+
+def test_histogram_exposition_is_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.register(
+        Histogram("demo_seconds", "Demo.", ("kind",), buckets=(0.1, 1.0))
+    )
+    histogram.observe(0.05, kind="a")
+    histogram.observe(0.5, kind="a")
+    histogram.observe(5, kind="a")
+
+    lines = registry.render().splitlines()
+    assert 'demo_seconds_bucket{kind="a",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{kind="a",le="1"} 2' in lines
+    assert 'demo_seconds_bucket{kind="a",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{kind="a"} 3' in lines
+    assert 'demo_seconds_sum{kind="a"} 5.55' in lines
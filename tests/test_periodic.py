@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from app.utils import periodic
+
+
+def test_start_periodic_job_replaces_and_stops_threads(app):
+    app.config["TEST_JOB_INTERVAL_HOURS"] = 1
+    try:
+        assert periodic.start_periodic_job(
+            app, "test-job", "TEST_JOB_INTERVAL_HOURS", lambda app: None
+        )
+        first, _ = periodic._jobs["test-job"]
+        assert first.name == "test-job" and first.is_alive()
+
+        assert periodic.start_periodic_job(
+            app, "test-job", "TEST_JOB_INTERVAL_HOURS", lambda app: None
+        )
+        second, _ = periodic._jobs["test-job"]
+        assert second is not first
+        assert not first.is_alive()
+
+        app.config["TEST_JOB_INTERVAL_HOURS"] = 0
+        assert not periodic.start_periodic_job(
+            app, "test-job", "TEST_JOB_INTERVAL_HOURS", lambda app: None
+        )
+        assert "test-job" not in periodic._jobs
+        assert not second.is_alive()
+    finally:
+        periodic.stop_periodic_job("test-job")
+
+
+def test_daily_job_requires_an_hour_of_the_day(app):
+    app.config["TEST_JOB_HOUR"] = 24
+    assert not periodic.start_periodic_job(
+        app, "test-daily", "TEST_JOB_HOUR", lambda app: None, daily=True
+    )
+    assert "test-daily" not in periodic._jobs
+
+
+def test_failed_run_is_logged_and_does_not_raise(app, monkeypatch):
+    logged = []
+    monkeypatch.setattr(
+        periodic.logger,
+        "exception",
+        lambda msg, *args: logged.append(msg % args),
+    )
+
+    def job(app):
+        raise RuntimeError("boom")
+
+    periodic._run(app, "test-job", job)
+
+    assert logged == ["Background job test-job failed"]
@@ -230,3 +230,93 @@ def test_sales_import_and_terminal_mapping_actions_require_csrf(client, app):
                 follow_redirects=False,
             )
             assert allowed.status_code in {302, 303}
+
+
+def test_sales_import_detail_pages_and_filters_rows(client, app):
+    admin_email = os.getenv("ADMIN_EMAIL", "admin@example.com")
+    admin_pass = os.getenv("ADMIN_PASS", "adminpass")
+
+    with app.app_context():
+        hot_dog = Product(name="Hot Dog", price=5.0, cost=2.0)
+        nachos = Product(name="Nachos", price=7.0, cost=3.0)
+        db.session.add_all([hot_dog, nachos])
+        db.session.flush()
+        db.session.add(
+            TerminalSaleProductAlias(
+                source_name="NACHO GRANDE",
+                normalized_name="nacho grande",
+                product_id=nachos.id,
+            )
+        )
+        sales_import = PosSalesImport(
+            source_provider="mailgun",
+            message_id="msg-paging",
+            attachment_filename="season.xls",
+            attachment_sha256="p" * 64,
+            status="needs_mapping",
+        )
+        db.session.add(sales_import)
+        db.session.flush()
+        stands = [
+            PosSalesImportLocation(
+                import_id=sales_import.id,
+                source_location_name=f"Stand {idx}",
+                normalized_location_name=f"stand {idx}",
+                parse_index=idx,
+            )
+            for idx in range(2)
+        ]
+        db.session.add_all(stands)
+        db.session.flush()
+        for idx in range(120):
+            name, price = ("Hot Dog", 5.0) if idx % 3 else ("Nacho Grande", 6.0)
+            db.session.add(
+                PosSalesImportRow(
+                    import_id=sales_import.id,
+                    location_import_id=stands[0].id,
+                    source_product_name=name if idx != 7 else "Mystery Item",
+                    normalized_product_name=(
+                        name.lower() if idx != 7 else "mystery item"
+                    ),
+                    quantity=0.0 if idx == 5 else 2.0,
+                    is_zero_quantity=idx == 5,
+                    computed_unit_price=price,
+                    computed_line_total=price * 2,
+                    parse_index=idx,
+                )
+            )
+        db.session.commit()
+        import_id = sales_import.id
+        stand_id = stands[0].id
+
+    with client:
+        login(client, admin_email, admin_pass)
+        page = client.get(
+            f"/controlpanel/sales-imports/{import_id}?location_id={stand_id}&per_page=50"
+        )
+        assert page.status_code == 200
+        assert b"120 item rows" in page.data
+        assert b"Page 1 of 3" in page.data
+        assert page.data.count(b"Resolve product mapping") == 1
+        assert b"1 unmapped" in page.data
+
+        unmapped = client.get(
+            f"/controlpanel/sales-imports/{import_id}"
+            f"?location_id={stand_id}&row_filter=unmapped"
+        )
+        assert b"Mystery Item" in unmapped.data
+        assert b"Nacho Grande" not in unmapped.data
+
+        mismatch = client.get(
+            f"/controlpanel/sales-imports/{import_id}"
+            f"?location_id={stand_id}&row_filter=price_mismatch"
+        )
+        assert b"Nacho Grande" in mismatch.data
+        assert b"Hot Dog</td>" not in mismatch.data
+
+    with app.app_context():
+        rows = PosSalesImportRow.query.filter_by(import_id=import_id).all()
+        by_name = {row.source_product_name: row.product_id for row in rows}
+        assert by_name["Hot Dog"] is not None
+        assert by_name["Nacho Grande"] == TerminalSaleProductAlias.query.one().product_id
+        assert by_name["Mystery Item"] is None
@@ -0,0 +1,140 @@
+import datetime
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models import (
+    Item,
+    ItemUnit,
+    Location,
+    LocationStandItem,
+    Product,
+    ProductCostHistory,
+    ProductRecipeItem,
+    PurchaseOrder,
+    PurchaseOrderItem,
+    User,
+    Vendor,
+)
+from app.services.product_costing import (
+    products_using_items,
+    propagate_item_cost_changes,
+)
+from tests.utils import login
+
+
+def _setup_recipes(app):
+    with app.app_context():
+        bun = Item(name="Bun", base_unit="each", cost=0.5)
+        patty = Item(name="Patty", base_unit="each", cost=2.0)
+        bun_case = ItemUnit(item=bun, name="dozen", factor=12)
+        burger = Product(name="Burger", price=10, cost=0, recipe_yield_quantity=1)
+        sliders = Product(name="Sliders", price=8, cost=0, recipe_yield_quantity=2)
+        patty_plate = Product(name="Patty Plate", price=6, cost=1.23)
+        db.session.add_all([bun, patty, bun_case, burger, sliders, patty_plate])
+        db.session.flush()
+        db.session.add_all(
+            [
+                ProductRecipeItem(product=burger, item=bun, quantity=1),
+                ProductRecipeItem(product=burger, item=patty, quantity=1),
+                ProductRecipeItem(
+                    product=sliders, item=bun, unit=bun_case, quantity=0.25
+                ),
+                ProductRecipeItem(product=patty_plate, item=patty, quantity=2),
+            ]
+        )
+        db.session.commit()
+        return bun.id, patty.id, burger.id, sliders.id, patty_plate.id
+
+
+def test_only_dependent_products_are_recalculated(app):
+    bun_id, _, burger_id, sliders_id, plate_id = _setup_recipes(app)
+    with app.app_context():
+        assert products_using_items([bun_id]) == [burger_id, sliders_id]
+
+        db.session.get(Item, bun_id).cost = 1.0
+        changes = propagate_item_cost_changes([bun_id], source="test")
+        db.session.commit()
+
+        assert changes == {
+            burger_id: pytest.approx(3.0),
+            sliders_id: pytest.approx(1.5),
+        }
+        assert db.session.get(Product, burger_id).cost == pytest.approx(3.0)
+        assert db.session.get(Product, sliders_id).cost == pytest.approx(1.5)
+        # Not linked to the bun, so its manual cost is untouched.
+        assert db.session.get(Product, plate_id).cost == pytest.approx(1.23)
+
+        history = ProductCostHistory.query.filter_by(product_id=burger_id).one()
+        assert history.previous_cost == 0
+        assert history.cost == pytest.approx(3.0)
+        assert history.source == "test"
+
+        assert propagate_item_cost_changes([bun_id], source="test") == {}
+        assert ProductCostHistory.query.count() == 2
+
+
+def test_receive_invoice_updates_dependent_product_costs(client, app):
+    _, patty_id, burger_id, _, plate_id = _setup_recipes(app)
+    with app.app_context():
+        user = User(
+            email="costbuyer@example.com",
+            password=generate_password_hash("pass"),
+            active=True,
+        )
+        vendor = Vendor(first_name="Meat", last_name="Co")
+        location = Location(name="Grill")
+        each = ItemUnit(item_id=patty_id, name="each", factor=1, receiving_default=True)
+        db.session.add_all([user, vendor, location, each])
+        db.session.commit()
+        db.session.add(
+            LocationStandItem(
+                location_id=location.id, item_id=patty_id, expected_count=0
+            )
+        )
+        po = PurchaseOrder(
+            vendor_id=vendor.id,
+            user_id=user.id,
+            order_date=datetime.date(2024, 1, 1),
+            expected_date=datetime.date(2024, 1, 2),
+        )
+        db.session.add(po)
+        db.session.flush()
+        db.session.add(
+            PurchaseOrderItem(
+                purchase_order_id=po.id, item_id=patty_id, unit_id=each.id, quantity=4
+            )
+        )
+        db.session.commit()
+        po_id, location_id, unit_id = po.id, location.id, each.id
+
+    with client:
+        login(client, "costbuyer@example.com", "pass")
+        resp = client.post(
+            f"/purchase_orders/{po_id}/receive",
+            data={
+                "received_date": "2024-01-02",
+                "gst": 0,
+                "pst": 0,
+                "delivery_charge": 0,
+                "location_id": location_id,
+                "items-0-item": patty_id,
+                "items-0-unit": unit_id,
+                "items-0-quantity": 4,
+                "items-0-cost": 3.0,
+                "items-0-location_id": 0,
+            },
+            follow_redirects=True,
+        )
+        assert resp.status_code == 200
+
+    with app.app_context():
+        assert db.session.get(Item, patty_id).cost == pytest.approx(3.0)
+        assert db.session.get(Product, burger_id).cost == pytest.approx(3.5)
+        assert db.session.get(Product, plate_id).cost == pytest.approx(6.0)
+        sources = {
+            row.source
+            for row in ProductCostHistory.query.filter_by(product_id=plate_id)
+        }
+        assert sources == {"receive_invoice"}
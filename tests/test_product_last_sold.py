@@ -0,0 +1,227 @@
+import os
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models import (
+    Customer,
+    Event,
+    EventLocation,
+    Invoice,
+    InvoiceProduct,
+    Location,
+    PosSalesImport,
+    PosSalesImportLocation,
+    PosSalesImportRow,
+    Product,
+    TerminalSale,
+    User,
+)
+from app.services.product_last_sold import last_sold_by_product, refresh_last_sold
+from tests.utils import login
+
+NOW = datetime(2026, 10, 1, 12, 0)
+
+
+def _stored(product_id):
+    return db.session.execute(
+        db.select(Product.last_sold_at).where(Product.id == product_id)
+    ).scalar_one()
+
+
+def _setup():
+    user = User(
+        email="lastsold@example.com",
+        password=generate_password_hash("pass"),
+        active=True,
+    )
+    customer = Customer(first_name="Last", last_name="Sold")
+    product = Product(name="Pretzel", price=4.0, cost=1.0)
+    other = Product(name="Lemonade", price=3.0, cost=0.5)
+    event = Event(name="Fair", start_date=date.today(), end_date=date.today())
+    event_location = EventLocation(event=event, location=Location(name="Stand"))
+    db.session.add_all([user, customer, product, other, event, event_location])
+    db.session.commit()
+    return user, customer, product, other, event_location
+
+
+def _invoice(user, customer, product, invoice_id, created):
+    invoice = Invoice(
+        id=invoice_id,
+        user_id=user.id,
+        customer_id=customer.id,
+        date_created=created,
+    )
+    invoice.products.append(
+        InvoiceProduct(
+            quantity=1,
+            product_id=product.id,
+            product_name=product.name,
+            unit_price=4,
+            line_subtotal=4,
+            line_gst=0,
+            line_pst=0,
+        )
+    )
+    db.session.add(invoice)
+    db.session.commit()
+    return invoice
+
+
+def test_orm_writes_keep_last_sold_current(app):
+    with app.app_context():
+        user, customer, product, other, event_location = _setup()
+        assert _stored(product.id) is None
+
+        invoice = _invoice(user, customer, product, "INVLS1", NOW - timedelta(days=5))
+        assert _stored(product.id) == NOW - timedelta(days=5)
+
+        sale = TerminalSale(
+            event_location_id=event_location.id,
+            product_id=product.id,
+            quantity=2,
+            sold_at=NOW,
+        )
+        db.session.add(sale)
+        db.session.commit()
+        assert product.last_sold_at == NOW
+
+        # Moving the sale to another product recomputes both.
+        sale.product_id = other.id
+        db.session.commit()
+        assert _stored(product.id) == NOW - timedelta(days=5)
+        assert _stored(other.id) == NOW
+
+        invoice.date_created = NOW - timedelta(days=2)
+        db.session.commit()
+        assert _stored(product.id) == NOW - timedelta(days=2)
+
+        # Invoice lines are removed by cascade.
+        db.session.delete(invoice)
+        db.session.commit()
+        assert _stored(product.id) is None
+
+        db.session.delete(sale)
+        db.session.commit()
+        assert _stored(other.id) is None
+
+
+def test_approved_pos_imports_count_as_sales(app):
+    with app.app_context():
+        _user, _customer, product, _other, _event_location = _setup()
+        received = NOW - timedelta(days=3)
+        sales_import = PosSalesImport(
+            source_provider="mailgun",
+            message_id="msg-last-sold",
+            attachment_filename="sales.xls",
+            attachment_sha256="l" * 64,
+            received_at=received,
+            status="needs_mapping",
+        )
+        db.session.add(sales_import)
+        db.session.flush()
+        location = PosSalesImportLocation(
+            import_id=sales_import.id,
+            source_location_name="Stand",
+            normalized_location_name="stand",
+            parse_index=0,
+        )
+        db.session.add(location)
+        db.session.flush()
+        db.session.add(
+            PosSalesImportRow(
+                import_id=sales_import.id,
+                location_import_id=location.id,
+                source_product_name="Pretzel",
+                normalized_product_name="pretzel",
+                product_id=product.id,
+                quantity=3.0,
+                parse_index=0,
+            )
+        )
+        db.session.commit()
+        assert _stored(product.id) is None
+
+        sales_import.status = "approved"
+        db.session.commit()
+        assert _stored(product.id) == received
+
+        sales_import.status = "reversed"
+        db.session.commit()
+        assert _stored(product.id) is None
+
+
+def test_refresh_after_bulk_writes(app):
+    with app.app_context():
+        _user, _customer, product, other, event_location = _setup()
+        db.session.execute(
+            insert(TerminalSale),
+            [
+                {
+                    "event_location_id": event_location.id,
+                    "product_id": product.id,
+                    "quantity": 1,
+                    "sold_at": NOW,
+                },
+                {
+                    "event_location_id": event_location.id,
+                    "product_id": other.id,
+                    "quantity": 1,
+                    "sold_at": NOW - timedelta(days=1),
+                },
+            ],
+        )
+        assert _stored(product.id) is None
+        assert last_sold_by_product(db.session) == {
+            product.id: NOW,
+            other.id: NOW - timedelta(days=1),
+        }
+
+        assert refresh_last_sold(db.session, [product.id]) == 1
+        assert _stored(other.id) is None
+        assert refresh_last_sold(db.session) == 1
+        assert refresh_last_sold(db.session) == 0
+        db.session.commit()
+        assert _stored(other.id) == NOW - timedelta(days=1)
+
+
+def test_product_list_sorts_by_last_sold(client, app):
+    with app.app_context():
+        _user, _customer, product, other, event_location = _setup()
+        unsold = Product(name="Snow Cone", price=2.0, cost=0.5)
+        db.session.add(unsold)
+        db.session.add_all(
+            [
+                TerminalSale(
+                    event_location_id=event_location.id,
+                    product_id=product.id,
+                    quantity=1,
+                    sold_at=NOW - timedelta(days=4),
+                ),
+                TerminalSale(
+                    event_location_id=event_location.id,
+                    product_id=other.id,
+                    quantity=1,
+                    sold_at=NOW,
+                ),
+            ]
+        )
+        db.session.commit()
+
+    with client:
+        login(
+            client,
+            os.getenv("ADMIN_EMAIL", "admin@example.com"),
+            os.getenv("ADMIN_PASS", "adminpass"),
+        )
+        body = client.get("/products?sort=last_sold_desc").get_data(as_text=True)
+        assert body.index("Lemonade") < body.index("Pretzel")
+
+        body = client.get(
+            "/products?sort=last_sold_asc&last_sold_before=2026-10-01"
+            "&include_unsold=1"
+        ).get_data(as_text=True)
+        assert body.index("Snow Cone") < body.index("Pretzel")
+        assert "Lemonade" not in body
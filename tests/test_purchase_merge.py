@@ -1,7 +1,5 @@
 import datetime
 import json
-import sys
-import types
 
 import pytest
 from werkzeug.security import generate_password_hash
@@ -22,8 +20,6 @@ from app.services.purchase_merge import merge_purchase_orders, PurchaseMergeErro
 from app.utils.activity import flush_activity_logs
 from tests.utils import login
 
-sys.modules.setdefault("pypdf", types.SimpleNamespace(PdfMerger=object))
-
 
 def _create_user_vendor_and_items(app):
     with app.app_context():
@@ -20,6 +20,7 @@ from app.models import (
     PurchaseInvoice,
     PurchaseInvoiceItem,
     PurchaseOrder,
+    ResultStoreEntry,
     Setting,
     User,
     TerminalSaleProductAlias,
@@ -39,6 +40,15 @@ from app.utils.units import serialize_conversion_setting
 from tests.utils import login
 
 
+def _stored_department_state(state_token: str) -> dict:
+    """Resolve a department sales form token to its server-side state."""
+
+    token_id = _department_sales_serializer().loads(state_token)["token_id"]
+    entry = ResultStoreEntry.query.filter_by(token=token_id).one()
+    assert entry.namespace == "department_sales_forecast"
+    return entry.payload
+
+
 def build_department_sales_workbook() -> BytesIO:
     workbook = Workbook()
     sheet = workbook.active
@@ -1335,8 +1345,7 @@ def test_department_sales_forecast_workflow(client, app):
     state_token = state_match.group(1)
 
     with app.app_context():
-        serializer = _department_sales_serializer()
-        state_data = serializer.loads(state_token)
+        state_data = _stored_department_state(state_token)
         payload = state_data["payload"]
         assert len(payload["departments"]) == 3
         assert payload["departments"][0]["gl_code"] == "401000"
@@ -1424,8 +1433,7 @@ def test_department_sales_forecast_workflow(client, app):
     updated_state_token = state_match_updated.group(1)
 
     with app.app_context():
-        serializer = _department_sales_serializer()
-        updated_state = serializer.loads(updated_state_token)
+        updated_state = _stored_department_state(updated_state_token)
         updated_payload = updated_state["payload"]
         assert updated_payload["options"].get("only_mapped") is True
 
@@ -1530,8 +1538,7 @@ def test_department_sales_forecast_creates_products(client, app):
     state_token = state_match.group(1)
 
     with app.app_context():
-        serializer = _department_sales_serializer()
-        state_data = serializer.loads(state_token)
+        state_data = _stored_department_state(state_token)
         payload = state_data["payload"]
         totals = _collect_department_product_totals(payload)
         auto_map = _auto_resolve_department_products(totals)
@@ -1611,8 +1618,7 @@ def test_department_sales_forecast_creates_products(client, app):
     final_state_token = state_match_final.group(1)
 
     with app.app_context():
-        serializer = _department_sales_serializer()
-        final_state = serializer.loads(final_state_token)
+        final_state = _stored_department_state(final_state_token)
         manual_mappings = final_state["payload"].get("manual_mappings") or {}
         assert donut_key in manual_mappings
         new_product_id = manual_mappings[donut_key]["product_id"]
@@ -0,0 +1,107 @@
+import datetime
+
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models import (
+    Item,
+    Location,
+    ResultStoreEntry,
+    Transfer,
+    TransferItem,
+    User,
+)
+from app.services import result_store
+from tests.utils import login
+
+
+def test_put_and_get_round_trip(app):
+    with app.test_request_context():
+        token = result_store.put("report", {"rows": [1, 2, 3]})
+        assert result_store.get("report", token) == {"rows": [1, 2, 3]}
+        assert result_store.get("other", token) is None
+
+        # Rewriting under the same token replaces the payload.
+        assert result_store.put("report", {"rows": []}, token=token) == token
+        assert result_store.get("report", token) == {"rows": []}
+
+        # A different namespace never reuses somebody else's token.
+        other = result_store.put("other", {"rows": [9]}, token=token)
+        assert other != token
+        assert result_store.get("report", token) == {"rows": []}
+
+        result_store.discard(token)
+        assert result_store.get("report", token) is None
+
+
+def test_expired_entries_are_hidden_and_purged(app):
+    with app.test_request_context():
+        token = result_store.put("report", {"rows": [1]})
+        entry = ResultStoreEntry.query.filter_by(token=token).one()
+        entry.expires_at = datetime.datetime.utcnow() - datetime.timedelta(
+            minutes=1
+        )
+        db.session.commit()
+
+        assert result_store.get("report", token) is None
+        fresh = result_store.put("report", {"rows": [2]})
+        assert ResultStoreEntry.query.filter_by(token=token).first() is None
+        assert result_store.get("report", fresh) == {"rows": [2]}
+
+
+def test_transfer_report_keeps_rows_out_of_the_session(client, app):
+    with app.app_context():
+        user = User(
+            email="report@example.com",
+            password=generate_password_hash("pass"),
+            active=True,
+        )
+        kitchen = Location(name="Kitchen")
+        bar = Location(name="Bar")
+        item = Item(name="Limes", base_unit="each")
+        db.session.add_all([user, kitchen, bar, item])
+        db.session.flush()
+        transfer = Transfer(
+            from_location_id=kitchen.id,
+            to_location_id=bar.id,
+            user_id=user.id,
+            completed=True,
+        )
+        db.session.add(transfer)
+        db.session.flush()
+        db.session.add(
+            TransferItem(
+                transfer_id=transfer.id,
+                item_id=item.id,
+                item_name=item.name,
+                quantity=4,
+                completed_quantity=4,
+            )
+        )
+        db.session.commit()
+
+    start = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+    end = datetime.datetime.utcnow() + datetime.timedelta(days=1)
+    with client:
+        login(client, "report@example.com", "pass")
+        resp = client.post(
+            "/transfers/generate_report",
+            data={
+                "start_datetime": start.strftime("%Y-%m-%d %H:%M"),
+                "end_datetime": end.strftime("%Y-%m-%d %H:%M"),
+            },
+        )
+        assert resp.status_code == 302
+        with client.session_transaction() as sess:
+            assert "aggregated_transfers" not in sess
+            token = sess["transfer_report_token"]
+
+        resp = client.get("/transfers/report")
+        assert resp.status_code == 200
+        assert b"Limes" in resp.data
+        assert b"Kitchen" in resp.data
+
+    with app.app_context():
+        entry = ResultStoreEntry.query.filter_by(token=token).one()
+        assert entry.namespace == "transfer_report"
+        assert entry.payload["aggregated_transfers"][0]["total_quantity"] == 4
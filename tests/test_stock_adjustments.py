@@ -0,0 +1,112 @@
+import pytest
+from sqlalchemy import event, update
+
+from app import db
+from app.models import (
+    GLCode,
+    Item,
+    Location,
+    LocationStandItem,
+    StockMovement,
+)
+from app.services.stock_adjustments import StockAdjustments
+from app.services.stock_ledger import tag_movements, verify_balances
+
+
+def _setup(app):
+    with app.app_context():
+        gl = GLCode(code="530001")
+        db.session.add(gl)
+        db.session.flush()
+        item = Item(
+            name="Napkins", base_unit="each", quantity=10, purchase_gl_code_id=gl.id
+        )
+        kitchen = Location(name="Kitchen")
+        bar = Location(name="Bar")
+        db.session.add_all([item, kitchen, bar])
+        db.session.flush()
+        db.session.add(
+            LocationStandItem(
+                location_id=kitchen.id, item_id=item.id, expected_count=10
+            )
+        )
+        db.session.commit()
+        return item.id, kitchen.id, bar.id, gl.id
+
+
+def test_adjustments_upsert_and_chain_before_after(app):
+    item_id, kitchen_id, bar_id, gl_id = _setup(app)
+    with app.app_context():
+        record = LocationStandItem.query.filter_by(location_id=kitchen_id).one()
+        item = db.session.get(Item, item_id)
+
+        statements = []
+
+        def _capture(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        tag_movements("transfer", reference_type="transfer", reference_id=3)
+        adjustments = StockAdjustments()
+        first = adjustments.adjust_location(kitchen_id, item_id, -4)
+        second = adjustments.adjust_location(kitchen_id, item_id, -2)
+        created = adjustments.adjust_location(bar_id, item_id, 6)
+        item_change = adjustments.adjust_item(item_id, 1.5)
+        event.listen(db.engine, "before_cursor_execute", _capture)
+        try:
+            adjustments.apply()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", _capture)
+
+        upserts = [s for s in statements if "ON CONFLICT" in s]
+        item_updates = [s for s in statements if s.startswith("UPDATE item")]
+        assert len(upserts) == 1
+        assert len(item_updates) == 1
+
+        assert (first.before, first.after) == (pytest.approx(10), pytest.approx(6))
+        assert (second.before, second.after) == (pytest.approx(6), pytest.approx(4))
+        assert (created.before, created.after) == (0, pytest.approx(6))
+        assert first.record_id == record.id
+        assert (item_change.before, item_change.after) == (
+            pytest.approx(10),
+            pytest.approx(11.5),
+        )
+        # Objects already in the session see the new balances.
+        assert record.expected_count == pytest.approx(4)
+        assert item.quantity == pytest.approx(11.5)
+        db.session.commit()
+
+        new_record = LocationStandItem.query.filter_by(location_id=bar_id).one()
+        assert new_record.id == created.record_id
+        assert new_record.purchase_gl_code_id == gl_id
+        movements = StockMovement.query.filter_by(movement_type="transfer").all()
+        assert {(m.location_id, m.quantity) for m in movements} == {
+            (kitchen_id, -6),
+            (bar_id, 6),
+            (None, 1.5),
+        }
+        assert {m.reference_id for m in movements} == {"3"}
+        assert verify_balances() == []
+
+
+def test_adjustments_apply_on_top_of_concurrent_writes(app):
+    item_id, kitchen_id, _, _ = _setup(app)
+    with app.app_context():
+        record = LocationStandItem.query.filter_by(location_id=kitchen_id).one()
+        assert record.expected_count == pytest.approx(10)
+        db.session.commit()
+
+        # Another writer moves stock after this request read the balance.
+        with db.engine.begin() as conn:
+            conn.execute(
+                update(LocationStandItem.__table__)
+                .where(LocationStandItem.__table__.c.id == record.id)
+                .values(expected_count=LocationStandItem.__table__.c.expected_count + 5)
+            )
+
+        adjustments = StockAdjustments()
+        change = adjustments.adjust_location(kitchen_id, item_id, -3)
+        adjustments.apply()
+        db.session.commit()
+
+        assert change.before == pytest.approx(15)
+        assert record.expected_count == pytest.approx(12)
@@ -0,0 +1,179 @@
+import datetime
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models import (
+    Item,
+    Location,
+    LocationStandItem,
+    StockMovement,
+    StockSnapshot,
+    Transfer,
+    TransferItem,
+    User,
+)
+from app.services.stock_ledger import (
+    balances_as_of,
+    create_snapshot,
+    current_balances,
+    movement_context,
+    reconcile_balances,
+    verify_balances,
+)
+from tests.utils import login
+
+
+def _setup_stock(app):
+    with app.app_context():
+        item = Item(name="Cups", base_unit="each", quantity=10)
+        kitchen = Location(name="Kitchen")
+        bar = Location(name="Bar")
+        db.session.add_all([item, kitchen, bar])
+        db.session.flush()
+        db.session.add(
+            LocationStandItem(
+                location_id=kitchen.id, item_id=item.id, expected_count=10
+            )
+        )
+        db.session.commit()
+        return item.id, kitchen.id, bar.id
+
+
+def test_orm_changes_are_written_to_the_ledger(app):
+    item_id, kitchen_id, _ = _setup_stock(app)
+    with app.app_context():
+        assert current_balances() == {
+            (kitchen_id, item_id): pytest.approx(10),
+            (None, item_id): pytest.approx(10),
+        }
+
+        with movement_context(
+            "spoilage", reference_type="test", reference_id=7
+        ):
+            record = LocationStandItem.query.filter_by(
+                location_id=kitchen_id, item_id=item_id
+            ).one()
+            record.expected_count -= 3
+        db.session.commit()
+
+        movement = StockMovement.query.order_by(StockMovement.id.desc()).first()
+        assert movement.quantity == pytest.approx(-3)
+        assert movement.location_id == kitchen_id
+        assert movement.movement_type == "spoilage"
+        assert (movement.reference_type, movement.reference_id) == ("test", "7")
+
+        # Overwriting an expired value still records the delta.
+        db.session.get(Item, item_id).quantity = 4
+        db.session.commit()
+
+        db.session.delete(
+            LocationStandItem.query.filter_by(location_id=kitchen_id).one()
+        )
+        db.session.commit()
+
+        assert current_balances() == {(None, item_id): pytest.approx(4)}
+        assert verify_balances() == []
+
+
+def test_balances_as_of_uses_snapshot_and_later_movements(app):
+    item_id, kitchen_id, _ = _setup_stock(app)
+    with app.app_context():
+        first = StockMovement.query.all()
+        for movement in first:
+            movement.occurred_at = datetime.datetime(2026, 1, 1)
+        db.session.commit()
+
+        snapshot = create_snapshot(datetime.datetime(2026, 1, 2))
+        db.session.commit()
+        assert snapshot.last_movement_id == max(m.id for m in first)
+        assert len(snapshot.lines) == 2
+
+        record = LocationStandItem.query.filter_by(location_id=kitchen_id).one()
+        record.expected_count = 25
+        db.session.commit()
+        later = StockMovement.query.order_by(StockMovement.id.desc()).first()
+        later.occurred_at = datetime.datetime(2026, 2, 1)
+        db.session.commit()
+
+        assert balances_as_of(datetime.datetime(2025, 12, 31)) == {}
+        assert balances_as_of(
+            datetime.datetime(2026, 1, 15), location_ids=[kitchen_id]
+        ) == {(kitchen_id, item_id): pytest.approx(10)}
+        assert balances_as_of(
+            datetime.datetime(2026, 3, 1), location_ids=[kitchen_id]
+        ) == {(kitchen_id, item_id): pytest.approx(25)}
+
+        # A later checkpoint carries the earlier snapshot forward.
+        create_snapshot()
+        db.session.commit()
+        assert StockSnapshot.query.count() == 2
+        assert current_balances(item_ids=[item_id])[
+            (kitchen_id, item_id)
+        ] == pytest.approx(25)
+
+
+def test_reconcile_seeds_balances_loaded_outside_the_orm(app):
+    item_id, kitchen_id, bar_id = _setup_stock(app)
+    with app.app_context():
+        db.session.execute(
+            LocationStandItem.__table__.insert().values(
+                location_id=bar_id, item_id=item_id, expected_count=6
+            )
+        )
+        db.session.commit()
+
+        drifts = verify_balances()
+        assert [(d.location_id, d.difference) for d in drifts] == [(bar_id, 6)]
+
+        assert reconcile_balances() == 1
+        db.session.commit()
+        assert verify_balances() == []
+        assert current_balances()[(bar_id, item_id)] == pytest.approx(6)
+
+
+def test_completing_a_transfer_records_tagged_movements(client, app):
+    item_id, kitchen_id, bar_id = _setup_stock(app)
+    with app.app_context():
+        user = User(
+            email="mover@example.com",
+            password=generate_password_hash("pass"),
+            active=True,
+        )
+        db.session.add(user)
+        db.session.commit()
+        transfer = Transfer(
+            from_location_id=kitchen_id, to_location_id=bar_id, user_id=user.id
+        )
+        db.session.add(transfer)
+        db.session.flush()
+        db.session.add(
+            TransferItem(
+                transfer_id=transfer.id,
+                item_id=item_id,
+                item_name="Cups",
+                quantity=4,
+            )
+        )
+        db.session.commit()
+        transfer_id, user_id = transfer.id, user.id
+
+    with client:
+        login(client, "mover@example.com", "pass")
+        resp = client.post(
+            f"/transfers/complete/{transfer_id}", data={}, follow_redirects=True
+        )
+        assert resp.status_code == 200
+
+    with app.app_context():
+        movements = StockMovement.query.filter_by(reference_type="transfer").all()
+        assert {
+            (m.location_id, m.quantity, m.movement_type, m.user_id)
+            for m in movements
+        } == {
+            (kitchen_id, -4, "transfer", user_id),
+            (bar_id, 4, "transfer", user_id),
+        }
+        assert all(m.reference_id == str(transfer_id) for m in movements)
+        assert verify_balances() == []
@@ -0,0 +1,74 @@
+from datetime import date
+
+import pytest
+
+from app import db
+from app.models import (
+    Event,
+    Item,
+    LocationStandItem,
+    PosSalesImport,
+    Product,
+    PurchaseOrder,
+    TerminalSale,
+)
+from app.utils.synthetic_data import (
+    SCALES,
+    generate_synthetic_dataset,
+    get_scale,
+)
+
+END_DATE = date(2025, 6, 30)
+
+
+def _snapshot():
+    return {
+        "items": [
+            (item.name, item.upc, item.cost)
+            for item in Item.query.order_by(Item.id).limit(25)
+        ],
+        "products": [
+            (product.name, product.price)
+            for product in Product.query.order_by(Product.id).limit(25)
+        ],
+        "sales": db.session.query(db.func.sum(TerminalSale.quantity)).scalar(),
+        "stand_items": LocationStandItem.query.count(),
+    }
+
+
+def test_generator_is_deterministic(app):
+    with app.app_context():
+        counts = generate_synthetic_dataset("tiny", seed=7, end_date=END_DATE)
+        first = _snapshot()
+
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+
+        assert generate_synthetic_dataset("tiny", seed=7, end_date=END_DATE) == counts
+        assert _snapshot() == first
+
+
+def test_generator_covers_benchmark_workloads(app):
+    scale = SCALES["tiny"]
+    with app.app_context():
+        counts = generate_synthetic_dataset(scale, seed=3, end_date=END_DATE)
+
+        assert counts["item"] == scale.items
+        assert counts["product"] == scale.products
+        assert counts["location"] == scale.locations
+        assert PurchaseOrder.query.filter_by(received=False).count() == (
+            scale.open_purchase_orders
+        )
+        assert PosSalesImport.query.filter_by(status="pending").count() == (
+            scale.pos_imports
+        )
+        assert Event.query.filter_by(closed=False).count() > 0
+        assert (
+            db.session.query(db.func.max(Event.end_date)).scalar() <= END_DATE
+        )
+
+
+def test_unknown_scale_is_rejected():
+    with pytest.raises(ValueError):
+        get_scale("enormous")
@@ -0,0 +1,108 @@
+from io import BytesIO
+from pathlib import Path
+
+import pdfplumber
+import pytest
+from pypdf.errors import PdfReadError
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from app.services import terminal_sales_pdf
+
+SAMPLE_PDF = Path(__file__).resolve().parents[1] / "location-12-stand-sheet (1).pdf"
+
+
+def _report(path, stands, items_per_stand=30):
+    """Write a multi-page report; columns are drawn right to left."""
+
+    pdf = canvas.Canvas(str(path), pagesize=letter)
+    expected = []
+    for stand in stands:
+        y = 750
+        pdf.drawString(40, y, stand)
+        for index in range(items_per_stand):
+            y -= 18
+            if y < 40:
+                pdf.showPage()
+                y = 750
+            quantity = str(index % 7 + 1)
+            pdf.drawString(400, y, quantity)
+            pdf.drawString(340, y, "3")
+            pdf.drawString(280, y, "4.00")
+            pdf.drawString(60, y, f"Item {chr(65 + index % 26)}{'x' * (index // 26)}")
+            pdf.drawString(40, y, str(index + 1))
+            expected.append(
+                (stand, f"Item {chr(65 + index % 26)}{'x' * (index // 26)}", quantity)
+            )
+        pdf.showPage()
+    pdf.save()
+    return expected
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    terminal_sales_pdf.clear_cache()
+    yield
+    terminal_sales_pdf.clear_cache()
+
+
+def test_parser_matches_layout_text_on_multi_page_report(tmp_path):
+    path = tmp_path / "report.pdf"
+    expected = _report(path, ["Popcorn East", "Popcorn West", "Pizza"], 60)
+
+    rows = terminal_sales_pdf.parse_terminal_sales_pdf(str(path))
+
+    assert rows == expected
+    with pdfplumber.open(path) as pdf:
+        text = "\n".join(page.extract_text() or "" for page in pdf.pages)
+    assert terminal_sales_pdf.parse_lines(text.splitlines()) == expected
+
+
+def test_large_reports_are_parsed_by_the_worker_pool(app, tmp_path):
+    path = tmp_path / "report.pdf"
+    expected = _report(path, [f"Stand {name}" for name in "ABCDEF"], 45)
+    app.config.update(
+        TERMINAL_SALES_PDF_WORKERS=2, TERMINAL_SALES_PDF_PARALLEL_PAGES=4
+    )
+
+    try:
+        with app.app_context():
+            # The first large report starts the pool and is parsed here.
+            assert terminal_sales_pdf.parse_terminal_sales_pdf(str(path)) == expected
+            for future in terminal_sales_pdf._pool_ready:
+                future.result(timeout=120)
+            assert terminal_sales_pdf._ready_pool(2) is not None
+            assert terminal_sales_pdf.parse_terminal_sales_pdf(str(path)) == expected
+    finally:
+        terminal_sales_pdf.shutdown_pool()
+
+
+def test_results_are_cached_by_file_hash(tmp_path, monkeypatch):
+    path = tmp_path / "report.pdf"
+    expected = _report(path, ["Popcorn East"], 5)
+    rows = terminal_sales_pdf.parse_terminal_sales_pdf(str(path), sha256="abc")
+
+    def _fail(_path):
+        raise AssertionError("parsed again")
+
+    monkeypatch.setattr(terminal_sales_pdf, "_extract_lines", _fail)
+    assert rows == expected
+    assert terminal_sales_pdf.parse_terminal_sales_pdf(str(path), sha256="abc") == rows
+    with pytest.raises(AssertionError):
+        terminal_sales_pdf.parse_terminal_sales_pdf(str(path), sha256="other")
+
+
+def test_unreadable_files_raise_and_are_not_cached(tmp_path):
+    # The checked-in sample is a three byte placeholder, not a PDF.
+    with pytest.raises(PdfReadError):
+        terminal_sales_pdf.parse_terminal_sales_pdf(str(SAMPLE_PDF), sha256="sample")
+    assert not terminal_sales_pdf._cache
+
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+    pdf.drawString(40, 750, "Popcorn East")
+    pdf.save()
+    truncated = tmp_path / "truncated.pdf"
+    truncated.write_bytes(buffer.getvalue()[:200])
+    with pytest.raises(Exception):
+        terminal_sales_pdf.parse_terminal_sales_pdf(str(truncated))
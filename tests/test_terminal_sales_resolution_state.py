@@ -1,4 +1,7 @@
+import json
+import re
 from datetime import date
+from html import unescape
 from secrets import token_urlsafe
 
 from app import db
@@ -8,12 +11,16 @@ from app.models import (
     Location,
     Product,
     TerminalSalesResolutionState,
+    TerminalSalesStagedRow,
+    TerminalSalesStagedSale,
 )
 from app.routes.event_routes import (
     _TERMINAL_SALES_STATE_KEY,
     _should_store_terminal_summary,
     _terminal_sales_serializer,
 )
+from app.services import terminal_sales_staging
+from app.utils.pos_import import group_terminal_sales_rows
 
 
 def _create_event(app):
@@ -203,3 +210,272 @@ def test_large_queue_assign_to_menu_preserves_state(client, app):
     with client.session_transaction() as sess:
         persisted = sess.get(_TERMINAL_SALES_STATE_KEY, {})
         assert persisted[str(event_id)]["token_id"] == token_id
+
+
+def test_resolution_step_keeps_staged_sales(client, app):
+    event_id = _create_event(app)
+
+    with app.app_context():
+        from app.models import User
+
+        event_location = EventLocation.query.filter_by(event_id=event_id).first()
+        user = User(email="staged@example.com", password="", active=True)
+        product = Product(name="Staged Popcorn", price=5.0)
+        db.session.add_all([user, product])
+        db.session.commit()
+
+        user_id = user.id
+        product_id = product.id
+        token_id = token_urlsafe(16)
+        state_row = TerminalSalesResolutionState(
+            event_id=event_id,
+            user_id=user_id,
+            token_id=token_id,
+            payload={
+                "stage": "menus",
+                "queue": [
+                    {
+                        "event_location_id": event_location.id,
+                        "location_name": "Prairie Grill",
+                        "sales_location": "PRAIRIE",
+                        "price_issues": [],
+                        "menu_issues": [
+                            {
+                                "product_id": product_id,
+                                "product_name": product.name,
+                                "menu_name": "Concessions",
+                                "sales_location": "PRAIRIE",
+                                "resolution": None,
+                            }
+                        ],
+                    }
+                ],
+                "issue_index": 0,
+                "token_id": token_id,
+            },
+        )
+        db.session.add(state_row)
+        db.session.flush()
+        terminal_sales_staging.stage(
+            db.session,
+            state_row.id,
+            [
+                {
+                    "event_location_id": event_location.id,
+                    "product_id": product_id,
+                    "product_name": product.name,
+                    "quantity": 12,
+                }
+            ],
+            [{"event_location_id": event_location.id, "total_quantity": 12}],
+        )
+        db.session.commit()
+        staged_ids = [row.id for row in TerminalSalesStagedSale.query.all()]
+
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user_id)
+        sess["_fresh"] = True
+        sess[_TERMINAL_SALES_STATE_KEY] = {str(event_id): {"token_id": token_id}}
+
+    with app.test_request_context():
+        state_token = _terminal_sales_serializer().dumps(
+            {"event_id": event_id, "token_id": token_id}
+        )
+
+    response = client.post(
+        f"/events/{event_id}/sales/upload",
+        data={
+            "step": "resolve",
+            "state_token": state_token,
+            "payload": "{}",
+            "action": f"menu:{product_id}:add",
+        },
+    )
+    assert response.status_code == 200
+
+    with app.app_context():
+        stored_state = TerminalSalesResolutionState.query.filter_by(
+            token_id=token_id
+        ).one()
+        assert "pending_sales" not in stored_state.payload
+        assert stored_state.payload["queue"][0]["menu_issues"][0][
+            "resolution"
+        ] == "add"
+        # The step only touched the issue queue; staged rows were not rewritten.
+        assert [row.id for row in TerminalSalesStagedSale.query.all()] == staged_ids
+        pending_sales, pending_totals = terminal_sales_staging.load(
+            db.session, stored_state.id
+        )
+        assert pending_sales[0]["quantity"] == 12
+        assert pending_totals[0]["total_quantity"] == 12
+
+
+UPLOAD_ROWS = [
+    {"location": "PRAIRIE", "product": "Popcorn", "quantity": 3, "price": 5.0},
+    {
+        "location": "PRAIRIE",
+        "product": "Pretzel",
+        "quantity": 2,
+        "price": 4.5,
+        "raw_price": 4.0,
+        "amount": 9.0,
+    },
+    {"location": "KEYSTONE", "product": "Popcorn", "quantity": 1, "amount": 5.0},
+    {
+        "location": "PRAIRIE",
+        "product": "Popcorn",
+        "quantity": 4,
+        "price": 5.001,
+        "net_including_tax_total": 21.0,
+        "discount_total": -1.0,
+    },
+    {
+        "location": "KEYSTONE",
+        "is_location_total": True,
+        "quantity": 3,
+        "amount": 14.0,
+    },
+    {"location": "KEYSTONE", "is_location_total": True, "quantity": 2},
+]
+
+
+def _public(summary):
+    return {
+        location: {key: value for key, value in data.items() if not key.startswith("_")}
+        for location, data in summary.items()
+    }
+
+
+def _add_state(event_id, user_id, token_id, payload):
+    state_row = TerminalSalesResolutionState(
+        event_id=event_id,
+        user_id=user_id,
+        token_id=token_id,
+        payload=payload,
+    )
+    db.session.add(state_row)
+    db.session.flush()
+    return state_row
+
+
+def test_staged_rows_group_like_the_in_memory_rows(app):
+    event_id = _create_event(app)
+
+    with app.app_context():
+        from app.models import User
+
+        user = User(email="grouped@example.com", password="", active=True)
+        db.session.add(user)
+        db.session.flush()
+        state_row = _add_state(event_id, user.id, token_urlsafe(16), {})
+        terminal_sales_staging.stage_rows(db.session, state_row.id, UPLOAD_ROWS)
+        db.session.commit()
+
+        summary = terminal_sales_staging.summarize_rows(db.session, state_row.id)
+        assert list(summary) == ["PRAIRIE", "KEYSTONE"]
+        assert list(summary["PRAIRIE"]["products"]) == ["Popcorn", "Pretzel"]
+        assert summary == _public(group_terminal_sales_rows(UPLOAD_ROWS))
+        assert summary["KEYSTONE"]["total"] == 2
+        assert summary["KEYSTONE"]["total_amount"] == 14.0
+
+
+def test_restaging_writes_only_changed_positions(app):
+    event_id = _create_event(app)
+
+    with app.app_context():
+        from app.models import User
+
+        event_location = EventLocation.query.filter_by(event_id=event_id).first()
+        user = User(email="restage@example.com", password="", active=True)
+        db.session.add(user)
+        db.session.flush()
+        state_row = _add_state(event_id, user.id, token_urlsafe(16), {})
+        sales = [
+            {
+                "event_location_id": event_location.id,
+                "product_name": name,
+                "normalized_name": name.lower(),
+                "quantity": 1,
+            }
+            for name in ("Popcorn", "Pretzel", "Soda")
+        ]
+        terminal_sales_staging.stage(db.session, state_row.id, sales, [])
+        db.session.commit()
+        ids = {
+            row.product_name: row.id for row in TerminalSalesStagedSale.query.all()
+        }
+
+        sales[1] = dict(sales[1], quantity=6)
+        terminal_sales_staging.stage(db.session, state_row.id, sales[:2], [])
+        db.session.commit()
+
+        staged = {
+            row.product_name: (row.id, row.quantity)
+            for row in TerminalSalesStagedSale.query.all()
+        }
+        assert staged == {
+            "Popcorn": (ids["Popcorn"], 1),
+            "Pretzel": (ids["Pretzel"], 6),
+        }
+
+
+def test_back_to_mapping_regroups_staged_rows(client, app):
+    event_id = _create_event(app)
+
+    with app.app_context():
+        from app.models import User
+
+        event_location = EventLocation.query.filter_by(event_id=event_id).first()
+        user = User(email="regroup@example.com", password="", active=True)
+        db.session.add(user)
+        db.session.flush()
+        user_id = user.id
+        token_id = token_urlsafe(16)
+        state_row = _add_state(
+            event_id,
+            user_id,
+            token_id,
+            {
+                "stage": "menus",
+                "queue": [],
+                "payload": {"filename": "terminal.xls"},
+                "token_id": token_id,
+            },
+        )
+        terminal_sales_staging.stage_rows(db.session, state_row.id, UPLOAD_ROWS)
+        terminal_sales_staging.stage(
+            db.session,
+            state_row.id,
+            [{"event_location_id": event_location.id, "quantity": 7}],
+            [],
+        )
+        db.session.commit()
+
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user_id)
+        sess["_fresh"] = True
+        sess[_TERMINAL_SALES_STATE_KEY] = {str(event_id): {"token_id": token_id}}
+
+    with app.test_request_context():
+        state_token = _terminal_sales_serializer().dumps(
+            {"event_id": event_id, "token_id": token_id}
+        )
+
+    response = client.post(
+        f"/events/{event_id}/sales/upload",
+        data={
+            "step": "resolve",
+            "state_token": state_token,
+            "payload": '{"filename": "terminal.xls"}',
+            "action": "back_to_mapping",
+        },
+    )
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert "PRAIRIE" in page and "KEYSTONE" in page
+    payload_field = re.search(r'name="payload" value="([^"]+)"', page)
+    assert json.loads(unescape(payload_field.group(1))) == {"filename": "terminal.xls"}
+
+    with app.app_context():
+        assert TerminalSalesStagedSale.query.count() == 0
+        assert TerminalSalesStagedRow.query.count() == len(UPLOAD_ROWS)
@@ -6,14 +6,18 @@ from datetime import date
 from io import BytesIO
 
 import pytest
+from sqlalchemy import event as sa_event
 
 from app import db
 from app.models import (
     Event,
     EventLocation,
     EventLocationTerminalSalesSummary,
+    Item,
     Location,
+    LocationStandItem,
     Product,
+    ProductRecipeItem,
     TerminalSale,
     TerminalSalesResolutionState,
     User,
@@ -23,6 +27,7 @@ from app.routes.event_routes import (
     _apply_resolution_actions,
     _derive_summary_totals_from_details,
 )
+from app.services import terminal_sales_staging
 from app.utils.pos_import import (
     combine_terminal_sales_totals,
     derive_terminal_sales_quantity,
@@ -160,6 +165,78 @@ def test_apply_pending_sales_leaves_location_menu_unchanged(app):
         assert sale.quantity == pytest.approx(8.0)
 
 
+def test_apply_pending_sales_batches_queries_across_stands(app):
+    with app.app_context():
+        event = Event(
+            name="Multi Stand Event",
+            start_date=date.today(),
+            end_date=date.today(),
+        )
+        products = [
+            Product(name=f"Snack {idx}", price=4.0, cost=1.0) for idx in range(15)
+        ]
+        for idx, product in enumerate(products):
+            product.recipe_items.append(
+                ProductRecipeItem(
+                    item=Item(name=f"Snack Item {idx}", base_unit="each"),
+                    quantity=1,
+                    countable=True,
+                )
+            )
+        event_locations = [
+            EventLocation(event=event, location=Location(name=f"Stand {idx}"))
+            for idx in range(8)
+        ]
+        db.session.add_all([event, *products, *event_locations])
+        db.session.commit()
+
+        pending_sales = [
+            {
+                "event_location_id": el.id,
+                "product_id": product.id,
+                "product_name": product.name,
+                "normalized_name": product.name.lower(),
+                "quantity": 2.0,
+            }
+            for el in event_locations
+            for product in products
+        ]
+        # A repeated line for the same stand and product replaces the first.
+        pending_sales.append(dict(pending_sales[0], quantity=5.0))
+        pending_totals = [
+            {"event_location_id": el.id, "total_quantity": 30.0}
+            for el in event_locations
+        ]
+
+        statements = []
+
+        def _capture(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        sa_event.listen(db.engine, "before_cursor_execute", _capture)
+        try:
+            _apply_pending_sales(pending_sales, pending_totals)
+            db.session.flush()
+        finally:
+            sa_event.remove(db.engine, "before_cursor_execute", _capture)
+        db.session.commit()
+
+        selects = [s for s in statements if s.lstrip().startswith("SELECT")]
+        assert len(selects) < 20
+        assert TerminalSale.query.count() == len(event_locations) * len(products)
+        first = TerminalSale.query.filter_by(
+            event_location_id=event_locations[0].id, product_id=products[0].id
+        ).one()
+        assert first.quantity == pytest.approx(5.0)
+        assert EventLocationTerminalSalesSummary.query.count() == len(
+            event_locations
+        )
+        # Every stand now counts each product's recipe item.
+        assert LocationStandItem.query.count() == len(event_locations) * len(
+            products
+        )
+
+
 def test_location_total_summary_rows_override_amount(app):
     with app.app_context():
         event = Event(
@@ -892,7 +969,8 @@ def test_terminal_sales_multiple_products_generate_price_issues(app, client):
             event_id=event_id, user_id=admin_user.id
         ).one()
         assert isinstance(state_row.payload, dict)
-        pending_sales = state_row.payload.get("pending_sales") or []
+        assert "pending_sales" not in state_row.payload
+        pending_sales, _ = terminal_sales_staging.load(db.session, state_row.id)
         assert len(pending_sales) == 2
         assert {
             entry.get("product_name") for entry in pending_sales
@@ -980,7 +1058,7 @@ def test_terminal_sales_zero_price_comp_does_not_queue_mismatch(app, client):
         else:
             assert issue_queue == []
 
-        pending_totals = state_row.payload.get("pending_totals") or []
+        _, pending_totals = terminal_sales_staging.load(db.session, state_row.id)
         assert len(pending_totals) == 1
         variance_details = pending_totals[0].get("variance_details") or {}
         price_mismatches = variance_details.get("price_mismatches") or []
@@ -1226,15 +1304,10 @@ def test_terminal_sales_excel_price_mismatch_detected(app, client, monkeypatch):
         state_row = TerminalSalesResolutionState.query.filter_by(
             event_id=event_id, user_id=admin_user.id
         ).one()
-        stored_rows = (
-            (state_row.payload or {})
-            .get("payload", {})
-            .get("rows", [])
-        )
-
-        assert stored_rows, "Expected uploaded rows to be stored in state"
+        assert "rows" not in state_row.payload.get("payload", {})
 
-        grouped = group_terminal_sales_rows(stored_rows)
+        grouped = terminal_sales_staging.summarize_rows(db.session, state_row.id)
+        assert grouped, "Expected uploaded rows to be staged"
         location_summary = grouped[location_name]
         product_summary = location_summary["products"][product_name]
         price_candidates = product_summary["prices"]